@@ -23,5 +23,16 @@ HAIL_SHOULD_PROFILE = os.environ.get('HAIL_SHOULD_PROFILE') is not None
 STANDING_WORKER_MAX_IDLE_TIME_MSECS = int(os.environ['STANDING_WORKER_MAX_IDLE_TIME_SECS']) * 1000
 WORKER_MAX_IDLE_TIME_MSECS = 30 * 1000
 HAIL_SHOULD_CHECK_INVARIANTS = os.environ.get('HAIL_SHOULD_CHECK_INVARIANTS') is not None
+# 'cores' places jobs and divides pools among users by cores alone; 'drf'
+# packs cores, memory and storage together and uses dominant resource fairness
+POOL_SCHEDULING_POLICY = os.environ.get('HAIL_POOL_SCHEDULING_POLICY', 'cores')
+assert POOL_SCHEDULING_POLICY in ('cores', 'drf'), POOL_SCHEDULING_POLICY
+# pool schedulers draw ready jobs from an in-memory index rather than
+# querying each of a user's running batches every round
+POOL_READY_JOB_INDEX = os.environ.get('HAIL_POOL_READY_JOB_INDEX', '1') == '1'
+# fraction of the unreserved data disk of pool workers set aside for caching
+# job inputs; the cache is off unless this is set
+INPUT_CACHE_FRACTION_OF_DATA_DISK = float(os.environ.get('HAIL_BATCH_INPUT_CACHE_FRACTION_OF_DATA_DISK', '0'))
+assert 0 <= INPUT_CACHE_FRACTION_OF_DATA_DISK < 1, INPUT_CACHE_FRACTION_OF_DATA_DISK
 
 MACHINE_NAME_PREFIX = f'batch-worker-{DEFAULT_NAMESPACE}-'
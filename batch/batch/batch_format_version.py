@@ -19,6 +19,9 @@ class BatchFormatVersion:
     def has_attempt_in_log_path(self):
         return self.format_version > 1
 
+    def has_compressed_specs(self):
+        return self.format_version > 7
+
     def db_spec(self, spec):
         if self.format_version == 1:
             return spec
@@ -50,12 +53,22 @@ class BatchFormatVersion:
                 int(len(spec.get('output_files', [])) > 0),
             ]
 
+        if self.format_version < 7:
+            return [
+                secrets,
+                service_account,
+                int(len(spec.get('input_files', [])) > 0),
+                int(len(spec.get('output_files', [])) > 0),
+                machine_spec,
+            ]
+
         return [
             secrets,
             service_account,
             int(len(spec.get('input_files', [])) > 0),
             int(len(spec.get('output_files', [])) > 0),
             machine_spec,
+            resources['storage_gib'],
         ]
 
     def get_spec_secrets(self, spec):
@@ -99,6 +112,11 @@ class BatchFormatVersion:
             }
         return None
 
+    def get_spec_storage_gib(self, spec):
+        if self.format_version < 7:
+            return None
+        return spec[5]
+
     def db_status(self, status):
         if self.format_version == 1:
             return status
@@ -1,5 +1,5 @@
 from typing import Union, List, Optional
-import sys
+import argparse
 import json
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
@@ -7,7 +7,7 @@ from hailtop.aiotools.fs import RouterAsyncFS, LocalAsyncFS, Transfer
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 
 
-async def copy(requester_pays_project: Optional[str], transfer: Union[Transfer, List[Transfer]]) -> None:
+async def copy(requester_pays_project: Optional[str], transfer: Union[Transfer, List[Transfer]], sync: bool = False) -> None:
     if requester_pays_project:
         params = {'userProject': requester_pays_project}
     else:
@@ -16,17 +16,24 @@ async def copy(requester_pays_project: Optional[str], transfer: Union[Transfer,
         async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool), GoogleStorageAsyncFS(params=params)]) as fs:
             sema = asyncio.Semaphore(50)
             async with sema:
-                copy_report = await fs.copy(sema, transfer)
+                copy_report = await fs.copy(sema, transfer, sync=sync)
                 copy_report.summarize()
 
 
 async def main() -> None:
-    assert len(sys.argv) == 3
-    requster_pays_project = json.loads(sys.argv[1])
-    files = json.loads(sys.argv[2])
+    parser = argparse.ArgumentParser()
+    parser.add_argument('requester_pays_project', help='JSON-encoded requester pays project')
+    parser.add_argument('files', help='JSON-encoded list of {"from": ..., "to": ...}')
+    parser.add_argument('--sync', action='store_true', help='skip files whose destination is unchanged')
+    args = parser.parse_args()
+
+    requster_pays_project = json.loads(args.requester_pays_project)
+    files = json.loads(args.files)
 
     await copy(
-        requster_pays_project, [Transfer(f['from'], f['to'], treat_dest_as=Transfer.DEST_IS_TARGET) for f in files]
+        requster_pays_project,
+        [Transfer(f['from'], f['to'], treat_dest_as=Transfer.DEST_IS_TARGET) for f in files],
+        sync=args.sync,
     )
 
 
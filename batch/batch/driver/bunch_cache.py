@@ -0,0 +1,53 @@
+from typing import List, Tuple
+import bisect
+
+from gear import Database
+
+from ..spec_cache import SpecCache
+
+# number of bunches to remember across batches
+MAX_CACHED_BUNCHES = 100_000
+
+
+class BatchBunches:
+    def __init__(self, start_job_ids: List[int], tokens: List[str]):
+        self.start_job_ids = start_job_ids
+        self.tokens = tokens
+
+    def __len__(self):
+        return len(self.start_job_ids)
+
+
+class BatchBunchCache:
+    """The bunches of the batches being scheduled.
+
+    Jobs are only scheduled from closed batches, whose bunches no longer
+    change, so a batch's bunches are read from the database once and the
+    bunch of each of its jobs is found in memory.
+    """
+
+    def __init__(self, db: Database, max_bunches: int = MAX_CACHED_BUNCHES):
+        self.db = db
+        self.cache = SpecCache(max_bunches)
+
+    async def _read_bunches(self, batch_id: int) -> BatchBunches:
+        records = self.db.select_and_fetchall(
+            '''
+SELECT start_job_id, token FROM batch_bunches
+WHERE batch_id = %s
+ORDER BY start_job_id;
+''',
+            (batch_id,),
+        )
+        start_job_ids = []
+        tokens = []
+        async for record in records:
+            start_job_ids.append(record['start_job_id'])
+            tokens.append(record['token'])
+        return BatchBunches(start_job_ids, tokens)
+
+    async def get_token_start_id(self, batch_id: int, job_id: int) -> Tuple[str, int]:
+        bunches = await self.cache.get(batch_id, lambda: self._read_bunches(batch_id))
+        i = bisect.bisect_right(bunches.start_job_ids, job_id) - 1
+        assert i >= 0, (batch_id, job_id)
+        return (bunches.tokens[i], bunches.start_job_ids[i])
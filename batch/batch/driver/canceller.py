@@ -1,5 +1,6 @@
 import logging
 import asyncio
+import collections
 
 from hailtop.utils import (
     WaitableSharedPool,
@@ -12,12 +13,17 @@ from hailtop.utils import (
 from hailtop import aiotools, aiogoogle
 from gear import Database
 
-from .job import unschedule_job, mark_job_complete
+from .job import cancel_ready_jobs, unschedule_jobs, mark_job_complete
 from .instance_collection_manager import InstanceCollectionManager
 from ..utils import Box
 
 log = logging.getLogger('canceller')
 
+# cancelled ready jobs are cancelled in bulk, a batch at a time, up to this
+# many per call and, shared among users, per round
+CANCELLED_READY_JOBS_PER_CALL = 1000
+CANCELLED_READY_JOBS_PER_ROUND = 10000
+
 
 class Canceller:
     def __init__(self, app):
@@ -83,11 +89,11 @@ HAVING n_cancelled_ready_jobs > 0;
             should_wait = True
             return should_wait
         user_share = {
-            user: max(int(300 * user_n_jobs / total + 0.5), 20)
+            user: max(int(CANCELLED_READY_JOBS_PER_ROUND * user_n_jobs / total + 0.5), CANCELLED_READY_JOBS_PER_CALL)
             for user, user_n_jobs in user_n_cancelled_ready_jobs.items()
         }
 
-        async def user_cancelled_ready_jobs(user, remaining):
+        async def user_batches_with_cancelled_ready_jobs(user):
             async for batch in self.db.select_and_fetchall(
                 '''
 SELECT id, cancelled
@@ -98,61 +104,40 @@ WHERE user = %s AND `state` = 'running';
                 timer_description=f'in cancel_cancelled_ready_jobs: get {user} running batches',
             ):
                 if batch['cancelled']:
-                    async for record in self.db.select_and_fetchall(
-                        '''
-SELECT jobs.job_id
-FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
-WHERE batch_id = %s AND state = 'Ready' AND always_run = 0
-LIMIT %s;
-''',
-                        (batch['id'], remaining.value),
-                        timer_description=f'in cancel_cancelled_ready_jobs: get {user} batch {batch["id"]} ready cancelled jobs (1)',
-                    ):
-                        record['batch_id'] = batch['id']
-                        yield record
+                    yield batch['id']
                 else:
-                    async for record in self.db.select_and_fetchall(
+                    record = await self.db.select_and_fetchone(
                         '''
 SELECT jobs.job_id
 FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
 WHERE batch_id = %s AND state = 'Ready' AND always_run = 0 AND cancelled = 1
-LIMIT %s;
+LIMIT 1;
 ''',
-                        (batch['id'], remaining.value),
-                        timer_description=f'in cancel_cancelled_ready_jobs: get {user} batch {batch["id"]} ready cancelled jobs (2)',
-                    ):
-                        record['batch_id'] = batch['id']
-                        yield record
-
-        waitable_pool = WaitableSharedPool(self.async_worker_pool)
+                        (batch['id'],),
+                    )
+                    if record:
+                        yield batch['id']
 
         should_wait = True
         for user, share in user_share.items():
             remaining = Box(share)
-            async for record in user_cancelled_ready_jobs(user, remaining):
-                batch_id = record['batch_id']
-                job_id = record['job_id']
-                id = (batch_id, job_id)
-                log.info(f'cancelling job {id}')
-
-                async def cancel_with_error_handling(app, batch_id, job_id, id):
+            async for batch_id in user_batches_with_cancelled_ready_jobs(user):
+                while remaining.value > 0:
                     try:
-                        resources = []
-                        await mark_job_complete(
-                            app, batch_id, job_id, None, None, 'Cancelled', None, None, None, 'cancelled', resources
+                        n_cancelled_jobs = await cancel_ready_jobs(
+                            self.app, batch_id, min(remaining.value, CANCELLED_READY_JOBS_PER_CALL)
                         )
                     except Exception:
-                        log.info(f'error while cancelling job {id}', exc_info=True)
-
-                await waitable_pool.call(cancel_with_error_handling, self.app, batch_id, job_id, id)
+                        log.info(f'error while cancelling ready jobs of batch {batch_id}', exc_info=True)
+                        break
+                    if n_cancelled_jobs == 0:
+                        break
+                    remaining.value -= n_cancelled_jobs
 
-                remaining.value -= 1
                 if remaining.value <= 0:
                     should_wait = False
                     break
 
-        await waitable_pool.wait()
-
         return should_wait
 
     async def cancel_cancelled_creating_jobs_loop_body(self):
@@ -305,26 +290,27 @@ LIMIT %s;
         waitable_pool = WaitableSharedPool(self.async_worker_pool)
 
         should_wait = True
+        instance_records = collections.defaultdict(list)
         for user, share in user_share.items():
             remaining = Box(share)
             async for record in user_cancelled_running_jobs(user, remaining):
-                batch_id = record['batch_id']
-                job_id = record['job_id']
-                id = (batch_id, job_id)
-
-                async def unschedule_with_error_handling(app, record, instance_name, id):
-                    try:
-                        await unschedule_job(app, record)
-                    except Exception:
-                        log.info(f'unscheduling job {id} on instance {instance_name}', exc_info=True)
-
-                await waitable_pool.call(unschedule_with_error_handling, self.app, record, record['instance_name'], id)
+                instance_records[record['instance_name']].append(record)
 
                 remaining.value -= 1
                 if remaining.value <= 0:
                     should_wait = False
                     break
 
+        for instance_name, records in instance_records.items():
+
+            async def unschedule_with_error_handling(app, instance_name, records):
+                try:
+                    await unschedule_jobs(app, instance_name, records)
+                except Exception:
+                    log.info(f'unscheduling {len(records)} jobs on instance {instance_name}', exc_info=True)
+
+            await waitable_pool.call(unschedule_with_error_handling, self.app, instance_name, records)
+
         await waitable_pool.wait()
 
         return should_wait
@@ -335,6 +321,7 @@ LIMIT %s;
 
         n_unscheduled = 0
 
+        instance_records = collections.defaultdict(list)
         async for record in self.db.select_and_fetchall(
             '''
 SELECT attempts.*
@@ -350,24 +337,22 @@ LIMIT 300;
 ''',
             timer_description='in cancel_orphaned_attempts',
         ):
-            batch_id = record['batch_id']
-            job_id = record['job_id']
-            attempt_id = record['attempt_id']
-            instance_name = record['instance_name']
-            id = (batch_id, job_id)
-
+            instance_records[record['instance_name']].append(record)
             n_unscheduled += 1
 
-            async def unschedule_with_error_handling(app, record, instance_name, id, attempt_id):
+        for instance_name, records in instance_records.items():
+
+            async def unschedule_with_error_handling(app, instance_name, records):
                 try:
-                    await unschedule_job(app, record)
+                    await unschedule_jobs(app, instance_name, records)
                 except Exception:
+                    attempts = [(record['batch_id'], record['job_id'], record['attempt_id']) for record in records]
                     log.info(
-                        f'unscheduling job {id} with orphaned attempt {attempt_id} on instance {instance_name}',
+                        f'unscheduling orphaned attempts {attempts} on instance {instance_name}',
                         exc_info=True,
                     )
 
-            await waitable_pool.call(unschedule_with_error_handling, self.app, record, instance_name, id, attempt_id)
+            await waitable_pool.call(unschedule_with_error_handling, self.app, instance_name, records)
 
         await waitable_pool.wait()
 
@@ -6,7 +6,13 @@ import uuid
 
 from hailtop import aiogoogle
 
-from ..batch_configuration import PROJECT, DOCKER_ROOT_IMAGE, DOCKER_PREFIX, DEFAULT_NAMESPACE
+from ..batch_configuration import (
+    PROJECT,
+    DOCKER_ROOT_IMAGE,
+    DOCKER_PREFIX,
+    DEFAULT_NAMESPACE,
+    INPUT_CACHE_FRACTION_OF_DATA_DISK,
+)
 from ..inst_coll_config import machine_type_to_dict
 from ..worker_config import WorkerConfig
 from ..log_store import LogStore
@@ -57,10 +63,13 @@ async def create_instance(
 
     if job_private:
         unreserved_disk_storage_gb = worker_pd_ssd_data_disk_size_gb
+        # the job has the whole data disk
+        input_cache_fraction = 0.0
     else:
         unreserved_disk_storage_gb = unreserved_worker_data_disk_size_gib(
             worker_local_ssd_data_disk, worker_pd_ssd_data_disk_size_gb, cores
         )
+        input_cache_fraction = INPUT_CACHE_FRACTION_OF_DATA_DISK
     assert unreserved_disk_storage_gb >= 0
 
     config = {
@@ -128,6 +137,7 @@ set -x
 
 WORKER_DATA_DISK_NAME="{worker_data_disk_name}"
 UNRESERVED_WORKER_DATA_DISK_SIZE_GB="{unreserved_disk_storage_gb}"
+INPUT_CACHE_FRACTION_OF_DATA_DISK="{input_cache_fraction}"
 
 # format worker data disk
 sudo mkfs.xfs -m reflink=1 -n ftype=1 /dev/$WORKER_DATA_DISK_NAME
@@ -265,6 +275,7 @@ docker run \
 -e BATCH_WORKER_IMAGE=$BATCH_WORKER_IMAGE \
 -e BATCH_WORKER_IMAGE_ID=$BATCH_WORKER_IMAGE_ID \
 -e UNRESERVED_WORKER_DATA_DISK_SIZE_GB=$UNRESERVED_WORKER_DATA_DISK_SIZE_GB \
+-e INPUT_CACHE_FRACTION_OF_DATA_DISK=$INPUT_CACHE_FRACTION_OF_DATA_DISK \
 -v /var/run/docker.sock:/var/run/docker.sock \
 -v /var/run/netns:/var/run/netns:shared \
 -v /usr/bin/docker:/usr/bin/docker \
@@ -3,12 +3,14 @@ import datetime
 import logging
 import secrets
 import humanize
+from typing import Dict, Tuple
 
 from hailtop.utils import time_msecs, time_msecs_str, retry_transient_errors
 from gear import Database
 
 from ..database import check_call_procedure
 from ..globals import INSTANCE_VERSION
+from .packing import Resources, NO_RESOURCES
 
 log = logging.getLogger('instance')
 
@@ -111,6 +113,11 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         self.zone = zone
         self.machine_type = machine_type
         self.preemptible = preemptible
+        # Resources of the jobs this driver scheduled on the instance. The
+        # database only tracks cores, so jobs scheduled before the driver
+        # started are not included.
+        self.job_resources: Dict[Tuple[int, int], Tuple[str, Resources]] = {}
+        self.reserved_resources = NO_RESOURCES
 
     @property
     def state(self):
@@ -147,6 +154,8 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         self.inst_coll.adjust_for_remove_instance(self)
         self._state = 'inactive'
         self._free_cores_mcpu = self.cores_mcpu
+        self.job_resources = {}
+        self.reserved_resources = NO_RESOURCES
         self.inst_coll.adjust_for_add_instance(self)
 
         # there might be jobs to reschedule
@@ -195,6 +204,17 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         self._free_cores_mcpu += delta_mcpu
         self.inst_coll.adjust_for_add_instance(self)
 
+    def reserve_job_resources_in_memory(self, id, user: str, resources: Resources):
+        self.release_job_resources_in_memory(id)
+        self.job_resources[id] = (user, resources)
+        self.reserved_resources = self.reserved_resources.plus(resources)
+
+    def release_job_resources_in_memory(self, id):
+        user_resources = self.job_resources.pop(id, None)
+        if user_resources is not None:
+            _, resources = user_resources
+            self.reserved_resources = self.reserved_resources.minus(resources)
+
     @property
     def failed_request_count(self):
         return self._failed_request_count
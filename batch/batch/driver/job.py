@@ -8,18 +8,18 @@ import traceback
 from hailtop.aiotools import BackgroundTaskManager
 from hailtop.utils import time_msecs, Notice, retry_transient_errors
 from hailtop.httpx import client_session
-from gear import Database
+from gear import Database, transaction
 
 from ..batch import batch_record_to_dict
 from ..globals import complete_states, tasks, STATUS_FORMAT_VERSION
-from ..batch_configuration import KUBERNETES_TIMEOUT_IN_SECONDS, KUBERNETES_SERVER_URL
+from ..batch_configuration import KUBERNETES_TIMEOUT_IN_SECONDS, KUBERNETES_SERVER_URL, POOL_READY_JOB_INDEX
 from ..batch_format_version import BatchFormatVersion
-from ..spec_writer import SpecWriter
 from ..log_store import LogStore
 
 from .k8s_cache import K8sCache
+from .bunch_cache import BatchBunchCache
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 if TYPE_CHECKING:
     from .instance_collection_manager import InstanceCollectionManager  # pylint: disable=cyclic-import
@@ -82,40 +82,167 @@ ON DUPLICATE KEY UPDATE quantity = quantity;
             raise
 
 
-async def mark_job_complete(
-    app, batch_id, job_id, attempt_id, instance_name, new_state, status, start_time, end_time, reason, resources
-):
+async def add_attempts_resources(db, attempts):
+    resource_args = [
+        (batch_id, job_id, attempt_id, resource['name'], resource['quantity'])
+        for batch_id, job_id, attempt_id, resources in attempts
+        if attempt_id
+        for resource in resources
+    ]
+    if not resource_args:
+        return
+
+    try:
+        await db.execute_many(
+            '''
+INSERT INTO `attempt_resources` (batch_id, job_id, attempt_id, resource, quantity)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE quantity = quantity;
+''',
+            resource_args,
+        )
+    except Exception:
+        log.exception(f'error while inserting resources for {len(attempts)} attempts')
+        raise
+
+
+async def add_ready_children_to_index(db, inst_coll_manager, parent_ids):
+    where = ' OR '.join(['(job_parents.batch_id = %s AND job_parents.parent_id = %s)'] * len(parent_ids))
+    records = db.select_and_fetchall(
+        f'''
+SELECT jobs.batch_id, jobs.job_id, jobs.spec, jobs.cores_mcpu, jobs.always_run, jobs.inst_coll,
+  batches.userdata, batches.user, batches.format_version
+FROM job_parents
+INNER JOIN jobs ON jobs.batch_id = job_parents.batch_id AND jobs.job_id = job_parents.job_id
+INNER JOIN batches ON batches.id = jobs.batch_id
+WHERE ({where}) AND jobs.state = 'Ready' AND batches.`state` = 'running'
+  AND (jobs.always_run OR (NOT jobs.cancelled AND NOT batches.cancelled));
+''',
+        [x for id in parent_ids for x in id],
+        timer_description=f'in add_ready_children_to_index: get ready children of {len(parent_ids)} jobs',
+    )
+    # a child read as ready may be scheduled before its record is added
+    pools = list(inst_coll_manager.pools.values())
+    generations = {pool.name: pool.scheduler.ready_jobs.start_query() for pool in pools}
+    try:
+        async for record in records:
+            pool = inst_coll_manager.pools.get(record.pop('inst_coll'))
+            if pool:
+                pool.scheduler.ready_jobs.add(record, generations[pool.name])
+    finally:
+        for pool in pools:
+            pool.scheduler.ready_jobs.end_query(generations[pool.name])
+
+
+async def mark_jobs_complete(app, instance_name, completions) -> List[Optional[Exception]]:
+    """Mark jobs that ran on `instance_name` complete.
+
+    Each completion is a dict with the batch_id, job_id, attempt_id,
+    new_state, status, start_time, end_time, reason and resources of a job.
+    The jobs, their attempts, the instance's free cores, the batches'
+    counters and the jobs' children are updated in one transaction by the
+    mark_jobs_complete procedure, with a few set-based statements over a
+    temporary table of the completions, and the in-memory bookkeeping,
+    attempt resources and batch callbacks are then handled once for all of
+    them. Returns, for
+    each completion, the error that prevented marking it complete, or None;
+    if the transaction fails, every completion gets its error and is retried
+    or rejected by the caller as before.
+    """
     scheduler_state_changed: Notice = app['scheduler_state_changed']
     cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
     db: Database = app['db']
     inst_coll_manager: 'InstanceCollectionManager' = app['inst_coll_manager']
     task_manager: BackgroundTaskManager = app['task_manager']
 
-    id = (batch_id, job_id)
+    now = time_msecs()
 
-    log.info(f'marking job {id} complete new_state {new_state}')
+    for completion in completions:
+        log.info(
+            f'marking job {(completion["batch_id"], completion["job_id"])} complete '
+            f'new_state {completion["new_state"]}'
+        )
 
-    now = time_msecs()
+    # the procedure handles each job once, so a job reported twice is marked
+    # complete again in a later round, as if it had been reported later
+    rounds: List[List[int]] = []
+    job_rounds: Dict[Tuple[int, int], int] = {}
+    for i, completion in enumerate(completions):
+        id = (completion['batch_id'], completion['job_id'])
+        r = job_rounds.get(id, -1) + 1
+        job_rounds[id] = r
+        if r == len(rounds):
+            rounds.append([])
+        rounds[r].append(i)
+
+    @transaction(db)
+    async def mark_complete(tx):
+        await tx.just_execute('DROP TEMPORARY TABLE IF EXISTS `tmp_job_completions`;')
+        await tx.just_execute(
+            '''
+CREATE TEMPORARY TABLE `tmp_job_completions` (
+  `idx` INT NOT NULL,
+  `batch_id` BIGINT NOT NULL,
+  `job_id` INT NOT NULL,
+  `attempt_id` VARCHAR(40),
+  `new_state` VARCHAR(40) NOT NULL,
+  `new_status` TEXT,
+  `new_start_time` BIGINT,
+  `new_end_time` BIGINT,
+  `new_reason` VARCHAR(40),
+  `cores_mcpu` INT,
+  `new_attempt` BOOLEAN NOT NULL DEFAULT 0,
+  `old_end_time` BIGINT,
+  `rc` INT,
+  `old_state` VARCHAR(40),
+  `expected_attempt_id` VARCHAR(40),
+  `delta_cores_mcpu` INT NOT NULL DEFAULT 0,
+  `changed` BOOLEAN NOT NULL DEFAULT 0,
+  PRIMARY KEY (`idx`)
+);
+'''
+        )
+        rvs: List[Optional[dict]] = [None for _ in completions]
+        for idxs in rounds:
+            await tx.just_execute('DELETE FROM `tmp_job_completions`;')
+            await tx.execute_many(
+                '''
+INSERT INTO `tmp_job_completions`
+  (idx, batch_id, job_id, attempt_id, new_state, new_status, new_start_time, new_end_time, new_reason)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
+''',
+                [
+                    (
+                        i,
+                        completions[i]['batch_id'],
+                        completions[i]['job_id'],
+                        completions[i]['attempt_id'],
+                        completions[i]['new_state'],
+                        json.dumps(completions[i]['status']) if completions[i]['status'] is not None else None,
+                        completions[i]['start_time'],
+                        completions[i]['end_time'],
+                        completions[i]['reason'],
+                    )
+                    for i in idxs
+                ],
+            )
+            async for rv in tx.execute_and_fetchall('CALL mark_jobs_complete(%s, %s);', (instance_name, now)):
+                rvs[rv['idx']] = rv
+        await tx.just_execute('DROP TEMPORARY TABLE `tmp_job_completions`;')
+        return rvs
 
     try:
-        rv = await db.execute_and_fetchone(
-            'CALL mark_job_complete(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);',
-            (
-                batch_id,
-                job_id,
-                attempt_id,
-                instance_name,
-                new_state,
-                json.dumps(status) if status is not None else None,
-                start_time,
-                end_time,
-                reason,
-                now,
-            ),
-        )
-    except Exception:
-        log.exception(f'error while marking job {id} complete on instance {instance_name}')
-        raise
+        rvs = await mark_complete()  # pylint: disable=no-value-for-parameter
+    except Exception as e:
+        log.exception(f'error while marking {len(completions)} jobs complete on instance {instance_name}')
+        return [e for _ in completions]
+    assert all(rv is not None for rv in rvs), rvs
+
+    errors: List[Optional[Exception]] = [None for _ in completions]
+    marked = list(zip(completions, rvs))
+
+    if not marked:
+        return errors
 
     scheduler_state_changed.notify()
     cancel_ready_state_changed.set()
@@ -125,54 +252,135 @@ async def mark_job_complete(
     if instance_name:
         instance = inst_coll_manager.get_instance(instance_name)
         if instance:
-            if rv['delta_cores_mcpu'] != 0 and instance.state == 'active':
+            delta_cores_mcpu = 0
+            for completion, rv in marked:
+                if rv['rc'] == 0:
+                    instance.release_job_resources_in_memory((completion['batch_id'], completion['job_id']))
+                delta_cores_mcpu += rv['delta_cores_mcpu']
+            if delta_cores_mcpu != 0 and instance.state == 'active':
                 # may also create scheduling opportunities, set above
-                instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
+                instance.adjust_free_cores_in_memory(delta_cores_mcpu)
         else:
-            log.warning(f'mark_complete for job {id} from unknown {instance}')
+            log.warning(f'mark_complete for {len(marked)} jobs from unknown {instance}')
+
+    await add_attempts_resources(
+        db,
+        [
+            (completion['batch_id'], completion['job_id'], completion['attempt_id'], completion['resources'])
+            for completion, _ in marked
+        ],
+    )
 
-    await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
+    # batches in the order their jobs completed
+    changed_batch_ids: Dict[int, None] = {}
+    completed_ids = []
+    for completion, rv in marked:
+        id = (completion['batch_id'], completion['job_id'])
 
-    if rv['rc'] != 0:
-        log.info(f'mark_job_complete returned {rv} for job {id}')
-        return
+        if rv['rc'] != 0:
+            log.info(f'mark_job_complete returned {rv} for job {id}')
+            continue
 
-    old_state = rv['old_state']
-    if old_state in complete_states:
-        log.info(f'old_state {old_state} complete for job {id}, doing nothing')
-        # already complete, do nothing
-        return
+        old_state = rv['old_state']
+        if old_state in complete_states:
+            log.info(f'old_state {old_state} complete for job {id}, doing nothing')
+            # already complete, do nothing
+            continue
 
-    log.info(f'job {id} changed state: {rv["old_state"]} => {new_state}')
+        log.info(f'job {id} changed state: {rv["old_state"]} => {completion["new_state"]}')
+        changed_batch_ids[completion['batch_id']] = None
+        completed_ids.append(id)
 
-    await notify_batch_job_complete(db, batch_id)
+    if not changed_batch_ids:
+        return errors
+
+    if POOL_READY_JOB_INDEX:
+        try:
+            await add_ready_children_to_index(db, inst_coll_manager, completed_ids)
+        except Exception:
+            log.exception(f'error while indexing the ready children of {len(completed_ids)} jobs')
+
+    for batch_id in changed_batch_ids:
+        await notify_batch_job_complete(db, batch_id)
 
     if instance and not instance.inst_coll.is_pool and instance.state == 'active':
         task_manager.ensure_future(instance.kill())
 
+    return errors
 
-async def mark_job_started(app, batch_id, job_id, attempt_id, instance, start_time, resources):
+
+async def mark_job_complete(
+    app, batch_id, job_id, attempt_id, instance_name, new_state, status, start_time, end_time, reason, resources
+):
+    completion = {
+        'batch_id': batch_id,
+        'job_id': job_id,
+        'attempt_id': attempt_id,
+        'new_state': new_state,
+        'status': status,
+        'start_time': start_time,
+        'end_time': end_time,
+        'reason': reason,
+        'resources': resources,
+    }
+    (error,) = await mark_jobs_complete(app, instance_name, [completion])
+    if error is not None:
+        raise error
+
+
+async def mark_jobs_started(app, instance, starts) -> List[Optional[Exception]]:
+    """Mark jobs running on `instance` started.
+
+    Each start is a dict with the batch_id, job_id, attempt_id, start_time
+    and resources of a job. Returns, for each start, the error that prevented
+    marking it started, or None.
+    """
     db: Database = app['db']
 
-    id = (batch_id, job_id)
+    errors: List[Optional[Exception]] = []
+    marked = []
+    delta_cores_mcpu = 0
+    for start in starts:
+        id = (start['batch_id'], start['job_id'])
 
-    log.info(f'mark job {id} started')
+        log.info(f'mark job {id} started')
 
-    try:
-        rv = await db.execute_and_fetchone(
-            '''
+        try:
+            rv = await db.execute_and_fetchone(
+                '''
 CALL mark_job_started(%s, %s, %s, %s, %s);
 ''',
-            (batch_id, job_id, attempt_id, instance.name, start_time),
-        )
-    except Exception:
-        log.info(f'error while marking job {id} started on {instance}')
-        raise
+                (start['batch_id'], start['job_id'], start['attempt_id'], instance.name, start['start_time']),
+            )
+        except Exception as e:
+            log.info(f'error while marking job {id} started on {instance}')
+            errors.append(e)
+            continue
+        errors.append(None)
+        marked.append(start)
+        delta_cores_mcpu += rv['delta_cores_mcpu']
+
+    if delta_cores_mcpu != 0 and instance.state == 'active':
+        instance.adjust_free_cores_in_memory(delta_cores_mcpu)
+
+    await add_attempts_resources(
+        db, [(start['batch_id'], start['job_id'], start['attempt_id'], start['resources']) for start in marked]
+    )
 
-    if rv['delta_cores_mcpu'] != 0 and instance.state == 'active':
-        instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
+    return errors
 
-    await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
+
+async def mark_job_started(app, batch_id, job_id, attempt_id, instance, start_time, resources):
+    start = {
+        'batch_id': batch_id,
+        'job_id': job_id,
+        'attempt_id': attempt_id,
+        'start_time': start_time,
+        'resources': resources,
+    }
+    (error,) = await mark_jobs_started(app, instance, [start])
+    if error is not None:
+        raise error
 
 
 async def mark_job_creating(app, batch_id, job_id, attempt_id, instance, start_time, resources):
@@ -200,64 +408,139 @@ CALL mark_job_creating(%s, %s, %s, %s, %s);
     await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
 
 
-async def unschedule_job(app, record):
+async def cancel_ready_jobs(app, batch_id, limit):
+    """Cancel up to `limit` of the ready jobs of `batch_id` that are
+    cancelled, or that belong to a cancelled batch and are not always run,
+    and return how many were cancelled.
+
+    The jobs, the batch's counters and the jobs' children are updated by the
+    cancel_ready_jobs procedure with a few statements in one transaction.
+    """
+    scheduler_state_changed: Notice = app['scheduler_state_changed']
+    cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
+    db: Database = app['db']
+
+    try:
+        rv = await db.execute_and_fetchone(
+            'CALL cancel_ready_jobs(%s, %s, %s);',
+            (batch_id, limit, time_msecs()),
+        )
+    except Exception:
+        log.exception(f'error while cancelling ready jobs of batch {batch_id}')
+        raise
+
+    n_cancelled_jobs = rv['n_cancelled_jobs']
+    if n_cancelled_jobs == 0:
+        return 0
+
+    log.info(f'cancelled {n_cancelled_jobs} ready jobs of batch {batch_id}')
+
+    scheduler_state_changed.notify()
+    # the jobs' children may now be ready to be cancelled
+    cancel_ready_state_changed.set()
+
+    await notify_batch_job_complete(db, batch_id)
+
+    return n_cancelled_jobs
+
+
+async def unschedule_jobs(app, instance_name, records):
+    """Unschedule the attempts in `records`, which all ran on
+    `instance_name`, and ask the instance to delete the jobs with one
+    request. If some attempts could not be unscheduled, the others are still
+    released and deleted, and the first error is then raised."""
     cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
     scheduler_state_changed: Notice = app['scheduler_state_changed']
     db: Database = app['db']
     inst_coll_manager = app['inst_coll_manager']
 
-    batch_id = record['batch_id']
-    job_id = record['job_id']
-    attempt_id = record['attempt_id']
-    id = (batch_id, job_id)
-
-    instance_name = record['instance_name']
     assert instance_name is not None
 
-    log.info(f'unscheduling job {id}, attempt {attempt_id} from instance {instance_name}')
-
     end_time = time_msecs()
 
-    try:
-        rv = await db.execute_and_fetchone(
-            'CALL unschedule_job(%s, %s, %s, %s, %s, %s);',
-            (batch_id, job_id, attempt_id, instance_name, end_time, 'cancelled'),
-        )
-    except Exception:
-        log.exception(f'error while unscheduling job {id} on instance {instance_name}')
-        raise
+    # an error unscheduling one attempt must not skip the in-memory
+    # bookkeeping and deletion on the worker of the others
+    unscheduled = []
+    error: Optional[Exception] = None
+    for record in records:
+        batch_id = record['batch_id']
+        job_id = record['job_id']
+        attempt_id = record['attempt_id']
+        id = (batch_id, job_id)
+
+        log.info(f'unscheduling job {id}, attempt {attempt_id} from instance {instance_name}')
+
+        try:
+            rv = await db.execute_and_fetchone(
+                'CALL unschedule_job(%s, %s, %s, %s, %s, %s);',
+                (batch_id, job_id, attempt_id, instance_name, end_time, 'cancelled'),
+            )
+        except Exception as e:
+            log.exception(f'error while unscheduling job {id} on instance {instance_name}')
+            if error is None:
+                error = e
+            continue
 
-    log.info(f'unschedule job {id}: updated database {rv}')
+        log.info(f'unschedule job {id}: updated database {rv}')
+        unscheduled.append((record, rv))
 
-    # job that was running is now ready to be cancelled
+    if error is not None and not unscheduled:
+        raise error
+
+    # jobs that were running are now ready to be cancelled
     cancel_ready_state_changed.set()
 
     instance = inst_coll_manager.get_instance(instance_name)
     if not instance:
-        log.warning(f'unschedule job {id}, attempt {attempt_id}: unknown instance {instance_name}')
+        log.warning(f'unschedule {len(unscheduled)} jobs: unknown instance {instance_name}')
+        if error is not None:
+            raise error
         return
 
-    if rv['delta_cores_mcpu'] and instance.state == 'active':
-        instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
+    delta_cores_mcpu = 0
+    for record, rv in unscheduled:
+        instance.release_job_resources_in_memory((record['batch_id'], record['job_id']))
+        delta_cores_mcpu += rv['delta_cores_mcpu']
+    if delta_cores_mcpu and instance.state == 'active':
+        instance.adjust_free_cores_in_memory(delta_cores_mcpu)
         scheduler_state_changed.notify()
-        log.info(f'unschedule job {id}, attempt {attempt_id}: updated {instance} free cores')
+        log.info(f'unschedule {len(unscheduled)} jobs: updated {instance} free cores')
 
-    url = f'http://{instance.ip_address}:5000' f'/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete'
+    async def delete_job(batch_id, job_id):
+        url = f'http://{instance.ip_address}:5000' f'/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete'
+        async with aiohttp.ClientSession(raise_for_status=True, timeout=aiohttp.ClientTimeout(total=5)) as session:
+            try:
+                await session.delete(url)
+            except aiohttp.ClientResponseError as err:
+                if err.status != 404:
+                    raise
 
     async def make_request():
         if instance.state in ('inactive', 'deleted'):
             return
         try:
-            async with aiohttp.ClientSession(raise_for_status=True, timeout=aiohttp.ClientTimeout(total=5)) as session:
-                await session.delete(url)
-                await instance.mark_healthy()
+            if len(unscheduled) == 1:
+                record, _ = unscheduled[0]
+                await delete_job(record['batch_id'], record['job_id'])
+            else:
+                url = f'http://{instance.ip_address}:5000/api/v1alpha/batches/jobs/delete'
+                body = {'jobs': [[record['batch_id'], record['job_id']] for record, _ in unscheduled]}
+                async with aiohttp.ClientSession(
+                    raise_for_status=True, timeout=aiohttp.ClientTimeout(total=5)
+                ) as session:
+                    try:
+                        await session.post(url, json=body)
+                    except aiohttp.ClientResponseError as err:
+                        if err.status != 404:
+                            raise
+                        # the worker predates the bulk endpoint
+                        for record, _ in unscheduled:
+                            await delete_job(record['batch_id'], record['job_id'])
+            await instance.mark_healthy()
         except asyncio.TimeoutError:
             await instance.incr_failed_request_count()
             return
-        except aiohttp.ClientResponseError as err:
-            if err.status == 404:
-                await instance.mark_healthy()
-                return
+        except aiohttp.ClientResponseError:
             await instance.incr_failed_request_count()
             raise
 
@@ -266,12 +549,14 @@ async def unschedule_job(app, record):
     if not instance.inst_coll.is_pool:
         await instance.kill()
 
-    log.info(f'unschedule job {id}, attempt {attempt_id}: called delete job')
+    log.info(f'unschedule {len(unscheduled)} jobs: called delete jobs on {instance}')
+
+    if error is not None:
+        raise error
 
 
 async def job_config(app, record, attempt_id):
     k8s_cache: K8sCache = app['k8s_cache']
-    db: Database = app['db']
 
     format_version = BatchFormatVersion(record['format_version'])
     batch_id = record['batch_id']
@@ -359,7 +644,8 @@ users:
         env.append({'name': 'KUBECONFIG', 'value': '/.kube/config'})
 
     if format_version.has_full_spec_in_gcs():
-        token, start_job_id = await SpecWriter.get_token_start_id(db, batch_id, job_id)
+        bunch_cache: BatchBunchCache = app['batch_bunch_cache']
+        token, start_job_id = await bunch_cache.get_token_start_id(batch_id, job_id)
     else:
         token = None
         start_job_id = None
@@ -445,6 +731,7 @@ CALL schedule_job(%s, %s, %s, %s);
         )
     except Exception:
         log.exception(f'error while scheduling job {id} on {instance}')
+        instance.release_job_resources_in_memory(id)
         if instance.state == 'active':
             instance.adjust_free_cores_in_memory(record['cores_mcpu'])
         return
@@ -456,6 +743,7 @@ CALL schedule_job(%s, %s, %s, %s);
 
     if rv['rc'] != 0:
         log.info(f'could not schedule job {id}, attempt {attempt_id} on {instance}, {rv}')
+        instance.release_job_resources_in_memory(id)
         return
 
     log.info(f'success scheduling job {id} on {instance}')
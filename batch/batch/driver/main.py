@@ -48,6 +48,7 @@ from ..batch_configuration import (
     HAIL_SHOULD_CHECK_INVARIANTS,
     PROJECT,
     MACHINE_NAME_PREFIX,
+    POOL_READY_JOB_INDEX,
 )
 from ..globals import HTTP_CLIENT_MAX_SIZE
 from ..inst_coll_config import InstanceCollectionConfigs
@@ -56,8 +57,9 @@ from .zone_monitor import ZoneMonitor
 from .gce import GCEEventMonitor
 from .canceller import Canceller
 from .instance_collection_manager import InstanceCollectionManager
-from .job import mark_job_complete, mark_job_started
+from .job import mark_job_complete, mark_job_started, mark_jobs_complete, mark_jobs_started
 from .k8s_cache import K8sCache
+from .bunch_cache import BatchBunchCache
 from .pool import Pool
 from ..utils import query_billing_projects, unreserved_worker_data_disk_size_gib, batch_only, authorization_token
 from ..exceptions import BatchUserError
@@ -185,28 +187,42 @@ SELECT state FROM batches WHERE user = %s AND id = %s;
     if not record:
         raise web.HTTPNotFound()
 
+    if POOL_READY_JOB_INDEX and record['state'] == 'running':
+        for pool in request.app['inst_coll_manager'].pools.values():
+            try:
+                await pool.scheduler.ready_jobs.add_batch(user, batch_id)
+            except Exception:
+                log.exception(f'error while indexing the ready jobs of batch {batch_id} in {pool}')
+
     request.app['scheduler_state_changed'].notify()
 
     return web.Response()
 
 
-def set_cancel_state_changed(app):
+async def set_cancel_state_changed(app):
     app['cancel_running_state_changed'].set()
     app['cancel_creating_state_changed'].set()
     app['cancel_ready_state_changed'].set()
+    # jobs of cancelled batches may be in the pools' ready job indexes
+    for pool in app['inst_coll_manager'].pools.values():
+        try:
+            await pool.scheduler.ready_jobs.remove_cancelled()
+        except Exception:
+            log.exception(f'error while removing cancelled jobs from the ready job index of {pool}')
+            pool.scheduler.ready_jobs.clear()
 
 
 @routes.post('/api/v1alpha/batches/cancel')
 @batch_only
 async def cancel_batch(request):
-    set_cancel_state_changed(request.app)
+    await set_cancel_state_changed(request.app)
     return web.Response()
 
 
 @routes.post('/api/v1alpha/batches/delete')
 @batch_only
 async def delete_batch(request):
-    set_cancel_state_changed(request.app)
+    await set_cancel_state_changed(request.app)
     return web.Response()
 
 
@@ -254,14 +270,7 @@ async def deactivate_instance(request, instance):  # pylint: disable=unused-argu
     return await asyncio.shield(deactivate_instance_1(instance))
 
 
-async def job_complete_1(request, instance):
-    body = await request.json()
-    job_status = body['status']
-
-    batch_id = job_status['batch_id']
-    job_id = job_status['job_id']
-    attempt_id = job_status['attempt_id']
-
+def job_completion_from_status(job_status):
     state = job_status['state']
     if state == 'succeeded':
         new_state = 'Success'
@@ -271,23 +280,45 @@ async def job_complete_1(request, instance):
         assert state == 'failed', state
         new_state = 'Failed'
 
-    start_time = job_status['start_time']
-    end_time = job_status['end_time']
-    status = job_status['status']
-    resources = job_status.get('resources')
+    return {
+        'batch_id': job_status['batch_id'],
+        'job_id': job_status['job_id'],
+        'attempt_id': job_status['attempt_id'],
+        'new_state': new_state,
+        'status': job_status['status'],
+        'start_time': job_status['start_time'],
+        'end_time': job_status['end_time'],
+        'reason': 'completed',
+        'resources': job_status.get('resources'),
+    }
+
+
+def job_start_from_status(job_status):
+    return {
+        'batch_id': job_status['batch_id'],
+        'job_id': job_status['job_id'],
+        'attempt_id': job_status['attempt_id'],
+        'start_time': job_status['start_time'],
+        'resources': job_status.get('resources'),
+    }
+
+
+async def job_complete_1(request, instance):
+    body = await request.json()
+    completion = job_completion_from_status(body['status'])
 
     await mark_job_complete(
         request.app,
-        batch_id,
-        job_id,
-        attempt_id,
+        completion['batch_id'],
+        completion['job_id'],
+        completion['attempt_id'],
         instance.name,
-        new_state,
-        status,
-        start_time,
-        end_time,
-        'completed',
-        resources,
+        completion['new_state'],
+        completion['status'],
+        completion['start_time'],
+        completion['end_time'],
+        completion['reason'],
+        completion['resources'],
     )
 
     await instance.mark_healthy()
@@ -301,17 +332,38 @@ async def job_complete(request, instance):
     return await asyncio.shield(job_complete_1(request, instance))
 
 
-async def job_started_1(request, instance):
+# The bulk endpoints respond with the indices of the statuses that could not
+# be recorded, which the worker retries.
+async def jobs_complete_1(request, instance):
     body = await request.json()
-    job_status = body['status']
+    completions = [job_completion_from_status(job_status) for job_status in body['statuses']]
+
+    errors = await mark_jobs_complete(request.app, instance.name, completions)
+
+    await instance.mark_healthy()
 
-    batch_id = job_status['batch_id']
-    job_id = job_status['job_id']
-    attempt_id = job_status['attempt_id']
-    start_time = job_status['start_time']
-    resources = job_status.get('resources')
+    return web.json_response({'failed': [i for i, error in enumerate(errors) if error is not None]})
 
-    await mark_job_started(request.app, batch_id, job_id, attempt_id, instance, start_time, resources)
+
+@routes.post('/api/v1alpha/instances/jobs_complete')
+@active_instances_only
+async def jobs_complete(request, instance):
+    return await asyncio.shield(jobs_complete_1(request, instance))
+
+
+async def job_started_1(request, instance):
+    body = await request.json()
+    start = job_start_from_status(body['status'])
+
+    await mark_job_started(
+        request.app,
+        start['batch_id'],
+        start['job_id'],
+        start['attempt_id'],
+        instance,
+        start['start_time'],
+        start['resources'],
+    )
 
     await instance.mark_healthy()
 
@@ -324,6 +376,23 @@ async def job_started(request, instance):
     return await asyncio.shield(job_started_1(request, instance))
 
 
+async def jobs_started_1(request, instance):
+    body = await request.json()
+    starts = [job_start_from_status(job_status) for job_status in body['statuses']]
+
+    errors = await mark_jobs_started(request.app, instance, starts)
+
+    await instance.mark_healthy()
+
+    return web.json_response({'failed': [i for i, error in enumerate(errors) if error is not None]})
+
+
+@routes.post('/api/v1alpha/instances/jobs_started')
+@active_instances_only
+async def jobs_started(request, instance):
+    return await asyncio.shield(jobs_started_1(request, instance))
+
+
 @routes.get('/')
 @routes.get('')
 @web_authenticated_developers_only()
@@ -874,7 +943,7 @@ async def _cancel_batch(app, batch_id):
     except BatchUserError as exc:
         log.info(f'cannot cancel batch because {exc.message}')
         return
-    set_cancel_state_changed(app)
+    await set_cancel_state_changed(app)
 
 
 async def monitor_billing_limits(app):
@@ -932,6 +1001,7 @@ async def on_startup(app):
     db = Database()
     await db.async_init(maxsize=50)
     app['db'] = db
+    app['batch_bunch_cache'] = BatchBunchCache(db)
 
     row = await db.select_and_fetchone(
         '''
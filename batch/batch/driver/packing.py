@@ -0,0 +1,123 @@
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple, TypeVar
+
+from ..utils import cores_mcpu_to_memory_bytes, unreserved_worker_data_disk_size_gib
+
+T = TypeVar('T')
+
+
+class Resources(NamedTuple):
+    cores_mcpu: int
+    memory_bytes: int
+    storage_gib: int
+
+    def plus(self, other: 'Resources') -> 'Resources':
+        return Resources(*[a + b for a, b in zip(self, other)])
+
+    def minus(self, other: 'Resources') -> 'Resources':
+        return Resources(*[a - b for a, b in zip(self, other)])
+
+    def scale(self, factor: float) -> 'Resources':
+        return Resources(*[int(a * factor) for a in self])
+
+    def fits_in(self, other: 'Resources') -> bool:
+        return all(a <= b for a, b in zip(self, other))
+
+    def dominant_share(self, capacity: 'Resources') -> float:
+        return max([a / c for a, c in zip(self, capacity) if c > 0], default=0.0)
+
+
+NO_RESOURCES = Resources(0, 0, 0)
+
+
+def worker_resources(
+    worker_type: str,
+    cores_mcpu: int,
+    worker_local_ssd_data_disk: bool,
+    worker_pd_ssd_data_disk_size_gb: int,
+    input_cache_fraction: float = 0.0,
+) -> Resources:
+    unreserved_storage_gib = unreserved_worker_data_disk_size_gib(
+        worker_local_ssd_data_disk, worker_pd_ssd_data_disk_size_gb, cores_mcpu // 1000
+    )
+    # the worker sets part of its data disk aside for its input cache
+    storage_gib = unreserved_storage_gib - int(unreserved_storage_gib * input_cache_fraction)
+    return Resources(cores_mcpu, cores_mcpu_to_memory_bytes(cores_mcpu, worker_type), max(storage_gib, 0))
+
+
+def best_fit(request: Resources, candidates: Iterable[Tuple[T, Resources, Resources]]) -> Optional[T]:
+    """Choose where to place `request` among `candidates`, triples of a
+    candidate, its free resources and its capacity.
+
+    Returns the candidate the request fits most tightly: the one whose
+    leftover free resources, as fractions of its capacity, have the smallest
+    sum of squares. Jobs that leave little behind go where they fill a
+    machine, keeping large, balanced holes for jobs that need them. Returns
+    None if the request does not fit anywhere.
+    """
+    best = None
+    best_score = None
+    for candidate, free, capacity in candidates:
+        if not request.fits_in(free):
+            continue
+        leftover = free.minus(request)
+        score = sum((left / total) ** 2 for left, total in zip(leftover, capacity) if total > 0)
+        if best_score is None or score < best_score:
+            best = candidate
+            best_score = score
+    return best
+
+
+def dominant_resource_fair_share(
+    free: Resources,
+    capacity: Resources,
+    user_running: Dict[str, Resources],
+    user_ready: Dict[str, Resources],
+) -> Dict[str, Resources]:
+    """Divide `free` among users by dominant resource fairness.
+
+    A user's share is their largest share of any one resource of `capacity`.
+    Shares are filled progressively: the fill level rises and every user
+    whose running share is below it is allocated ready resources, in
+    proportion to what they have ready, until their share reaches the level
+    or they have nothing more to run. The level stops where the allocations
+    would no longer fit in `free`, found by bisection. Shares are treated as
+    additive, so the result is approximate for users whose ready and running
+    jobs have different dominant resources.
+    """
+    users = list(user_ready)
+
+    def allocation(user, mark):
+        ready = user_ready[user]
+        ready_share = ready.dominant_share(capacity)
+        if ready_share == 0:
+            return NO_RESOURCES
+        running_share = user_running.get(user, NO_RESOURCES).dominant_share(capacity)
+        fraction = min(max((mark - running_share) / ready_share, 0.0), 1.0)
+        return ready.scale(fraction)
+
+    def fits(mark):
+        total = NO_RESOURCES
+        for user in users:
+            total = total.plus(allocation(user, mark))
+        return total.fits_in(free)
+
+    high = max(
+        [
+            user_running.get(user, NO_RESOURCES).dominant_share(capacity) + user_ready[user].dominant_share(capacity)
+            for user in users
+        ],
+        default=0.0,
+    )
+    if fits(high):
+        mark = high
+    else:
+        low = 0.0
+        for _ in range(50):
+            mid = (low + high) / 2
+            if fits(mid):
+                low = mid
+            else:
+                high = mid
+        mark = low
+
+    return {user: allocation(user, mark) for user in users}
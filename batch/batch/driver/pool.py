@@ -4,6 +4,8 @@ import asyncio
 import secrets
 import random
 import collections
+import json
+import prometheus_client as pc  # type: ignore
 
 from gear import Database, transaction
 from hailtop import aiotools
@@ -18,7 +20,15 @@ from hailtop.utils import (
     periodically_call,
 )
 
-from ..batch_configuration import STANDING_WORKER_MAX_IDLE_TIME_MSECS, WORKER_MAX_IDLE_TIME_MSECS, GCP_ZONE
+from ..batch_configuration import (
+    STANDING_WORKER_MAX_IDLE_TIME_MSECS,
+    WORKER_MAX_IDLE_TIME_MSECS,
+    GCP_ZONE,
+    POOL_SCHEDULING_POLICY,
+    POOL_READY_JOB_INDEX,
+    INPUT_CACHE_FRACTION_OF_DATA_DISK,
+)
+from ..batch_format_version import BatchFormatVersion
 from ..inst_coll_config import PoolConfig
 from ..utils import (
     Box,
@@ -26,14 +36,26 @@ from ..utils import (
     adjust_cores_for_memory_request,
     adjust_cores_for_packability,
     adjust_cores_for_storage_request,
+    cores_mcpu_to_memory_bytes,
 )
 from .create_instance import create_instance
 from .instance import Instance
 from .instance_collection import InstanceCollection
 from .job import schedule_job
+from .packing import Resources, NO_RESOURCES, best_fit, dominant_resource_fair_share, worker_resources
+from .ready_jobs import ReadyJobIndex
 
 log = logging.getLogger('pool')
 
+SCHEDULE_LOOP_TIME = pc.Summary('batch_pool_schedule_loop_seconds', 'Pool scheduling round latency in seconds', ['pool'])
+READY_JOBS_LOOKUP_TIME = pc.Summary(
+    'batch_pool_ready_jobs_lookup_seconds',
+    'Latency in seconds of finding a user\'s ready jobs in a pool scheduling round',
+    ['pool', 'source'],
+)
+
+READY_JOB_INDEX_RECONCILE_INTERVAL_MSECS = 60 * 1000
+
 
 class Pool(InstanceCollection):
     def __init__(self, app, machine_name_prefix: str, config: PoolConfig):
@@ -155,6 +177,42 @@ WHERE name = %s;
             return cores_mcpu
         return None
 
+    def instance_capacity(self, instance) -> Resources:
+        return worker_resources(
+            self.worker_type,
+            instance.cores_mcpu,
+            self.worker_local_ssd_data_disk,
+            self.worker_pd_ssd_data_disk_size_gb,
+            INPUT_CACHE_FRACTION_OF_DATA_DISK,
+        )
+
+    def instance_free_resources(self, instance) -> Resources:
+        # Pool jobs get memory in proportion to their cores, so free memory
+        # follows free cores, which the database tracks for every job.
+        capacity = self.instance_capacity(instance)
+        return Resources(
+            instance.free_cores_mcpu,
+            cores_mcpu_to_memory_bytes(instance.free_cores_mcpu, self.worker_type),
+            capacity.storage_gib - instance.reserved_resources.storage_gib,
+        )
+
+    def job_resources(self, record) -> Resources:
+        format_version = BatchFormatVersion(record['format_version'])
+        storage_gib = format_version.get_spec_storage_gib(json.loads(record['spec'])) or 0
+        worker_storage_gib = worker_resources(
+            self.worker_type,
+            self.worker_cores * 1000,
+            self.worker_local_ssd_data_disk,
+            self.worker_pd_ssd_data_disk_size_gb,
+            INPUT_CACHE_FRACTION_OF_DATA_DISK,
+        ).storage_gib
+        if storage_gib > worker_storage_gib:
+            # the worker attaches a persistent disk for the job instead
+            storage_gib = 0
+        return Resources(
+            record['cores_mcpu'], cores_mcpu_to_memory_bytes(record['cores_mcpu'], self.worker_type), storage_gib
+        )
+
     def adjust_for_remove_instance(self, instance):
         super().adjust_for_remove_instance(instance)
         if instance in self.healthy_instances_by_free_cores:
@@ -297,6 +355,8 @@ class PoolScheduler:
         self.pool = pool
         self.async_worker_pool: AsyncWorkerPool = self.app['async_worker_pool']
         self.exceeded_shares_counter = ExceededSharesCounter()
+        self.ready_jobs = ReadyJobIndex(self.db, pool.name)
+        self.ready_jobs_reconciled_msecs = time_msecs()
         self.task_manager = aiotools.BackgroundTaskManager()
 
     async def async_init(self):
@@ -310,17 +370,8 @@ class PoolScheduler:
         finally:
             self.async_worker_pool.shutdown()
 
-    async def compute_fair_share(self):
-        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
-
-        user_running_cores_mcpu = {}
-        user_total_cores_mcpu = {}
-        result = {}
-
-        pending_users_by_running_cores = sortedcontainers.SortedSet(key=lambda user: user_running_cores_mcpu[user])
-        allocating_users_by_total_cores = sortedcontainers.SortedSet(key=lambda user: user_total_cores_mcpu[user])
-
-        records = self.db.execute_and_fetchall(
+    def user_resources(self, description):
+        return self.db.execute_and_fetchall(
             '''
 SELECT user,
   CAST(COALESCE(SUM(n_ready_jobs), 0) AS SIGNED) AS n_ready_jobs,
@@ -333,10 +384,20 @@ GROUP BY user
 HAVING n_ready_jobs + n_running_jobs > 0;
 ''',
             (self.pool.name,),
-            timer_description=f'in compute_fair_share for {self.pool.name}: aggregate user_inst_coll_resources',
+            timer_description=f'in {description} for {self.pool.name}: aggregate user_inst_coll_resources',
         )
 
-        async for record in records:
+    async def compute_fair_share(self):
+        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
+
+        user_running_cores_mcpu = {}
+        user_total_cores_mcpu = {}
+        result = {}
+
+        pending_users_by_running_cores = sortedcontainers.SortedSet(key=lambda user: user_running_cores_mcpu[user])
+        allocating_users_by_total_cores = sortedcontainers.SortedSet(key=lambda user: user_total_cores_mcpu[user])
+
+        async for record in self.user_resources('compute_fair_share'):
             user = record['user']
             user_running_cores_mcpu[user] = record['running_cores_mcpu']
             user_total_cores_mcpu[user] = record['running_cores_mcpu'] + record['ready_cores_mcpu']
@@ -386,16 +447,74 @@ HAVING n_ready_jobs + n_running_jobs > 0;
 
         return result
 
+    def healthy_capacity(self):
+        capacity = NO_RESOURCES
+        free = NO_RESOURCES
+        for instance in self.pool.healthy_instances_by_free_cores:
+            capacity = capacity.plus(self.pool.instance_capacity(instance))
+            free = free.plus(self.pool.instance_free_resources(instance))
+        return capacity, free
+
+    async def compute_dominant_resource_fair_share(self):
+        capacity, free = self.healthy_capacity()
+
+        # The database aggregates only cores. Memory follows cores in a pool,
+        # and storage is estimated from the jobs this driver has scheduled.
+        user_known_cores_mcpu = collections.defaultdict(int)
+        user_known_storage_gib = collections.defaultdict(int)
+        for instance in self.pool.name_instance.values():
+            for user, resources in instance.job_resources.values():
+                user_known_cores_mcpu[user] += resources.cores_mcpu
+                user_known_storage_gib[user] += resources.storage_gib
+
+        def estimate_resources(user, cores_mcpu):
+            known_cores_mcpu = user_known_cores_mcpu[user]
+            if known_cores_mcpu:
+                storage_gib = int(cores_mcpu * user_known_storage_gib[user] / known_cores_mcpu)
+            else:
+                storage_gib = 0
+            return Resources(cores_mcpu, cores_mcpu_to_memory_bytes(cores_mcpu, self.pool.worker_type), storage_gib)
+
+        user_running = {}
+        user_ready = {}
+        result = {}
+        async for record in self.user_resources('compute_dominant_resource_fair_share'):
+            user = record['user']
+            user_running[user] = estimate_resources(user, record['running_cores_mcpu'])
+            user_ready[user] = estimate_resources(user, record['ready_cores_mcpu'])
+            result[user] = record
+
+        allocations = dominant_resource_fair_share(free, capacity, user_running, user_ready)
+        for user, record in result.items():
+            record['allocated_cores_mcpu'] = allocations[user].cores_mcpu
+            record['allocated_resources'] = allocations[user]
+
+        return result
+
     async def schedule_loop_body(self):
         if self.app['frozen']:
             log.info(f'not scheduling any jobs for {self.pool}; batch is frozen')
             return True
 
+        with SCHEDULE_LOOP_TIME.labels(pool=self.pool.name).time():
+            return await self.schedule_loop_body_1()
+
+    async def schedule_loop_body_1(self):
         log.info(f'schedule {self.pool}: starting')
         start = time_msecs()
         n_scheduled = 0
 
-        user_resources = await self.compute_fair_share()
+        if POOL_READY_JOB_INDEX and start - self.ready_jobs_reconciled_msecs > READY_JOB_INDEX_RECONCILE_INTERVAL_MSECS:
+            # reconcile between rounds, when no jobs are being scheduled
+            await self.ready_jobs.reconcile()
+            self.ready_jobs_reconciled_msecs = start
+
+        drf = POOL_SCHEDULING_POLICY == 'drf'
+        if drf:
+            user_resources = await self.compute_dominant_resource_fair_share()
+            capacity, _ = self.healthy_capacity()
+        else:
+            user_resources = await self.compute_fair_share()
 
         total = sum(resources['allocated_cores_mcpu'] for resources in user_resources.values())
         if not total:
@@ -407,6 +526,16 @@ HAVING n_ready_jobs + n_running_jobs > 0;
             for user, resources in user_resources.items()
         }
 
+        async def indexed_user_runnable_jobs(user, n_ready_jobs, remaining):
+            lookup_start = time_msecs()
+            records, loaded = await self.ready_jobs.ready_jobs(user, remaining.value, n_ready_jobs)
+            source = 'database' if loaded else 'index'
+            READY_JOBS_LOOKUP_TIME.labels(pool=self.pool.name, source=source).observe(
+                (time_msecs() - lookup_start) / 1000
+            )
+            for record in records:
+                yield record
+
         async def user_runnable_jobs(user, remaining):
             async for batch in self.db.select_and_fetchall(
                 '''
@@ -451,6 +580,23 @@ LIMIT %s;
 
         waitable_pool = WaitableSharedPool(self.async_worker_pool)
 
+        def get_instance_by_best_fit(user, resources):
+            def candidates():
+                i = self.pool.healthy_instances_by_free_cores.bisect_key_left(resources.cores_mcpu)
+                for instance in self.pool.healthy_instances_by_free_cores.islice(i):
+                    if user != 'ci' or instance.zone == GCP_ZONE:
+                        yield (instance, self.pool.instance_free_resources(instance), self.pool.instance_capacity(instance))
+
+            instance = best_fit(resources, candidates())
+            if instance is None and resources.storage_gib > 0:
+                # the worker attaches a persistent disk for jobs whose storage
+                # does not fit on its data disk
+                resources = resources._replace(storage_gib=0)
+                instance = best_fit(resources, candidates())
+            if instance is None:
+                log.info(f'schedule {self.pool}: no viable instances for {resources}')
+            return instance, resources
+
         def get_instance(user, cores_mcpu):
             i = self.pool.healthy_instances_by_free_cores.bisect_key_left(cores_mcpu)
             while i < len(self.pool.healthy_instances_by_free_cores):
@@ -473,37 +619,58 @@ LIMIT %s;
                 continue
 
             scheduled_cores_mcpu = 0
+            scheduled_resources = NO_RESOURCES
+            if drf:
+                allocated_share = resources['allocated_resources'].dominant_share(capacity)
             share = user_share[user]
 
             log.info(f'schedule {self.pool}: user-share: {user}: {allocated_cores_mcpu} {share}')
 
             remaining = Box(share)
-            async for record in user_runnable_jobs(user, remaining):
+            if POOL_READY_JOB_INDEX:
+                runnable_jobs = indexed_user_runnable_jobs(user, resources['n_ready_jobs'], remaining)
+            else:
+                runnable_jobs = user_runnable_jobs(user, remaining)
+            async for record in runnable_jobs:
                 batch_id = record['batch_id']
                 job_id = record['job_id']
                 id = (batch_id, job_id)
                 attempt_id = secret_alnum_string(6)
                 record['attempt_id'] = attempt_id
 
-                if scheduled_cores_mcpu + record['cores_mcpu'] > allocated_cores_mcpu:
+                job_resources = self.pool.job_resources(record)
+
+                if drf:
+                    exceeds_share = scheduled_resources.plus(job_resources).dominant_share(capacity) > allocated_share
+                else:
+                    exceeds_share = scheduled_cores_mcpu + record['cores_mcpu'] > allocated_cores_mcpu
+                if exceeds_share:
                     if random.random() > self.exceeded_shares_counter.rate():
                         self.exceeded_shares_counter.push(True)
                         self.scheduler_state_changed.set()
                         break
                     self.exceeded_shares_counter.push(False)
 
-                instance = get_instance(user, record['cores_mcpu'])
+                if drf:
+                    instance, job_resources = get_instance_by_best_fit(user, job_resources)
+                else:
+                    instance = get_instance(user, record['cores_mcpu'])
                 if instance:
                     instance.adjust_free_cores_in_memory(-record['cores_mcpu'])
+                    instance.reserve_job_resources_in_memory(id, user, job_resources)
                     scheduled_cores_mcpu += record['cores_mcpu']
+                    scheduled_resources = scheduled_resources.plus(job_resources)
                     n_scheduled += 1
                     should_wait = False
+                    self.ready_jobs.start_scheduling(user, id)
 
                     async def schedule_with_error_handling(app, record, id, instance):
                         try:
                             await schedule_job(app, record, instance)
                         except Exception:
                             log.info(f'scheduling job {id} on {instance} for {self.pool}', exc_info=True)
+                        finally:
+                            self.ready_jobs.done_scheduling(id)
 
                     await waitable_pool.call(schedule_with_error_handling, self.app, record, id, instance)
 
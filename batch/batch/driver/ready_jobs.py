@@ -0,0 +1,200 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+from gear import Database
+
+log = logging.getLogger('ready_jobs')
+
+JobId = Tuple[int, int]
+
+
+class ReadyJobIndex:
+    """Ready jobs of one pool, by user, for the scheduler to draw from.
+
+    A user's jobs are loaded with one query across all of their running
+    batches when the index holds fewer than the scheduler asks for and the
+    database has more. Jobs of batches that start running, and jobs that
+    become ready when their parents complete, are added as they do, and
+    jobs are removed as they are scheduled or their batches are cancelled.
+    Jobs that become ready any other way, or stop being ready, are picked
+    up when the index is reconciled with the database.
+
+    A job read as ready by a query may be scheduled before the query's
+    records are added. Each job that is done scheduling is stamped with a
+    generation, and records are not added for jobs stamped after their query
+    started.
+    """
+
+    def __init__(self, db: Database, pool_name: str):
+        self.db = db
+        self.pool_name = pool_name
+        # jobs in the order they were added
+        self.user_jobs: Dict[str, Dict[JobId, dict]] = {}
+        # jobs being scheduled, which may still be ready in the database
+        self.scheduling: Set[JobId] = set()
+        # incremented each time a job is done scheduling
+        self.generation = 0
+        # the generation at which jobs were done scheduling, kept while a
+        # query that started before then is running
+        self.scheduled: Dict[JobId, int] = {}
+        # the number of running queries by the generation they started at
+        self.queries: Dict[int, int] = {}
+
+    def __len__(self):
+        return sum(len(jobs) for jobs in self.user_jobs.values())
+
+    def start_query(self) -> int:
+        """Note that a query for ready jobs is starting and return the
+        generation to add its records at."""
+        self.queries[self.generation] = self.queries.get(self.generation, 0) + 1
+        return self.generation
+
+    def end_query(self, generation: int):
+        """Note that the query started at `generation` has added its
+        records."""
+        n = self.queries[generation] - 1
+        if n:
+            self.queries[generation] = n
+        else:
+            del self.queries[generation]
+        if not self.queries:
+            self.scheduled = {}
+        elif generation < min(self.queries):
+            oldest = min(self.queries)
+            self.scheduled = {id: g for id, g in self.scheduled.items() if g > oldest}
+
+    def may_add(self, id: JobId, generation: Optional[int]) -> bool:
+        if id in self.scheduling:
+            return False
+        return generation is None or self.scheduled.get(id, generation) <= generation
+
+    def add(self, record: dict, generation: Optional[int] = None):
+        """Add a ready job, unless it is being scheduled or, if `generation`
+        is that of the query that read it, was scheduled since."""
+        user = record['user']
+        id = (record['batch_id'], record['job_id'])
+        if self.may_add(id, generation):
+            self.user_jobs.setdefault(user, {})[id] = record
+
+    def start_scheduling(self, user: str, id: JobId):
+        jobs = self.user_jobs.get(user)
+        if jobs is not None:
+            jobs.pop(id, None)
+        self.scheduling.add(id)
+
+    def done_scheduling(self, id: JobId):
+        self.scheduling.discard(id)
+        self.generation += 1
+        if self.queries:
+            self.scheduled[id] = self.generation
+
+    def clear(self):
+        self.user_jobs = {}
+
+    async def load(self, user: str, limit: int):
+        generation = self.start_query()
+        try:
+            jobs = await self._load(user, limit)
+            jobs = {id: record for id, record in jobs.items() if self.may_add(id, generation)}
+        finally:
+            self.end_query(generation)
+        if jobs:
+            self.user_jobs[user] = jobs
+        else:
+            self.user_jobs.pop(user, None)
+
+    async def add_batch(self, user: str, batch_id: int):
+        """Add the ready jobs of a batch that has started running, if its
+        user's jobs are in the index, up to as many as the index holds for
+        the user."""
+        jobs = self.user_jobs.get(user)
+        if not jobs:
+            # the user's jobs are loaded when the scheduler next asks for them
+            return
+        generation = self.start_query()
+        try:
+            records = await self._load(user, len(jobs), batch_id)
+            for record in records.values():
+                self.add(record, generation)
+        finally:
+            self.end_query(generation)
+
+    async def remove_cancelled(self):
+        """Remove the jobs of cancelled batches, other than those that always
+        run."""
+        batch_ids = list({batch_id for jobs in self.user_jobs.values() for batch_id, _ in jobs})
+        if not batch_ids:
+            return
+        cancelled = set()
+        async for record in self.db.select_and_fetchall(
+            f'''
+SELECT id FROM batches
+WHERE id IN ({', '.join(['%s'] * len(batch_ids))}) AND cancelled;
+''',
+            batch_ids,
+            timer_description=f'in ready job index for {self.pool_name}: find cancelled batches',
+        ):
+            cancelled.add(record['id'])
+        if not cancelled:
+            return
+        for user, jobs in list(self.user_jobs.items()):
+            jobs = {id: record for id, record in jobs.items() if id[0] not in cancelled or record['always_run']}
+            if jobs:
+                self.user_jobs[user] = jobs
+            else:
+                del self.user_jobs[user]
+
+    async def _load(self, user: str, limit: int, batch_id: Optional[int] = None) -> Dict[JobId, dict]:
+        # jobs in the order the scheduler drew them from each batch before
+        # the index, those that always run first
+        where_batch = 'AND batches.id = %s' if batch_id is not None else ''
+        args = [user] + ([batch_id] if batch_id is not None else []) + [self.pool_name, limit]
+        jobs = {}
+        async for record in self.db.select_and_fetchall(
+            f'''
+SELECT jobs.batch_id, jobs.job_id, jobs.spec, jobs.cores_mcpu, jobs.always_run,
+  batches.userdata, batches.user, batches.format_version
+FROM batches
+INNER JOIN jobs FORCE INDEX(jobs_batch_id_state_always_run_inst_coll_cancelled)
+  ON batches.id = jobs.batch_id
+WHERE batches.user = %s {where_batch} AND batches.`state` = 'running'
+  AND jobs.state = 'Ready' AND jobs.inst_coll = %s
+  AND (jobs.always_run OR (NOT jobs.cancelled AND NOT batches.cancelled))
+ORDER BY jobs.batch_id, jobs.always_run DESC, jobs.job_id
+LIMIT %s;
+''',
+            args,
+            timer_description=f'in ready job index for {self.pool_name}: load {user} ready jobs',
+        ):
+            jobs[(record['batch_id'], record['job_id'])] = record
+        return jobs
+
+    async def ready_jobs(self, user: str, n: int, n_ready_jobs: Optional[int] = None) -> Tuple[List[dict], bool]:
+        """Return up to `n` of `user`'s ready jobs and whether the database
+        was queried for them.
+
+        `n_ready_jobs` is the number of ready jobs the database reports for
+        the user. The index is only reloaded if it holds fewer than `n` of
+        them.
+        """
+        jobs = self.user_jobs.get(user, {})
+        wanted = n if n_ready_jobs is None else min(n, n_ready_jobs)
+        loaded = False
+        if len(jobs) < wanted:
+            # load ahead so the next rounds can be served from memory
+            await self.load(user, 2 * n)
+            jobs = self.user_jobs.get(user, {})
+            loaded = True
+        result = []
+        for record in jobs.values():
+            if len(result) == n:
+                break
+            result.append(record)
+        return result, loaded
+
+    async def reconcile(self):
+        """Reload the users in the index from the database, dropping jobs
+        that are no longer ready and adding any that the index missed."""
+        for user, jobs in list(self.user_jobs.items()):
+            await self.load(user, len(jobs))
+        log.info(f'reconciled ready job index for {self.pool_name}: {len(self)} jobs')
@@ -0,0 +1,159 @@
+"""Replay job shapes against a pool to compare scheduling policies.
+
+    python3 -m batch.driver.simulate_packing --worker-type standard --worker-cores 16 --n-instances 10 jobs.json
+
+Each line of the jobs file describes one job as requested by its user:
+
+    {"cores_mcpu": 1000, "memory_bytes": 8589934592, "storage_gib": 50, "duration_secs": 600}
+
+Jobs are ready at the start of the simulation and are placed in order,
+skipping jobs that do not fit until resources free up. For each policy the
+simulation reports the makespan, the fraction of the pool's capacity that
+was allocated over that time, and how many jobs did not fit on their
+worker's data disk and would have needed a persistent disk.
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import heapq
+import json
+
+from ..utils import adjust_cores_for_memory_request, adjust_cores_for_packability, cores_mcpu_to_memory_bytes
+from .packing import Resources, best_fit, worker_resources
+
+
+class SimulatedInstance:
+    def __init__(self, capacity: Resources):
+        self.capacity = capacity
+        self.free = capacity
+
+
+def best_fit_on_cores(request: Resources, instances: List[SimulatedInstance]) -> Optional[SimulatedInstance]:
+    # the instance with the fewest free cores that fit, as PoolScheduler.get_instance picks
+    candidates = [instance for instance in instances if request.cores_mcpu <= instance.free.cores_mcpu]
+    return min(candidates, key=lambda instance: instance.free.cores_mcpu, default=None)
+
+
+def best_fit_on_resources(request: Resources, instances: List[SimulatedInstance]) -> Optional[SimulatedInstance]:
+    # as PoolScheduler.get_instance_by_best_fit picks
+    instance = best_fit(request, ((instance, instance.free, instance.capacity) for instance in instances))
+    if instance is None and request.storage_gib > 0:
+        instance = best_fit(
+            request._replace(storage_gib=0), ((instance, instance.free, instance.capacity) for instance in instances)
+        )
+    return instance
+
+
+def simulate(
+    jobs: List[Resources],
+    durations_secs: List[float],
+    capacity: Resources,
+    n_instances: int,
+    place: Callable[[Resources, List[SimulatedInstance]], Optional[SimulatedInstance]],
+) -> Dict[str, float]:
+    instances = [SimulatedInstance(capacity) for _ in range(n_instances)]
+    ready = list(range(len(jobs)))
+    # (finish time, job index, instance, resources held on the instance)
+    running: List = []
+    now = 0.0
+    allocated_resource_secs = [0.0, 0.0, 0.0]
+    n_external_disks = 0
+
+    while ready or running:
+        still_ready = []
+        for i in ready:
+            job = jobs[i]
+            if job.storage_gib > capacity.storage_gib:
+                # too large for any data disk, the worker attaches a persistent disk
+                job = job._replace(storage_gib=0)
+            instance = place(job, instances)
+            if instance is None:
+                still_ready.append(i)
+                continue
+            if not job.fits_in(instance.free):
+                # placed where its storage does not fit
+                job = job._replace(storage_gib=0)
+            if job.storage_gib < jobs[i].storage_gib:
+                n_external_disks += 1
+            instance.free = instance.free.minus(job)
+            for d, amount in enumerate(job):
+                allocated_resource_secs[d] += amount * durations_secs[i]
+            heapq.heappush(running, (now + durations_secs[i], i, instance, job))
+        ready = still_ready
+
+        if not running:
+            raise ValueError(f'jobs {ready} do not fit on an empty instance with {capacity}')
+
+        now, _, instance, job = heapq.heappop(running)
+        instance.free = instance.free.plus(job)
+        while running and running[0][0] == now:
+            _, _, instance, job = heapq.heappop(running)
+            instance.free = instance.free.plus(job)
+
+    capacity_secs = [amount * n_instances * now for amount in capacity]
+    result = {'makespan_secs': now, 'n_external_disks': n_external_disks}
+    for name, allocated, total in zip(Resources._fields, allocated_resource_secs, capacity_secs):
+        result[f'{name}_utilization'] = allocated / total if total else 0.0
+    return result
+
+
+def job_resources(job: dict, worker_type: str, decouple_memory: bool) -> Resources:
+    cores_mcpu = job['cores_mcpu']
+    memory_bytes = job['memory_bytes']
+    if decouple_memory:
+        return Resources(adjust_cores_for_packability(cores_mcpu), memory_bytes, job['storage_gib'])
+    # as InstanceCollectionConfigs converts requests for pools
+    cores_mcpu = adjust_cores_for_packability(adjust_cores_for_memory_request(cores_mcpu, memory_bytes, worker_type))
+    return Resources(cores_mcpu, cores_mcpu_to_memory_bytes(cores_mcpu, worker_type), job['storage_gib'])
+
+
+def compare(
+    jobs: List[dict],
+    worker_type: str,
+    worker_cores: int,
+    worker_local_ssd_data_disk: bool,
+    worker_pd_ssd_data_disk_size_gb: int,
+    n_instances: int,
+) -> Dict[str, Dict[str, float]]:
+    capacity = worker_resources(
+        worker_type, worker_cores * 1000, worker_local_ssd_data_disk, worker_pd_ssd_data_disk_size_gb
+    )
+    durations_secs = [job['duration_secs'] for job in jobs]
+    converted = [job_resources(job, worker_type, decouple_memory=False) for job in jobs]
+    decoupled = [job_resources(job, worker_type, decouple_memory=True) for job in jobs]
+    return {
+        'cores': simulate(converted, durations_secs, capacity, n_instances, best_fit_on_cores),
+        'drf': simulate(converted, durations_secs, capacity, n_instances, best_fit_on_resources),
+        'drf-decoupled-memory': simulate(decoupled, durations_secs, capacity, n_instances, best_fit_on_resources),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pool scheduling policies on recorded job shapes.')
+    parser.add_argument('jobs', help='file with one JSON job shape per line')
+    parser.add_argument('--worker-type', default='standard', choices=['highcpu', 'standard', 'highmem'])
+    parser.add_argument('--worker-cores', type=int, default=16)
+    parser.add_argument(
+        '--worker-pd-ssd-data-disk-size-gb',
+        type=int,
+        default=0,
+        help='size of the workers\' persistent SSD data disk, which they use instead of a local SSD if set',
+    )
+    parser.add_argument('--n-instances', type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.jobs) as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+
+    result = compare(
+        jobs,
+        args.worker_type,
+        args.worker_cores,
+        args.worker_pd_ssd_data_disk_size_gb == 0,
+        args.worker_pd_ssd_data_disk_size_gb,
+        args.n_instances,
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -69,11 +69,12 @@ from ..inst_coll_config import InstanceCollectionConfigs
 from ..log_store import LogStore
 from ..database import CallError, check_call_procedure
 from ..batch_configuration import BATCH_BUCKET_NAME, DEFAULT_NAMESPACE, SCOPE
-from ..globals import HTTP_CLIENT_MAX_SIZE, BATCH_FORMAT_VERSION, memory_to_worker_type
+from ..globals import HTTP_CLIENT_MAX_SIZE, BATCH_FORMAT_VERSION, complete_states, memory_to_worker_type
 from ..spec_writer import SpecWriter
 from ..batch_format_version import BatchFormatVersion
 
 from .validate import ValidationError, validate_batch, validate_and_clean_jobs
+from .progress import BatchProgressWatcher
 
 # uvloop.install()
 
@@ -88,6 +89,15 @@ BATCH_JOB_DEFAULT_MEMORY = os.environ.get('HAIL_BATCH_JOB_DEFAULT_MEMORY', 'stan
 BATCH_JOB_DEFAULT_STORAGE = os.environ.get('HAIL_BATCH_JOB_DEFAULT_STORAGE', '0Gi')
 BATCH_JOB_DEFAULT_PREEMPTIBLE = True
 
+# requests waiting on batches and jobs respond within this many seconds, and
+# the progress of a batch being waited on is polled this often
+DEFAULT_WAIT_TIMEOUT_SECS = 30
+MAX_WAIT_TIMEOUT_SECS = 55
+WAIT_POLL_INTERVAL_SECS = 1
+
+DEFAULT_EXPORT_PAGE_SIZE = 1000
+MAX_EXPORT_PAGE_SIZE = 10000
+
 
 def rest_authenticated_developers_or_auth_only(fun):
     @rest_authenticated_users_only
@@ -197,7 +207,13 @@ async def _handle_api_error(f, *args, **kwargs):
         raise e.http_response()
 
 
-async def _query_batch_jobs(request, batch_id):
+class InvalidSearchTermError(Exception):
+    def __init__(self, term):
+        super().__init__(term)
+        self.term = term
+
+
+def _batch_jobs_query(batch_id, q, last_job_id, limit):
     state_query_values = {
         'pending': ['Pending'],
         'ready': ['Ready'],
@@ -212,19 +228,14 @@ async def _query_batch_jobs(request, batch_id):
         'done': ['Cancelled', 'Error', 'Failed', 'Success'],
     }
 
-    db = request.app['db']
-
     # batch has already been validated
     where_conditions = ['(jobs.batch_id = %s)']
     where_args = [batch_id]
 
-    last_job_id = request.query.get('last_job_id')
     if last_job_id is not None:
-        last_job_id = int(last_job_id)
         where_conditions.append('(jobs.job_id > %s)')
         where_args.append(last_job_id)
 
-    q = request.query.get('q', '')
     terms = q.split()
     for t in terms:
         if t[0] == '!':
@@ -255,9 +266,7 @@ async def _query_batch_jobs(request, batch_id):
             condition = f'({condition})'
             args = values
         else:
-            session = await aiohttp_session.get_session(request)
-            set_message(session, f'Invalid search term: {t}.', 'error')
-            return ([], None)
+            raise InvalidSearchTermError(t)
 
         if negate:
             condition = f'(NOT {condition})'
@@ -265,10 +274,18 @@ async def _query_batch_jobs(request, batch_id):
         where_conditions.append(condition)
         where_args.extend(args)
 
+    # select the page of jobs before joining, so the joins only see the page
     sql = f'''
 SELECT jobs.*, batches.user, batches.billing_project,  batches.format_version,
   job_attributes.value AS name, SUM(`usage` * rate) AS cost
-FROM jobs
+FROM (
+  SELECT jobs.batch_id, jobs.job_id
+  FROM jobs
+  WHERE {' AND '.join(where_conditions)}
+  ORDER BY jobs.batch_id, jobs.job_id ASC
+  LIMIT %s
+) AS page
+INNER JOIN jobs ON page.batch_id = jobs.batch_id AND page.job_id = jobs.job_id
 INNER JOIN batches ON jobs.batch_id = batches.id
 LEFT JOIN job_attributes
   ON jobs.batch_id = job_attributes.batch_id AND
@@ -279,12 +296,27 @@ LEFT JOIN aggregated_job_resources
      jobs.job_id = aggregated_job_resources.job_id
 LEFT JOIN resources
   ON aggregated_job_resources.resource = resources.resource
-WHERE {' AND '.join(where_conditions)}
 GROUP BY jobs.batch_id, jobs.job_id
-ORDER BY jobs.batch_id, jobs.job_id ASC
-LIMIT 50;
+ORDER BY jobs.batch_id, jobs.job_id ASC;
 '''
-    sql_args = where_args
+    sql_args = where_args + [limit]
+
+    return (sql, sql_args)
+
+
+async def _query_batch_jobs(request, batch_id):
+    db = request.app['db']
+
+    last_job_id = request.query.get('last_job_id')
+    if last_job_id is not None:
+        last_job_id = int(last_job_id)
+
+    try:
+        sql, sql_args = _batch_jobs_query(batch_id, request.query.get('q', ''), last_job_id, 50)
+    except InvalidSearchTermError as e:
+        session = await aiohttp_session.get_session(request)
+        set_message(session, f'Invalid search term: {e.term}.', 'error')
+        return ([], None)
 
     jobs = [job_record_to_dict(record, record['name']) async for record in db.select_and_fetchall(sql, sql_args)]
 
@@ -317,6 +349,57 @@ WHERE id = %s AND NOT deleted;
     return web.json_response(resp)
 
 
+@routes.get('/api/v1alpha/batches/{batch_id}/jobs/export')
+@rest_billing_project_users_only
+async def export_jobs(request, userdata, batch_id):  # pylint: disable=unused-argument
+    # streams the jobs matching q after last_job_id as newline-delimited
+    # JSON, in order of job id, querying page_size jobs at a time
+    db = request.app['db']
+    record = await db.select_and_fetchone(
+        '''
+SELECT * FROM batches
+WHERE id = %s AND NOT deleted;
+''',
+        (batch_id,),
+    )
+    if not record:
+        raise web.HTTPNotFound()
+
+    try:
+        last_job_id = request.query.get('last_job_id')
+        if last_job_id is not None:
+            last_job_id = int(last_job_id)
+        page_size = int(request.query.get('page_size', DEFAULT_EXPORT_PAGE_SIZE))
+    except ValueError as e:
+        raise web.HTTPBadRequest(reason=str(e))
+    if not 0 < page_size <= MAX_EXPORT_PAGE_SIZE:
+        raise web.HTTPBadRequest(reason=f'page_size must be between 1 and {MAX_EXPORT_PAGE_SIZE}')
+    q = request.query.get('q', '')
+
+    try:
+        _batch_jobs_query(batch_id, q, last_job_id, page_size)
+    except InvalidSearchTermError as e:
+        raise web.HTTPBadRequest(reason=f'invalid search term: {e.term}')
+
+    resp = web.StreamResponse()
+    resp.content_type = 'application/x-ndjson'
+    await resp.prepare(request)
+
+    while True:
+        sql, sql_args = _batch_jobs_query(batch_id, q, last_job_id, page_size)
+        lines = []
+        async for record in db.select_and_fetchall(sql, sql_args):
+            lines.append(json.dumps(job_record_to_dict(record, record['name'])))
+            last_job_id = record['job_id']
+        if lines:
+            await resp.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        if len(lines) < page_size:
+            break
+
+    await resp.write_eof()
+    return resp
+
+
 async def _get_job_log_from_record(app, batch_id, job_id, record):
     state = record['state']
     ip_address = record['ip_address']
@@ -420,7 +503,7 @@ async def _get_full_job_spec(app, record):
     token, start_job_id = await SpecWriter.get_token_start_id(db, batch_id, job_id)
 
     try:
-        spec = await log_store.read_spec_file(batch_id, token, start_job_id, job_id)
+        spec = await log_store.read_spec_file(format_version, batch_id, token, start_job_id, job_id)
         return json.loads(spec)
     except google.api_core.exceptions.NotFound:
         id = (batch_id, job_id)
@@ -657,7 +740,7 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 raise web.HTTPBadRequest(reason=e.reason)
 
         async with timer.step('build db args'):
-            spec_writer = SpecWriter(log_store, batch_id)
+            spec_writer = SpecWriter(log_store, batch_id, batch_format_version)
 
             jobs_args = []
             job_parents_args = []
@@ -1143,6 +1226,35 @@ async def get_batch(request, userdata, batch_id):  # pylint: disable=unused-argu
     return web.json_response(await _get_batch(request.app, batch_id))
 
 
+def wait_timeout_secs(request):
+    try:
+        timeout_secs = float(request.query.get('timeout', DEFAULT_WAIT_TIMEOUT_SECS))
+    except ValueError as e:
+        raise web.HTTPBadRequest(reason=f'invalid timeout: {e}')
+    return min(max(timeout_secs, 0), MAX_WAIT_TIMEOUT_SECS)
+
+
+@routes.get('/api/v1alpha/batches/{batch_id}/wait')
+@rest_billing_project_users_only
+async def wait_for_batch(request, userdata, batch_id):  # pylint: disable=unused-argument
+    # responds with the batch's status once its number of completed jobs
+    # differs from last_n_completed, it is complete, or timeout elapses
+    try:
+        last_n_completed = int(request.query.get('last_n_completed', -1))
+    except ValueError as e:
+        raise web.HTTPBadRequest(reason=f'invalid last_n_completed: {e}')
+    timeout_secs = wait_timeout_secs(request)
+
+    watcher: BatchProgressWatcher = request.app['batch_progress_watcher']
+    await watcher.wait(
+        batch_id,
+        lambda progress: progress['n_completed'] != last_n_completed or progress['state'] == 'complete',
+        timeout_secs,
+    )
+
+    return web.json_response(await _get_batch(request.app, batch_id))
+
+
 @routes.patch('/api/v1alpha/batches/{batch_id}/cancel')
 @rest_billing_project_users_only
 async def cancel_batch(request, userdata, batch_id):  # pylint: disable=unused-argument
@@ -1368,6 +1480,41 @@ async def get_job(request, userdata, batch_id):  # pylint: disable=unused-argume
     return web.json_response(status)
 
 
+@routes.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/wait')
+@rest_billing_project_users_only
+async def wait_for_job(request, userdata, batch_id):  # pylint: disable=unused-argument
+    # responds with the job's status once it is complete or timeout elapses
+    app = request.app
+    db: Database = app['db']
+    job_id = int(request.match_info['job_id'])
+    timeout_secs = wait_timeout_secs(request)
+    watcher: BatchProgressWatcher = app['batch_progress_watcher']
+
+    deadline = time_msecs() + timeout_secs * 1000
+    while True:
+        record = await db.select_and_fetchone(
+            '''
+SELECT jobs.state, batches.n_completed
+FROM jobs
+INNER JOIN batches ON jobs.batch_id = batches.id
+WHERE jobs.batch_id = %s AND jobs.job_id = %s AND NOT deleted;
+''',
+            (batch_id, job_id),
+        )
+        if not record:
+            raise web.HTTPNotFound()
+        remaining_msecs = deadline - time_msecs()
+        if record['state'] in complete_states or remaining_msecs <= 0:
+            break
+        # the job is complete only once the batch's number of completed jobs changes
+        progress = await watcher.wait_for_completions(batch_id, record['n_completed'], remaining_msecs / 1000)
+        if progress is None or progress['n_completed'] <= record['n_completed']:
+            break
+
+    status = await _get_job(app, batch_id, job_id)
+    return web.json_response(status)
+
+
 @routes.get('/batches/{batch_id}/jobs/{job_id}')
 @web_billing_project_users_only()
 @catch_ui_error_in_dev
@@ -2119,6 +2266,8 @@ SELECT instance_id, internal_token, n_tokens, frozen FROM globals;
         periodically_call(5, _refresh, app)
     )
 
+    app['batch_progress_watcher'] = BatchProgressWatcher(db, app['task_manager'], WAIT_POLL_INTERVAL_SECS)
+
 
 async def on_cleanup(app):
     try:
@@ -0,0 +1,97 @@
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+
+from hailtop import aiotools
+from gear import Database
+
+log = logging.getLogger('progress')
+
+
+class BatchWatch:
+    def __init__(self):
+        self.n_waiters = 0
+        self.polled = False
+        # n_completed and state of the batch, None if it does not exist
+        self.progress: Optional[dict] = None
+        self.changed = asyncio.Event()
+
+
+class BatchProgressWatcher:
+    """Waits for the progress of batches to change.
+
+    The requests waiting on a batch share one poll of its progress, every
+    `poll_interval_secs` for as long as any of them is waiting, so the
+    database sees one small query per watched batch per interval however
+    many clients are waiting on it.
+    """
+
+    def __init__(self, db: Database, task_manager: aiotools.BackgroundTaskManager, poll_interval_secs: float):
+        self.db = db
+        self.task_manager = task_manager
+        self.poll_interval_secs = poll_interval_secs
+        self.watches: Dict[int, BatchWatch] = {}
+
+    async def poll(self, batch_id: int, watch: BatchWatch):
+        try:
+            while watch.n_waiters > 0:
+                try:
+                    progress = await self.db.select_and_fetchone(
+                        '''
+SELECT n_completed, `state` FROM batches WHERE id = %s AND NOT deleted;
+''',
+                        (batch_id,),
+                    )
+                except asyncio.CancelledError:  # pylint: disable=try-except-raise
+                    raise
+                except Exception:
+                    log.exception(f'error while polling the progress of batch {batch_id}')
+                else:
+                    if not watch.polled or progress != watch.progress:
+                        watch.polled = True
+                        watch.progress = progress
+                        watch.changed.set()
+                        watch.changed = asyncio.Event()
+                await asyncio.sleep(self.poll_interval_secs)
+        finally:
+            del self.watches[batch_id]
+
+    async def wait(self, batch_id: int, done: Callable[[dict], bool], timeout_secs: float) -> Optional[dict]:
+        """Wait up to `timeout_secs` for the progress of `batch_id` to satisfy
+        `done`. Returns the latest progress, or None if the batch does not
+        exist."""
+        watch = self.watches.get(batch_id)
+        if watch is None:
+            watch = BatchWatch()
+            self.watches[batch_id] = watch
+            watch.n_waiters += 1
+            self.task_manager.ensure_future(self.poll(batch_id, watch))
+        else:
+            watch.n_waiters += 1
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout_secs
+        try:
+            while True:
+                changed = watch.changed
+                if watch.polled and (watch.progress is None or done(watch.progress)):
+                    return watch.progress
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    return watch.progress
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return watch.progress
+        finally:
+            watch.n_waiters -= 1
+
+    async def wait_for_completions(self, batch_id: int, n_completed: int, timeout_secs: float) -> Optional[dict]:
+        """Wait up to `timeout_secs` for more than `n_completed` jobs of
+        `batch_id` to complete.
+
+        `n_completed` may have been read after the watch's last poll, so the
+        watch is only done once a poll sees more completed jobs, never merely
+        a different number.
+        """
+        return await self.wait(batch_id, lambda progress: progress['n_completed'] > n_completed, timeout_secs)
@@ -88,6 +88,7 @@ job_validator = keyed(
             keyed({required('namespace'): k8s_str, required('name'): k8s_str, required('mount_path'): str_type})
         ),
         'service_account': keyed({required('namespace'): k8s_str, required('name'): k8s_str}),
+        'sync_output_files': bool_type,
         'timeout': numeric(**{"x > 0": lambda x: x > 0}),
     }
 )
@@ -28,10 +28,12 @@ memory_to_worker_type = {'lowmem': 'highcpu', 'standard': 'standard', 'highmem':
 
 HTTP_CLIENT_MAX_SIZE = 8 * 1024 * 1024
 
-BATCH_FORMAT_VERSION = 6
+BATCH_FORMAT_VERSION = 8
 STATUS_FORMAT_VERSION = 5
-INSTANCE_VERSION = 19
+INSTANCE_VERSION = 20
 WORKER_CONFIG_VERSION = 3
 
 MAX_PERSISTENT_SSD_SIZE_GIB = 64 * 1024
 RESERVED_STORAGE_GB_PER_CORE = 5
+# number of jobs on a worker that may copy inputs or outputs at once
+MAX_CONCURRENT_TRANSFERS_PER_WORKER = 16
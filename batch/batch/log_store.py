@@ -1,14 +1,19 @@
 import logging
 import asyncio
+import zlib
 
 from hailtop.google_storage import GCS
 
-from .spec_writer import SpecWriter
+from .spec_writer import SpecWriter, CompressedSpecIndex
+from .spec_cache import SpecCache
 from .globals import BATCH_FORMAT_VERSION
 from .batch_format_version import BatchFormatVersion
 
 log = logging.getLogger('logstore')
 
+# memory for decoded spec indexes and decompressed spec blocks
+SPEC_CACHE_SIZE_BYTES = 64 * 1024 * 1024
+
 
 class LogStore:
     def __init__(self, batch_logs_bucket_name, instance_id, blocking_pool, *, project=None, credentials=None):
@@ -16,6 +21,7 @@ class LogStore:
         self.instance_id = instance_id
         self.batch_logs_root = f'gs://{batch_logs_bucket_name}/batch/logs/{instance_id}/batch'
         self.gcs = GCS(blocking_pool, project=project, credentials=credentials)
+        self.spec_cache = SpecCache(SPEC_CACHE_SIZE_BYTES)
 
         log.info(f'BATCH_LOGS_ROOT {self.batch_logs_root}')
         format_version = BatchFormatVersion(BATCH_FORMAT_VERSION)
@@ -65,7 +71,10 @@ class LogStore:
     def specs_index_path(self, batch_id, token):
         return f'{self.specs_dir(batch_id, token)}/specs.idx'
 
-    async def read_spec_file(self, batch_id, token, start_job_id, job_id):
+    async def read_spec_file(self, format_version, batch_id, token, start_job_id, job_id):
+        if format_version.has_compressed_specs():
+            return await self._read_compressed_spec_file(batch_id, token, job_id - start_job_id)
+
         idx_path = self.specs_index_path(batch_id, token)
         idx_start, idx_end = SpecWriter.get_index_file_offsets(job_id, start_job_id)
         offsets = await self.gcs.read_binary_gs_file(idx_path, start=idx_start, end=idx_end)
@@ -74,6 +83,23 @@ class LogStore:
         spec_start, spec_end = SpecWriter.get_spec_file_offsets(offsets)
         return await self.gcs.read_gs_file(spec_path, start=spec_start, end=spec_end)
 
+    async def _read_compressed_spec_file(self, batch_id, token, i):
+        async def read_index():
+            idx_path = self.specs_index_path(batch_id, token)
+            return CompressedSpecIndex(await self.gcs.read_binary_gs_file(idx_path))
+
+        index = await self.spec_cache.get(('index', batch_id, token), read_index)
+        block, spec_start, spec_end = index.locate(i)
+
+        async def read_block():
+            spec_path = self.specs_path(batch_id, token)
+            block_start, block_end = index.compressed_block_offsets(block)
+            data = await self.gcs.read_binary_gs_file(spec_path, start=block_start, end=block_end)
+            return zlib.decompress(data)
+
+        data = await self.spec_cache.get(('block', batch_id, token, block), read_block)
+        return data[spec_start:spec_end].decode('utf-8')
+
     async def write_spec_file(self, batch_id, token, data_bytes, offsets_bytes):
         idx_path = self.specs_index_path(batch_id, token)
         write1 = self.gcs.write_gs_file_from_string(idx_path, offsets_bytes, content_type='application/octet-stream')
@@ -0,0 +1,60 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import collections
+
+
+class SpecCache:
+    """An in-memory cache of immutable values read from GCS or the database,
+    such as spec indexes and blocks.
+
+    Entries never go stale. The cache holds values of total size at most
+    `max_size`, as measured by `size`, evicting the least recently used
+    entries to make room. Concurrent requests for an entry that is being
+    fetched wait for that fetch rather than starting another.
+    """
+
+    def __init__(self, max_size: int, size: Callable[[Any], int] = len):
+        self.max_size = max_size
+        self.size = size
+
+        self.current_size = 0
+        # in least recently used order
+        self.entries: 'collections.OrderedDict[Hashable, Any]' = collections.OrderedDict()
+        self.fetches: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if key in self.fetches:
+            self.hits += 1
+            return await asyncio.shield(self.fetches[key])
+
+        self.misses += 1
+        fetching = asyncio.ensure_future(self._fetch(key, fetch))
+        self.fetches[key] = fetching
+        try:
+            return await asyncio.shield(fetching)
+        finally:
+            if fetching.done():
+                del self.fetches[key]
+            else:
+                fetching.add_done_callback(lambda _: self.fetches.pop(key, None))
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        size = self.size(value)
+        if size > self.max_size:
+            return value
+
+        while self.entries and self.current_size + size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.current_size -= self.size(evicted)
+
+        self.entries[key] = value
+        self.current_size += size
+        return value
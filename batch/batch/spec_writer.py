@@ -1,4 +1,7 @@
+from typing import List, Tuple
+import bisect
 import logging
+import zlib
 
 from hailtop.utils import secret_alnum_string
 
@@ -9,6 +12,8 @@ class SpecWriter:
     byteorder = 'little'
     signed = False
     bytes_per_offset = 8
+    # size of the blocks compressed specs are split into
+    block_size_bytes = 128 * 1024
 
     @staticmethod
     def get_index_file_offsets(job_id, start_job_id):
@@ -41,9 +46,46 @@ LIMIT 1;
         start_job_id = bunch_record['start_job_id']
         return (token, start_job_id)
 
-    def __init__(self, log_store, batch_id):
+    @staticmethod
+    def compress(data_bytes: bytes, offsets: List[int]) -> Tuple[bytes, bytes]:
+        """Compress the specs in `data_bytes`, which start at `offsets`, in
+        blocks of whole specs of about `block_size_bytes` each. Returns the
+        compressed specs and their index."""
+        block_starts = [0]
+        for offset in offsets[1:-1]:
+            if offset - block_starts[-1] >= SpecWriter.block_size_bytes:
+                block_starts.append(offset)
+        block_starts.append(offsets[-1])
+
+        compressed = bytearray()
+        compressed_block_starts = []
+        for start, end in zip(block_starts[:-1], block_starts[1:]):
+            compressed_block_starts.append(len(compressed))
+            compressed.extend(zlib.compress(data_bytes[start:end]))
+        compressed_block_starts.append(len(compressed))
+
+        index = [len(offsets) - 1, len(block_starts) - 1] + offsets + block_starts + compressed_block_starts
+        return (bytes(compressed), SpecWriter.encode_offsets(index))
+
+    @staticmethod
+    def encode_offsets(offsets: List[int]) -> bytes:
+        return b''.join(
+            offset.to_bytes(SpecWriter.bytes_per_offset, byteorder=SpecWriter.byteorder, signed=SpecWriter.signed)
+            for offset in offsets
+        )
+
+    @staticmethod
+    def decode_offsets(offsets_bytes: bytes) -> List[int]:
+        n = SpecWriter.bytes_per_offset
+        return [
+            int.from_bytes(offsets_bytes[i:i + n], byteorder=SpecWriter.byteorder, signed=SpecWriter.signed)
+            for i in range(0, len(offsets_bytes), n)
+        ]
+
+    def __init__(self, log_store, batch_id, format_version):
         self.log_store = log_store
         self.batch_id = batch_id
+        self.format_version = format_version
         self.token = secret_alnum_string(16)
 
         self._data_bytes = bytearray()
@@ -63,7 +105,45 @@ LIMIT 1;
         end = len(self._data_bytes)
         self._offsets_bytes.extend(end.to_bytes(8, byteorder=SpecWriter.byteorder, signed=SpecWriter.signed))
 
-        await self.log_store.write_spec_file(
-            self.batch_id, self.token, bytes(self._data_bytes), bytes(self._offsets_bytes)
-        )
+        data_bytes = bytes(self._data_bytes)
+        offsets_bytes = bytes(self._offsets_bytes)
+        if self.format_version.has_compressed_specs():
+            data_bytes, offsets_bytes = SpecWriter.compress(data_bytes, SpecWriter.decode_offsets(offsets_bytes))
+
+        await self.log_store.write_spec_file(self.batch_id, self.token, data_bytes, offsets_bytes)
         return self.token
+
+
+class CompressedSpecIndex:
+    """The index of a bunch of specs compressed by SpecWriter.compress.
+
+    The index holds the number of specs and blocks, the offsets of the specs
+    in the uncompressed data, and the offsets of the blocks in the
+    uncompressed and compressed data.
+    """
+
+    def __init__(self, index_bytes: bytes):
+        index = SpecWriter.decode_offsets(index_bytes)
+        n_specs, n_blocks = index[0], index[1]
+        i = 2
+        self.spec_starts = index[i:i + n_specs + 1]
+        i += n_specs + 1
+        self.block_starts = index[i:i + n_blocks + 1]
+        i += n_blocks + 1
+        self.compressed_block_starts = index[i:i + n_blocks + 1]
+        self.size = len(index_bytes)
+
+    def __len__(self):
+        return self.size
+
+    def locate(self, i: int) -> Tuple[int, int, int]:
+        """Return the block of spec `i` and its start and end in the
+        uncompressed block."""
+        spec_start = self.spec_starts[i]
+        block = bisect.bisect_right(self.block_starts, spec_start) - 1
+        block_start = self.block_starts[block]
+        return (block, spec_start - block_start, self.spec_starts[i + 1] - block_start)
+
+    def compressed_block_offsets(self, block: int) -> Tuple[int, int]:
+        # `end` parameter in gcs is inclusive of last byte to return
+        return (self.compressed_block_starts[block], self.compressed_block_starts[block + 1] - 1)
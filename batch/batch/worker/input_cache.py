@@ -0,0 +1,145 @@
+from typing import Awaitable, Callable, Dict, Tuple
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from hailtop.utils import blocking_to_async, check_exec_output, CalledProcessError
+
+log = logging.getLogger('input_cache')
+
+# (url, generation, size in bytes)
+CacheKey = Tuple[str, str, int]
+
+
+class InputCache:
+    """Input files shared by the jobs on a worker, stored on the data disk.
+
+    Objects are identified by URL, generation and size, so a cached copy is
+    only used for the exact object a job asked for. The cache holds at most
+    `max_size_bytes`, evicting the least recently used objects to make room.
+    Objects for which no room can be made are not cached.
+    Concurrent requests for an object that is being fetched wait for that
+    fetch rather than starting another.
+    """
+
+    def __init__(self, root: str, max_size_bytes: int, pool):
+        self.root = root
+        self.max_size_bytes = max_size_bytes
+        self.pool = pool
+
+        self.size_bytes = 0
+        # in least recently used order
+        self.entries: 'collections.OrderedDict[CacheKey, str]' = collections.OrderedDict()
+        self.fetches: Dict[CacheKey, asyncio.Future] = {}
+        # entries being linked into a job, which must not be evicted
+        self.pins: Dict[CacheKey, int] = collections.Counter()
+
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root)
+
+    async def localize(
+        self, key: CacheKey, fetch: Callable[[str], Awaitable[None]], dest: str, counters: Dict[str, int]
+    ) -> bool:
+        """Materialize the object `key` at `dest`, calling `fetch` with a path to
+        download it to if it is not cached. Updates the hit and miss counts and
+        byte counts in `counters`. Returns False, doing nothing, if the object
+        is too large to cache or if room cannot be made for it because the
+        cache is full of objects in use."""
+        _, _, size = key
+        if size > self.max_size_bytes:
+            return False
+
+        self.pins[key] += 1
+        try:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                path = self.entries[key]
+                counters['hits'] += 1
+                counters['hit_bytes'] += size
+            elif key in self.fetches:
+                path = await asyncio.shield(self.fetches[key])
+                counters['hits'] += 1
+                counters['hit_bytes'] += size
+            else:
+                if not self._evict(size):
+                    return False
+                # reserve the space before yielding, so concurrent fetches
+                # cannot claim it too
+                self.size_bytes += size
+                fetching = asyncio.ensure_future(self._fetch(key, fetch))
+                self.fetches[key] = fetching
+                try:
+                    path = await asyncio.shield(fetching)
+                finally:
+                    if fetching.done():
+                        del self.fetches[key]
+                    else:
+                        fetching.add_done_callback(lambda _: self.fetches.pop(key, None))
+                counters['misses'] += 1
+                counters['fetched_bytes'] += size
+
+            await self._materialize(path, dest)
+            return True
+        finally:
+            self.pins[key] -= 1
+            if self.pins[key] == 0:
+                del self.pins[key]
+
+    async def _fetch(self, key: CacheKey, fetch: Callable[[str], Awaitable[None]]) -> str:
+        _, _, size = key
+        path = f'{self.root}/{hashlib.sha256(json.dumps(key).encode()).hexdigest()}'
+        partial_path = f'{path}.partial'
+        try:
+            await fetch(partial_path)
+            actual_size = os.path.getsize(partial_path)
+            if actual_size != size:
+                raise ValueError(f'expected {key} to have {size} bytes, found {actual_size}')
+            os.chmod(partial_path, 0o444)
+            os.rename(partial_path, path)
+        except BaseException:
+            self.size_bytes -= size
+            try:
+                os.remove(partial_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self.entries[key] = path
+        return path
+
+    def _evict(self, n_bytes: int) -> bool:
+        """Evict unpinned entries, least recently used first, until there is
+        room for `n_bytes` more. Returns whether there is."""
+        for key in list(self.entries):
+            if self.size_bytes + n_bytes <= self.max_size_bytes:
+                return True
+            if key in self.pins:
+                continue
+            path = self.entries.pop(key)
+            _, _, size = key
+            os.remove(path)
+            self.size_bytes -= size
+            log.info(f'evicted {key} from the input cache')
+        return self.size_bytes + n_bytes <= self.max_size_bytes
+
+    async def _materialize(self, path: str, dest: str):
+        # Prefer a reflink, which shares blocks but not the inode, so the job
+        # cannot modify the cached copy.  XFS refuses to hard link across
+        # project quota boundaries, in which case the file is copied.
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            await check_exec_output('cp', '--reflink=always', path, dest)
+            os.chmod(dest, 0o644)
+            return
+        except CalledProcessError:
+            pass
+        try:
+            os.link(path, dest)
+        except OSError:
+            await blocking_to_async(self.pool, shutil.copyfile, path, dest)
@@ -0,0 +1,88 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import random
+
+import aiohttp
+
+from hailtop import aiotools
+from hailtop.httpx import client_session
+
+log = logging.getLogger('job_status_reporter')
+
+
+class JobStatusReporter:
+    """Reports job statuses to a bulk driver endpoint.
+
+    Statuses reported within `window_secs` of the first unsent one are sent
+    together, at most `max_statuses_per_request` at a time. The endpoint
+    responds with the indices of the statuses it failed to record. Those,
+    and the statuses of requests that fail, are retried with exponential
+    backoff. If the endpoint responds 404, the reports fail with that error.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Callable[[], Optional[Dict[str, str]]],
+        task_manager: aiotools.BackgroundTaskManager,
+        window_secs: float,
+        max_statuses_per_request: int,
+    ):
+        self.url = url
+        self.headers = headers
+        self.task_manager = task_manager
+        self.window_secs = window_secs
+        self.max_statuses_per_request = max_statuses_per_request
+
+        self.pending: List[Tuple[dict, asyncio.Future]] = []
+        self.pending_changed = asyncio.Event()
+
+    def report(self, status: dict) -> asyncio.Future:
+        """Queue `status`, returning a future that completes when the driver
+        has recorded it."""
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append((status, future))
+        self.pending_changed.set()
+        return future
+
+    async def run(self):
+        while True:
+            await self.pending_changed.wait()
+            if len(self.pending) < self.max_statuses_per_request:
+                await asyncio.sleep(self.window_secs)
+            self.pending_changed.clear()
+            n = self.max_statuses_per_request
+            while self.pending:
+                reports, self.pending = self.pending[:n], self.pending[n:]
+                self.task_manager.ensure_future(self.send(reports))
+
+    async def send(self, reports: List[Tuple[dict, asyncio.Future]]):
+        delay_secs = 0.1
+        while True:
+            try:
+                async with client_session() as session:
+                    async with session.post(
+                        self.url, json={'statuses': [status for status, _ in reports]}, headers=self.headers()
+                    ) as resp:
+                        failed = set((await resp.json())['failed'])
+                for i, (_, future) in enumerate(reports):
+                    if i not in failed and not future.done():
+                        future.set_result(None)
+                reports = [report for i, report in enumerate(reports) if i in failed]
+                if not reports:
+                    return
+                log.warning(f'{self.url} failed to record {len(reports)} statuses, retrying')
+            except asyncio.CancelledError:  # pylint: disable=try-except-raise
+                raise
+            except Exception as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:  # pylint: disable=no-member
+                    for _, future in reports:
+                        if not future.done():
+                            future.set_exception(e)
+                    return
+                log.warning(f'failed to post {len(reports)} statuses to {self.url}, retrying', exc_info=True)
+
+            await asyncio.sleep(delay_secs * random.uniform(0.7, 1.3))
+            # exponentially back off, up to (expected) max of 2m
+            delay_secs = min(delay_secs * 2, 2 * 60.0)
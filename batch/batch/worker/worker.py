@@ -5,10 +5,10 @@ import sys
 import re
 import logging
 import asyncio
-import random
 import traceback
 import base64
 import uuid
+import functools
 import shutil
 import signal
 import aiohttp
@@ -37,6 +37,7 @@ from hailtop.utils import (
     parse_docker_image_reference,
     blocking_to_async,
     periodically_call,
+    bounded_gather,
 )
 from hailtop.httpx import client_session
 from hailtop.batch_client.parse import parse_cpu_in_mcpu, parse_memory_in_bytes, parse_storage_in_bytes
@@ -65,6 +66,7 @@ from ..globals import (
     STATUS_FORMAT_VERSION,
     RESERVED_STORAGE_GB_PER_CORE,
     MAX_PERSISTENT_SSD_SIZE_GIB,
+    MAX_CONCURRENT_TRANSFERS_PER_WORKER,
 )
 from ..batch_format_version import BatchFormatVersion
 from ..worker_config import WorkerConfig
@@ -72,6 +74,8 @@ from ..publicly_available_images import publicly_available_images
 from ..utils import storage_gib_to_bytes, Box
 
 from .disk import Disk
+from .input_cache import InputCache
+from .job_status_reporter import JobStatusReporter
 
 # uvloop.install()
 
@@ -84,6 +88,9 @@ MAX_DOCKER_OTHER_OPERATION_SECS = 1 * 60
 
 IPTABLES_WAIT_TIMEOUT_SECS = 60
 
+JOB_STATUS_REPORT_WINDOW_SECS = 0.5
+MAX_JOB_STATUSES_PER_REPORT = 100
+
 CORES = int(os.environ['CORES'])
 NAME = os.environ['NAME']
 NAMESPACE = os.environ['NAMESPACE']
@@ -102,6 +109,7 @@ BATCH_WORKER_IMAGE = os.environ['BATCH_WORKER_IMAGE']
 BATCH_WORKER_IMAGE_ID = os.environ['BATCH_WORKER_IMAGE_ID']
 UNRESERVED_WORKER_DATA_DISK_SIZE_GB = int(os.environ['UNRESERVED_WORKER_DATA_DISK_SIZE_GB'])
 assert UNRESERVED_WORKER_DATA_DISK_SIZE_GB >= 0
+INPUT_CACHE_FRACTION_OF_DATA_DISK = float(os.environ.get('INPUT_CACHE_FRACTION_OF_DATA_DISK', '0'))
 
 log.info(f'CORES {CORES}')
 log.info(f'NAME {NAME}')
@@ -117,6 +125,7 @@ log.info(f'WORKER_CONFIG {WORKER_CONFIG}')
 log.info(f'MAX_IDLE_TIME_MSECS {MAX_IDLE_TIME_MSECS}')
 log.info(f'WORKER_DATA_DISK_MOUNT {WORKER_DATA_DISK_MOUNT}')
 log.info(f'UNRESERVED_WORKER_DATA_DISK_SIZE_GB {UNRESERVED_WORKER_DATA_DISK_SIZE_GB}')
+log.info(f'INPUT_CACHE_FRACTION_OF_DATA_DISK {INPUT_CACHE_FRACTION_OF_DATA_DISK}')
 
 worker_config = WorkerConfig(WORKER_CONFIG)
 assert worker_config.cores == CORES
@@ -340,6 +349,7 @@ class ContainerStepManager:
         if self.is_deleted():
             raise JobDeletedError()
         self.timing['start_time'] = time_msecs()
+        return self.timing
 
     def __exit__(self, exc_type, exc, tb):
         if self.is_deleted():
@@ -973,18 +983,21 @@ async def add_gcsfuse_bucket(mount_path, bucket, key_file, read_only):
         delay = await sleep_and_backoff(delay)
 
 
-def copy_container(job, name, files, volume_mounts, cpu, memory, scratch, requester_pays_project):
+def copy_container(job, name, files, volume_mounts, cpu, memory, scratch, requester_pays_project, sync=False):
     assert files
+    command = [
+        '/usr/bin/python3',
+        '-m',
+        'batch.copy',
+        json.dumps(requester_pays_project),
+        json.dumps(files),
+    ]
+    if sync:
+        command.append('--sync')
     copy_spec = {
         'image': BATCH_WORKER_IMAGE,
         'name': name,
-        'command': [
-            '/usr/bin/python3',
-            '-m',
-            'batch.copy',
-            json.dumps(requester_pays_project),
-            json.dumps(files),
-        ],
+        'command': command,
         'env': ['GOOGLE_APPLICATION_CREDENTIALS=/gsa-key/key.json'],
         'cpu': cpu,
         'memory': memory,
@@ -1213,6 +1226,8 @@ class DockerJob(Job):
         output_files = job_spec.get('output_files')
 
         requester_pays_project = job_spec.get('requester_pays_project')
+        self.input_files = input_files
+        self.requester_pays_project = requester_pays_project
 
         self.timings = Timings(lambda: False)
 
@@ -1234,16 +1249,7 @@ class DockerJob(Job):
         containers = {}
 
         if input_files:
-            containers['input'] = copy_container(
-                self,
-                'input',
-                input_files,
-                self.input_volume_mounts,
-                self.cpu_in_mcpu,
-                self.memory_in_bytes,
-                self.scratch,
-                requester_pays_project,
-            )
+            containers['input'] = self.input_container(input_files)
 
         # main container
         main_spec = {
@@ -1281,13 +1287,87 @@ class DockerJob(Job):
                 self.memory_in_bytes,
                 self.scratch,
                 requester_pays_project,
+                sync=job_spec.get('sync_output_files', False),
             )
 
         self.containers = containers
 
+    def input_container(self, input_files):
+        return copy_container(
+            self,
+            'input',
+            input_files,
+            self.input_volume_mounts,
+            self.cpu_in_mcpu,
+            self.memory_in_bytes,
+            self.scratch,
+            self.requester_pays_project,
+        )
+
     def step(self, name: str):
         return self.timings.step(name)
 
+    async def localize_cached_inputs(self, counters):
+        # Returns the input files that still need to be copied by the input container.
+        counters.update({'hits': 0, 'misses': 0, 'hit_bytes': 0, 'fetched_bytes': 0})
+        if worker.input_cache is None:
+            return self.input_files
+        key = json.loads(base64.b64decode(self.gsa_key['key.json']).decode())
+        params = {'userProject': self.requester_pays_project} if self.requester_pays_project else None
+        storage_client = aiogoogle.StorageClient(
+            credentials=aiogoogle.ServiceAccountCredentials(key), params=params
+        )
+        try:
+            localized = await bounded_gather(
+                *[
+                    functools.partial(self.localize_cached_input, storage_client, file, counters)
+                    for file in self.input_files
+                ],
+                parallelism=10,
+            )
+        finally:
+            await storage_client.close()
+        return [file for file, is_localized in zip(self.input_files, localized) if not is_localized]
+
+    async def localize_cached_input(self, storage_client, file, counters):
+        src = file['from']
+        dest = file['to']
+        if not src.startswith('gs://') or not dest.startswith('/io/'):
+            return False
+        bucket, name = aiogoogle.GoogleStorageAsyncFS._get_bucket_name(src)
+        if not name or name.endswith('/'):
+            return False
+
+        try:
+            # directories, missing objects and permission errors are left to
+            # the input container, which reports them to the user
+            metadata = await storage_client.get_object_metadata(bucket, name)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return False
+        generation = metadata['generation']
+
+        async def fetch(path):
+            local_fs = LocalAsyncFS(worker.pool)
+            async with await storage_client.get_object(bucket, name, params={'generation': generation}) as data:
+                async with await local_fs.create(path) as local_file:
+                    while True:
+                        b = await data.read(256 * 1024)
+                        if not b:
+                            break
+                        written = await local_file.write(b)
+                        assert written == len(b)
+
+        host_dest = self.io_host_path() + dest[len('/io'):]
+        try:
+            return await worker.input_cache.localize((src, generation, int(metadata['size'])), fetch, host_dest, counters)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception(f'{self}: while localizing {src} from the input cache')
+            return False
+
     async def setup_io(self):
         if not worker_config.job_private:
             if worker.data_disk_space_remaining.value < self.external_storage_in_gib:
@@ -1322,102 +1402,115 @@ class DockerJob(Job):
         os.makedirs(self.io_host_path())
 
     async def run(self, worker):
-        async with worker.cpu_sem(self.cpu_in_mcpu):
-            self.start_time = time_msecs()
-
-            try:
-                self.task_manager.ensure_future(worker.post_job_started(self))
+        self.start_time = time_msecs()
 
-                log.info(f'{self}: initializing')
-                self.state = 'initializing'
+        try:
+            self.task_manager.ensure_future(worker.post_job_started(self))
 
-                os.makedirs(f'{self.scratch}/')
+            log.info(f'{self}: initializing')
+            self.state = 'initializing'
 
-                with self.step('setup_io'):
-                    await self.setup_io()
+            os.makedirs(f'{self.scratch}/')
 
-                if not self.disk:
-                    data_disk_storage_in_bytes = storage_gib_to_bytes(
-                        self.external_storage_in_gib + self.data_disk_storage_in_gib
-                    )
-                else:
-                    data_disk_storage_in_bytes = storage_gib_to_bytes(self.data_disk_storage_in_gib)
+            with self.step('setup_io'):
+                await self.setup_io()
 
-                with self.step('configuring xfsquota'):
-                    # Quota will not be applied to `/io` if the job has an attached disk mounted there
-                    await check_shell_output(f'xfs_quota -x -c "project -s -p {self.scratch} {self.project_id}" /host/')
-                    await check_shell_output(
-                        f'xfs_quota -x -c "limit -p bsoft={data_disk_storage_in_bytes} bhard={data_disk_storage_in_bytes} {self.project_id}" /host/'
-                    )
+            if not self.disk:
+                data_disk_storage_in_bytes = storage_gib_to_bytes(
+                    self.external_storage_in_gib + self.data_disk_storage_in_gib
+                )
+            else:
+                data_disk_storage_in_bytes = storage_gib_to_bytes(self.data_disk_storage_in_gib)
 
-                with self.step('populating secrets'):
-                    if self.secrets:
-                        for secret in self.secrets:
-                            populate_secret_host_path(self.secret_host_path(secret), secret['data'])
-
-                with self.step('adding gcsfuse bucket'):
-                    if self.gcsfuse:
-                        populate_secret_host_path(self.gsa_key_file_path(), self.gsa_key)
-                        for b in self.gcsfuse:
-                            bucket = b['bucket']
-                            await add_gcsfuse_bucket(
-                                mount_path=self.gcsfuse_path(bucket),
-                                bucket=bucket,
-                                key_file=f'{self.gsa_key_file_path()}/key.json',
-                                read_only=b['read_only'],
-                            )
-                            b['mounted'] = True
+            with self.step('configuring xfsquota'):
+                # Quota will not be applied to `/io` if the job has an attached disk mounted there
+                await check_shell_output(f'xfs_quota -x -c "project -s -p {self.scratch} {self.project_id}" /host/')
+                await check_shell_output(
+                    f'xfs_quota -x -c "limit -p bsoft={data_disk_storage_in_bytes} bhard={data_disk_storage_in_bytes} {self.project_id}" /host/'
+                )
 
-                self.state = 'running'
+            with self.step('populating secrets'):
+                if self.secrets:
+                    for secret in self.secrets:
+                        populate_secret_host_path(self.secret_host_path(secret), secret['data'])
 
-                input = self.containers.get('input')
-                if input:
-                    log.info(f'{self}: running input')
-                    await input.run(worker)
-                    log.info(f'{self} input: {input.state}')
+            with self.step('adding gcsfuse bucket'):
+                if self.gcsfuse:
+                    populate_secret_host_path(self.gsa_key_file_path(), self.gsa_key)
+                    for b in self.gcsfuse:
+                        bucket = b['bucket']
+                        await add_gcsfuse_bucket(
+                            mount_path=self.gcsfuse_path(bucket),
+                            bucket=bucket,
+                            key_file=f'{self.gsa_key_file_path()}/key.json',
+                            read_only=b['read_only'],
+                        )
+                        b['mounted'] = True
+
+            self.state = 'running'
+
+            # Only the main container holds the job's cores.  Inputs and
+            # outputs are transferred under the worker's separate I/O budget,
+            # which bounds the network and disk traffic of concurrent jobs.
+            # The driver still counts a job's cores as used until it
+            # completes, so no other job is scheduled into them while this
+            # one transfers its files.
+            input = self.containers.get('input')
+            if input:
+                async with worker.transfer_sem(1):
+                    with self.step('localizing cached inputs') as counters:
+                        remaining_input_files = await self.localize_cached_inputs(counters)
+                    if remaining_input_files:
+                        if len(remaining_input_files) < len(self.input_files):
+                            input = self.containers['input'] = self.input_container(remaining_input_files)
+                        log.info(f'{self}: running input')
+                        await input.run(worker)
+                        log.info(f'{self} input: {input.state}')
+                    else:
+                        input.state = 'succeeded'
 
-                if not input or input.state == 'succeeded':
+            if not input or input.state == 'succeeded':
+                main = self.containers['main']
+                async with worker.cpu_sem(self.cpu_in_mcpu):
                     log.info(f'{self}: running main')
-
-                    main = self.containers['main']
                     await main.run(worker)
-
                     log.info(f'{self} main: {main.state}')
 
-                    output = self.containers.get('output')
-                    if output:
+                output = self.containers.get('output')
+                if output:
+                    async with worker.transfer_sem(1):
                         log.info(f'{self}: running output')
                         await output.run(worker)
                         log.info(f'{self} output: {output.state}')
 
-                    if main.state != 'succeeded':
-                        self.state = main.state
-                    elif output:
-                        self.state = output.state
-                    else:
-                        self.state = 'succeeded'
+                if main.state != 'succeeded':
+                    self.state = main.state
+                elif output:
+                    self.state = output.state
                 else:
-                    self.state = input.state
-            except asyncio.CancelledError:
-                raise
-            except Exception as e:
-                if not user_error(e):
-                    log.exception(f'while running {self}')
+                    self.state = 'succeeded'
+            else:
+                self.state = input.state
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not user_error(e):
+                log.exception(f'while running {self}')
 
-                self.state = 'error'
-                self.error = traceback.format_exc()
-            finally:
-                with self.step('post-job finally block'):
-                    if self.disk:
-                        try:
-                            await self.disk.delete()
-                            log.info(f'deleted disk {self.disk.name} for {self.id}')
-                        except Exception:
-                            log.exception(f'while detaching and deleting disk {self.disk.name} for {self.id}')
-                    else:
-                        worker.data_disk_space_remaining.value += self.external_storage_in_gib
+            self.state = 'error'
+            self.error = traceback.format_exc()
+        finally:
+            with self.step('post-job finally block'):
+                if self.disk:
+                    try:
+                        await self.disk.delete()
+                        log.info(f'deleted disk {self.disk.name} for {self.id}')
+                    except Exception:
+                        log.exception(f'while detaching and deleting disk {self.disk.name} for {self.id}')
+                else:
+                    worker.data_disk_space_remaining.value += self.external_storage_in_gib
 
-                    await self.cleanup()
+                await self.cleanup()
 
     async def cleanup(self):
         self.end_time = time_msecs()
@@ -1684,8 +1777,13 @@ class Worker:
         self.cores_mcpu = CORES * 1000
         self.last_updated = time_msecs()
         self.cpu_sem = FIFOWeightedSemaphore(self.cores_mcpu)
-        self.data_disk_space_remaining = Box(UNRESERVED_WORKER_DATA_DISK_SIZE_GB)
+        self.transfer_sem = FIFOWeightedSemaphore(MAX_CONCURRENT_TRANSFERS_PER_WORKER)
+        input_cache_size_gb = int(UNRESERVED_WORKER_DATA_DISK_SIZE_GB * INPUT_CACHE_FRACTION_OF_DATA_DISK)
+        self.data_disk_space_remaining = Box(UNRESERVED_WORKER_DATA_DISK_SIZE_GB - input_cache_size_gb)
         self.pool = concurrent.futures.ThreadPoolExecutor()
+        self.input_cache: Optional[InputCache] = None
+        if input_cache_size_gb > 0:
+            self.input_cache = InputCache('/batch/input-cache', storage_gib_to_bytes(input_cache_size_gb), self.pool)
         self.jobs: Dict[Tuple[int, int], Job] = {}
         self.stop_event = asyncio.Event()
         self.task_manager = aiotools.BackgroundTaskManager()
@@ -1699,6 +1797,21 @@ class Worker:
         self.headers = None
         self.compute_client = None
 
+        self.job_started_reporter = JobStatusReporter(
+            deploy_config.url('batch-driver', '/api/v1alpha/instances/jobs_started'),
+            lambda: self.headers,
+            self.task_manager,
+            JOB_STATUS_REPORT_WINDOW_SECS,
+            MAX_JOB_STATUSES_PER_REPORT,
+        )
+        self.job_complete_reporter = JobStatusReporter(
+            deploy_config.url('batch-driver', '/api/v1alpha/instances/jobs_complete'),
+            lambda: self.headers,
+            self.task_manager,
+            JOB_STATUS_REPORT_WINDOW_SECS,
+            MAX_JOB_STATUSES_PER_REPORT,
+        )
+
     async def shutdown(self):
         self.task_manager.shutdown()
         if self.compute_client:
@@ -1726,7 +1839,9 @@ class Worker:
             start_job_id = body['start_job_id']
             addtl_spec = body['job_spec']
 
-            job_spec = await self.log_store.read_spec_file(batch_id, token, start_job_id, job_id)
+            job_spec = await self.log_store.read_spec_file(
+                format_version, batch_id, token, start_job_id, job_id
+            )
             job_spec = json.loads(job_spec)
 
             job_spec['attempt_id'] = addtl_spec['attempt_id']
@@ -1806,6 +1921,26 @@ class Worker:
     async def delete_job(self, request):
         return await asyncio.shield(self.delete_job_1(request))
 
+    async def delete_jobs_1(self, request):
+        body = await request.json()
+        for batch_id, job_id in body['jobs']:
+            id = (batch_id, job_id)
+
+            job = self.jobs.pop(id, None)
+            if job is None:
+                log.info(f'not deleting job {id}, not in jobs')
+                continue
+
+            log.info(f'deleting job {id}, removing from jobs')
+            self.task_manager.ensure_future(job.delete())
+
+        self.last_updated = time_msecs()
+
+        return web.Response()
+
+    async def delete_jobs(self, request):
+        return await asyncio.shield(self.delete_jobs_1(request))
+
     async def healthcheck(self, request):  # pylint: disable=unused-argument
         body = {'name': NAME}
         return web.json_response(body)
@@ -1817,6 +1952,7 @@ class Worker:
                 web.post('/api/v1alpha/kill', self.kill),
                 web.post('/api/v1alpha/batches/jobs/create', self.create_job),
                 web.delete('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete', self.delete_job),
+                web.post('/api/v1alpha/batches/jobs/delete', self.delete_jobs),
                 web.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/log', self.get_job_log),
                 web.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/status', self.get_job_status),
                 web.get('/healthcheck', self.healthcheck),
@@ -1834,6 +1970,8 @@ class Worker:
         await site.start()
 
         self.task_manager.ensure_future(periodically_call(60, self.cleanup_old_images))
+        self.task_manager.ensure_future(self.job_started_reporter.run())
+        self.task_manager.ensure_future(self.job_complete_reporter.run())
         try:
             while True:
                 try:
@@ -1900,37 +2038,17 @@ class Worker:
             'status': db_status,
         }
 
-        body = {'status': status}
-
-        start_time = time_msecs()
-        delay_secs = 0.1
-        while True:
-            try:
-                async with client_session() as session:
-                    await session.post(
-                        deploy_config.url('batch-driver', '/api/v1alpha/instances/job_complete'),
-                        json=body,
-                        headers=self.headers,
-                    )
-                    return
-            except asyncio.CancelledError:  # pylint: disable=try-except-raise
-                raise
-            except Exception as e:
-                if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:  # pylint: disable=no-member
-                    raise
-                log.warning(f'failed to mark {job} complete, retrying', exc_info=True)
+        reported = self.job_complete_reporter.report(status)
 
-            # unlist job after 3m or half the run duration
-            now = time_msecs()
-            elapsed = now - start_time
-            if job.id in self.jobs and elapsed > 180 * 1000 and elapsed > run_duration / 2:
+        # unlist job after 3m or half the run duration
+        try:
+            await asyncio.wait_for(asyncio.shield(reported), max(180, run_duration / 2 / 1000))
+        except asyncio.TimeoutError:
+            if job.id in self.jobs:
                 log.info(f'too much time elapsed marking {job} complete, removing from jobs, will keep retrying')
                 del self.jobs[job.id]
                 self.last_updated = time_msecs()
-
-            await asyncio.sleep(delay_secs * random.uniform(0.7, 1.3))
-            # exponentially back off, up to (expected) max of 2m
-            delay_secs = min(delay_secs * 2, 2 * 60.0)
+            await reported
 
     async def post_job_complete(self, job):
         try:
@@ -1957,16 +2075,7 @@ class Worker:
             'resources': full_status['resources'],
         }
 
-        body = {'status': status}
-
-        async with client_session() as session:
-            await request_retry_transient_errors(
-                session,
-                'POST',
-                deploy_config.url('batch-driver', '/api/v1alpha/instances/job_started'),
-                json=body,
-                headers=self.headers,
-            )
+        await self.job_started_reporter.report(status)
 
     async def post_job_started(self, job):
         try:
@@ -0,0 +1,72 @@
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS cancel_ready_jobs $$
+CREATE PROCEDURE cancel_ready_jobs(
+  IN in_batch_id BIGINT,
+  IN in_limit INT,
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE cur_batch_cancelled BOOLEAN;
+  DECLARE cur_n_cancelled_jobs INT;
+
+  START TRANSACTION;
+
+  SELECT cancelled INTO cur_batch_cancelled FROM batches
+  WHERE id = in_batch_id
+  FOR UPDATE;
+
+  DROP TEMPORARY TABLE IF EXISTS `tmp_cancelled_ready_jobs`;
+
+  CREATE TEMPORARY TABLE `tmp_cancelled_ready_jobs` (
+    `job_id` INT NOT NULL,
+    PRIMARY KEY (`job_id`)
+  ) ENGINE = MEMORY;
+
+  INSERT INTO `tmp_cancelled_ready_jobs` (job_id)
+  SELECT job_id
+  FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+  WHERE batch_id = in_batch_id AND state = 'Ready' AND always_run = 0 AND (cur_batch_cancelled OR cancelled = 1)
+  LIMIT in_limit
+  FOR UPDATE;
+
+  SELECT COUNT(*) INTO cur_n_cancelled_jobs FROM `tmp_cancelled_ready_jobs`;
+
+  UPDATE jobs
+    INNER JOIN `tmp_cancelled_ready_jobs`
+      ON jobs.job_id = `tmp_cancelled_ready_jobs`.job_id
+    SET jobs.state = 'Cancelled', jobs.status = NULL, jobs.attempt_id = NULL
+    WHERE jobs.batch_id = in_batch_id;
+
+  UPDATE batches
+    SET n_completed = n_completed + cur_n_cancelled_jobs,
+        n_cancelled = n_cancelled + cur_n_cancelled_jobs
+    WHERE id = in_batch_id;
+  UPDATE batches
+    SET time_completed = new_timestamp,
+        `state` = 'complete'
+    WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+
+  # the children of cancelled jobs are cancelled
+  UPDATE jobs
+    INNER JOIN (
+      SELECT `job_parents`.job_id, COUNT(*) AS n_cancelled_parents
+      FROM `job_parents`
+      INNER JOIN `tmp_cancelled_ready_jobs`
+        ON `job_parents`.parent_id = `tmp_cancelled_ready_jobs`.job_id
+      WHERE `job_parents`.batch_id = in_batch_id
+      GROUP BY `job_parents`.job_id
+    ) AS cancelled_parents
+      ON jobs.job_id = cancelled_parents.job_id
+    SET jobs.state = IF(jobs.n_pending_parents = cancelled_parents.n_cancelled_parents, 'Ready', 'Pending'),
+        jobs.n_pending_parents = jobs.n_pending_parents - cancelled_parents.n_cancelled_parents,
+        jobs.cancelled = 1
+    WHERE jobs.batch_id = in_batch_id;
+
+  DROP TEMPORARY TABLE `tmp_cancelled_ready_jobs`;
+
+  COMMIT;
+  SELECT 0 as rc, cur_n_cancelled_jobs AS n_cancelled_jobs;
+END $$
+
+DELIMITER ;
@@ -0,0 +1,161 @@
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS mark_jobs_complete $$
+CREATE PROCEDURE mark_jobs_complete(
+  IN in_instance_name VARCHAR(100),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  # Marks complete the jobs listed by the caller in the temporary table
+  # `tmp_job_completions`, one row per job indexed by idx from 0.  Each job
+  # is handled as by mark_job_complete, and the rc, old_state,
+  # expected_attempt_id and delta_cores_mcpu it would have returned are
+  # selected for each completion, in order.  The caller owns the transaction.
+  DECLARE cur_n_rows INT;
+  DECLARE cur_instance_state VARCHAR(40);
+  DECLARE cur_delta_cores_mcpu INT;
+
+  SELECT COUNT(*) INTO cur_n_rows
+  FROM jobs
+  INNER JOIN `tmp_job_completions`
+    ON jobs.batch_id = `tmp_job_completions`.batch_id AND jobs.job_id = `tmp_job_completions`.job_id
+  FOR UPDATE;
+
+  # jobs that no longer exist, because their batch has been deleted, keep
+  # a NULL old_state
+  UPDATE `tmp_job_completions`
+    INNER JOIN jobs
+      ON jobs.batch_id = `tmp_job_completions`.batch_id AND jobs.job_id = `tmp_job_completions`.job_id
+    SET `tmp_job_completions`.old_state = jobs.state,
+        `tmp_job_completions`.cores_mcpu = jobs.cores_mcpu,
+        `tmp_job_completions`.expected_attempt_id = jobs.attempt_id;
+
+  SELECT COUNT(*) INTO cur_n_rows
+  FROM attempts
+  INNER JOIN `tmp_job_completions`
+    ON attempts.batch_id = `tmp_job_completions`.batch_id AND
+       attempts.job_id = `tmp_job_completions`.job_id AND
+       attempts.attempt_id = `tmp_job_completions`.attempt_id
+  FOR UPDATE;
+
+  UPDATE `tmp_job_completions`
+    LEFT JOIN attempts
+      ON attempts.batch_id = `tmp_job_completions`.batch_id AND
+         attempts.job_id = `tmp_job_completions`.job_id AND
+         attempts.attempt_id = `tmp_job_completions`.attempt_id
+    SET `tmp_job_completions`.new_attempt = (attempts.attempt_id IS NULL AND
+                                             `tmp_job_completions`.attempt_id IS NOT NULL AND
+                                             `tmp_job_completions`.old_state IS NOT NULL),
+        `tmp_job_completions`.old_end_time = attempts.end_time;
+
+  SELECT state INTO cur_instance_state FROM instances WHERE name = in_instance_name LOCK IN SHARE MODE;
+
+  # as add_attempt
+  INSERT INTO attempts (batch_id, job_id, attempt_id, instance_name)
+  SELECT batch_id, job_id, attempt_id, in_instance_name
+  FROM `tmp_job_completions`
+  WHERE new_attempt;
+
+  # instance pending when attempt is from a job private instance
+  IF cur_instance_state = 'pending' OR cur_instance_state = 'active' THEN
+    UPDATE `tmp_job_completions`
+    SET delta_cores_mcpu = -1 * cores_mcpu
+    WHERE new_attempt;
+  END IF;
+
+  UPDATE attempts
+    INNER JOIN `tmp_job_completions`
+      ON attempts.batch_id = `tmp_job_completions`.batch_id AND
+         attempts.job_id = `tmp_job_completions`.job_id AND
+         attempts.attempt_id = `tmp_job_completions`.attempt_id
+    SET attempts.start_time = `tmp_job_completions`.new_start_time,
+        attempts.end_time = `tmp_job_completions`.new_end_time,
+        attempts.reason = `tmp_job_completions`.new_reason
+    WHERE `tmp_job_completions`.old_state IS NOT NULL;
+
+  # the cores of attempts that had not ended are freed
+  IF cur_instance_state = 'active' THEN
+    UPDATE `tmp_job_completions`
+    SET delta_cores_mcpu = delta_cores_mcpu + cores_mcpu
+    WHERE old_state IS NOT NULL AND old_end_time IS NULL;
+  END IF;
+
+  SELECT COALESCE(SUM(delta_cores_mcpu), 0) INTO cur_delta_cores_mcpu FROM `tmp_job_completions`;
+  IF cur_delta_cores_mcpu != 0 THEN
+    UPDATE instances
+    SET free_cores_mcpu = free_cores_mcpu + cur_delta_cores_mcpu
+    WHERE name = in_instance_name;
+  END IF;
+
+  # assignments are evaluated left to right, so changed and
+  # expected_attempt_id see the new rc
+  UPDATE `tmp_job_completions`
+  SET rc = CASE
+        WHEN old_state IS NULL THEN 1
+        WHEN expected_attempt_id IS NOT NULL AND expected_attempt_id != attempt_id THEN 2
+        WHEN old_state IN ('Ready', 'Creating', 'Running', 'Cancelled', 'Error', 'Failed', 'Success') THEN 0
+        ELSE 1
+      END,
+      changed = (rc = 0 AND old_state IN ('Ready', 'Creating', 'Running')),
+      expected_attempt_id = IF(rc = 2, expected_attempt_id, NULL);
+
+  UPDATE jobs
+    INNER JOIN `tmp_job_completions`
+      ON jobs.batch_id = `tmp_job_completions`.batch_id AND jobs.job_id = `tmp_job_completions`.job_id
+    SET jobs.state = `tmp_job_completions`.new_state,
+        jobs.status = `tmp_job_completions`.new_status,
+        jobs.attempt_id = `tmp_job_completions`.attempt_id
+    WHERE `tmp_job_completions`.changed;
+
+  # the batches and children of the jobs that changed state are updated with
+  # one statement each
+  UPDATE batches
+    INNER JOIN (
+      SELECT batch_id,
+        COUNT(*) AS n_completed,
+        SUM(new_state = 'Cancelled') AS n_cancelled,
+        SUM(new_state = 'Error' OR new_state = 'Failed') AS n_failed,
+        SUM(new_state != 'Cancelled' AND new_state != 'Error' AND new_state != 'Failed') AS n_succeeded
+      FROM `tmp_job_completions`
+      WHERE changed
+      GROUP BY batch_id
+    ) AS completed
+      ON batches.id = completed.batch_id
+    SET batches.n_completed = batches.n_completed + completed.n_completed,
+        batches.n_cancelled = batches.n_cancelled + completed.n_cancelled,
+        batches.n_failed = batches.n_failed + completed.n_failed,
+        batches.n_succeeded = batches.n_succeeded + completed.n_succeeded;
+  UPDATE batches
+    INNER JOIN (
+      SELECT DISTINCT batch_id
+      FROM `tmp_job_completions`
+      WHERE changed
+    ) AS completed
+      ON batches.id = completed.batch_id
+    SET batches.time_completed = new_timestamp,
+        batches.`state` = 'complete'
+    WHERE batches.n_completed = batches.n_jobs;
+
+  UPDATE jobs
+    INNER JOIN (
+      SELECT `job_parents`.batch_id, `job_parents`.job_id,
+        COUNT(*) AS n_completed_parents,
+        MAX(`tmp_job_completions`.new_state != 'Success') AS any_parent_unsuccessful
+      FROM `job_parents`
+      INNER JOIN `tmp_job_completions`
+        ON `job_parents`.batch_id = `tmp_job_completions`.batch_id AND
+           `job_parents`.parent_id = `tmp_job_completions`.job_id
+      WHERE `tmp_job_completions`.changed
+      GROUP BY `job_parents`.batch_id, `job_parents`.job_id
+    ) AS completed_parents
+      ON jobs.batch_id = completed_parents.batch_id AND jobs.job_id = completed_parents.job_id
+    SET jobs.state = IF(jobs.n_pending_parents = completed_parents.n_completed_parents, 'Ready', 'Pending'),
+        jobs.n_pending_parents = jobs.n_pending_parents - completed_parents.n_completed_parents,
+        jobs.cancelled = IF(completed_parents.any_parent_unsuccessful, 1, jobs.cancelled);
+
+  SELECT idx, rc, old_state, expected_attempt_id, delta_cores_mcpu
+  FROM `tmp_job_completions`
+  ORDER BY idx;
+END $$
+
+DELIMITER ;
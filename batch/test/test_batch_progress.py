@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from hailtop import aiotools
+from batch.front_end.progress import BatchProgressWatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+class StandInDatabase:
+    def __init__(self):
+        self.progress = {1: {'n_completed': 0, 'state': 'running'}}
+        self.n_queries = 0
+
+    async def select_and_fetchone(self, sql, args):  # pylint: disable=unused-argument
+        self.n_queries += 1
+        (batch_id,) = args
+        progress = self.progress.get(batch_id)
+        return dict(progress) if progress is not None else None
+
+
+@pytest.fixture
+async def task_manager():
+    task_manager = aiotools.BackgroundTaskManager()
+    yield task_manager
+    task_manager.shutdown()
+
+
+async def test_waiters_share_one_poll(task_manager):
+    db = StandInDatabase()
+    watcher = BatchProgressWatcher(db, task_manager, 0.05)
+
+    waiters = [
+        asyncio.ensure_future(watcher.wait(1, lambda progress: progress['n_completed'] > 0, 10)) for _ in range(20)
+    ]
+    await asyncio.sleep(0.2)
+    assert not any(waiter.done() for waiter in waiters)
+    n_queries = db.n_queries
+    assert n_queries <= 5
+
+    db.progress[1] = {'n_completed': 1, 'state': 'running'}
+    results = await asyncio.gather(*waiters)
+    assert all(result['n_completed'] == 1 for result in results)
+    assert db.n_queries - n_queries <= 2
+
+    # polling stops once nothing is waiting
+    await asyncio.sleep(0.1)
+    assert not watcher.watches
+
+
+async def test_wait_returns_progress_on_timeout(task_manager):
+    watcher = BatchProgressWatcher(StandInDatabase(), task_manager, 0.05)
+    progress = await watcher.wait(1, lambda progress: progress['state'] == 'complete', 0.2)
+    assert progress == {'n_completed': 0, 'state': 'running'}
+
+
+async def test_wait_returns_none_for_missing_batches(task_manager):
+    watcher = BatchProgressWatcher(StandInDatabase(), task_manager, 0.05)
+    assert await watcher.wait(2, lambda progress: True, 1) is None
+
+
+async def test_completions_are_not_read_from_a_stale_watch(task_manager):
+    db = StandInDatabase()
+    watcher = BatchProgressWatcher(db, task_manager, 0.3)
+    # a waiter keeps the watch, and its progress, from the first poll
+    waiter = asyncio.ensure_future(watcher.wait(1, lambda progress: False, 10))
+    await asyncio.sleep(0.05)
+    assert watcher.watches[1].progress['n_completed'] == 0
+
+    # a fresh read of the batch sees a job complete before the watch does
+    db.progress[1] = {'n_completed': 1, 'state': 'running'}
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    progress = await watcher.wait_for_completions(1, 1, 0.1)
+    assert loop.time() - start >= 0.09
+    assert progress['n_completed'] <= 1
+
+    db.progress[1] = {'n_completed': 2, 'state': 'running'}
+    progress = await watcher.wait_for_completions(1, 1, 1)
+    assert progress['n_completed'] == 2
+
+    waiter.cancel()
@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import concurrent.futures
+import os
+
+import pytest
+
+from batch.worker.input_cache import InputCache
+
+pytestmark = pytest.mark.asyncio
+
+
+class Source:
+    def __init__(self, contents):
+        self.contents = contents
+        self.n_fetches = collections.Counter()
+
+    def fetcher(self, url):
+        async def fetch(path):
+            self.n_fetches[url] += 1
+            await asyncio.sleep(0.01)
+            with open(path, 'wb') as f:
+                f.write(self.contents[url])
+
+        return fetch
+
+
+def key(source, url):
+    return (url, '1', len(source.contents[url]))
+
+
+def new_counters():
+    return {'hits': 0, 'misses': 0, 'hit_bytes': 0, 'fetched_bytes': 0}
+
+
+@pytest.fixture
+def pool():
+    pool = concurrent.futures.ThreadPoolExecutor()
+    yield pool
+    pool.shutdown()
+
+
+async def test_hits_reuse_cached_copy(tmp_path, pool):
+    source = Source({'gs://b/a': b'a' * 10})
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    counters = new_counters()
+    for job in ('j1', 'j2'):
+        dest = str(tmp_path / job / 'io' / 'a')
+        assert await cache.localize(key(source, 'gs://b/a'), source.fetcher('gs://b/a'), dest, counters)
+        with open(dest, 'rb') as f:
+            assert f.read() == b'a' * 10
+
+    assert source.n_fetches['gs://b/a'] == 1
+    assert counters == {'hits': 1, 'misses': 1, 'hit_bytes': 10, 'fetched_bytes': 10}
+
+
+async def test_concurrent_requests_share_a_fetch(tmp_path, pool):
+    source = Source({'gs://b/a': b'a' * 10})
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    counters = new_counters()
+    results = await asyncio.gather(
+        *[
+            cache.localize(
+                key(source, 'gs://b/a'), source.fetcher('gs://b/a'), str(tmp_path / f'j{i}' / 'a'), counters
+            )
+            for i in range(5)
+        ]
+    )
+    assert all(results)
+    assert source.n_fetches['gs://b/a'] == 1
+    assert counters['misses'] == 1
+    assert counters['hits'] == 4
+    assert not cache.fetches
+
+
+async def test_evicts_least_recently_used(tmp_path, pool):
+    source = Source({'gs://b/a': b'a' * 40, 'gs://b/b': b'b' * 40, 'gs://b/c': b'c' * 40})
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    counters = new_counters()
+    for url in ('gs://b/a', 'gs://b/b', 'gs://b/a', 'gs://b/c'):
+        await cache.localize(key(source, url), source.fetcher(url), str(tmp_path / 'j' / url[-1]), counters)
+
+    assert list(cache.entries) == [key(source, 'gs://b/a'), key(source, 'gs://b/c')]
+    assert cache.size_bytes == 80
+    assert len(os.listdir(tmp_path / 'cache')) == 2
+
+
+async def test_objects_larger_than_the_cache_are_not_cached(tmp_path, pool):
+    source = Source({'gs://b/a': b'a' * 200})
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    counters = new_counters()
+    assert not await cache.localize(
+        key(source, 'gs://b/a'), source.fetcher('gs://b/a'), str(tmp_path / 'j' / 'a'), counters
+    )
+    assert source.n_fetches['gs://b/a'] == 0
+    assert counters == new_counters()
+
+
+async def test_failed_fetches_are_not_cached(tmp_path, pool):
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    async def fetch(path):
+        with open(path, 'wb') as f:
+            f.write(b'short')
+
+    with pytest.raises(ValueError):
+        await cache.localize(('gs://b/a', '1', 10), fetch, str(tmp_path / 'j' / 'a'), new_counters())
+    assert not cache.entries
+    assert cache.size_bytes == 0
+    assert os.listdir(tmp_path / 'cache') == []
+
+
+async def test_objects_are_not_cached_when_room_cannot_be_made(tmp_path, pool):
+    source = Source({'gs://b/a': b'a' * 60, 'gs://b/b': b'b' * 60})
+    cache = InputCache(str(tmp_path / 'cache'), 100, pool)
+
+    # both fetches are in flight at once, so neither can evict the other
+    counters = new_counters()
+    results = await asyncio.gather(
+        *[
+            cache.localize(key(source, url), source.fetcher(url), str(tmp_path / 'j' / url[-1]), counters)
+            for url in ('gs://b/a', 'gs://b/b')
+        ]
+    )
+    assert results == [True, False]
+    assert source.n_fetches == {'gs://b/a': 1}
+    assert cache.size_bytes == 60
+    assert cache.size_bytes <= cache.max_size_bytes
@@ -0,0 +1,87 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+import pytest
+
+from hailtop import aiotools
+from batch.worker.job_status_reporter import JobStatusReporter
+
+pytestmark = pytest.mark.asyncio
+
+
+class StandInDriver:
+    def __init__(self):
+        self.requests = []
+        self.fail_once = set()
+        self.runner = None
+        self.url = None
+
+    async def jobs_complete(self, request):
+        statuses = (await request.json())['statuses']
+        self.requests.append(statuses)
+        failed = [i for i, status in enumerate(statuses) if status['job_id'] in self.fail_once]
+        for i in failed:
+            self.fail_once.remove(statuses[i]['job_id'])
+        return web.json_response({'failed': failed})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/api/v1alpha/instances/jobs_complete', self.jobs_complete)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+@pytest.fixture
+async def driver():
+    driver = StandInDriver()
+    await driver.start()
+    yield driver
+    await driver.stop()
+
+
+@pytest.fixture
+async def task_manager():
+    task_manager = aiotools.BackgroundTaskManager()
+    yield task_manager
+    task_manager.shutdown()
+
+
+def reporter(url, task_manager, max_statuses_per_request=100):
+    reporter = JobStatusReporter(url, lambda: None, task_manager, 0.05, max_statuses_per_request)
+    task_manager.ensure_future(reporter.run())
+    return reporter
+
+
+async def test_statuses_are_coalesced(driver, task_manager):
+    r = reporter(f'{driver.url}/api/v1alpha/instances/jobs_complete', task_manager)
+    await asyncio.gather(*[r.report({'job_id': i}) for i in range(10)])
+    assert len(driver.requests) == 1
+    assert [status['job_id'] for status in driver.requests[0]] == list(range(10))
+
+
+async def test_requests_are_bounded_in_size(driver, task_manager):
+    r = reporter(f'{driver.url}/api/v1alpha/instances/jobs_complete', task_manager, max_statuses_per_request=4)
+    await asyncio.gather(*[r.report({'job_id': i}) for i in range(10)])
+    assert sorted(len(statuses) for statuses in driver.requests) == [2, 4, 4]
+
+
+async def test_failed_statuses_are_retried(driver, task_manager):
+    driver.fail_once = {1, 3}
+    r = reporter(f'{driver.url}/api/v1alpha/instances/jobs_complete', task_manager)
+    await asyncio.gather(*[r.report({'job_id': i}) for i in range(5)])
+    assert [status['job_id'] for status in driver.requests[-1]] == [1, 3]
+
+
+async def test_missing_endpoint_fails_reports(driver, task_manager):
+    r = reporter(f'{driver.url}/api/v1alpha/instances/missing', task_manager)
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await r.report({'job_id': 0})
+    assert exc_info.value.status == 404
@@ -0,0 +1,70 @@
+from batch.driver.packing import Resources, best_fit, dominant_resource_fair_share
+from batch.driver.simulate_packing import best_fit_on_cores, best_fit_on_resources, simulate
+
+GIB = 1024 ** 3
+
+
+def test_best_fit_picks_tightest_instance():
+    capacity = Resources(16000, 64 * GIB, 300)
+    candidates = [
+        ('empty', capacity, capacity),
+        ('half', Resources(8000, 32 * GIB, 150), capacity),
+        ('no-storage', Resources(8000, 32 * GIB, 0), capacity),
+    ]
+    assert best_fit(Resources(4000, 16 * GIB, 50), candidates) == 'half'
+    assert best_fit(Resources(4000, 16 * GIB, 0), candidates) == 'no-storage'
+    assert best_fit(Resources(4000, 16 * GIB, 200), candidates) == 'empty'
+    assert best_fit(Resources(32000, 16 * GIB, 0), candidates) is None
+
+
+def test_drf_equalizes_dominant_shares():
+    capacity = Resources(16000, 64 * GIB, 300)
+    allocations = dominant_resource_fair_share(
+        capacity,
+        capacity,
+        {},
+        {
+            'cpu-heavy': Resources(16000, 4 * GIB, 0),
+            'disk-heavy': Resources(1000, 4 * GIB, 300),
+        },
+    )
+    cpu_share = allocations['cpu-heavy'].dominant_share(capacity)
+    disk_share = allocations['disk-heavy'].dominant_share(capacity)
+    assert abs(cpu_share - disk_share) < 0.01
+    total = allocations['cpu-heavy'].plus(allocations['disk-heavy'])
+    assert total.fits_in(capacity)
+
+
+def test_drf_favors_users_with_less_running():
+    capacity = Resources(16000, 64 * GIB, 300)
+    free = Resources(8000, 32 * GIB, 300)
+    allocations = dominant_resource_fair_share(
+        free,
+        capacity,
+        {'running': Resources(8000, 32 * GIB, 0)},
+        {
+            'running': Resources(8000, 32 * GIB, 0),
+            'waiting': Resources(8000, 32 * GIB, 0),
+        },
+    )
+    assert allocations['running'].cores_mcpu == 0
+    assert allocations['waiting'].cores_mcpu == 8000
+
+
+def test_drf_allocates_all_demand_when_it_fits():
+    capacity = Resources(16000, 64 * GIB, 300)
+    ready = {'a': Resources(2000, 8 * GIB, 10), 'b': Resources(1000, 4 * GIB, 0)}
+    assert dominant_resource_fair_share(capacity, capacity, {}, ready) == ready
+
+
+def test_simulate_counts_external_disks():
+    capacity = Resources(4000, 16 * GIB, 100)
+    jobs = [Resources(1000, 4 * GIB, 80), Resources(1000, 4 * GIB, 80), Resources(1000, 4 * GIB, 0)]
+    durations = [10, 10, 10]
+
+    by_cores = simulate(jobs, durations, capacity, 2, best_fit_on_cores)
+    by_resources = simulate(jobs, durations, capacity, 2, best_fit_on_resources)
+
+    assert by_cores['makespan_secs'] == by_resources['makespan_secs'] == 10
+    assert by_cores['n_external_disks'] == 1
+    assert by_resources['n_external_disks'] == 0
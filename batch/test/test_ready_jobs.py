@@ -0,0 +1,148 @@
+import pytest
+
+from batch.driver.ready_jobs import ReadyJobIndex
+
+pytestmark = pytest.mark.asyncio
+
+
+class StandInDatabase:
+    def __init__(self, records):
+        self.records = records
+        self.cancelled_batch_ids = set()
+        self.n_queries = 0
+
+    async def select_and_fetchall(self, sql, args, timer_description=None):  # pylint: disable=unused-argument
+        self.n_queries += 1
+        if 'cancelled;' in sql:
+            for batch_id in args:
+                if batch_id in self.cancelled_batch_ids:
+                    yield {'id': batch_id}
+            return
+        if 'batches.id = %s' in sql:
+            user, batch_id, _, limit = args
+        else:
+            user, _, limit = args
+            batch_id = None
+        records = [
+            record
+            for record in self.records
+            if record['user'] == user
+            and batch_id in (None, record['batch_id'])
+            and (record['always_run'] or record['batch_id'] not in self.cancelled_batch_ids)
+        ]
+        for record in records[:limit]:
+            yield dict(record)
+
+
+def job(user, batch_id, job_id, always_run=False):
+    return {'user': user, 'batch_id': batch_id, 'job_id': job_id, 'cores_mcpu': 1000, 'always_run': always_run}
+
+
+def ids(records):
+    return [(record['batch_id'], record['job_id']) for record in records]
+
+
+async def test_jobs_are_served_from_memory_once_loaded():
+    db = StandInDatabase([job('a', 1, i) for i in range(10)] + [job('b', 2, 1)])
+    index = ReadyJobIndex(db, 'standard')
+
+    records, loaded = await index.ready_jobs('a', 3, 10)
+    assert loaded and ids(records) == [(1, 0), (1, 1), (1, 2)]
+    assert db.n_queries == 1
+
+    records, loaded = await index.ready_jobs('a', 3, 10)
+    assert not loaded and len(records) == 3
+    assert db.n_queries == 1
+
+
+async def test_scheduled_jobs_are_not_served_again():
+    db = StandInDatabase([job('a', 1, i) for i in range(4)])
+    index = ReadyJobIndex(db, 'standard')
+
+    records, _ = await index.ready_jobs('a', 2, 4)
+    for record in records:
+        index.start_scheduling('a', (record['batch_id'], record['job_id']))
+    # the database still reports them ready while they are being scheduled
+    await index.reconcile()
+    index.add(job('a', 1, 0))
+
+    records, _ = await index.ready_jobs('a', 2, 4)
+    assert ids(records) == [(1, 2), (1, 3)]
+
+
+async def test_index_reloads_when_database_has_more_jobs():
+    db = StandInDatabase([job('a', 1, 0)])
+    index = ReadyJobIndex(db, 'standard')
+
+    records, _ = await index.ready_jobs('a', 5, 1)
+    assert len(records) == 1
+
+    db.records.append(job('a', 2, 0))
+    records, loaded = await index.ready_jobs('a', 5, 1)
+    assert not loaded and len(records) == 1
+
+    records, loaded = await index.ready_jobs('a', 5, 2)
+    assert loaded and ids(records) == [(1, 0), (2, 0)]
+
+
+async def test_reconcile_drops_jobs_that_are_no_longer_ready():
+    db = StandInDatabase([job('a', 1, 0), job('a', 1, 1)])
+    index = ReadyJobIndex(db, 'standard')
+    await index.ready_jobs('a', 2, 2)
+
+    db.records = [job('a', 1, 1)]
+    await index.reconcile()
+    assert ids(index.user_jobs['a'].values()) == [(1, 1)]
+
+    db.records = []
+    await index.reconcile()
+    assert 'a' not in index.user_jobs
+
+
+async def test_jobs_scheduled_during_a_query_are_not_added_back():
+    db = StandInDatabase([job('a', 1, 0), job('a', 1, 1)])
+    index = ReadyJobIndex(db, 'standard')
+
+    # the query reads both jobs as ready, then one is scheduled before the
+    # records are added
+    generation = index.start_query()
+    index.start_scheduling('a', (1, 0))
+    index.done_scheduling((1, 0))
+    index.add(job('a', 1, 0), generation)
+    index.add(job('a', 1, 1), generation)
+    index.end_query(generation)
+    assert ids(index.user_jobs['a'].values()) == [(1, 1)]
+    assert index.scheduled == {}
+
+    # a query that starts afterwards reads the database as it is then
+    generation = index.start_query()
+    index.add(job('a', 1, 0), generation)
+    index.end_query(generation)
+    assert ids(index.user_jobs['a'].values()) == [(1, 1), (1, 0)]
+
+
+async def test_jobs_of_a_batch_that_starts_running_are_added():
+    db = StandInDatabase([job('a', 1, i) for i in range(4)])
+    index = ReadyJobIndex(db, 'standard')
+    await index.ready_jobs('a', 2, 4)
+    assert len(index.user_jobs['a']) == 4
+
+    db.records += [job('a', 2, i) for i in range(10)] + [job('b', 3, 0)]
+    await index.add_batch('a', 2)
+    assert ids(index.user_jobs['a'].values()) == [(1, 0), (1, 1), (1, 2), (1, 3), (2, 0), (2, 1), (2, 2), (2, 3)]
+
+    # users not in the index are loaded when the scheduler asks for them
+    await index.add_batch('b', 3)
+    assert 'b' not in index.user_jobs
+
+
+async def test_only_jobs_of_cancelled_batches_are_removed():
+    db = StandInDatabase([job('a', 1, 0), job('a', 1, 1, always_run=True), job('a', 2, 0), job('b', 3, 0)])
+    index = ReadyJobIndex(db, 'standard')
+    await index.ready_jobs('a', 3, 3)
+    await index.ready_jobs('b', 1, 1)
+
+    db.cancelled_batch_ids = {1, 3}
+    await index.remove_cancelled()
+    assert ids(index.user_jobs['a'].values()) == [(1, 1), (2, 0)]
+    assert 'b' not in index.user_jobs
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from batch.batch_format_version import BatchFormatVersion
+from batch.driver.bunch_cache import BatchBunchCache
+from batch.log_store import LogStore
+from batch.spec_cache import SpecCache
+from batch.spec_writer import SpecWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+class StandInGCS:
+    def __init__(self):
+        self.files = {}
+        self.n_reads = 0
+
+    async def write_gs_file_from_string(self, uri, data, *args, **kwargs):  # pylint: disable=unused-argument
+        self.files[uri] = data if isinstance(data, bytes) else data.encode('utf-8')
+
+    async def read_binary_gs_file(self, uri, start=None, end=None):
+        self.n_reads += 1
+        data = self.files[uri]
+        if start is None:
+            return data
+        # `end` is inclusive
+        return data[start:end + 1]
+
+    async def read_gs_file(self, uri, start=None, end=None):
+        data = await self.read_binary_gs_file(uri, start=start, end=end)
+        return data.decode('utf-8')
+
+
+def stand_in_log_store():
+    log_store = LogStore.__new__(LogStore)
+    log_store.batch_logs_root = 'gs://bucket/batch/logs/instance/batch'
+    log_store.gcs = StandInGCS()
+    log_store.spec_cache = SpecCache(1024 * 1024)
+    return log_store
+
+
+def random_spec(job_id):
+    return {'job_id': job_id, 'command': ['echo', 'x' * random.randint(0, 2000)]}
+
+
+@pytest.mark.parametrize('format_version', [7, 8])
+async def test_specs_round_trip(format_version):
+    format_version = BatchFormatVersion(format_version)
+    log_store = stand_in_log_store()
+
+    specs = [random_spec(job_id) for job_id in range(11, 511)]
+    spec_writer = SpecWriter(log_store, 1, format_version)
+    for spec in specs:
+        spec_writer.add(json.dumps(spec))
+    token = await spec_writer.write()
+
+    data = log_store.gcs.files[log_store.specs_path(1, token)]
+    if format_version.has_compressed_specs():
+        assert len(data) < sum(len(json.dumps(spec)) for spec in specs)
+
+    for spec in specs:
+        read_spec = await log_store.read_spec_file(format_version, 1, token, 11, spec['job_id'])
+        assert json.loads(read_spec) == spec
+
+
+async def test_compressed_specs_are_read_from_cached_blocks():
+    format_version = BatchFormatVersion(8)
+    log_store = stand_in_log_store()
+
+    spec_writer = SpecWriter(log_store, 1, format_version)
+    for job_id in range(1, 101):
+        spec_writer.add(json.dumps(random_spec(job_id)))
+    token = await spec_writer.write()
+
+    await asyncio.gather(*[log_store.read_spec_file(format_version, 1, token, 1, job_id) for job_id in range(1, 101)])
+    # the index and a single block
+    assert log_store.gcs.n_reads == 2
+
+
+async def test_spec_cache_evicts_least_recently_used():
+    cache = SpecCache(10)
+    n_fetches = 0
+
+    def fetch(value):
+        async def f():
+            nonlocal n_fetches
+            n_fetches += 1
+            return value
+
+        return f
+
+    assert await cache.get('a', fetch(b'aaaa')) == b'aaaa'
+    assert await cache.get('b', fetch(b'bbbb')) == b'bbbb'
+    assert await cache.get('a', fetch(b'aaaa')) == b'aaaa'
+    assert await cache.get('c', fetch(b'cccc')) == b'cccc'
+    assert n_fetches == 3
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.current_size == 8
+
+
+class StandInDatabase:
+    def __init__(self, bunches):
+        self.bunches = bunches
+        self.n_queries = 0
+
+    async def select_and_fetchall(self, sql, args):  # pylint: disable=unused-argument
+        self.n_queries += 1
+        (batch_id,) = args
+        for start_job_id, token in self.bunches[batch_id]:
+            yield {'start_job_id': start_job_id, 'token': token}
+
+
+async def test_bunch_cache_reads_each_batch_once():
+    db = StandInDatabase({1: [(1, 'a'), (101, 'b'), (201, 'c')], 2: [(1, 'd')]})
+    bunch_cache = BatchBunchCache(db)
+
+    assert await bunch_cache.get_token_start_id(1, 1) == ('a', 1)
+    assert await bunch_cache.get_token_start_id(1, 100) == ('a', 1)
+    assert await bunch_cache.get_token_start_id(1, 101) == ('b', 101)
+    assert await bunch_cache.get_token_start_id(1, 500) == ('c', 201)
+    assert await bunch_cache.get_token_start_id(2, 7) == ('d', 1)
+    assert db.n_queries == 2
@@ -0,0 +1,65 @@
+import hail as hl
+
+from .utils import benchmark
+
+
+def _deep_pipeline(n_steps):
+    hts = [hl.utils.range_table(100)]
+    for i in range(n_steps):
+        ht = hts[-1]
+        ht = ht.annotate(x=ht.idx * i + hl.len(hl.str(ht.idx)))
+        hts.append(ht.filter(ht.x % 7 != 3))
+    return hts
+
+
+def _deep_expression(n_steps):
+    xs = [hl.int64(0)]
+    for i in range(n_steps):
+        xs.append((xs[-1] * 31 + i) % 1_000_003)
+    return xs
+
+
+@benchmark()
+def ir_construction_deep_table_pipeline():
+    _deep_pipeline(500)
+
+
+@benchmark()
+def ir_construction_deep_expression():
+    _deep_expression(2000)
+
+
+@benchmark()
+def ir_render_and_hash_deep_table_pipeline():
+    tirs = [ht._tir for ht in _deep_pipeline(500)]
+    assert len(set(tirs)) == len(tirs)
+    str(tirs[-1])
+
+
+@benchmark()
+def ir_render_and_hash_deep_expression():
+    irs = [x._ir for x in _deep_expression(2000)]
+    assert len(set(irs)) == len(irs)
+    str(irs[-1])
+
+
+def _build_checked_indexing(n_steps):
+    a = hl.literal([1, 2, 3])
+    x = hl.int32(0)
+    for i in range(n_steps):
+        x = a[x % 3] + i
+    return x
+
+
+@benchmark()
+def ir_construction_with_stack_traces():
+    _build_checked_indexing(5000)
+
+
+@benchmark()
+def ir_construction_without_stack_traces():
+    hl.ir.capture_stack_traces(False)
+    try:
+        _build_checked_indexing(5000)
+    finally:
+        hl.ir.capture_stack_traces(True)
@@ -71,3 +71,38 @@ def king():
     mt = hl.balding_nichols_model(6, n_variants=10000, n_samples=4096)
     path = hl.utils.new_temp_file(extension='mt')
     hl.king(mt.GT).write(path, overwrite=True)
+
+
+def _fit_alternatives_numpy(n, m, low_rank):
+    import numpy as np
+    from hail.stats import LinearMixedModel
+
+    rng = np.random.RandomState(0)
+    x = np.hstack([np.ones((n, 1)), rng.normal(size=(n, 2))])
+    y = rng.normal(size=n)
+    k = rng.normal(size=(n, n))
+    s, u = np.linalg.eigh(k @ k.T / n)
+    p = u.T
+    if low_rank:
+        r = n // 4
+        s, p = s[-r:], p[-r:, :]
+        model = LinearMixedModel(p @ y, p @ x, s, y, x)
+        a = rng.normal(size=(n, m))
+    else:
+        r = n
+        model = LinearMixedModel(p @ y, p @ x, s)
+        a = None
+    model.fit(log_gamma=0.0)
+    # the projected alternatives are themselves random, so skip projecting them
+    pa = rng.normal(size=(r, m))
+    model.fit_alternatives_numpy(pa, a, return_pandas=True)
+
+
+@benchmark()
+def linear_mixed_model_fit_alternatives_numpy_full_rank():
+    _fit_alternatives_numpy(500, 50_000, low_rank=False)
+
+
+@benchmark()
+def linear_mixed_model_fit_alternatives_numpy_low_rank():
+    _fit_alternatives_numpy(500, 50_000, low_rank=True)
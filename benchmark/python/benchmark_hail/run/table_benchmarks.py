@@ -425,3 +425,65 @@ def test_left_join_region_memory():
     high_mem_table2 = hl.utils.range_table(30).naive_coalesce(1).annotate(big_array=hl.zeros(50_000_000))
     joined = high_mem_table.join(high_mem_table2, how='left')
     joined._force_count()
+
+
+def _collect_with_result_encoding(binary: bool, collect):
+    backend = hl.utils.java.Env.backend()
+    old = backend._binary_results
+    backend._binary_results = binary
+    try:
+        collect()
+    finally:
+        backend._binary_results = old
+
+
+def _collect_wide_rows():
+    ht = hl.utils.range_table(2_000_000, n_partitions=16)
+    ht = ht.annotate(s=hl.str(ht.idx), f=hl.float64(ht.idx), a=hl.range(ht.idx % 10))
+    ht.collect()
+
+
+def _collect_ndarray():
+    hl.eval(hl.nd.arange(4096 * 4096).map(hl.float64).reshape((4096, 4096)))
+
+
+@benchmark()
+def table_collect_json():
+    _collect_with_result_encoding(False, _collect_wide_rows)
+
+
+@benchmark()
+def table_collect_binary():
+    _collect_with_result_encoding(True, _collect_wide_rows)
+
+
+@benchmark()
+def ndarray_collect_json():
+    _collect_with_result_encoding(False, _collect_ndarray)
+
+
+@benchmark()
+def ndarray_collect_binary():
+    _collect_with_result_encoding(True, _collect_ndarray)
+
+
+def _annotate_with_large_literal(threshold: int):
+    backend = hl.utils.java.Env.backend()
+    old = backend._literal_encoding_threshold
+    backend._literal_encoding_threshold = threshold
+    try:
+        lookup = hl.literal({i: str(i) for i in range(1_000_000)})
+        ht = hl.utils.range_table(100, n_partitions=4)
+        ht.annotate(s=lookup.get(ht.idx))._force_count()
+    finally:
+        backend._literal_encoding_threshold = old
+
+
+@benchmark()
+def table_annotate_large_literal_json():
+    _annotate_with_large_literal(2 ** 62)
+
+
+@benchmark()
+def table_annotate_large_literal_encoded():
+    _annotate_with_large_literal(0)
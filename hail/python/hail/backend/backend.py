@@ -1,4 +1,8 @@
 import abc
+
+import numpy as np
+
+from ..expr.types import tbool, tfloat32, tfloat64, tint32, tint64
 from ..fs.fs import FS
 
 
@@ -11,6 +15,12 @@ class Backend(abc.ABC):
     def execute(self, ir, timed=False):
         pass
 
+    def execute_columns(self, ir):
+        """Execute `ir`, a struct of arrays, returning a :obj:`dict` mapping each
+        field to a :class:`numpy.ma.MaskedArray` whose mask marks missing elements."""
+        value = self.execute(ir)
+        return {f: _masked_array(t.element_type, value[f]) for f, t in ir.typ.items()}
+
     @abc.abstractmethod
     def value_type(self, ir):
         pass
@@ -103,3 +113,14 @@ class Backend(abc.ABC):
     @abc.abstractmethod
     def persist_ir(self, ir):
         pass
+
+
+def _masked_array(element_type, values):
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    if element_type in (tbool, tint32, tint64, tfloat32, tfloat64):
+        data = np.array([0 if v is None else v for v in values], dtype=element_type.to_numpy())
+    else:
+        data = np.empty(len(values), dtype=object)
+        for i, v in enumerate(values):
+            data[i] = v
+    return np.ma.MaskedArray(data, mask=mask)
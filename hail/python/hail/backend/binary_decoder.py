@@ -0,0 +1,400 @@
+import math
+import re
+import struct
+
+import numpy as np
+
+from hail import genetics
+from hail.expr.types import (HailType, tstruct, ttuple, tarray, tstream, tset, tdict, tndarray,
+                             tinterval, tlocus, tint32, tint64, tfloat32, tfloat64, tbool, tstr,
+                             tcall)
+from hail.utils import Struct, Interval, frozendict
+
+BLOCKED_UNBUFFERED_SPEC = \
+    '{"name":"BlockingBufferSpec","blockSize":65536,"child":{"name":"StreamBlockBufferSpec"}}'
+
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F32 = struct.Struct('<f')
+_F64 = struct.Struct('<d')
+
+_PTYPE_TOKEN = re.compile(r'\s*(`(?:[^`\\]|\\.)*`|[+\[\]{}(),:]|[^\s+\[\]{}(),:`]+)')
+
+# (numpy dtype, byte width) of the encoded representation of numeric primitives
+_NUMPY_PRIMITIVES = {
+    tint32: (np.dtype('<i4'), 4),
+    tint64: (np.dtype('<i8'), 8),
+    tfloat32: (np.dtype('<f4'), 4),
+    tfloat64: (np.dtype('<f8'), 8),
+    tbool: (np.dtype('u1'), 1),
+}
+
+
+def unframe_blocks(b):
+    """Strip the framing of a ``BlockingBufferSpec`` over a ``StreamBlockBufferSpec``.
+
+    Every block is a little-endian int32 length followed by that many bytes. Primitive
+    values never straddle block boundaries, so the concatenated block contents are the
+    encoded value. The result is writable so that numpy views into it are too.
+    """
+    mv = memoryview(b)
+    blocks = []
+    off = 0
+    end = len(mv)
+    while off < end:
+        (n,) = _I32.unpack_from(mv, off)
+        off += 4
+        blocks.append(mv[off:off + n])
+        off += n
+    return bytearray().join(blocks)
+
+
+def _call_from_int(c):
+    c &= 0xFFFFFFFF
+    phased = (c & 0x1) == 1
+    ploidy = (c >> 1) & 0x3
+    ar = c >> 3
+    if ploidy == 0:
+        return genetics.Call([], phased=phased)
+    if ploidy == 1:
+        return genetics.Call([ar], phased=phased)
+    k = (int(math.sqrt(8 * ar + 1)) - 1) // 2
+    j = ar - k * (k + 1) // 2
+    if phased:
+        return genetics.Call([j, k - j], phased=True)
+    return genetics.Call([j, k])
+
+
+def _missing_bits(buf, off, n):
+    return np.unpackbits(np.frombuffer(buf, dtype=np.uint8, count=(n + 7) >> 3, offset=off),
+                         bitorder='little')[:n].astype(bool)
+
+
+class _DecoderBuilder:
+    """Builds a decoder for values of a virtual type from the physical type string
+    returned alongside the bytes by ``encodeToBytes``.
+
+    The physical type is only consulted for requiredness, which determines the
+    layout of missing bits in the default encoding. Each decoder takes a buffer and
+    an offset and returns the decoded value and the offset just past it.
+    """
+
+    def __init__(self, ptype_str):
+        self._tokens = _PTYPE_TOKEN.findall(ptype_str)
+        self._pos = 0
+
+    def _next(self):
+        tok = self._tokens[self._pos]
+        self._pos += 1
+        return tok
+
+    def _expect(self, tok):
+        actual = self._next()
+        if actual != tok:
+            raise ValueError(f'malformed physical type: expected {tok!r}, found {actual!r}')
+
+    def build(self, t):
+        f = self._build(t)[1]
+        if self._pos != len(self._tokens):
+            raise ValueError(f'malformed physical type: trailing tokens {self._tokens[self._pos:]}')
+        return f
+
+    def build_columns(self, t):
+        # t is a struct of arrays; each array is decoded into a numpy masked array
+        self._pos += self._tokens[self._pos] == '+'
+        self._next()
+        self._expect('{')
+        fields = []
+        for i, ft in enumerate(t.types):
+            if i > 0:
+                self._expect(',')
+            self._next()
+            self._expect(':')
+            required = self._tokens[self._pos] == '+'
+            self._pos += required
+            self._next()
+            self._expect('[')
+            elt_required, elt_f = self._build(ft.element_type)
+            self._expect(']')
+            fields.append((required, _column_decoder(ft.element_type, elt_required, elt_f)))
+        self._expect('}')
+        if self._pos != len(self._tokens):
+            raise ValueError(f'malformed physical type: trailing tokens {self._tokens[self._pos:]}')
+        names = list(t)
+        return _struct_decoder(fields, lambda values: dict(zip(names, values)))
+
+    def _build(self, t):
+        required = self._tokens[self._pos] == '+'
+        if required:
+            self._pos += 1
+        name = self._next()
+
+        if t == tint32:
+            return required, _decode_int32
+        if t == tint64:
+            return required, _decode_int64
+        if t == tfloat32:
+            return required, _decode_float32
+        if t == tfloat64:
+            return required, _decode_float64
+        if t == tbool:
+            return required, _decode_bool
+        if t == tstr:
+            return required, _decode_str
+        if t == tcall:
+            return required, _decode_call
+        if isinstance(t, tlocus):
+            self._expect('(')
+            self._next()
+            self._expect(')')
+            return required, _locus_decoder(t)
+        if isinstance(t, tinterval):
+            self._expect('[')
+            point_required, point_f = self._build(t.point_type)
+            self._expect(']')
+            return required, _interval_decoder(point_required, point_f)
+        if isinstance(t, (tarray, tstream, tset)):
+            self._expect('[')
+            elt_required, elt_f = self._build(t.element_type)
+            self._expect(']')
+            conv = frozenset if isinstance(t, tset) else None
+            return required, _array_decoder(t.element_type, elt_required, elt_f, conv)
+        if isinstance(t, tdict):
+            self._expect('[')
+            key = self._build(t.key_type)
+            self._expect(',')
+            value = self._build(t.value_type)
+            self._expect(']')
+            entry_f = _struct_decoder([key, value], tuple)
+            return required, _array_decoder(None, True, entry_f, lambda entries: frozendict(dict(entries)))
+        if isinstance(t, tndarray):
+            self._expect('[')
+            self._build(t.element_type)
+            self._expect(',')
+            self._next()
+            self._expect(']')
+            return required, _ndarray_decoder(t)
+        if isinstance(t, tstruct):
+            self._expect('{')
+            fields = []
+            for i, ft in enumerate(t.types):
+                if i > 0:
+                    self._expect(',')
+                self._next()
+                self._expect(':')
+                fields.append(self._build(ft))
+            self._expect('}')
+            names = list(t)
+            return required, _struct_decoder(fields, lambda values: Struct(**dict(zip(names, values))))
+        if isinstance(t, ttuple):
+            self._expect('[')
+            fields = []
+            for i, ft in enumerate(t.types):
+                if i > 0:
+                    self._expect(',')
+                self._next()
+                self._expect(':')
+                fields.append(self._build(ft))
+            self._expect(']')
+            return required, _struct_decoder(fields, tuple)
+        raise ValueError(f'cannot decode physical type {name} as {t}')
+
+
+def _decode_int32(buf, off):
+    return _I32.unpack_from(buf, off)[0], off + 4
+
+
+def _decode_int64(buf, off):
+    return _I64.unpack_from(buf, off)[0], off + 8
+
+
+def _decode_float32(buf, off):
+    return _F32.unpack_from(buf, off)[0], off + 4
+
+
+def _decode_float64(buf, off):
+    return _F64.unpack_from(buf, off)[0], off + 8
+
+
+def _decode_bool(buf, off):
+    return buf[off] != 0, off + 1
+
+
+def _decode_str(buf, off):
+    (n,) = _I32.unpack_from(buf, off)
+    off += 4
+    return bytes(buf[off:off + n]).decode('utf-8'), off + n
+
+
+def _decode_call(buf, off):
+    return _call_from_int(_I32.unpack_from(buf, off)[0]), off + 4
+
+
+def _struct_decoder(fields, make):
+    # fields: list of (required, decoder); missing bits are only written for optional fields
+    n_optional = sum(1 for required, _ in fields if not required)
+    n_missing_bytes = (n_optional + 7) >> 3
+    plan = []
+    k = 0
+    for required, f in fields:
+        if required:
+            plan.append((None, f))
+        else:
+            plan.append((k, f))
+            k += 1
+
+    def decode(buf, off):
+        mbytes = off
+        off += n_missing_bytes
+        values = []
+        for bit, f in plan:
+            if bit is not None and (buf[mbytes + (bit >> 3)] >> (bit & 7)) & 1:
+                values.append(None)
+            else:
+                v, off = f(buf, off)
+                values.append(v)
+        return make(values), off
+
+    return decode
+
+
+def _locus_decoder(t):
+    rg = t.reference_genome
+
+    def decode(buf, off):
+        contig, off = _decode_str(buf, off)
+        return genetics.Locus(contig, _I32.unpack_from(buf, off)[0], reference_genome=rg), off + 4
+
+    return decode
+
+
+def _interval_decoder(point_required, point_f):
+    return _struct_decoder(
+        [(point_required, point_f), (point_required, point_f), (True, _decode_bool), (True, _decode_bool)],
+        lambda values: Interval(*values))
+
+
+def _array_decoder(element_type, elt_required, elt_f, conv):
+    primitive = _NUMPY_PRIMITIVES.get(element_type)
+
+    def decode(buf, off):
+        (n,) = _I32.unpack_from(buf, off)
+        off += 4
+        if elt_required:
+            missing = None
+        else:
+            missing = _missing_bits(buf, off, n)
+            off += (n + 7) >> 3
+
+        if primitive is not None:
+            dtype, width = primitive
+            n_present = n if missing is None else n - int(np.count_nonzero(missing))
+            data = np.frombuffer(buf, dtype=dtype, count=n_present, offset=off)
+            off += n_present * width
+            if element_type == tbool:
+                data = data != 0
+            if missing is None:
+                values = data.tolist()
+            else:
+                out = np.full(n, None, dtype=object)
+                out[~missing] = data.tolist()
+                values = out.tolist()
+        else:
+            values = []
+            if missing is None:
+                for _ in range(n):
+                    v, off = elt_f(buf, off)
+                    values.append(v)
+            else:
+                for m in missing.tolist():
+                    if m:
+                        values.append(None)
+                    else:
+                        v, off = elt_f(buf, off)
+                        values.append(v)
+
+        if conv is not None:
+            values = conv(values)
+        return values, off
+
+    return decode
+
+
+def _column_decoder(element_type, elt_required, elt_f):
+    primitive = _NUMPY_PRIMITIVES.get(element_type)
+
+    def decode(buf, off):
+        (n,) = _I32.unpack_from(buf, off)
+        off += 4
+        if elt_required:
+            missing = np.zeros(n, dtype=bool)
+        else:
+            missing = _missing_bits(buf, off, n)
+            off += (n + 7) >> 3
+        present = ~missing
+
+        if primitive is not None:
+            dtype, width = primitive
+            n_present = int(np.count_nonzero(present))
+            data = np.frombuffer(buf, dtype=dtype, count=n_present, offset=off)
+            off += n_present * width
+            if element_type == tbool:
+                data = data != 0
+            if n_present == n:
+                out = data
+            else:
+                out = np.zeros(n, dtype=data.dtype)
+                out[present] = data
+        else:
+            out = np.full(n, None, dtype=object)
+            for i in np.flatnonzero(present).tolist():
+                out[i], off = elt_f(buf, off)
+        return np.ma.MaskedArray(out, mask=missing), off
+
+    return decode
+
+
+def _ndarray_decoder(t):
+    primitive = _NUMPY_PRIMITIVES.get(t.element_type)
+    if primitive is None or t.element_type == tbool:
+        raise TypeError("Hail cannot currently return ndarrays of non-numeric or boolean type.")
+    dtype, width = primitive
+    ndim = t.ndim
+
+    def decode(buf, off):
+        shape = tuple(np.frombuffer(buf, dtype='<i8', count=ndim, offset=off).tolist())
+        off += 8 * ndim
+        size = int(np.prod(shape, dtype=np.int64))
+        data = np.frombuffer(buf, dtype=dtype, count=size, offset=off)
+        # elements are encoded in column-major order
+        return data.reshape(shape, order='F'), off + size * width
+
+    return decode
+
+
+def decode(t: HailType, ptype_str: str, b: bytes):
+    """Decode the result of ``encodeToBytes`` using :data:`BLOCKED_UNBUFFERED_SPEC`.
+
+    Produces the same Python values as ``t._from_json`` on the JSON encoding of the
+    value, except that arrays of numeric primitives and ndarrays are read directly
+    from the buffer with numpy instead of element by element.
+    """
+    f = _DecoderBuilder(ptype_str).build(t)
+    buf = unframe_blocks(b)
+    value, off = f(buf, 0)
+    assert off == len(buf), (off, len(buf))
+    return value
+
+
+def decode_columns(t: tstruct, ptype_str: str, b: bytes):
+    """Decode a struct of arrays into a :obj:`dict` of :class:`numpy.ma.MaskedArray`.
+
+    Arrays of numeric primitives are read directly from the buffer; the mask marks
+    missing elements. Other element types produce object arrays of the values
+    :func:`decode` would produce.
+    """
+    f = _DecoderBuilder(ptype_str).build_columns(t)
+    buf = unframe_blocks(b)
+    value, off = f(buf, 0)
+    assert off == len(buf), (off, len(buf))
+    return value
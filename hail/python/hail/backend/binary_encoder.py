@@ -0,0 +1,215 @@
+import struct
+
+import numpy as np
+
+from hail.expr.types import (HailType, tstruct, ttuple, tarray, tset, tdict, tndarray, tinterval,
+                             tlocus, tint32, tint64, tfloat32, tfloat64, tbool, tstr, tcall)
+from hail.utils.java import escape_parsable
+
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F32 = struct.Struct('<f')
+_F64 = struct.Struct('<d')
+
+_PRIMITIVE_ETYPES = {
+    tint32: 'EInt32',
+    tint64: 'EInt64',
+    tfloat32: 'EFloat32',
+    tfloat64: 'EFloat64',
+    tbool: 'EBoolean',
+    tstr: 'EBinary',
+    tcall: 'EInt32',
+}
+
+_NUMPY_PRIMITIVES = {
+    tint32: np.dtype('<i4'),
+    tint64: np.dtype('<i8'),
+    tfloat32: np.dtype('<f4'),
+    tfloat64: np.dtype('<f8'),
+    tbool: np.dtype('u1'),
+}
+
+# Element types of sets and keys of dicts whose Python ordering matches Hail's, so
+# their values can be written in sorted order without consulting the JVM.
+_SORTABLE = (tint32, tint64, tbool, tstr)
+
+
+def is_encodable(t: HailType) -> bool:
+    """Whether values of `t` can be encoded by :func:`encode`."""
+    if t in _PRIMITIVE_ETYPES or isinstance(t, tlocus):
+        return True
+    if isinstance(t, tinterval):
+        return is_encodable(t.point_type)
+    if isinstance(t, tarray):
+        return is_encodable(t.element_type)
+    if isinstance(t, tset):
+        return t.element_type in _SORTABLE
+    if isinstance(t, tdict):
+        return t.key_type in _SORTABLE and is_encodable(t.value_type)
+    if isinstance(t, tndarray):
+        return t.element_type in _NUMPY_PRIMITIVES and t.element_type != tbool
+    if isinstance(t, (tstruct, ttuple)):
+        return all(is_encodable(ft) for ft in t.types)
+    return False
+
+
+def _sort_key(v):
+    return (v is None, v)
+
+
+def _call_to_int(c):
+    phased = c.phased
+    ploidy = c.ploidy
+    if ploidy == 0:
+        ar = 0
+    elif ploidy == 1:
+        ar = c[0]
+    else:
+        j, k = c[0], c[1]
+        if phased:
+            k = j + k
+        elif k < j:
+            j, k = k, j
+        ar = k * (k + 1) // 2 + j
+    v = int(phased) | (ploidy << 1) | (ar << 3)
+    return v - (1 << 32) if v >= (1 << 31) else v
+
+
+def _missing_bytes(missing):
+    return np.packbits(np.asarray(missing, dtype=bool), bitorder='little').tobytes()
+
+
+class _Encoder:
+    """Writes values of a virtual type in the default encoding of a type that is optional
+    everywhere except where the physical representation requires otherwise: dict
+    entries, ndarray elements and the fields of loci and interval endpoints flags."""
+
+    def __init__(self, t: HailType):
+        self.etype, self.write = self._build(t)
+
+    def _build(self, t):
+        if t == tint32:
+            return 'EInt32', lambda out, v: out.extend(_I32.pack(v))
+        if t == tint64:
+            return 'EInt64', lambda out, v: out.extend(_I64.pack(v))
+        if t == tfloat32:
+            return 'EFloat32', lambda out, v: out.extend(_F32.pack(v))
+        if t == tfloat64:
+            return 'EFloat64', lambda out, v: out.extend(_F64.pack(v))
+        if t == tbool:
+            return 'EBoolean', lambda out, v: out.append(1 if v else 0)
+        if t == tstr:
+            return 'EBinary', _write_str
+        if t == tcall:
+            return 'EInt32', lambda out, v: out.extend(_I32.pack(_call_to_int(v)))
+        if isinstance(t, tlocus):
+            return 'EBaseStruct{contig:+EBinary,position:+EInt32}', _write_locus
+        if isinstance(t, tinterval):
+            point_etype, point_write = self._build(t.point_type)
+            write = _struct_writer([point_write, point_write, _write_bool, _write_bool],
+                                   [False, False, True, True],
+                                   lambda i: (i.start, i.end, i.includes_start, i.includes_end))
+            return (f'EBaseStruct{{start:{point_etype},end:{point_etype},'
+                    'includesStart:+EBoolean,includesEnd:+EBoolean}'), write
+        if isinstance(t, tarray):
+            elt_etype, elt_write = self._build(t.element_type)
+            return f'EArray[{elt_etype}]', _array_writer(t.element_type, elt_write, None)
+        if isinstance(t, tset):
+            elt_etype, elt_write = self._build(t.element_type)
+            return f'EArray[{elt_etype}]', _array_writer(t.element_type, elt_write,
+                                                         lambda v: sorted(v, key=_sort_key))
+        if isinstance(t, tdict):
+            key_etype, key_write = self._build(t.key_type)
+            value_etype, value_write = self._build(t.value_type)
+            entry_write = _struct_writer([key_write, value_write], [False, False], lambda kv: kv)
+            write = _array_writer(None, entry_write, lambda v: sorted(v.items(), key=lambda kv: _sort_key(kv[0])),
+                                  elements_required=True)
+            return f'EArray[+EBaseStruct{{key:{key_etype},value:{value_etype}}}]', write
+        if isinstance(t, tndarray):
+            dtype = _NUMPY_PRIMITIVES[t.element_type]
+            elt_etype = _PRIMITIVE_ETYPES[t.element_type]
+
+            def write_ndarray(out, v):
+                a = np.asarray(v, dtype=dtype)
+                out.extend(np.asarray(a.shape, dtype='<i8').tobytes())
+                out.extend(a.tobytes(order='F'))
+
+            return f'ENDArrayColumnMajor[+{elt_etype},{t.ndim}]', write_ndarray
+        if isinstance(t, tstruct):
+            fields = [(name, self._build(ft)) for name, ft in t.items()]
+            names = list(t)
+            etype = ','.join(f'{escape_parsable(name)}:{etype}' for name, (etype, _) in fields)
+            write = _struct_writer([w for _, (_, w) in fields], [False] * len(fields),
+                                   lambda s: [s[name] for name in names])
+            return f'EBaseStruct{{{etype}}}', write
+        if isinstance(t, ttuple):
+            fields = [self._build(ft) for ft in t.types]
+            etype = ','.join(f'{escape_parsable(str(i))}:{etype}' for i, (etype, _) in enumerate(fields))
+            write = _struct_writer([w for _, w in fields], [False] * len(fields), lambda v: v)
+            return f'EBaseStruct{{{etype}}}', write
+        raise NotImplementedError(f'cannot encode values of type {t}')
+
+
+def _write_bool(out, v):
+    out.append(1 if v else 0)
+
+
+def _write_str(out, v):
+    b = v.encode('utf-8')
+    out.extend(_I32.pack(len(b)))
+    out.extend(b)
+
+
+def _write_locus(out, v):
+    _write_str(out, v.contig)
+    out.extend(_I32.pack(v.position))
+
+
+def _struct_writer(writers, required, fields_of):
+    n_optional = sum(1 for r in required if not r)
+
+    def write(out, v):
+        values = fields_of(v)
+        if n_optional > 0:
+            out.extend(_missing_bytes([values[i] is None for i in range(len(values)) if not required[i]]))
+        for w, x in zip(writers, values):
+            if x is not None:
+                w(out, x)
+
+    return write
+
+
+def _array_writer(element_type, elt_write, elements_of, elements_required=False):
+    dtype = _NUMPY_PRIMITIVES.get(element_type)
+
+    def write(out, v):
+        values = list(v) if elements_of is None else elements_of(v)
+        out.extend(_I32.pack(len(values)))
+        if not elements_required:
+            missing = [x is None for x in values]
+            out.extend(_missing_bytes(missing))
+            if any(missing):
+                values = [x for x in values if x is not None]
+        if dtype is not None:
+            out.extend(np.asarray(values, dtype=dtype).tobytes())
+        else:
+            for x in values:
+                elt_write(out, x)
+
+    return write
+
+
+def encode(t: HailType, value):
+    """Encode a present value of type `t`.
+
+    Returns
+    -------
+    (:class:`str`, :class:`bytes`)
+        The encoded type, in the syntax of the JVM's ``EType`` parser, and the
+        value encoded with an unblocked, uncompressed buffer.
+    """
+    assert value is not None
+    enc = _Encoder(t)
+    out = bytearray()
+    enc.write(out, value)
+    return f'+{enc.etype}', bytes(out)
@@ -14,7 +14,6 @@ from hail.expr.matrix_type import tmatrix
 from hail.expr.table_type import ttable
 from hail.expr.types import dtype
 from hail.ir import JavaIR
-from hail.ir.renderer import CSERenderer
 from hail.utils.java import scala_package_object, scala_object
 from .py4j_backend import Py4JBackend, handle_java_exception
 from ..fs.local_fs import LocalFS
@@ -203,7 +202,7 @@ class LocalBackend(Py4JBackend):
 
     def _to_java_ir(self, ir, parse):
         if not hasattr(ir, '_jir'):
-            r = CSERenderer(stop_at_jir=True)
+            r = self._renderer()
             # FIXME parse should be static
             ir._jir = parse(r(ir), ir_map=r.jirs)
         return ir._jir
@@ -1,12 +1,19 @@
 import abc
+import hashlib
 import json
+from collections import OrderedDict
+
+import numpy as np
 
 import py4j
 
 import hail
+from hail.expr.types import ttuple, tvoid, tarray, tset, tdict, tndarray, tstruct
+from hail.ir import MakeTuple
 from hail.ir.renderer import CSERenderer
 from hail.utils.java import FatalError, Env, HailUserError
 from .backend import Backend
+from . import binary_decoder, binary_encoder
 
 
 def handle_java_exception(f):
@@ -39,6 +46,17 @@ def handle_java_exception(f):
 
 
 class Py4JBackend(Backend):
+    # Transfer results from the JVM in Hail's binary encoding rather than as JSON.
+    # Set to ``False`` to fall back to ``executeJSON``.
+    _binary_results = True
+
+    # Literals holding at least this many values are sent to the JVM in Hail's binary
+    # encoding, outside of the IR text, rather than rendered as JSON.
+    _literal_encoding_threshold = 1024
+    # Number of encoded literals kept alive on the JVM, keyed by the hash of their
+    # encoding, so that literals reused across queries are only transferred once.
+    _literal_cache_size = 32
+
     @abc.abstractmethod
     def jvm(self):
         pass
@@ -55,8 +73,35 @@ class Py4JBackend(Backend):
     def _parse_value_ir(self, code, ref_map={}, ir_map={}):
         pass
 
+    def _renderer(self):
+        return CSERenderer(stop_at_jir=True, literal_encoder=self._encoded_literal)
+
+    def _encoded_literal(self, lit):
+        """The JVM ``EncodedLiteral`` for `lit`, or ``None`` if `lit` should be rendered inline."""
+        if not hasattr(lit, '_encoded_jir'):
+            lit._encoded_jir = None
+            if (_approximate_size(lit.typ, lit.value) >= self._literal_encoding_threshold
+                    and binary_encoder.is_encodable(lit.typ)):
+                lit._encoded_jir = self._encoded_literal_jir(lit.typ, *binary_encoder.encode(lit.typ, lit.value))
+        return lit._encoded_jir
+
+    def _encoded_literal_jir(self, t, etype, b):
+        if not hasattr(self, '_literal_cache'):
+            self._literal_cache = OrderedDict()
+        type_str = t._parsable_string()
+        key = hashlib.sha256(b'\0'.join([type_str.encode(), etype.encode(), b])).hexdigest()
+        jir = self._literal_cache.get(key)
+        if jir is not None:
+            self._literal_cache.move_to_end(key)
+            return jir
+        jir = self.hail_package().expr.ir.EncodedLiteral.fromPython(type_str, etype, b)
+        self._literal_cache[key] = jir
+        if len(self._literal_cache) > self._literal_cache_size:
+            self._literal_cache.popitem(last=False)
+        return jir
+
     def register_ir_function(self, name, type_parameters, argument_names, argument_types, return_type, body):
-        r = CSERenderer(stop_at_jir=True)
+        r = self._renderer()
         code = r(body._ir)
         jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=r.jirs))
 
@@ -67,32 +112,74 @@ class Py4JBackend(Backend):
             return_type._parsable_string(),
             jbody)
 
-    def execute(self, ir, timed=False):
+    def _encode_to_bytes(self, ir):
         jir = self._to_java_value_ir(ir)
-        # print(self._hail_package.expr.ir.Pretty.apply(jir, True, -1))
+        tup = self._jhc.backend().encodeToBytes(jir, binary_decoder.BLOCKED_UNBUFFERED_SPEC)
+        return tup._1(), tup._2()
+
+    def _execute_binary(self, ir):
+        # wrap the result in a tuple, encodeToBytes requires a present value
+        ptype_str, b = self._encode_to_bytes(MakeTuple([ir]))
+        return binary_decoder.decode(ttuple(ir.typ), ptype_str, b)[0]
+
+    def execute(self, ir, timed=False):
         try:
+            # executeJSON is the only path that reports timings
+            if self._binary_results and not timed and ir.typ != tvoid:
+                return self._execute_binary(ir)
+
+            jir = self._to_java_value_ir(ir)
+            # print(self._hail_package.expr.ir.Pretty.apply(jir, True, -1))
             result = json.loads(self._jhc.backend().executeJSON(jir))
             value = ir.typ._from_json(result['value'])
             timings = result['timings']
 
             return (value, timings) if timed else value
         except FatalError as e:
-            error_id = e._error_id
-
-            def criteria(hail_ir):
-                return hail_ir._error_id is not None and hail_ir._error_id == error_id
-
-            error_sources = ir.base_search(criteria)
-            better_stack_trace = None
-            if error_sources:
-                better_stack_trace = error_sources[0]._stack_trace
+            self._reraise_with_hail_stack_trace(ir, e)
 
-            if better_stack_trace:
-                error_message = str(e)
-                message_and_trace = (f'{error_message}\n'
-                                     '------------\n'
-                                     'Hail stack trace:\n'
-                                     f'{better_stack_trace}')
-                raise HailUserError(message_and_trace) from None
-
-            raise e
+    def execute_columns(self, ir):
+        if not self._binary_results:
+            return super().execute_columns(ir)
+        try:
+            ptype_str, b = self._encode_to_bytes(ir)
+            return binary_decoder.decode_columns(ir.typ, ptype_str, b)
+        except FatalError as e:
+            self._reraise_with_hail_stack_trace(ir, e)
+
+    def _reraise_with_hail_stack_trace(self, ir, e):
+        error_id = e._error_id
+
+        def criteria(hail_ir):
+            return hail_ir._error_id is not None and hail_ir._error_id == error_id
+
+        error_sources = ir.base_search(criteria)
+        better_stack_trace = None
+        if error_sources and error_sources[0]._stack_trace is not None:
+            # formatting is deferred until a failure is attributed to the node
+            better_stack_trace = str(error_sources[0]._stack_trace)
+
+        if better_stack_trace:
+            error_message = str(e)
+            message_and_trace = (f'{error_message}\n'
+                                 '------------\n'
+                                 'Hail stack trace:\n'
+                                 f'{better_stack_trace}')
+            raise HailUserError(message_and_trace) from None
+
+        raise e
+
+
+def _approximate_size(t, value):
+    """The number of values in the outermost collection(s) of `value`."""
+    if value is None:
+        return 0
+    if isinstance(t, (tarray, tset, tdict)):
+        return len(value)
+    if isinstance(t, tndarray):
+        return np.size(value)
+    if isinstance(t, tstruct):
+        return sum(_approximate_size(ft, value[name]) for name, ft in t.items())
+    if isinstance(t, ttuple):
+        return sum(_approximate_size(ft, v) for ft, v in zip(t.types, value))
+    return 1
@@ -1,4 +1,7 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import itertools
 import os
 import aiohttp
 import json
@@ -13,6 +16,8 @@ from hail.expr.blockmatrix_type import tblockmatrix
 from hailtop.config import get_deploy_config, get_user_config, DeployConfig
 from hailtop.auth import service_auth_headers
 from hailtop.utils import async_to_blocking, retry_transient_errors, secret_alnum_string, TransientError
+from hail.ir import (BaseIR, TableRead, MatrixRead, BlockMatrixRead, TableNativeReader, MatrixNativeReader,
+                     MatrixRangeReader, BlockMatrixNativeReader, TableFromBlockMatrixNativeReader)
 from hail.ir.renderer import CSERenderer
 
 from .backend import Backend
@@ -21,12 +26,24 @@ from ..fs.google_fs import GoogleCloudStorageFS
 
 
 class ServiceSocket:
+    """A single websocket to the query service, shared by all requests.
+
+    Requests are tagged with an id and may be in flight concurrently; responses are
+    matched to requests by id as they arrive. If the connection is lost, outstanding
+    requests fail with a :class:`.TransientError` and the next request reconnects.
+    """
+
     def __init__(self, *, deploy_config: Optional[DeployConfig] = None):
         if not deploy_config:
             deploy_config = get_deploy_config()
         self.deploy_config = deploy_config
         self.url = deploy_config.base_url('query')
         self._session: Optional[aiohttp.ClientSession] = None
+        self._socket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._receiver: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._request_ids = itertools.count()
 
     async def session(self) -> aiohttp.ClientSession:
         if self._session is None:
@@ -34,11 +51,20 @@ class ServiceSocket:
                 headers=service_auth_headers(self.deploy_config, 'query'))
         return self._session
 
-    def close(self):
+    async def async_close(self):
+        if self._socket is not None:
+            await self._socket.close()
+            self._socket = None
+        if self._receiver is not None:
+            await self._receiver
+            self._receiver = None
         if self._session is not None:
-            async_to_blocking(self._session.close())
+            await self._session.close()
             self._session = None
 
+    def close(self):
+        async_to_blocking(self.async_close())
+
     def handle_response(self, resp):
         if resp.type == aiohttp.WSMsgType.CLOSE:
             raise aiohttp.ServerDisconnectedError('Socket was closed by server. (code={resp.data})')
@@ -47,24 +73,50 @@ class ServiceSocket:
         assert resp.type == aiohttp.WSMsgType.TEXT, resp.type
         return resp.data
 
+    async def _connection(self) -> Tuple[aiohttp.ClientWebSocketResponse, Dict[int, asyncio.Future]]:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._socket is None or self._socket.closed:
+                session = await self.session()
+                self._socket = await session.ws_connect(f'{self.url}/api/v1alpha/multiplex',
+                                                        heartbeat=30, max_msg_size=0)
+                self._pending = {}
+                self._receiver = asyncio.ensure_future(self._receive(self._socket, self._pending))
+            return self._socket, self._pending
+
+    async def _receive(self, socket: aiohttp.ClientWebSocketResponse, pending: Dict[int, asyncio.Future]):
+        try:
+            async for response in socket:
+                if response.type != aiohttp.WSMsgType.TEXT:
+                    warnings.warn(f'closing connection after unexpected message: {response}')
+                    break
+                result = json.loads(response.data)
+                f = pending.pop(result['id'], None)
+                if f is not None and not f.done():
+                    f.set_result(result)
+        finally:
+            if not socket.closed:
+                await socket.close()
+            for f in pending.values():
+                if not f.done():
+                    f.set_exception(TransientError(f'lost connection to the query service: {socket.close_code}'))
+            pending.clear()
+
     async def async_request(self, endpoint, **data):
         data['token'] = secret_alnum_string()
-        session = await self.session()
-        async with session.ws_connect(f'{self.url}/api/v1alpha/{endpoint}') as socket:
-            await socket.send_str(json.dumps(data))
-            response = await socket.receive()
-            await socket.send_str('bye')
-            if response.type == aiohttp.WSMsgType.ERROR:
-                raise ValueError(f'bad response: {endpoint}; {data}; {response}')
-            if response.type in (aiohttp.WSMsgType.CLOSE,
-                                 aiohttp.WSMsgType.CLOSED):
-                warnings.warn(f'retrying after losing connection {endpoint}; {data}; {response}')
-                raise TransientError()
-            assert response.type == aiohttp.WSMsgType.TEXT
-            result = json.loads(response.data)
-            if result['status'] != 200:
-                raise FatalError(f'Error from server: {result["value"]}')
-            return result['value']
+        socket, pending = await self._connection()
+        request_id = next(self._request_ids)
+        f = asyncio.get_event_loop().create_future()
+        pending[request_id] = f
+        try:
+            await socket.send_str(json.dumps({'id': request_id, 'endpoint': endpoint, 'data': data}))
+            result = await f
+        finally:
+            pending.pop(request_id, None)
+        if result['status'] != 200:
+            raise FatalError(f'Error from server: {result["value"]}')
+        return result['value']
 
     def request(self, endpoint, **data):
         return async_to_blocking(retry_transient_errors(self.async_request, endpoint, **data))
@@ -100,6 +152,7 @@ class ServiceBackend(Backend):
         self._logger = PythonOnlyLogger(skip_logging_configuration)
 
         self.socket = ServiceSocket(deploy_config=deploy_config)
+        self._type_cache: Dict[Tuple[str, BaseIR, Tuple[Any, ...]], object] = OrderedDict()
 
     @property
     def logger(self):
@@ -134,25 +187,74 @@ class ServiceBackend(Backend):
 
         return (value, None) if timed else value
 
-    def _request_type(self, ir, kind):
+    # Number of IR-to-type results kept by the client. IRs hash structurally, so the
+    # type of a subtree is reused by any equal subtree, not only by the same node.
+    _type_cache_size = 1024
+
+    @staticmethod
+    def _metadata_path(reader) -> Optional[str]:
+        # the file that changes whenever the data read by `reader` is
+        # overwritten, or None if there is none
+        if isinstance(reader, (TableNativeReader, MatrixNativeReader)):
+            return f'{reader.path}/metadata.json.gz'
+        if isinstance(reader, (BlockMatrixNativeReader, TableFromBlockMatrixNativeReader)):
+            return f'{reader.path}/metadata.json'
+        return None
+
+    def _read_identities(self, ir) -> Optional[Tuple[Any, ...]]:
+        """The path, modification time and size of the metadata file of each
+        dataset read by `ir`, or None if the identity of some of the files
+        read cannot be determined.
+
+        The type of a read depends on the files read, which may be
+        overwritten during the session, so the type of an IR is cached under
+        the identity of the files it reads.
+        """
+        identities = []
+        stack = [ir]
+        while stack:
+            x = stack.pop()
+            if isinstance(x, (TableRead, MatrixRead, BlockMatrixRead)):
+                if isinstance(x.reader, MatrixRangeReader):
+                    continue
+                path = self._metadata_path(x.reader)
+                if path is None:
+                    return None
+                try:
+                    stat = self.fs.stat(path)
+                except FileNotFoundError:
+                    return None
+                identities.append((path, stat['modification_time'], stat['size_bytes']))
+            stack.extend(x.children)
+        return tuple(identities)
+
+    def _request_type(self, ir, kind, from_json):
+        identities = self._read_identities(ir)
+        if identities is None:
+            return from_json(self.socket.request(f'type/{kind}', code=self._render(ir)))
+        key = (kind, ir, identities)
+        typ = self._type_cache.get(key)
+        if typ is not None:
+            self._type_cache.move_to_end(key)
+            return typ
         code = self._render(ir)
-        return self.socket.request(f'type/{kind}', code=code)
+        typ = from_json(self.socket.request(f'type/{kind}', code=code))
+        self._type_cache[key] = typ
+        if len(self._type_cache) > self._type_cache_size:
+            self._type_cache.popitem(last=False)
+        return typ
 
     def value_type(self, ir):
-        resp = self._request_type(ir, 'value')
-        return dtype(resp)
+        return self._request_type(ir, 'value', dtype)
 
     def table_type(self, tir):
-        resp = self._request_type(tir, 'table')
-        return ttable._from_json(resp)
+        return self._request_type(tir, 'table', ttable._from_json)
 
     def matrix_type(self, mir):
-        resp = self._request_type(mir, 'matrix')
-        return tmatrix._from_json(resp)
+        return self._request_type(mir, 'matrix', tmatrix._from_json)
 
     def blockmatrix_type(self, bmir):
-        resp = self._request_type(bmir, 'blockmatrix')
-        return tblockmatrix._from_json(resp)
+        return self._request_type(bmir, 'blockmatrix', tblockmatrix._from_json)
 
     def add_reference(self, config):
         raise NotImplementedError("ServiceBackend does not support 'add_reference'")
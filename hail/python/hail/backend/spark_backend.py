@@ -16,7 +16,6 @@ from hail.expr.types import dtype
 from hail.expr.table_type import ttable
 from hail.expr.matrix_type import tmatrix
 from hail.expr.blockmatrix_type import tblockmatrix
-from hail.ir.renderer import CSERenderer
 from hail.ir import JavaIR
 from hail.table import Table
 from hail.matrixtable import MatrixTable
@@ -255,7 +254,7 @@ class SparkBackend(Py4JBackend):
 
     def _to_java_ir(self, ir, parse):
         if not hasattr(ir, '_jir'):
-            r = CSERenderer(stop_at_jir=True)
+            r = self._renderer()
             # FIXME parse should be static
             ir._jir = parse(r(ir), ir_map=r.jirs)
         return ir._jir
@@ -313,9 +312,6 @@ class SparkBackend(Py4JBackend):
         return pyspark.sql.DataFrame(self._jbackend.pyToDF(self._to_java_table_ir(t._tir)),
                                      Env.spark_session()._wrapped)
 
-    def to_pandas(self, t, flatten):
-        return self.to_spark(t, flatten).toPandas()
-
     def from_pandas(self, df, key):
         return Table.from_spark(Env.spark_session().createDataFrame(df), key)
 
@@ -359,7 +355,7 @@ class SparkBackend(Py4JBackend):
 
     def register_ir_function(self, name, type_parameters, argument_names, argument_types, return_type, body):
 
-        r = CSERenderer(stop_at_jir=True)
+        r = self._renderer()
         code = r(body._ir)
         jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=r.jirs))
 
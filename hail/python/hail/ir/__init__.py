@@ -1,6 +1,6 @@
 from .export_type import ExportType
 from .base_ir import BaseIR, IR, TableIR, MatrixIR, BlockMatrixIR, \
-    JIRVectorReference
+    JIRVectorReference, StackTrace, capture_stack_traces
 from .ir import MatrixWrite, MatrixMultiWrite, BlockMatrixWrite, \
     BlockMatrixMultiWrite, TableToValueApply, \
     MatrixToValueApply, BlockMatrixToValueApply, BlockMatrixCollect, \
@@ -71,6 +71,8 @@ __all__ = [
     'MatrixIR',
     'BlockMatrixIR',
     'JIRVectorReference',
+    'StackTrace',
+    'capture_stack_traces',
     'register_functions',
     'register_aggregators',
     'filter_predicate_with_keep',
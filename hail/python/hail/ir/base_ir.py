@@ -1,4 +1,6 @@
 import abc
+import sys
+import traceback
 
 from hail.utils.java import Env
 from .renderer import Renderer, PlainRenderer, Renderable
@@ -13,6 +15,74 @@ def get_next_int():
     return counter
 
 
+_capture_stack_traces = True
+
+
+def capture_stack_traces(enabled: bool):
+    """Enable or disable recording where IR nodes that can fail at runtime were built.
+
+    When enabled (the default), errors raised while executing those nodes include
+    the Python stack trace of the code that built them. Disabling capture makes
+    building large expressions cheaper, at the cost of less precise error messages.
+
+    Parameters
+    ----------
+    enabled : :obj:`bool`
+    """
+    global _capture_stack_traces
+    _capture_stack_traces = enabled
+
+
+class StackTrace:
+    """The Python stack at the point an IR node was built.
+
+    Only code objects and line numbers are recorded at construction; source lines are
+    looked up and the trace formatted the first time it is converted to a string.
+    """
+
+    __slots__ = ['_frames', '_formatted']
+
+    forbidden_phrases = [
+        '_ir_lambda_method',
+        'decorator.py',
+        'decorator-gen',
+        'typecheck/check',
+        'interactiveshell.py',
+        'expressions.construct_variable',
+    ]
+
+    def __init__(self, frame):
+        frames = []
+        while frame is not None:
+            frames.append((frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        frames.reverse()
+        self._frames = frames
+        self._formatted = None
+
+    def _format(self):
+        stack = traceback.StackSummary.from_list(
+            [(code.co_filename, lineno, code.co_name, None) for code, lineno in self._frames]).format()
+        i = len(stack)
+        while i > 0:
+            candidate = stack[i - 1]
+            if 'IPython' in candidate:
+                break
+            i -= 1
+
+        filt_stack = [
+            candidate for candidate in stack[i:]
+            if not any(phrase in candidate for phrase in self.forbidden_phrases)
+        ]
+
+        return '\n'.join(filt_stack)
+
+    def __str__(self):
+        if self._formatted is None:
+            self._formatted = self._format()
+        return self._formatted
+
+
 def _env_bind(env, bindings):
     if bindings:
         if env:
@@ -32,10 +102,18 @@ class BaseIR(Renderable):
         self.children = children
         self._error_id = None
         self._stack_trace = None
+        # IR nodes are immutable, so the hash is computed once, bottom-up, from the
+        # (already computed) hashes of the children. The node's own attributes are
+        # not set yet, so they are folded in by the first call to __hash__.
+        self._children_hash = hash((self._ir_name(), *(hash(c) for c in children)))
+        self._hash = None
+        self._rendered = None
 
     def __str__(self):
-        r = PlainRenderer(stop_at_jir=False)
-        return r(self)
+        if self._rendered is None:
+            r = PlainRenderer(stop_at_jir=False)
+            self._rendered = r(self)
+        return self._rendered
 
     def render_head(self, r: Renderer):
         head_str = self.head_str()
@@ -71,7 +149,12 @@ class BaseIR(Renderable):
         return
 
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.children == other.children and self._eq(other)
+        if self is other:
+            return True
+        return (isinstance(other, self.__class__)
+                and hash(self) == hash(other)
+                and self.children == other.children
+                and self._eq(other))
 
     def __ne__(self, other):
         return not self == other
@@ -90,8 +173,21 @@ class BaseIR(Renderable):
         """
         return True
 
+    def _head_key(self):
+        """Hashable summary of the non-child attributes compared by `_eq`.
+
+        IRs that are equal under `_eq` must have equal head keys.
+
+        Returns
+        -------
+        hashable
+        """
+        return self.head_str()
+
     def __hash__(self):
-        return 31 + hash(str(self))
+        if self._hash is None:
+            self._hash = hash((self._children_hash, self._head_key()))
+        return self._hash
 
     def new_block(self, i: int) -> bool:
         return self.renderable_new_block(self.renderable_idx_of_child(i))
@@ -197,31 +293,10 @@ class BaseIR(Renderable):
 
     def save_error_info(self):
         self._error_id = get_next_int()
-
-        import traceback
-        stack = traceback.format_stack()
-        i = len(stack)
-        while i > 0:
-            candidate = stack[i - 1]
-            if 'IPython' in candidate:
-                break
-            i -= 1
-
-        forbidden_phrases = [
-            '_ir_lambda_method',
-            'decorator.py',
-            'decorator-gen',
-            'typecheck/check',
-            'interactiveshell.py',
-            'expressions.construct_variable',
-            'traceback.format_stack()'
-        ]
-        filt_stack = [
-            candidate for candidate in stack[i:]
-            if not any(phrase in candidate for phrase in forbidden_phrases)
-        ]
-
-        self._stack_trace = '\n'.join(filt_stack)
+        if _capture_stack_traces:
+            self._stack_trace = StackTrace(sys._getframe(1))
+        else:
+            self._stack_trace = None
 
 
 class IR(BaseIR):
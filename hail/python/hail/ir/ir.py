@@ -12,7 +12,7 @@ from hail.typecheck import typecheck, typecheck_method, sequenceof, numeric, \
     sized_tupleof, nullable, tupleof, anytype, func_spec
 from hail.utils.java import Env
 from hail.utils.misc import escape_str, dump_json, parsable_strings, escape_id
-from .base_ir import BaseIR, IR, TableIR, MatrixIR, BlockMatrixIR, _env_bind
+from .base_ir import BaseIR, IR, TableIR, MatrixIR, BlockMatrixIR, StackTrace, _env_bind
 from .matrix_writer import MatrixWriter, MatrixNativeMultiWriter
 from .renderer import Renderer, Renderable, ParensRenderer
 from .table_writer import TableWriter
@@ -558,7 +558,7 @@ class MakeArray(IR):
 
 
 class ArrayRef(IR):
-    @typecheck_method(a=IR, i=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(a=IR, i=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, a, i, error_id=None, stack_trace=None):
         super().__init__(a, i)
         self.a = a
@@ -613,7 +613,7 @@ class ArrayZeros(IR):
 
 class StreamRange(IR):
     @typecheck_method(start=IR, stop=IR, step=IR, requires_memory_management_per_element=bool,
-                      error_id=nullable(int), stack_trace=nullable(str))
+                      error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, start, stop, step, requires_memory_management_per_element=False,
                  error_id=None, stack_trace=None):
         super().__init__(start, stop, step)
@@ -657,7 +657,7 @@ class StreamGrouped(IR):
 
 
 class MakeNDArray(IR):
-    @typecheck_method(data=IR, shape=IR, row_major=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(data=IR, shape=IR, row_major=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, data, shape, row_major, error_id=None, stack_trace=None):
         super().__init__(data, shape, row_major)
         self.data = data
@@ -699,7 +699,7 @@ class NDArrayShape(IR):
 
 
 class NDArrayReshape(IR):
-    @typecheck_method(nd=IR, shape=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(nd=IR, shape=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, nd, shape, error_id=None, stack_trace=None):
         super().__init__(nd, shape)
         self.nd = nd
@@ -760,7 +760,7 @@ class NDArrayMap(IR):
 
 
 class NDArrayMap2(IR):
-    @typecheck_method(left=IR, right=IR, lname=str, rname=str, body=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(left=IR, right=IR, lname=str, rname=str, body=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, left, right, lname, rname, body, error_id=None, stack_trace=None):
         super().__init__(left, right, body)
         self.right = right
@@ -805,7 +805,7 @@ class NDArrayMap2(IR):
 
 
 class NDArrayRef(IR):
-    @typecheck_method(nd=IR, idxs=sequenceof(IR), error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(nd=IR, idxs=sequenceof(IR), error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, nd, idxs, error_id=None, stack_trace=None):
         super().__init__(nd, *idxs)
         self.nd = nd
@@ -893,7 +893,7 @@ class NDArrayAgg(IR):
 
 
 class NDArrayMatMul(IR):
-    @typecheck_method(left=IR, right=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(left=IR, right=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, left, right, error_id=None, stack_trace=None):
         super().__init__(left, right)
         self.left = left
@@ -921,7 +921,7 @@ class NDArrayMatMul(IR):
 
 
 class NDArrayQR(IR):
-    @typecheck_method(nd=IR, mode=str, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(nd=IR, mode=str, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, nd, mode, error_id=None, stack_trace=None):
         super().__init__(nd)
         self.nd = nd
@@ -951,7 +951,7 @@ class NDArrayQR(IR):
 
 
 class NDArraySVD(IR):
-    @typecheck_method(nd=IR, full_matrices=bool, compute_uv=bool, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(nd=IR, full_matrices=bool, compute_uv=bool, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, nd, full_matrices, compute_uv, error_id=None, stack_trace=None):
         super().__init__(nd)
         self.nd = nd
@@ -977,7 +977,7 @@ class NDArraySVD(IR):
 
 
 class NDArrayInv(IR):
-    @typecheck_method(nd=IR, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(nd=IR, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, nd, error_id=None, stack_trace=None):
         super().__init__(nd)
         self.nd = nd
@@ -1235,7 +1235,7 @@ class StreamMap(IR):
 
 class StreamZip(IR):
     @typecheck_method(streams=sequenceof(IR), names=sequenceof(str), body=IR, behavior=str,
-                      error_id=nullable(int), stack_trace=nullable(str))
+                      error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, streams, names, body, behavior, error_id=None, stack_trace=None):
         super().__init__(*streams, body)
         self.streams = streams
@@ -2043,7 +2043,7 @@ class GetTupleElement(IR):
 
 
 class Die(IR):
-    @typecheck_method(message=IR, typ=hail_type, error_id=nullable(int), stack_trace=nullable(str))
+    @typecheck_method(message=IR, typ=hail_type, error_id=nullable(int), stack_trace=nullable(StackTrace))
     def __init__(self, message, typ, error_id=None, stack_trace=None):
         super().__init__(message)
         self.message = message
@@ -2125,7 +2125,7 @@ def udf(*param_types):
 
 class Apply(IR):
     @typecheck_method(function=str, return_type=hail_type, args=IR,
-                      error_id=nullable(int), stack_trace=nullable(str), type_args=tupleof(hail_type))
+                      error_id=nullable(int), stack_trace=nullable(StackTrace), type_args=tupleof(hail_type))
     def __init__(self, function, return_type, *args, type_args=(), error_id=None, stack_trace=None,):
         super().__init__(*args)
         self.function = function
@@ -2538,12 +2538,30 @@ class Literal(IR):
         super(Literal, self).__init__()
         self._typ: HailType = typ
         self.value = value
+        self._head_str = None
 
     def copy(self):
         return Literal(self._typ, self.value)
 
+    def render_head(self, r):
+        jir = r.encode_literal(self)
+        if jir is not None:
+            return f'(JavaIR {r.add_jir(jir)}'
+        return super().render_head(r)
+
     def head_str(self):
-        return f'{self._typ._parsable_string()} {dump_json(self._typ._convert_to_json_na(self.value))}'
+        # rendering large values is expensive and the same literal is often rendered
+        # several times, for instance when hashing
+        if self._head_str is None:
+            self._head_str = f'{self._typ._parsable_string()} {dump_json(self._typ._convert_to_json_na(self.value))}'
+        return self._head_str
+
+    def _head_key(self):
+        # rendering the value is as expensive as rendering the literal, and
+        # the head key is computed whenever a parent is built
+        value = self.value
+        size = len(value) if isinstance(value, (list, tuple, set, frozenset, dict, str)) else None
+        return (self._typ._parsable_string(), size)
 
     def _eq(self, other):
         return other._typ == self._typ and \
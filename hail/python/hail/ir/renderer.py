@@ -94,10 +94,17 @@ class Renderer:
     def add_jir(self, jir):
         pass
 
+    def encode_literal(self, lit: 'ir.Literal'):
+        """A Java IR standing in for `lit`, or ``None`` to render `lit` inline."""
+        if self.stop_at_jir and self.literal_encoder is not None:
+            return self.literal_encoder(lit)
+        return None
+
 
 class PlainRenderer(Renderer):
-    def __init__(self, stop_at_jir=False):
+    def __init__(self, stop_at_jir=False, literal_encoder=None):
         self.stop_at_jir = stop_at_jir
+        self.literal_encoder = literal_encoder
         self.count = 0
         self.jirs = {}
 
@@ -125,10 +132,12 @@ class PlainRenderer(Renderer):
                     else:
                         assert isinstance(x, ir.IR)
                         builder.append(f'(JavaIR {jir_id})')
+                elif not self.stop_at_jir and getattr(x, '_rendered', None) is not None:
+                    builder.append(x._rendered)
                 else:
                     head = x.render_head(self)
                     if head != '':
-                        builder.append(x.render_head(self))
+                        builder.append(head)
                     stack.push(RenderableQueue(x.render_children(self), x.render_tail(self)))
                 x = None
             else:
@@ -153,8 +162,9 @@ BindingSite = namedtuple(
 
 
 class CSERenderer(Renderer):
-    def __init__(self, stop_at_jir=False):
+    def __init__(self, stop_at_jir=False, literal_encoder=None):
         self.stop_at_jir = stop_at_jir
+        self.literal_encoder = literal_encoder
         self.jir_count = 0
         self.jirs = {}
         self.memo: Dict[int, Sequence[str]] = {}
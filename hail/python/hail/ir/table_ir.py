@@ -524,6 +524,10 @@ class TableFilterIntervals(TableIR):
     def head_str(self):
         return f'{dump_json(hl.tarray(hl.tinterval(self.point_type))._convert_to_json(self.intervals))} {self.keep}'
 
+    def _head_key(self):
+        # the intervals are not rendered, as they may be many
+        return (len(self.intervals), str(self.point_type), self.keep)
+
     def _eq(self, other):
         return self.intervals == other.intervals and self.point_type == other.point_type and self.keep == other.keep
 
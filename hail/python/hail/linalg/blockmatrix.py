@@ -1,8 +1,16 @@
+import concurrent.futures
+from contextlib import contextmanager
+import functools
+import io
+import mmap
 import os
+import shutil
+import tempfile
 
 import itertools
 import math
 import re
+import urllib.parse
 import numpy as np
 import scipy.linalg as spla
 
@@ -31,6 +39,7 @@ from hail.typecheck import (typecheck, typecheck_method, nullable, oneof,
 from hail.utils import (new_temp_file, new_local_temp_file, local_path_uri,
                         storage_level, with_local_temp_file)
 from hail.utils.java import Env
+from hailtop.utils import async_to_blocking, blocking_to_async, bounded_gather
 
 block_matrix_type = lazy()
 
@@ -284,7 +293,9 @@ class BlockMatrix(object):
         func:`numpy.tofile` to be a valid binary input to :meth:`.fromfile`.
         This is not checked.
 
-        The number of entries must be less than :math:`2^{31}`.
+        The number of rows and the number of columns must each be less than
+        :math:`2^{31}`. The matrix is read one block row at a time, so the number
+        of entries is not limited.
 
         Parameters
         ----------
@@ -326,7 +337,8 @@ class BlockMatrix(object):
         -----
         The ndarray must have two dimensions, each of non-zero size.
 
-        The number of entries must be less than :math:`2^{31}`.
+        The number of rows and the number of columns must each be less than
+        :math:`2^{31}`.
 
         Parameters
         ----------
@@ -1213,10 +1225,10 @@ class BlockMatrix(object):
             self.export_blocks(path, binary=True)
             return BlockMatrix.rectangles_to_numpy(path, binary=True)
 
-        with with_local_temp_file() as path:
+        with _local_transfer_file(8 * self.n_rows * self.n_cols) as path:
             uri = local_path_uri(path)
             self.tofile(uri)
-            return np.fromfile(path).reshape((self.n_rows, self.n_cols))
+            return _read_doubles(path).reshape((self.n_rows, self.n_cols))
 
     def to_ndarray(self):
         """Collects a BlockMatrix into a local hail ndarray expression on driver. This should not
@@ -2230,8 +2242,8 @@ class BlockMatrix(object):
         self.export_rectangles(path_out, rectangles, delimiter, binary)
 
     @staticmethod
-    @typecheck(path=str, binary=bool)
-    def rectangles_to_numpy(path, binary=False):
+    @typecheck(path=str, binary=bool, memmap_path=nullable(str))
+    def rectangles_to_numpy(path, binary=False, memmap_path=None):
         """Instantiates a NumPy ndarray from files of rectangles written out using
         :meth:`.export_rectangles` or :meth:`.export_blocks`. For any given
         dimension, the ndarray will have length equal to the upper bound of that dimension
@@ -2262,6 +2274,10 @@ class BlockMatrix(object):
         If exporting to binary files, note that they are not platform independent. No byte-order
         or data-type information is saved.
 
+        Rectangles are read concurrently, each directly into its slice of the result.
+        For results larger than memory, set `memmap_path` to back the result with a
+        local file using :class:`numpy.memmap`.
+
         See Also
         --------
         :meth:`.export_rectangles`
@@ -2273,6 +2289,9 @@ class BlockMatrix(object):
             Path to directory where rectangles were written.
         binary: :obj:`bool`
             If true, reads the files as binary, otherwise as text delimited.
+        memmap_path: :class:`str`, optional
+            Local path of a file to create and map the result into. If not set, the
+            result is held in memory.
 
         Returns
         -------
@@ -2290,16 +2309,22 @@ class BlockMatrix(object):
         n_rows = max(rects, key=lambda r: r[2])[2]
         n_cols = max(rects, key=lambda r: r[4])[4]
 
-        nd = np.zeros(shape=(n_rows, n_cols))
-        with with_local_temp_file() as f:
-            uri = local_path_uri(f)
-            for rect, file_path in zip(rects, rect_files):
-                hl.utils.hadoop_copy(file_path, uri)
-                if binary:
-                    rect_data = np.reshape(np.fromfile(f), (rect[2] - rect[1], rect[4] - rect[3]))
-                else:
-                    rect_data = np.loadtxt(f, ndmin=2)
-                nd[rect[1]:rect[2], rect[3]:rect[4]] = rect_data
+        if memmap_path is None:
+            nd = np.zeros(shape=(n_rows, n_cols))
+        else:
+            # a new file-backed map is zero-filled
+            nd = np.memmap(memmap_path, dtype=np.float64, mode='w+', shape=(n_rows, n_cols))
+
+        def fill(rect, data):
+            if binary:
+                rect_data = np.frombuffer(data, dtype=np.float64).reshape((rect[2] - rect[1], rect[4] - rect[3]))
+            else:
+                rect_data = np.loadtxt(io.BytesIO(data), ndmin=2)
+            nd[rect[1]:rect[2], rect[3]:rect[4]] = rect_data
+
+        _read_files_concurrently(rect_files, [functools.partial(fill, rect) for rect in rects])
+        if memmap_path is not None:
+            nd.flush()
         return nd
 
     @typecheck_method(compute_uv=bool,
@@ -2555,17 +2580,17 @@ def _jarray_from_ndarray(nd):
         raise ValueError(f'size of ndarray must be less than 2^31, found {nd.size}')
 
     nd = _ndarray_as_float64(nd)
-    with with_local_temp_file() as path:
+    with _local_transfer_file(nd.nbytes) as path:
         uri = local_path_uri(path)
         nd.tofile(path)
         return Env.hail().utils.richUtils.RichArray.importFromDoubles(Env.spark_backend('_jarray_from_ndarray').fs._jfs, uri, nd.size)
 
 
 def _ndarray_from_jarray(ja):
-    with with_local_temp_file() as path:
+    with _local_transfer_file(8 * len(ja)) as path:
         uri = local_path_uri(path)
         Env.hail().utils.richUtils.RichArray.exportToDoubles(Env.spark_backend('_ndarray_from_jarray').fs._jfs, uri, ja)
-        return np.fromfile(path)
+        return _read_doubles(path)
 
 
 def _breeze_fromfile(uri, n_rows, n_cols):
@@ -2588,12 +2613,60 @@ def _breeze_from_ndarray(nd):
     nd = _ndarray_as_float64(nd)
     n_rows, n_cols = nd.shape
 
-    with with_local_temp_file() as path:
+    with _local_transfer_file(nd.nbytes) as path:
         uri = local_path_uri(path)
         nd.tofile(path)
         return _breeze_fromfile(uri, n_rows, n_cols)
 
 
+# tmpfs directory through which arrays are exchanged with the JVM, when it has room
+_SHARED_MEMORY_DIR = '/dev/shm'
+
+
+@contextmanager
+def _local_transfer_file(n_bytes):
+    """Yields a local path for exchanging `n_bytes` with the JVM.
+
+    The file is created in shared memory when there is room, so neither side's
+    copy touches disk, and is otherwise a local temporary file. In shared
+    memory it is placed in a private directory, which is removed on exit along
+    with any checksum file the JVM's local file system writes beside it.
+    """
+    try:
+        use_shared_memory = shutil.disk_usage(_SHARED_MEMORY_DIR).free > n_bytes and os.access(_SHARED_MEMORY_DIR, os.W_OK)
+    except OSError:
+        use_shared_memory = False
+
+    if not use_shared_memory:
+        with with_local_temp_file() as path:
+            yield path
+        return
+
+    transfer_dir = tempfile.mkdtemp(prefix='hail-', dir=_SHARED_MEMORY_DIR)
+    try:
+        yield os.path.join(transfer_dir, 'transfer')
+    finally:
+        shutil.rmtree(transfer_dir, ignore_errors=True)
+
+
+def _read_doubles(path):
+    """Reads a local binary file of float64 values as a one-dimensional ndarray.
+
+    Files in shared memory are mapped rather than copied. The mapping outlives
+    the file, so the result remains valid after :func:`_local_transfer_file`
+    removes it.
+    """
+    if os.path.commonpath([path, _SHARED_MEMORY_DIR]) != _SHARED_MEMORY_DIR:
+        return np.fromfile(path)
+
+    with open(path, 'r+b') as f:
+        n_bytes = os.fstat(f.fileno()).st_size
+        if n_bytes == 0:
+            return np.zeros(0)
+        buffer = mmap.mmap(f.fileno(), n_bytes)
+    return np.frombuffer(buffer, dtype=np.float64)
+
+
 def _svd(a, full_matrices=True, compute_uv=True, overwrite_a=False, check_finite=True):
     """
     SciPy supports two Lapack algorithms:
@@ -2621,3 +2694,51 @@ def _eigh(a):
     DC (syevd) is faster but uses O(elements) memory; lwork overflows int32 for dim_a > 32766
     """
     return np.linalg.eigh(a) if a.shape[0] <= 32766 else spla.eigh(a)
+
+
+# Number of files read at once by _read_files_concurrently.
+_FILE_READ_PARALLELISM = 16
+
+
+def _read_files_concurrently(paths, callbacks):
+    """Read each file in `paths` and pass its contents to the corresponding callback.
+
+    Files on local disk, Google Cloud Storage and S3 are read with a
+    :class:`.RouterAsyncFS`; files on other filesystems are read through the backend's
+    filesystem on a thread pool. Callbacks may run concurrently, so must touch
+    disjoint state.
+    """
+    schemes = {urllib.parse.urlparse(path).scheme for path in paths}
+    if schemes <= {'', 'file', 'gs', 's3'}:
+        async_to_blocking(_async_read_files_concurrently(paths, callbacks, schemes))
+        return
+
+    def read(path, callback):
+        with hl.hadoop_open(path, 'rb') as f:
+            callback(f.read())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_FILE_READ_PARALLELISM) as pool:
+        for f in [pool.submit(read, path, callback) for path, callback in zip(paths, callbacks)]:
+            f.result()
+
+
+async def _async_read_files_concurrently(paths, callbacks, schemes):
+    from hailtop.aiotools import RouterAsyncFS, LocalAsyncFS
+
+    with concurrent.futures.ThreadPoolExecutor() as thread_pool:
+        filesystems = [LocalAsyncFS(thread_pool)]
+        if 'gs' in schemes:
+            from hailtop.aiogoogle import GoogleStorageAsyncFS
+            filesystems.append(GoogleStorageAsyncFS())
+        if 's3' in schemes:
+            from hailtop.aiotools.s3asyncfs import S3AsyncFS
+            filesystems.append(S3AsyncFS(thread_pool))
+
+        async with RouterAsyncFS('file', filesystems) as fs:
+            async def read(path, callback):
+                data = await fs.read(path)
+                await blocking_to_async(thread_pool, callback, data)
+
+            await bounded_gather(*[functools.partial(read, path, callback)
+                                   for path, callback in zip(paths, callbacks)],
+                                 parallelism=_FILE_READ_PARALLELISM)
@@ -1,4 +1,5 @@
-from .plots import output_notebook, show, histogram, cumulative_histogram, histogram2d, scatter, joint_plot, qq, manhattan, smoothed_pdf, pdf, cdf, set_font_size, visualize_missingness
+from .plots import output_notebook, show, histogram, cumulative_histogram, histogram2d, scatter, joint_plot, qq, manhattan, smoothed_pdf, pdf, cdf, set_font_size, visualize_missingness, \
+    PlotSpec, aggregate_plots
 
 __all__ = ['output_notebook',
            'show',
@@ -13,4 +14,6 @@ __all__ = ['output_notebook',
            'smoothed_pdf',
            'cdf',
            'set_font_size',
-           'visualize_missingness']
+           'visualize_missingness',
+           'PlotSpec',
+           'aggregate_plots']
@@ -621,7 +621,10 @@ def histogram2d(x: NumericExpression,
     :class:`bokeh.plotting.figure.Figure`
     """
     data = _generate_hist2d_data(x, y, bins, range).to_pandas()
+    return _render_histogram2d(data, title, width, height, colors, log)
 
+
+def _render_histogram2d(data, title, width, height, colors, log):
     # Use python prettier float -> str function
     data['x'] = data['x'].apply(lambda e: str(float(e)))
     data['y'] = data['y'].apply(lambda e: str(float(e)))
@@ -692,6 +695,16 @@ def _generate_hist2d_data(x, y, bins, range):
     else:
         warning('If x_range or y_range are specified in histogram_2d, and there are points '
                 'outside of these ranges, they will not be plotted')
+    x_bin, y_bin, x_end, y_end = _hist2d_bins(x, y, x_bins, y_bins, x_range, y_range)
+    grouped_ht = source.group_by(x=x_bin, y=y_bin).aggregate(c=hail.agg.count())
+    data = grouped_ht.filter(hail.is_defined(grouped_ht.x) & (grouped_ht.x != x_end)
+                             & hail.is_defined(grouped_ht.y) & (grouped_ht.y != y_end))
+    return data
+
+
+def _hist2d_bins(x, y, x_bins, y_bins, x_range, y_range):
+    """Returns expressions for the labels of the bins containing `x` and `y`,
+    and the labels of the right-hand edges of the ranges, which are not bins."""
     x_range = list(map(float, x_range))
     y_range = list(map(float, y_range))
     x_spacing = (x_range[1] - x_range[0]) / x_bins
@@ -703,13 +716,10 @@ def _generate_hist2d_data(x, y, bins, range):
 
     x_levels = hail.literal(list(frange(x_range[0], x_range[1], x_spacing))[::-1])
     y_levels = hail.literal(list(frange(y_range[0], y_range[1], y_spacing))[::-1])
-    grouped_ht = source.group_by(
-        x=hail.str(x_levels.find(lambda w: x >= w)),
-        y=hail.str(y_levels.find(lambda w: y >= w))
-    ).aggregate(c=hail.agg.count())
-    data = grouped_ht.filter(hail.is_defined(grouped_ht.x) & (grouped_ht.x != str(x_range[1]))
-                             & hail.is_defined(grouped_ht.y) & (grouped_ht.y != str(y_range[1])))
-    return data
+    return (hail.str(x_levels.find(lambda w: x >= w)),
+            hail.str(y_levels.find(lambda w: y >= w)),
+            str(x_range[1]),
+            str(y_range[1]))
 
 
 def _collect_scatter_plot_data(
@@ -719,37 +729,65 @@ def _collect_scatter_plot_data(
         n_divisions: int = None,
         missing_label: str = 'NA'
 ) -> pd.DataFrame:
+    if n_divisions is None:
+        expressions = _scatter_plot_fields(fields, missing_label)
+        collect_expr = hail.struct(**dict((k, v) for k, v in (x, y)), **expressions)
+        plot_data = [point for point in collect_expr.collect() if point[x[0]] is not None and point[y[0]] is not None]
+        return pd.DataFrame(plot_data)
 
+    aggregation, to_pandas = _scatter_plot_data_aggregation(x, y, fields, n_divisions, missing_label)
+    agg_f = x[1]._aggregation_method()
+    return to_pandas(agg_f(aggregation))
+
+
+def _scatter_plot_fields(fields, missing_label):
     expressions = dict()
     if fields is not None:
         expressions.update({k: hail.or_else(v, missing_label) if isinstance(v, StringExpression) else v for k, v in fields.items()})
+    return expressions
+
+
+def _scatter_plot_data_aggregation(
+        x: Tuple[str, NumericExpression],
+        y: Tuple[str, NumericExpression],
+        fields: Dict[str, Expression] = None,
+        n_divisions: int = None,
+        missing_label: str = 'NA'
+):
+    """Returns an aggregation collecting the points of a scatter plot, and a
+    function converting its result to the data frame returned by
+    :func:`_collect_scatter_plot_data`."""
+    expressions = _scatter_plot_fields(fields, missing_label)
 
     if n_divisions is None:
         collect_expr = hail.struct(**dict((k, v) for k, v in (x, y)), **expressions)
-        plot_data = [point for point in collect_expr.collect() if point[x[0]] is not None and point[y[0]] is not None]
-        source_pd = pd.DataFrame(plot_data)
-    else:
-        # FIXME: remove the type conversion logic if/when downsample supports continuous values for labels
-        # Save all numeric types to cast in DataFrame
-        numeric_expr = {k: 'int32' for k, v in expressions.items() if isinstance(v, Int32Expression)}
-        numeric_expr.update({k: 'int64' for k, v in expressions.items() if isinstance(v, Int64Expression)})
-        numeric_expr.update({k: 'float32' for k, v in expressions.items() if isinstance(v, Float32Expression)})
-        numeric_expr.update({k: 'float64' for k, v in expressions.items() if isinstance(v, Float64Expression)})
-
-        # Cast non-string types to string
-        expressions = {k: hail.str(v) if not isinstance(v, StringExpression) else v for k, v in expressions.items()}
-
-        agg_f = x[1]._aggregation_method()
-        res = agg_f(hail.agg.downsample(x[1], y[1], label=list(expressions.values()) if expressions else None, n_divisions=n_divisions))
+
+        def to_pandas(res):
+            return pd.DataFrame([point for point in res if point[x[0]] is not None and point[y[0]] is not None])
+
+        return hail.agg.collect(collect_expr), to_pandas
+
+    # FIXME: remove the type conversion logic if/when downsample supports continuous values for labels
+    # Save all numeric types to cast in DataFrame
+    numeric_expr = {k: 'int32' for k, v in expressions.items() if isinstance(v, Int32Expression)}
+    numeric_expr.update({k: 'int64' for k, v in expressions.items() if isinstance(v, Int64Expression)})
+    numeric_expr.update({k: 'float32' for k, v in expressions.items() if isinstance(v, Float32Expression)})
+    numeric_expr.update({k: 'float64' for k, v in expressions.items() if isinstance(v, Float64Expression)})
+
+    # Cast non-string types to string
+    expressions = {k: hail.str(v) if not isinstance(v, StringExpression) else v for k, v in expressions.items()}
+
+    def to_pandas(res):
         source_pd = pd.DataFrame([
             dict(
                 **{x[0]: point[0], y[0]: point[1]},
                 **(dict(zip(expressions, point[2])) if point[2] is not None else {})
             ) for point in res
         ])
-        source_pd = source_pd.astype(numeric_expr, copy=False)
+        return source_pd.astype(numeric_expr, copy=False)
 
-    return source_pd
+    aggregation = hail.agg.downsample(x[1], y[1], label=list(expressions.values()) if expressions else None, n_divisions=n_divisions)
+    return aggregation, to_pandas
 
 
 def _get_categorical_palette(factors: List[str]) -> Dict[str, str]:
@@ -943,8 +981,12 @@ def scatter(
         y = ('y', y)
 
     source_pd = _collect_scatter_plot_data(x, y, fields={**hover_fields, **label}, n_divisions=None if collect_all else n_divisions, missing_label=missing_label)
+    return _render_scatter(source_pd, x[0], y[0], label_cols, colors, size, title, xlabel, ylabel, width, height, legend)
+
+
+def _render_scatter(source_pd, x_col, y_col, label_cols, colors, size, title, xlabel, ylabel, width, height, legend):
     sp = figure(title=title, x_axis_label=xlabel, y_axis_label=ylabel, height=height, width=width)
-    sp, sp_legend_items, sp_legend, sp_color_bar, sp_color_mappers, sp_scatter_renderers = _get_scatter_plot_elements(sp, source_pd, x[0], y[0], label_cols, colors, size)
+    sp, sp_legend_items, sp_legend, sp_color_bar, sp_color_mappers, sp_scatter_renderers = _get_scatter_plot_elements(sp, source_pd, x_col, y_col, label_cols, colors, size)
 
     if not legend:
         sp_legend.visible = False
@@ -1340,6 +1382,10 @@ def qq(
     )
     from hail.methods.statgen import _lambda_gc_agg
     lambda_gc, max_p = ht.aggregate((_lambda_gc_agg(ht['p_value']), hail.agg.max(hail.max(ht.observed_p, ht.expected_p))))
+    return _annotate_qq(p, lambda_gc, max_p)
+
+
+def _annotate_qq(p, lambda_gc, max_p):
     if isinstance(p, Column):
         qq = p.children[1]
     else:
@@ -1403,6 +1449,10 @@ def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_
         fields=hover_fields,
         n_divisions=None if collect_all else n_divisions
     )
+    return _render_manhattan(source_pd, ref, title, size, significance_line)
+
+
+def _render_manhattan(source_pd, ref, title, size, significance_line):
     source_pd['p_value'] = [10 ** (-p) for p in source_pd['_pval']]
     source_pd['_contig'] = [locus.split(":")[0] for locus in source_pd['locus']]
 
@@ -1542,3 +1592,289 @@ def visualize_missingness(entry_field, row_field=None, column_field=None,
                          label_standoff=6, border_line_color=None, location=(0, 0))
     p.add_layout(color_bar, 'right')
     return p
+
+
+class PlotSpec(object):
+    """A plot whose data is computed together with that of other plots by
+    :func:`.aggregate_plots`.
+
+    Construct plot specifications with the static methods of this class, which
+    take the same parameters as the plotting functions of the same names, but
+    only accept data in the form of :class:`.Table` and :class:`.MatrixTable`
+    fields.
+
+    Examples
+    --------
+
+    >>> ht = hail.utils.range_table(1000).annotate(x=hail.rand_norm(), y=hail.rand_norm())
+    >>> p_hist, p_cdf, p_scatter = hail.plot.aggregate_plots([
+    ...     hail.plot.PlotSpec.histogram(ht.x, range=(-3, 3)),
+    ...     hail.plot.PlotSpec.cdf(ht.y),
+    ...     hail.plot.PlotSpec.scatter(ht.x, ht.y)])
+    """
+
+    def __init__(self, source, aggregation, render, range_aggregation=None):
+        self._source = source
+        self._aggregation = aggregation
+        self._render = render
+        self._range_aggregation = range_aggregation
+
+    @staticmethod
+    @typecheck(data=expr_float64, range=nullable(sized_tupleof(numeric, numeric)),
+               bins=int, legend=nullable(str), title=nullable(str), log=bool)
+    def histogram(data, range=None, bins=50, legend=None, title=None, log=False) -> 'PlotSpec':
+        """Specify a histogram. See :func:`.histogram`."""
+        def aggregation(computed_range):
+            start, end = range if range is not None else computed_range
+            if start is None and end is None:
+                raise ValueError("'data' contains no values that are defined and finite")
+            return aggregators.hist(data, start, end, bins)
+
+        return PlotSpec(data,
+                        aggregation,
+                        lambda res: histogram(res, legend=legend, title=title, log=log),
+                        _histogram_range_aggregation(data, range, finite=True))
+
+    @staticmethod
+    @typecheck(data=expr_float64, range=nullable(sized_tupleof(numeric, numeric)),
+               bins=int, legend=nullable(str), title=nullable(str), normalize=bool, log=bool)
+    def cumulative_histogram(data, range=None, bins=50, legend=None, title=None, normalize=True, log=False) -> 'PlotSpec':
+        """Specify a cumulative histogram. See :func:`.cumulative_histogram`."""
+        def aggregation(computed_range):
+            start, end = range if range is not None else computed_range
+            return aggregators.hist(data, start, end, bins)
+
+        return PlotSpec(data,
+                        aggregation,
+                        lambda res: cumulative_histogram(res, legend=legend, title=title, normalize=normalize, log=log),
+                        _histogram_range_aggregation(data, range, finite=False))
+
+    @staticmethod
+    @typecheck(data=expr_float64, k=int, legend=nullable(str), title=nullable(str), normalize=bool, log=bool)
+    def cdf(data, k=350, legend=None, title=None, normalize=True, log=False) -> 'PlotSpec':
+        """Specify a cumulative density plot. See :func:`.cdf`."""
+        return PlotSpec(data,
+                        lambda _: aggregators.approx_cdf(data, k),
+                        lambda res: cdf(res, legend=legend, title=title, normalize=normalize, log=log))
+
+    @staticmethod
+    @typecheck(data=expr_float64, k=int, confidence=numeric, legend=nullable(str), title=nullable(str), log=bool)
+    def pdf(data, k=1000, confidence=5, legend=None, title=None, log=False) -> 'PlotSpec':
+        """Specify a density plot. See :func:`.pdf`."""
+        return PlotSpec(data,
+                        lambda _: aggregators.approx_cdf(data, k),
+                        lambda res: pdf(res, confidence=confidence, legend=legend, title=title, log=log))
+
+    @staticmethod
+    @typecheck(data=expr_float64, k=int, smoothing=numeric, legend=nullable(str), title=nullable(str), log=bool)
+    def smoothed_pdf(data, k=350, smoothing=.5, legend=None, title=None, log=False) -> 'PlotSpec':
+        """Specify a smoothed density plot. See :func:`.smoothed_pdf`."""
+        return PlotSpec(data,
+                        lambda _: aggregators.approx_cdf(data, k),
+                        lambda res: smoothed_pdf(res, smoothing=smoothing, legend=legend, title=title, log=log))
+
+    @staticmethod
+    @typecheck(x=expr_numeric, y=expr_numeric, bins=oneof(int, sequenceof(int)),
+               range=nullable(sized_tupleof(nullable(sized_tupleof(numeric, numeric)),
+                                            nullable(sized_tupleof(numeric, numeric)))),
+               title=nullable(str), width=int, height=int,
+               colors=sequenceof(str),
+               log=bool)
+    def histogram2d(x, y, bins=40, range=None, title=None, width=600, height=600,
+                    colors=bokeh.palettes.all_palettes['Blues'][7][::-1], log=False) -> 'PlotSpec':
+        """Specify a two-dimensional histogram. See :func:`.histogram2d`.
+
+        Unlike :func:`.histogram2d`, `x` and `y` may be fields of a
+        :class:`.MatrixTable`, but must be indexed by the same axes.
+        """
+        if x._indices != y._indices:
+            raise ValueError("histogram2d expects 'x' and 'y' to be indexed by the same axes of the same source")
+        if isinstance(bins, int):
+            x_bins = y_bins = bins
+        else:
+            x_bins, y_bins = bins
+        x_range, y_range = (None, None) if range is None else range
+
+        range_aggregation = None
+        if x_range is None or y_range is None:
+            range_aggregation = hail.tuple([aggregators.stats(x), aggregators.stats(y)])
+
+        # labels of the right-hand edges of the ranges, which are not bins
+        ends = None
+
+        def aggregation(stats):
+            nonlocal ends
+            _x_range, _y_range = x_range, y_range
+            if stats is not None:
+                x_stats, y_stats = stats
+                _x_range = _x_range or (x_stats.min, x_stats.max)
+                _y_range = _y_range or (y_stats.min, y_stats.max)
+            x_bin, y_bin, *ends = _hist2d_bins(x, y, x_bins, y_bins, _x_range, _y_range)
+            return aggregators.group_by(hail.struct(x=x_bin, y=y_bin), aggregators.count())
+
+        def render(res):
+            x_end, y_end = ends
+            data = pd.DataFrame([(k.x, k.y, c) for k, c in res.items()
+                                 if k.x is not None and k.x != x_end and k.y is not None and k.y != y_end],
+                                columns=['x', 'y', 'c'])
+            return _render_histogram2d(data, title, width, height, colors, log)
+
+        return PlotSpec(x, aggregation, render, range_aggregation)
+
+    @staticmethod
+    @typecheck(x=oneof(expr_numeric, sized_tupleof(str, expr_numeric)),
+               y=oneof(expr_numeric, sized_tupleof(str, expr_numeric)),
+               label=nullable(oneof(dictof(str, expr_any), expr_any)), title=nullable(str),
+               xlabel=nullable(str), ylabel=nullable(str), size=int, legend=bool,
+               hover_fields=nullable(dictof(str, expr_any)),
+               colors=nullable(oneof(bokeh.models.mappers.ColorMapper, dictof(str, bokeh.models.mappers.ColorMapper))),
+               width=int, height=int, collect_all=bool, n_divisions=nullable(int), missing_label=str)
+    def scatter(x, y, label=None, title=None, xlabel=None, ylabel=None, size=4, legend=True, hover_fields=None,
+                colors=None, width=800, height=800, collect_all=False, n_divisions=500, missing_label='NA') -> 'PlotSpec':
+        """Specify a scatter plot. See :func:`.scatter`."""
+        hover_fields = {} if hover_fields is None else hover_fields
+        label = {} if label is None else {'label': label} if isinstance(label, Expression) else label
+        colors = {'label': colors} if isinstance(colors, ColorMapper) else colors
+        label_cols = list(label.keys())
+        if isinstance(x, NumericExpression):
+            x = ('x', x)
+        if isinstance(y, NumericExpression):
+            y = ('y', y)
+
+        aggregation, to_pandas = _scatter_plot_data_aggregation(
+            x, y, fields={**hover_fields, **label}, n_divisions=None if collect_all else n_divisions, missing_label=missing_label)
+        return PlotSpec(x[1],
+                        lambda _: aggregation,
+                        lambda res: _render_scatter(to_pandas(res), x[0], y[0], label_cols, colors, size,
+                                                    title, xlabel, ylabel, width, height, legend))
+
+    @staticmethod
+    @typecheck(pvals=expr_numeric, title=nullable(str), xlabel=nullable(str), ylabel=nullable(str),
+               size=int, width=int, height=int, k=int, n_smallest=int)
+    def qq(pvals, title='Q-Q plot', xlabel='Expected -log10(p)', ylabel='Observed -log10(p)',
+           size=6, width=800, height=800, k=1000, n_smallest=1000) -> 'PlotSpec':
+        """Specify a Quantile-Quantile plot. See :func:`.qq`.
+
+        Unlike :func:`.qq`, which ranks every p-value, the plot is drawn from the
+        `n_smallest` p-values, which are ranked exactly, and from approximate
+        quantiles of the remainder computed with :func:`~.approx_cdf` with
+        accuracy parameter `k`. Labels and hover fields are not supported.
+        """
+        from hail.methods.statgen import _lambda_gc_agg
+
+        aggregation = hail.struct(
+            smallest=aggregators.take(pvals, n_smallest, ordering=pvals),
+            cdf=aggregators.approx_cdf(pvals, k),
+            lambda_gc=_lambda_gc_agg(pvals))
+
+        def render(res):
+            n = res.cdf.ranks[-1]
+            smallest = [p for p in res.smallest if p is not None]
+            # quantiles beyond those ranked exactly; ranks count the smaller p-values
+            rest = [(p, rank) for p, rank in zip(res.cdf.values, res.cdf.ranks) if rank >= len(smallest)]
+            p_values = np.array(smallest + [p for p, _ in rest], dtype=np.float64)
+            ranks = np.array([*range(1, len(smallest) + 1), *(rank + 1 for _, rank in rest)], dtype=np.float64)
+            source_pd = pd.DataFrame({
+                'p_value': p_values,
+                'expected_p': -np.log10(ranks / n),
+                'observed_p': -np.log10(p_values)})
+            p = _render_scatter(source_pd, 'expected_p', 'observed_p', [], None, size,
+                                title, xlabel, ylabel, width, height, True)
+            max_p = max(source_pd.expected_p.max(), source_pd.observed_p.max()) if len(source_pd) > 0 else 0
+            return _annotate_qq(p, res.lambda_gc, max_p)
+
+        return PlotSpec(pvals, lambda _: aggregation, render)
+
+    @staticmethod
+    @typecheck(pvals=expr_float64, locus=nullable(expr_locus()), title=nullable(str),
+               size=int, hover_fields=nullable(dictof(str, expr_any)), collect_all=bool, n_divisions=int,
+               significance_line=nullable(numeric))
+    def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_all=False, n_divisions=500,
+                  significance_line=5e-8) -> 'PlotSpec':
+        """Specify a Manhattan plot. See :func:`.manhattan`."""
+        if locus is None:
+            locus = pvals._indices.source.locus
+        ref = locus.dtype.reference_genome
+        hover_fields = {**({} if hover_fields is None else hover_fields), 'locus': hail.str(locus)}
+
+        aggregation, to_pandas = _scatter_plot_data_aggregation(
+            ('_global_locus', locus.global_position()),
+            ('_pval', -hail.log10(pvals)),
+            fields=hover_fields,
+            n_divisions=None if collect_all else n_divisions)
+        return PlotSpec(pvals,
+                        lambda _: aggregation,
+                        lambda res: _render_manhattan(to_pandas(res), ref, title, size, significance_line))
+
+
+def _histogram_range_aggregation(data, range, finite):
+    if range is not None:
+        return None
+    if finite:
+        data = hail.bind(lambda x: hail.case().when(hail.is_finite(x), x).or_missing(), data)
+    return hail.tuple([aggregators.min(data), aggregators.max(data)])
+
+
+def _aggregate_by_source(sources, aggregations):
+    """Evaluate each aggregation over the axis of its source expression, with one
+    pass per dataset and axis."""
+    groups = {}
+    for i, source in enumerate(sources):
+        if source._indices.source is None:
+            raise ValueError('plot data must be a field of a Table or MatrixTable, found a scalar expression')
+        agg_f = source._aggregation_method()
+        groups.setdefault((id(agg_f.__self__), agg_f.__func__), (agg_f, []))[1].append(i)
+
+    results = [None] * len(sources)
+    for agg_f, indices in groups.values():
+        values = agg_f(hail.tuple([aggregations[i] for i in indices]))
+        for i, value in zip(indices, values):
+            results[i] = value
+    return results
+
+
+@typecheck(plots=sequenceof(PlotSpec))
+def aggregate_plots(plots):
+    """Create several plots, computing their data together.
+
+    Examples
+    --------
+
+    >>> mt = hail.sample_qc(hail.variant_qc(dataset))
+    >>> figures = hail.plot.aggregate_plots([
+    ...     hail.plot.PlotSpec.histogram(mt.sample_qc.call_rate, range=(.88, 1)),
+    ...     hail.plot.PlotSpec.histogram(mt.sample_qc.gq_stats.mean, range=(10, 70)),
+    ...     hail.plot.PlotSpec.scatter(mt.sample_qc.dp_stats.mean, mt.sample_qc.call_rate),
+    ...     hail.plot.PlotSpec.histogram(mt.variant_qc.AF[1], range=(0, 1))])
+
+    Notes
+    -----
+    Calling a plotting function such as :func:`.histogram` for each of several
+    plots reads the data once per plot. This function instead builds a single
+    aggregation for all plots of data indexed by the same axis of the same
+    dataset, and renders each figure from its part of the result. In the
+    example above, the data is read once for the three plots of sample
+    (column) fields and once for the plot of the variant (row) field.
+
+    Histograms without a `range` need the minimum and maximum of their data
+    before they can be aggregated. If any are present, the ranges of all of
+    them are computed together in one additional pass.
+
+    Parameters
+    ----------
+    plots : list of :class:`.PlotSpec`
+        Plots to create.
+
+    Returns
+    -------
+    :obj:`list`
+        The figure for each plot, in the order given.
+    """
+    needs_range = [p for p in plots if p._range_aggregation is not None]
+    ranges = dict(zip(map(id, needs_range),
+                      _aggregate_by_source([p._source for p in needs_range],
+                                           [p._range_aggregation for p in needs_range])))
+
+    results = _aggregate_by_source([p._source for p in plots],
+                                   [p._aggregation(ranges.get(id(p))) for p in plots])
+    return [p._render(result) for p, result in zip(plots, results)]
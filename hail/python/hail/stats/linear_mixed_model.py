@@ -783,17 +783,87 @@ class LinearMixedModel(object):
 
         if self.low_rank:
             assert a.shape[0] == self.n and a.shape[1] == n_cols
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], a[:, i]) for i in range(n_cols)]
-        else:
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], None) for i in range(n_cols)]
 
-        df = pd.DataFrame.from_records(data, columns=['idx', 'beta', 'sigma_sq', 'chi_sq', 'p_value'])
+        # fit blocks of alternatives at once to bound the size of temporaries
+        block_size = 4096
+        results = [self._fit_alternatives_block_numpy(pa[:, start:start + block_size],
+                                                      a[:, start:start + block_size] if self.low_rank else None)
+                   for start in range(0, n_cols, block_size)]
+        beta, sigma_sq, chi_sq, p_value = (np.concatenate(x) for x in zip(*results)) if results else 4 * [np.zeros(0)]
+
+        df = pd.DataFrame({'idx': np.arange(n_cols),
+                           'beta': beta,
+                           'sigma_sq': sigma_sq,
+                           'chi_sq': chi_sq,
+                           'p_value': p_value})
 
         if return_pandas:
             return df
         else:
             return Table.from_pandas(df, key='idx')
 
+    def _fit_alternatives_block_numpy(self, pa, a):
+        r"""Fit the alternative models for the columns of `pa` (and `a`) at once.
+
+        Each alternative augments the null design with one column, so its normal
+        equations have the block form
+
+        .. math::
+
+          \begin{bmatrix} s & c^T \\ c & C \end{bmatrix}
+          \begin{bmatrix} \beta_\star \\ \beta \end{bmatrix}
+          = \begin{bmatrix} t \\ u \end{bmatrix}
+
+        where :math:`C` and :math:`u` are shared by all alternatives. With the Schur
+        complement :math:`S = s - c^T C^{-1} c`, the solution is
+        :math:`\beta_\star = (t - u^T C^{-1} c) / S` and
+        :math:`\beta = C^{-1} (u - c \beta_\star)`, so a single Cholesky
+        factorization of :math:`C` serves every column. The system is positive
+        definite exactly when :math:`S > 0`; columns for which it is not (up to
+        rounding) get missing statistics, as in :meth:`_fit_alternative_numpy`.
+        """
+        from scipy.linalg import cho_factor, cho_solve, LinAlgError
+        from scipy.stats.distributions import chi2
+
+        gamma = self.gamma
+        dpa = self._d_alt[:, np.newaxis] * pa
+
+        ydy = self._ydy_alt
+        u = self._xdy_alt[1:]
+        cov = self._xdx_alt[1:, 1:]
+
+        if self.low_rank:
+            t = self.py @ dpa + gamma * (self.y @ a)
+            s = np.einsum('ij,ij->j', pa, dpa) + gamma * np.einsum('ij,ij->j', a, a)
+            c = self.px.T @ dpa + gamma * (self.x.T @ a)
+        else:
+            t = self.py @ dpa
+            s = np.einsum('ij,ij->j', pa, dpa)
+            c = self.px.T @ dpa
+
+        try:
+            factor = cho_factor(cov)
+        except LinAlgError:
+            nan = np.full(pa.shape[1], float('nan'))
+            return nan, nan, nan, nan
+
+        cov_inv_c = cho_solve(factor, c)
+        cov_inv_u = cho_solve(factor, u)
+        schur = s - np.einsum('ij,ij->j', c, cov_inv_c)
+        # an alternative (numerically) in the span of the covariates leaves only
+        # rounding error in the Schur complement
+        valid = schur > 1e-12 * s
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta_star = np.where(valid, (t - u @ cov_inv_c) / schur, float('nan'))
+            beta = cov_inv_u[:, np.newaxis] - cov_inv_c * beta_star
+            residual_sq = ydy - (t * beta_star + u @ beta)
+            sigma_sq = residual_sq / self._dof_alt
+            chi_sq = self.n * np.log(self._residual_sq / residual_sq)  # division => precision
+            p_value = chi2.sf(chi_sq, 1)
+
+        return beta_star, sigma_sq, chi_sq, p_value
+
     def _fit_alternative_numpy(self, pa, a):
         from scipy.linalg import solve, LinAlgError
         from scipy.stats.distributions import chi2
@@ -1,5 +1,6 @@
 import collections
 import itertools
+import numpy as np
 import pandas
 import pyspark
 from typing import Optional, Dict, Callable
@@ -16,7 +17,7 @@ import hail.ir as ir
 from hail.typecheck import typecheck, typecheck_method, dictof, anytype, \
     anyfunc, nullable, sequenceof, oneof, numeric, lazy, enumeration, \
     table_key_type, func_spec
-from hail.utils import deduplicate
+from hail.utils import deduplicate, new_temp_file
 from hail.utils.placement_tree import PlacementTree
 from hail.utils.java import Env, info, warning
 from hail.utils.misc import wrap_to_tuple, storage_level, plural, \
@@ -3232,13 +3233,82 @@ class Table(ExprContainer):
         """
         return Env.spark_backend('to_spark').to_spark(self, flatten)
 
+    def _columnar_chunks(self, partitions_per_query):
+        parts = list(range(self.n_partitions()))
+        for i in range(0, len(parts), partitions_per_query):
+            yield self._filter_partitions(parts[i:i + partitions_per_query])._columnar()
+
+    def _columnar(self):
+        rows = construct_expr(ir.GetField(ir.TableCollect(self._tir), 'rows'), hl.tarray(self.row.dtype))
+        columns = hl.rbind(rows, lambda rows: hl.struct(**{f: rows.map(lambda r: r[f]) for f in self.row}))
+        return Env.backend().execute_columns(columns._ir)
+
+    @typecheck_method(flatten=bool)
+    def to_numpy(self, flatten=True) -> Dict[str, np.ma.MaskedArray]:
+        """Converts this table to a dictionary of NumPy masked arrays, one per field.
+
+        Examples
+        --------
+
+        >>> columns = table1.to_numpy()
+        >>> columns['HT'].mean()  # doctest: +SKIP_OUTPUT_CHECK
+
+        Notes
+        -----
+        Types are expanded with :meth:`expand_types` before flattening or
+        conversion. Fields of type :py:data:`.tint32`, :py:data:`.tint64`,
+        :py:data:`.tfloat32`, :py:data:`.tfloat64` and :py:data:`.tbool` become
+        arrays of the corresponding NumPy type; all other fields become object
+        arrays of the values :meth:`collect` would return. The mask of each
+        array marks missing values.
+
+        Tables with more than a few partitions are checkpointed to a temporary
+        file once and then read back a few partitions at a time into arrays
+        allocated up front, so the driver never holds more than a few
+        partitions of row data in addition to the result.
+
+        Parameters
+        ----------
+        flatten : :obj:`bool`
+            If ``True``, :meth:`flatten` before converting.
+
+        Returns
+        -------
+        :obj:`dict` of :obj:`str` to :class:`numpy.ma.MaskedArray`
+        """
+        return self._to_numpy(flatten)
+
+    def _to_numpy(self, flatten, partitions_per_query=8):
+        t = self.expand_types()
+        if flatten:
+            t = t.flatten()
+        if t.n_partitions() <= partitions_per_query or len(t.row) == 0:
+            return t._columnar()
+
+        t = t.checkpoint(new_temp_file('to_numpy', 'ht'))
+        n = t.count()
+        columns = None
+        start = 0
+        for chunk in t._columnar_chunks(partitions_per_query):
+            if columns is None:
+                columns = {f: np.ma.masked_array(np.empty(n, dtype=a.dtype), mask=np.zeros(n, dtype=bool))
+                           for f, a in chunk.items()}
+            end = start + len(next(iter(chunk.values())))
+            for f, a in chunk.items():
+                columns[f][start:end] = a
+            start = end
+        assert start == n, (start, n)
+        return columns
+
     @typecheck_method(flatten=bool)
     def to_pandas(self, flatten=True):
         """Converts this table to a Pandas DataFrame.
 
-        Because conversion to Pandas is done through Spark, and Spark
-        cannot represent complex types, types are expanded before
-        flattening or conversion.
+        Types are expanded with :meth:`expand_types` before flattening or
+        conversion, and the table is converted column by column with
+        :meth:`to_numpy`. Integer and boolean fields with missing values use
+        Pandas' nullable ``Int32``, ``Int64`` and ``boolean`` types; missing
+        floating point values become ``NaN``.
 
         Parameters
         ----------
@@ -3250,7 +3320,9 @@ class Table(ExprContainer):
         :class:`.pandas.DataFrame`
 
         """
-        return Env.spark_backend('to_pandas').to_pandas(self, flatten)
+        columns = self.to_numpy(flatten)
+        return pandas.DataFrame({f: _masked_array_to_pandas(a) for f, a in columns.items()},
+                                columns=list(columns))
 
     @staticmethod
     @typecheck(df=pandas.DataFrame,
@@ -3527,3 +3599,17 @@ class Table(ExprContainer):
 
 
 table_type.set(Table)
+
+
+def _masked_array_to_pandas(a):
+    mask = np.ma.getmaskarray(a)
+    if not mask.any():
+        return a.data
+    kind = a.dtype.kind
+    if kind == 'f':
+        return a.filled(np.nan)
+    if kind == 'i':
+        return pandas.arrays.IntegerArray(a.data, mask)
+    if kind == 'b':
+        return pandas.arrays.BooleanArray(a.data, mask)
+    return a.data
@@ -1,20 +1,29 @@
-from typing import Any, AsyncContextManager, Optional, List, Type, BinaryIO, cast, Set, AsyncIterator, Union, Dict
+from typing import Any, AsyncContextManager, Optional, List, Type, BinaryIO, cast, Set, AsyncIterator, Union, Dict, Tuple
 from types import TracebackType
 import abc
+import base64
+import hashlib
 import os
 import os.path
 import io
 import stat
 import shutil
+import time
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
 import functools
+import logging
+import google_crc32c
 import humanize
 from hailtop.utils import (
     retry_transient_errors, blocking_to_async, url_basename, url_join, bounded_gather2,
-    time_msecs, humanize_timedelta_msecs, OnlineBoundedGather2)
-from .stream import ReadableStream, WritableStream, blocking_readable_stream_to_async, blocking_writable_stream_to_async
+    time_msecs, humanize_timedelta_msecs, OnlineBoundedGather2, sleep_and_backoff)
+from .stream import (
+    ReadableStream, WritableStream, LimitedReadableStream, blocking_readable_stream_to_async,
+    blocking_writable_stream_to_async)
+
+log = logging.getLogger('aiotools.fs')
 
 
 class FileStatus(abc.ABC):
@@ -27,6 +36,43 @@ class FileStatus(abc.ABC):
         pass
 
 
+async def stored_checksums(status: FileStatus) -> Dict[str, bytes]:
+    '''The digests of the checksums recorded in `status`, by algorithm.
+
+    Google Storage records the CRC32C and, except for composite
+    objects, the MD5 of each object.  The ETag of an S3 object
+    uploaded in a single part is its MD5.
+    '''
+    checksums = {}
+    for algorithm, key in (('crc32c', 'crc32c'), ('crc32c', 'ChecksumCRC32C'), ('md5', 'md5Hash')):
+        try:
+            checksums[algorithm] = base64.b64decode(await status[key])
+        except KeyError:
+            pass
+    try:
+        etag = (await status['ETag']).strip('"')
+        if '-' not in etag:
+            checksums['md5'] = bytes.fromhex(etag)
+    except KeyError:
+        pass
+    return checksums
+
+
+async def content_encoding(status: FileStatus) -> Optional[str]:
+    '''The content encoding recorded in `status`, if any.
+
+    Google Storage serves objects stored with a gzip content encoding
+    decompressed, so the bytes read differ from the stored size and
+    checksums.
+    '''
+    for key in ('contentEncoding', 'ContentEncoding'):
+        try:
+            return await status[key]
+        except KeyError:
+            pass
+    return None
+
+
 class FileListEntry(abc.ABC):
     @abc.abstractmethod
     def name(self) -> str:
@@ -83,8 +129,12 @@ class AsyncFS(abc.ABC):
         pass
 
     @abc.abstractmethod
-    async def open_from(self, url: str, start: int) -> ReadableStream:
-        pass
+    async def open_from(self, url: str, start: int, *, length: Optional[int] = None) -> ReadableStream:
+        '''Open `url` for reading from byte `start`.
+
+        If `length` is given, it must be positive, and at most `length`
+        bytes are read: object stores are asked for just that range.
+        '''
 
     @abc.abstractmethod
     async def create(self, url: str, *, retry_writes: bool = True) -> AsyncContextManager[WritableStream]:
@@ -190,8 +240,10 @@ class AsyncFS(abc.ABC):
 
     async def read_range(self, url: str, start: int, end: int) -> bytes:
         n = (end - start) + 1
-        async with await self.open_from(url, start) as f:
-            return await f.read(n)
+        if n <= 0:
+            return b''
+        async with await self.open_from(url, start, length=n) as f:
+            return await f.read()
 
     async def write(self, url: str, data: bytes) -> None:
         async def _write() -> None:
@@ -284,6 +336,67 @@ class LocalMultiPartCreate(MultiPartCreate):
                 pass
 
 
+class LocalPreallocatedCreate:
+    '''A local file of a known size, written by concurrent positioned
+    writes.'''
+
+    def __init__(self, fs: 'LocalAsyncFS', path: str, size: int):
+        self._fs = fs
+        self._path = path
+        self._size = size
+        self._fd: Optional[int] = None
+
+    def _open(self) -> int:
+        fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(fd, self._size)
+            if self._size > 0 and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(fd, 0, self._size)
+                except OSError:
+                    # not all file systems support preallocation
+                    pass
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _pwrite(self, b: bytes, offset: int) -> None:
+        assert self._fd is not None
+        view = memoryview(b)
+        while view:
+            n = os.pwrite(self._fd, view, offset)
+            view = view[n:]
+            offset += n
+
+    async def pwrite(self, b: bytes, offset: int) -> None:
+        assert self._fd is not None
+        assert offset + len(b) <= self._size
+        await blocking_to_async(self._fs._thread_pool, self._pwrite, b, offset)
+
+    async def __aenter__(self) -> 'LocalPreallocatedCreate':
+        self._fd = await blocking_to_async(self._fs._thread_pool, self._open)
+        return self
+
+    async def __aexit__(self,
+                        exc_type: Optional[Type[BaseException]],
+                        exc_val: Optional[BaseException],
+                        exc_tb: Optional[TracebackType]) -> None:
+        fd = self._fd
+        assert fd is not None
+        self._fd = None
+        try:
+            if not exc_val:
+                await blocking_to_async(self._fs._thread_pool, os.fsync, fd)
+        finally:
+            await blocking_to_async(self._fs._thread_pool, os.close, fd)
+            if exc_val:
+                try:
+                    await self._fs.remove(self._path)
+                except FileNotFoundError:
+                    pass
+
+
 class LocalAsyncFS(AsyncFS):
     def __init__(self, thread_pool: ThreadPoolExecutor, max_workers=None):
         if not thread_pool:
@@ -312,10 +425,13 @@ class LocalAsyncFS(AsyncFS):
         f = await blocking_to_async(self._thread_pool, open, self._get_path(url), 'rb')
         return blocking_readable_stream_to_async(self._thread_pool, cast(BinaryIO, f))
 
-    async def open_from(self, url: str, start: int) -> ReadableStream:
+    async def open_from(self, url: str, start: int, *, length: Optional[int] = None) -> ReadableStream:
         f = await blocking_to_async(self._thread_pool, open, self._get_path(url), 'rb')
         f.seek(start, io.SEEK_SET)
-        return blocking_readable_stream_to_async(self._thread_pool, cast(BinaryIO, f))
+        stream = blocking_readable_stream_to_async(self._thread_pool, cast(BinaryIO, f))
+        if length is not None:
+            return LimitedReadableStream(stream, length)
+        return stream
 
     async def create(self, url: str, *, retry_writes: bool = True) -> WritableStream:  # pylint: disable=unused-argument
         f = await blocking_to_async(self._thread_pool, open, self._get_path(url), 'wb')
@@ -332,6 +448,12 @@ class LocalAsyncFS(AsyncFS):
             pass
         return LocalMultiPartCreate(self, self._get_path(url), num_parts)
 
+    async def preallocated_create(self, url: str, size: int) -> LocalPreallocatedCreate:
+        path = self._get_path(url)
+        if not await blocking_to_async(self._thread_pool, os.path.isdir, os.path.dirname(path) or '.'):
+            raise FileNotFoundError(os.path.dirname(path))
+        return LocalPreallocatedCreate(self, path, size)
+
     async def statfile(self, url: str) -> LocalStatFileStatus:
         path = self._get_path(url)
         stat_result = await blocking_to_async(self._thread_pool, os.stat, path)
@@ -435,6 +557,8 @@ class SourceReport:
         self._source_type: Optional[str] = None
         self._files = 0
         self._bytes = 0
+        self._skipped_files = 0
+        self._skipped_bytes = 0
         self._errors = 0
         self._complete = 0
         self._first_file_error: Optional[Dict[str, Any]] = None
@@ -497,7 +621,7 @@ class CopyReport:
             else:
                 source_reports.extend(transfer_report._source_report)
 
-        if isinstance(self._transfer_report, Transfer):
+        if isinstance(self._transfer_report, TransferReport):
             total_transfers = 1
             add_source_reports(self._transfer_report)
         else:
@@ -508,24 +632,148 @@ class CopyReport:
         total_sources = len(source_reports)
         total_files = sum([sr._files for sr in source_reports])
         total_bytes = sum([sr._bytes for sr in source_reports])
+        total_skipped_files = sum([sr._skipped_files for sr in source_reports])
+        total_skipped_bytes = sum([sr._skipped_bytes for sr in source_reports])
 
         print('Transfer summary:')
         print(f'  Transfers: {total_transfers}')
         print(f'  Sources: {total_sources}')
         print(f'  Files: {total_files}')
         print(f'  Bytes: {humanize.naturalsize(total_bytes)}')
+        if total_skipped_files:
+            print(f'  Unchanged files skipped: {total_skipped_files}')
+            print(f'  Unchanged bytes skipped: {humanize.naturalsize(total_skipped_bytes)}')
         print(f'  Time: {humanize_timedelta_msecs(self._duration)}')
         print(f'  Average transfer rate: {humanize.naturalsize(total_bytes / (self._duration / 1000))}/s')
 
         print('Sources:')
         for sr in source_reports:
-            print(f'  {sr._source}: {sr._files} files, {humanize.naturalsize(sr._bytes)}')
+            skipped = f', {sr._skipped_files} unchanged files skipped' if sr._skipped_files else ''
+            print(f'  {sr._source}: {sr._files} files, {humanize.naturalsize(sr._bytes)}{skipped}')
 
 
 class UnexpectedEOFError(Exception):
     pass
 
 
+class ChecksumMismatchError(Exception):
+    pass
+
+
+# the reversed Castagnoli polynomial
+CRC32C_POLYNOMIAL = 0x82F63B78
+
+
+def _gf2_matrix_times(mat: List[int], vec: int) -> int:
+    s = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            s ^= mat[i]
+        vec >>= 1
+        i += 1
+    return s
+
+
+def _gf2_matrix_square(mat: List[int]) -> List[int]:
+    return [_gf2_matrix_times(mat, row) for row in mat]
+
+
+def crc32c_combine(crc1: int, crc2: int, len2: int) -> int:
+    '''The CRC32C of the concatenation of two byte strings, given the
+    CRC32C `crc1` of the first, and the CRC32C `crc2` and length `len2`
+    of the second.
+
+    This is zlib's crc32_combine for the Castagnoli polynomial: `crc1`
+    is advanced over `len2` zero bytes by repeatedly squaring the
+    operator that advances a CRC by one zero bit.  It takes time
+    logarithmic in `len2`.
+    '''
+    if len2 <= 0:
+        return crc1
+
+    # the operator for one zero bit
+    odd = [CRC32C_POLYNOMIAL] + [1 << n for n in range(31)]
+    # two zero bits
+    even = _gf2_matrix_square(odd)
+    # four zero bits
+    odd = _gf2_matrix_square(even)
+
+    # apply len2 zero bytes to crc1, the first square giving the
+    # operator for one zero byte
+    while True:
+        even = _gf2_matrix_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+
+        odd = _gf2_matrix_square(even)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+
+    return crc1 ^ crc2
+
+
+def _combine_crc32cs(crcs: List[Tuple[int, int]]) -> int:
+    '''The CRC32C of consecutive pieces, given as (CRC32C, length) in order.'''
+    crc = 0
+    for piece_crc, length in crcs:
+        crc = crc32c_combine(crc, piece_crc, length)
+    return crc
+
+
+class RangeScheduler:
+    '''Hands out the byte ranges of a download of `size` bytes to
+    concurrent streams.
+
+    The first ranges are small enough that every stream has several.
+    After each range, the range size is set so a range takes about
+    `target_secs` at the per-stream throughput observed so far.  Near
+    the end, ranges shrink so the streams finish together.
+    '''
+
+    def __init__(self, size: int, max_streams: int, min_range_size: int, max_range_size: int, target_secs: float):
+        self.size = size
+        self.min_range_size = min_range_size
+        self.max_range_size = max_range_size
+        self.target_secs = target_secs
+
+        self.n_streams = max(1, min(max_streams, size // min_range_size))
+        self.range_size = self._clamp(size // (4 * self.n_streams))
+        self.offset = 0
+        # bytes per second of a single stream
+        self.throughput: Optional[float] = None
+
+    def _clamp(self, n: int) -> int:
+        return max(self.min_range_size, min(self.max_range_size, n))
+
+    def next_range(self) -> Optional[Tuple[int, int]]:
+        '''The start and length of the next range, or `None` if the
+        whole download has been handed out.'''
+        remaining = self.size - self.offset
+        if remaining <= 0:
+            return None
+        length = min(self.range_size, max(self.min_range_size, remaining // self.n_streams), remaining)
+        start = self.offset
+        self.offset += length
+        return start, length
+
+    def observe(self, n_bytes: int, secs: float) -> None:
+        if secs <= 0:
+            return
+        throughput = n_bytes / secs
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput = (self.throughput + throughput) / 2
+        self.range_size = self._clamp(int(self.throughput * self.target_secs))
+
+
 class SourceCopier:
     '''This class implements copy from a single source.  In general, a
     transfer will have multiple sources, and a SourceCopier will be
@@ -534,12 +782,22 @@ class SourceCopier:
 
     PART_SIZE = 128 * 1024 * 1024
 
-    def __init__(self, router_fs: 'RouterAsyncFS', src: str, dest: str, treat_dest_as: str, dest_type_task):
+    # large files are downloaded to local files with concurrent ranged reads
+    MIN_RANGE_SIZE = 8 * 1024 * 1024
+    MAX_RANGED_STREAMS = 8
+    TARGET_RANGE_SECS = 2.0
+
+    # copies that fail verification are retried, but not forever: the
+    # source may be changing underneath us
+    MAX_INTEGRITY_ATTEMPTS = 5
+
+    def __init__(self, router_fs: 'RouterAsyncFS', src: str, dest: str, treat_dest_as: str, dest_type_task, sync: bool = False):
         self.router_fs = router_fs
         self.src = src
         self.dest = dest
         self.treat_dest_as = treat_dest_as
         self.dest_type_task = dest_type_task
+        self.sync = sync
 
         self.src_is_file: Optional[bool] = None
         self.src_is_dir: Optional[bool] = None
@@ -552,7 +810,22 @@ class SourceCopier:
         if self.pending == 0:
             self.barrier.set()
 
-    async def _copy_file(self, srcfile: str, destfile: str) -> None:
+    async def _retry_integrity_errors(self, f, *args):
+        delay = 0.1
+        attempts = 0
+        while True:
+            try:
+                return await f(*args)
+            except (UnexpectedEOFError, ChecksumMismatchError) as e:
+                attempts += 1
+                if attempts >= self.MAX_INTEGRITY_ATTEMPTS:
+                    raise
+                log.warning(f'retrying copy from {self.src} after integrity error: {e!r}')
+            delay = await sleep_and_backoff(delay)
+
+    async def _copy_file(self, srcfile: str, destfile: str) -> Tuple[int, int]:
+        '''Copy `srcfile` to `destfile`, returning the number of bytes
+        copied and their CRC32C.'''
         assert not destfile.endswith('/')
 
         async with await self.router_fs.open(srcfile) as srcf:
@@ -562,32 +835,147 @@ class SourceCopier:
                 await self.router_fs.makedirs(os.path.dirname(destfile), exist_ok=True)
                 dest_cm = await self.router_fs.create(destfile)
 
+            n_bytes = 0
+            crc32c = google_crc32c.Checksum()
             async with dest_cm as destf:
                 while True:
                     b = await srcf.read(Copier.BUFFER_SIZE)
                     if not b:
-                        return
+                        break
+                    crc32c.update(b)
                     written = await destf.write(b)
                     assert written == len(b)
+                    n_bytes += len(b)
+            return n_bytes, int.from_bytes(crc32c.digest(), 'big')
+
+    async def _checksums(self, url: str, status: FileStatus) -> Dict[str, bytes]:
+        checksums = await stored_checksums(status)
+        if not checksums and isinstance(self.router_fs._get_fs(url), LocalAsyncFS):
+            crc32c = google_crc32c.Checksum()
+            md5 = hashlib.md5()
+            async with await self.router_fs.open(url) as f:
+                while True:
+                    b = await f.read(Copier.BUFFER_SIZE)
+                    if not b:
+                        break
+                    crc32c.update(b)
+                    md5.update(b)
+            checksums = {'crc32c': crc32c.digest(), 'md5': md5.digest()}
+        return checksums
 
-    async def _copy_part(self, source_report, srcfile, part_number, part_creator, return_exceptions):
+    async def _is_unchanged(self, srcfile: str, srcstat: FileStatus, destfile: str, deststat: FileStatus) -> bool:
+        '''Whether `destfile` has the same size and checksum as `srcfile`.
+
+        Files without a checksum in common are assumed to differ.
+        '''
+        if await srcstat.size() != await deststat.size():
+            return False
+        src_checksums = await self._checksums(srcfile, srcstat)
+        dest_checksums = await self._checksums(destfile, deststat)
+        algorithms = src_checksums.keys() & dest_checksums.keys()
+        return bool(algorithms) and all(src_checksums[a] == dest_checksums[a] for a in algorithms)
+
+    async def _copy_part_main(self, srcfile: str, size: int, part_number: int, part_creator: 'MultiPartCreate') -> int:
+        start = part_number * self.PART_SIZE
+        n = min(self.PART_SIZE, size - start)
+        crc32c = google_crc32c.Checksum()
+        async with await self.router_fs.open_from(srcfile, start, length=n) as srcf:
+            async with await part_creator.create_part(part_number, start) as destf:
+                while n > 0:
+                    b = await srcf.read(min(Copier.BUFFER_SIZE, n))
+                    if not b:
+                        raise UnexpectedEOFError(srcfile)
+                    crc32c.update(b)
+                    written = await destf.write(b)
+                    assert written == len(b)
+                    n -= len(b)
+        return int.from_bytes(crc32c.digest(), 'big')
+
+    async def _copy_part(self, source_report, srcfile, size, part_number, part_creator, return_exceptions) -> Optional[int]:
         try:
-            async with await self.router_fs.open_from(srcfile, part_number * self.PART_SIZE) as srcf:
-                async with await part_creator.create_part(part_number, part_number * self.PART_SIZE) as destf:
-                    n = self.PART_SIZE
-                    while n > 0:
-                        b = await srcf.read(min(Copier.BUFFER_SIZE, n))
-                        # FIXME check expected bytes
-                        if not b:
-                            return
-                        written = await destf.write(b)
-                        assert written == len(b)
-                        n -= len(b)
+            return await self._retry_integrity_errors(
+                retry_transient_errors, self._copy_part_main, srcfile, size, part_number, part_creator)
         except Exception as e:
             if return_exceptions:
                 source_report.set_exception(e)
-            else:
-                raise
+                return None
+            raise
+
+    def _is_ranged_download(self, srcfile: str, destfile: str, size: int) -> bool:
+        return (size >= 2 * self.MIN_RANGE_SIZE
+                and isinstance(self.router_fs._get_fs(destfile), LocalAsyncFS)
+                and not isinstance(self.router_fs._get_fs(srcfile), LocalAsyncFS))
+
+    async def _copy_range(self, srcfile: str, start: int, length: int, destf: LocalPreallocatedCreate) -> int:
+        offset = start
+        end = start + length
+        crc32c = google_crc32c.Checksum()
+        async with await self.router_fs.open_from(srcfile, start, length=length) as srcf:
+            while offset < end:
+                b = await srcf.read(min(Copier.BUFFER_SIZE, end - offset))
+                if not b:
+                    raise UnexpectedEOFError(srcfile)
+                crc32c.update(b)
+                await destf.pwrite(b, offset)
+                offset += len(b)
+        return int.from_bytes(crc32c.digest(), 'big')
+
+    async def _copy_file_ranged(self, sema: asyncio.Semaphore, srcfile: str, size: int, destfile: str) -> int:
+        '''Download `srcfile` to the local file `destfile`, returning the
+        CRC32C of the bytes copied.'''
+        dest_fs = self.router_fs._get_fs(destfile)
+        assert isinstance(dest_fs, LocalAsyncFS)
+        try:
+            dest_cm = await dest_fs.preallocated_create(destfile, size)
+        except FileNotFoundError:
+            await self.router_fs.makedirs(os.path.dirname(destfile), exist_ok=True)
+            dest_cm = await dest_fs.preallocated_create(destfile, size)
+
+        scheduler = RangeScheduler(
+            size, self.MAX_RANGED_STREAMS, self.MIN_RANGE_SIZE, self.PART_SIZE, self.TARGET_RANGE_SECS)
+
+        # start => (CRC32C, length) of the ranges copied
+        range_crc32cs: Dict[int, Tuple[int, int]] = {}
+
+        async with dest_cm as destf:
+            async def copy_ranges():
+                while True:
+                    next_range = scheduler.next_range()
+                    if next_range is None:
+                        return
+                    start, length = next_range
+                    start_time = time.monotonic()
+                    crc32c = await self._retry_integrity_errors(retry_transient_errors, self._copy_range, srcfile, start, length, destf)
+                    range_crc32cs[start] = (crc32c, length)
+                    scheduler.observe(length, time.monotonic() - start_time)
+
+            await bounded_gather2(sema, *[copy_ranges for _ in range(scheduler.n_streams)], cancel_on_error=True)
+
+        return _combine_crc32cs([range_crc32cs[start] for start in sorted(range_crc32cs)])
+
+    async def _verify(self, srcfile: str, srcstat: FileStatus, destfile: str, n_bytes: int, crc32c: int) -> None:
+        '''Check the bytes copied from `srcfile` to `destfile`, `n_bytes`
+        bytes with CRC32C `crc32c`, against the size and checksum the
+        source and destination file systems report.'''
+        # the size and checksums of an encoded source are those of the
+        # stored bytes, not of the decoded bytes read
+        if await content_encoding(srcstat) is None:
+            size = await srcstat.size()
+            if n_bytes != size:
+                raise ChecksumMismatchError(f'{srcfile}: copied {n_bytes} bytes, expected {size}')
+
+            src_crc32c = (await stored_checksums(srcstat)).get('crc32c')
+            if src_crc32c is not None and int.from_bytes(src_crc32c, 'big') != crc32c:
+                raise ChecksumMismatchError(f'{srcfile}: CRC32C of bytes read does not match the stored CRC32C')
+
+        deststat = await retry_transient_errors(self.router_fs.statfile, destfile)
+        dest_size = await deststat.size()
+        if dest_size != n_bytes:
+            raise ChecksumMismatchError(f'{destfile}: has {dest_size} bytes, expected {n_bytes}')
+
+        dest_crc32c = (await stored_checksums(deststat)).get('crc32c')
+        if dest_crc32c is not None and int.from_bytes(dest_crc32c, 'big') != crc32c:
+            raise ChecksumMismatchError(f'{destfile}: stored CRC32C does not match the CRC32C of bytes written')
 
     async def _copy_file_multi_part_main(
             self,
@@ -598,8 +986,20 @@ class SourceCopier:
             destfile: str,
             return_exceptions: bool):
         size = await srcstat.size()
+        if await content_encoding(srcstat) is not None:
+            # the decoded size is unknown, so the source is read as one stream
+            n_bytes, crc32c = await retry_transient_errors(self._copy_file, srcfile, destfile)
+            await self._verify(srcfile, srcstat, destfile, n_bytes, crc32c)
+            return
+
+        if self._is_ranged_download(srcfile, destfile, size):
+            crc32c = await self._copy_file_ranged(sema, srcfile, size, destfile)
+            await self._verify(srcfile, srcstat, destfile, size, crc32c)
+            return
+
         if size <= self.PART_SIZE:
-            await retry_transient_errors(self._copy_file, srcfile, destfile)
+            n_bytes, crc32c = await retry_transient_errors(self._copy_file, srcfile, destfile)
+            await self._verify(srcfile, srcstat, destfile, n_bytes, crc32c)
             return
 
         n_parts = int((size + self.PART_SIZE - 1) / self.PART_SIZE)
@@ -611,11 +1011,21 @@ class SourceCopier:
             part_creator = await self.router_fs.multi_part_create(sema, destfile, n_parts)
 
         async with part_creator:
-            await bounded_gather2(sema, *[
-                functools.partial(retry_transient_errors, self._copy_part, source_report, srcfile, i, part_creator, return_exceptions)
+            part_crc32cs = await bounded_gather2(sema, *[
+                functools.partial(self._copy_part, source_report, srcfile, size, i, part_creator, return_exceptions)
                 for i in range(n_parts)
             ], cancel_on_error=True)
 
+        if any(crc32c is None for crc32c in part_crc32cs):
+            # the failed part has been reported
+            return
+
+        # the parts have been composed into destfile
+        crc32c = _combine_crc32cs([
+            (part_crc32c, min(self.PART_SIZE, size - i * self.PART_SIZE))
+            for i, part_crc32c in enumerate(part_crc32cs)])
+        await self._verify(srcfile, srcstat, destfile, size, crc32c)
+
     async def _copy_file_multi_part(
             self,
             sema: asyncio.Semaphore,
@@ -623,12 +1033,19 @@ class SourceCopier:
             srcfile: str,
             srcstat: FileStatus,
             destfile: str,
-            return_exceptions: bool):
+            return_exceptions: bool,
+            deststat: Optional[FileStatus] = None):
+        if deststat is not None and await self._is_unchanged(srcfile, srcstat, destfile, deststat):
+            source_report._skipped_files += 1
+            source_report._skipped_bytes += await srcstat.size()
+            return
+
         source_report._files += 1
         source_report._bytes += await srcstat.size()
         success = False
         try:
-            await self._copy_file_multi_part_main(sema, source_report, srcfile, srcstat, destfile, return_exceptions)
+            await self._retry_integrity_errors(
+                self._copy_file_multi_part_main, sema, source_report, srcfile, srcstat, destfile, return_exceptions)
             source_report._complete += 1
             success = True
         except Exception as e:
@@ -687,7 +1104,32 @@ class SourceCopier:
         if full_dest_type == AsyncFS.DIR:
             raise IsADirectoryError(full_dest)
 
-        await self._copy_file_multi_part(sema, source_report, src, srcstat, full_dest, return_exceptions)
+        deststat = None
+        if self.sync:
+            try:
+                deststat = await self.router_fs.statfile(full_dest)
+            except FileNotFoundError:
+                pass
+
+        await self._copy_file_multi_part(sema, source_report, src, srcstat, full_dest, return_exceptions, deststat)
+
+    async def _dest_statuses(self, full_dest: str) -> Dict[str, FileStatus]:
+        '''The status of each file under `full_dest`, by path relative to
+        `full_dest`.'''
+        dest = full_dest if full_dest.endswith('/') else full_dest + '/'
+        try:
+            destentries = await self.router_fs.listfiles(dest, recursive=True)
+        except (NotADirectoryError, FileNotFoundError):
+            return {}
+
+        statuses = {}
+        async for destentry in destentries:
+            destfile = destentry.url_maybe_trailing_slash()
+            assert destfile.startswith(dest)
+            if destfile.endswith('/'):
+                continue
+            statuses[destfile[len(dest):]] = await destentry.status()
+        return statuses
 
     async def copy_as_dir(self, sema: asyncio.Semaphore, source_report: SourceReport, return_exceptions: bool):
         try:
@@ -715,6 +1157,11 @@ class SourceCopier:
         if full_dest_type == AsyncFS.FILE:
             raise NotADirectoryError(full_dest)
 
+        # the destination is listed while the source is
+        dest_statuses_task: Optional[asyncio.Task] = None
+        if self.sync:
+            dest_statuses_task = asyncio.create_task(self._dest_statuses(full_dest))
+
         async def copy_source(srcentry):
             srcfile = srcentry.url_maybe_trailing_slash()
             assert srcfile.startswith(src)
@@ -726,11 +1173,20 @@ class SourceCopier:
             relsrcfile = srcfile[len(src):]
             assert not relsrcfile.startswith('/')
 
-            await self._copy_file_multi_part(sema, source_report, srcfile, await srcentry.status(), url_join(full_dest, relsrcfile), return_exceptions)
+            deststat = None
+            if dest_statuses_task is not None:
+                deststat = (await dest_statuses_task).get(relsrcfile)
 
-        await bounded_gather2(sema, *[
-            functools.partial(copy_source, srcentry)
-            async for srcentry in srcentries], cancel_on_error=True)
+            await self._copy_file_multi_part(sema, source_report, srcfile, await srcentry.status(), url_join(full_dest, relsrcfile), return_exceptions, deststat)
+
+        try:
+            await bounded_gather2(sema, *[
+                functools.partial(copy_source, srcentry)
+                async for srcentry in srcentries], cancel_on_error=True)
+        finally:
+            if dest_statuses_task is not None and not dest_statuses_task.done():
+                dest_statuses_task.cancel()
+                await asyncio.wait([dest_statuses_task])
 
     async def copy(self, sema: asyncio.Semaphore, source_report: SourceReport, return_exceptions: bool):
         try:
@@ -765,8 +1221,9 @@ class Copier:
 
     BUFFER_SIZE = 256 * 1024
 
-    def __init__(self, router_fs):
+    def __init__(self, router_fs, sync: bool = False):
         self.router_fs = router_fs
+        self.sync = sync
 
     async def _dest_type(self, transfer: Transfer):
         '''Return the (real or assumed) type of `dest`.
@@ -791,7 +1248,7 @@ class Copier:
         return dest_type
 
     async def copy_source(self, sema: asyncio.Semaphore, transfer: Transfer, source_report: SourceReport, src: str, dest_type_task, return_exceptions: bool):
-        src_copier = SourceCopier(self.router_fs, src, transfer.dest, transfer.treat_dest_as, dest_type_task)
+        src_copier = SourceCopier(self.router_fs, src, transfer.dest, transfer.treat_dest_as, dest_type_task, self.sync)
         await src_copier.copy(sema, source_report, return_exceptions)
 
     async def _copy_one_transfer(self, sema: asyncio.Semaphore, transfer_report: TransferReport, transfer: Transfer, return_exceptions: bool):
@@ -889,9 +1346,9 @@ class RouterAsyncFS(AsyncFS):
         fs = self._get_fs(url)
         return await fs.open(url)
 
-    async def open_from(self, url: str, start: int) -> ReadableStream:
+    async def open_from(self, url: str, start: int, *, length: Optional[int] = None) -> ReadableStream:
         fs = self._get_fs(url)
-        return await fs.open_from(url, start)
+        return await fs.open_from(url, start, length=length)
 
     async def create(self, url: str, retry_writes: bool = True) -> WritableStream:
         fs = self._get_fs(url)
@@ -945,8 +1402,18 @@ class RouterAsyncFS(AsyncFS):
         for fs in self._filesystems:
             await fs.close()
 
-    async def copy(self, sema: asyncio.Semaphore, transfer: Union[Transfer, List[Transfer]], return_exceptions: bool = False) -> CopyReport:
-        copier = Copier(self)
+    async def copy(self,
+                   sema: asyncio.Semaphore,
+                   transfer: Union[Transfer, List[Transfer]],
+                   return_exceptions: bool = False,
+                   *,
+                   sync: bool = False) -> CopyReport:
+        '''Copy the files of `transfer`.
+
+        If `sync` is true, files whose destination already has the same
+        size and checksum are skipped and counted in the report.
+        '''
+        copier = Copier(self, sync)
         copy_report = CopyReport(transfer)
         await copier.copy(sema, copy_report, transfer, return_exceptions)
         copy_report.mark_done()
@@ -252,12 +252,13 @@ class S3AsyncFS(AsyncFS):
                                        Key=name)
         return blocking_readable_stream_to_async(self._thread_pool, cast(BinaryIO, resp['Body']))
 
-    async def open_from(self, url: str, start: int) -> ReadableStream:
+    async def open_from(self, url: str, start: int, *, length: Optional[int] = None) -> ReadableStream:
         bucket, name = self._get_bucket_name(url)
+        end = '' if length is None else str(start + length - 1)
         resp = await blocking_to_async(self._thread_pool, self._s3.get_object,
                                        Bucket=bucket,
                                        Key=name,
-                                       Range=f'bytes={start}-')
+                                       Range=f'bytes={start}-{end}')
         return blocking_readable_stream_to_async(self._thread_pool, cast(BinaryIO, resp['Body']))
 
     async def create(self, url: str, *, retry_writes: bool = True) -> S3CreateManager:  # pylint: disable=unused-argument
@@ -126,6 +126,27 @@ class _WritableStreamFromBlocking(WritableStream):
         del self._f
 
 
+class LimitedReadableStream(ReadableStream):
+    '''The first `n` bytes of `stream`.'''
+
+    def __init__(self, stream: ReadableStream, n: int):
+        super().__init__()
+        self._stream = stream
+        self._n = n
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == -1 or n > self._n:
+            n = self._n
+        if n == 0:
+            return b''
+        b = await self._stream.read(n)
+        self._n -= len(b)
+        return b
+
+    async def _wait_closed(self) -> None:
+        await self._stream.wait_closed()
+
+
 def blocking_readable_stream_to_async(thread_pool: ThreadPoolExecutor, f: BinaryIO) -> _ReadableStreamFromBlocking:
     return _ReadableStreamFromBlocking(thread_pool, f)
 
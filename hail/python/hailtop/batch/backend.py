@@ -1,5 +1,7 @@
-from typing import Optional, Dict, Any, TypeVar, Generic
+from typing import Optional, Dict, Any, TypeVar, Generic, List, Set, Tuple, Union
 import sys
+import asyncio
+import collections
 import abc
 import os
 import subprocess as sp
@@ -15,13 +17,14 @@ from concurrent.futures import ThreadPoolExecutor
 from hailtop.config import get_deploy_config, get_user_config
 from hailtop.utils import is_google_registry_domain, parse_docker_image_reference, async_to_blocking, bounded_gather, tqdm
 from hailtop.batch.hail_genetics_images import HAIL_GENETICS_IMAGES
-from hailtop.batch_client.parse import parse_cpu_in_mcpu
+from hailtop.batch_client.parse import parse_cpu_in_mcpu, parse_memory_in_bytes
 import hailtop.batch_client.client as bc
 from hailtop.batch_client.client import BatchClient
-from hailtop.aiotools import RouterAsyncFS, LocalAsyncFS, AsyncFS
+from hailtop.aiotools import RouterAsyncFS, LocalAsyncFS, AsyncFS, Transfer
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 
 from . import resource, batch, job as _job  # pylint: disable=unused-import
+from .call_cache import CallCache
 from .exceptions import BatchException
 
 
@@ -33,6 +36,25 @@ enables the user to monitor the asynchronous execution of a Batch.
 
 SelfType = TypeVar('SelfType')
 
+# concurrent copies of reused outputs to their destinations
+COPY_PARALLELISM = 50
+
+# memory per core of the named memory requests
+MEMORY_RATIOS = {'lowmem': 1024**3, 'standard': 4 * 1024**3, 'highmem': 7 * 1024**3}
+
+
+def _host_memory_in_bytes() -> Optional[int]:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _job_order(job: '_job.Job') -> int:
+    # jobs are numbered when they are added to their batch
+    assert job._job_id is not None
+    return job._job_id
+
 
 class Backend(abc.ABC, Generic[RunningBatchType]):
     """
@@ -92,14 +114,38 @@ class LocalBackend(Backend[None]):
         Additional flags to pass to `docker run`. Only used if a job specifies
         a docker image. This option will override the value set by the environment
         variable `HAIL_BATCH_EXTRA_DOCKER_RUN_FLAGS`.
+    max_cpus:
+        The number of cores the jobs of a batch may use at once. Jobs whose
+        dependencies have succeeded run in parallel as long as the cores they
+        request, as set by :meth:`.Job.cpu`, fit. A job that does not request
+        cores uses one. Defaults to the number of cores of this computer.
+    max_memory:
+        The memory the jobs of a batch may use at once, as for
+        :meth:`.Job.memory`. Jobs that do not request memory do not count
+        against it. Defaults to the memory of this computer.
     """
 
     def __init__(self,
                  tmp_dir: str = '/tmp/',
                  gsa_key_file: Optional[str] = None,
-                 extra_docker_run_flags: Optional[str] = None):
+                 extra_docker_run_flags: Optional[str] = None,
+                 max_cpus: Optional[Union[int, float]] = None,
+                 max_memory: Optional[Union[str, int]] = None):
         self._tmp_dir = tmp_dir.rstrip('/')
 
+        if max_cpus is None:
+            max_cpus = os.cpu_count() or 1
+        if max_cpus <= 0:
+            raise ValueError(f'max_cpus must be positive, found {max_cpus}')
+        self._max_cpus = float(max_cpus)
+
+        if max_memory is None:
+            self._max_memory = _host_memory_in_bytes()
+        else:
+            self._max_memory = parse_memory_in_bytes(str(max_memory))
+            if self._max_memory is None:
+                raise ValueError(f'invalid value for max_memory: {max_memory}')
+
         flags = ''
 
         if extra_docker_run_flags is not None:
@@ -226,6 +272,18 @@ class LocalBackend(Backend[None]):
                     symlinks.append(f'ln -sf {shq(src)} {shq(dest)}')
             return symlinks
 
+        call_cache = None
+        keys: Dict[_job.Job, Optional[str]] = {}
+        reused = set()
+        if batch._call_cache is not None:
+            if batch._call_cache.startswith('gs://'):
+                raise BatchException('the call cache of the LocalBackend must be a local directory')
+            call_cache = CallCache(self._fs, os.path.abspath(batch._call_cache))
+            keys = async_to_blocking(call_cache.keys(batch._jobs))
+            reused = async_to_blocking(call_cache.lookup(keys))
+            if reused:
+                print(f'Reusing the outputs of {len(reused)} jobs from the call cache.')
+
         try:
             write_inputs = [x for r in batch._input_resources for x in copy_external_output(r)]
             if write_inputs:
@@ -235,19 +293,37 @@ class LocalBackend(Backend[None]):
                 code += ['\n']
                 run_code(code)
 
+            # inputs are localized before any job runs, as jobs sharing an
+            # input may run at the same time
+            localize_inputs = []
+            jobs_code = {}
             for job in batch._jobs:
+                os.makedirs(f'{tmpdir}/{job._job_id}/', exist_ok=True)
+
+                if job in reused:
+                    assert call_cache is not None
+                    key = keys[job]
+                    assert key is not None
+                    code = new_code_block()
+                    code.append(f"# {job._job_id}: {job.name if job.name else ''} (reused from the call cache)")
+                    code += [f'cp {shq(call_cache.output_url(key, r))} {shq(r._get_path(tmpdir))}'
+                             for r in call_cache.outputs(job)]
+                    code += [x for r in job._external_outputs for x in copy_external_output(r)]
+                    code += ['\n']
+                    jobs_code[job] = code
+                    continue
+
                 if isinstance(job, _job.PythonJob):
                     async_to_blocking(job._compile(tmpdir, tmpdir))
 
-                os.makedirs(f'{tmpdir}/{job._job_id}/', exist_ok=True)
+                localize_inputs += [x for r in job._inputs for x in copy_input(job, r)]
+                localize_inputs += [x for r in job._mentioned for x in symlink_input_resource_group(r)
+                                    if x not in localize_inputs]
 
                 code = new_code_block()
 
                 code.append(f"# {job._job_id}: {job.name if job.name else ''}")
 
-                code += [x for r in job._inputs for x in copy_input(job, r)]
-                code += [x for r in job._mentioned for x in symlink_input_resource_group(r)]
-
                 resource_defs = [r._declare(tmpdir) for r in job._mentioned]
                 env = [f'export {k}={v}' for k, v in job._env.items()]
 
@@ -265,12 +341,11 @@ class LocalBackend(Backend[None]):
 
                     memory = job._memory
                     if memory is not None:
-                        memory_ratios = {'lowmem': 1024**3, 'standard': 4 * 1024**3, 'highmem': 7 * 1024**3}
-                        if memory in memory_ratios:
+                        if memory in MEMORY_RATIOS:
                             if job._cpu is not None:
                                 mcpu = parse_cpu_in_mcpu(job._cpu)
                                 if mcpu is not None:
-                                    memory = str(int(memory_ratios[memory] * (mcpu / 1000)))
+                                    memory = str(int(MEMORY_RATIOS[memory] * (mcpu / 1000)))
                                 else:
                                     raise BatchException(f'invalid value for cpu: {job._cpu}')
                             else:
@@ -292,15 +367,145 @@ class LocalBackend(Backend[None]):
                     code.append(f"{job_shell} -c {quoted_job_script}")
 
                 code += [x for r in job._external_outputs for x in copy_external_output(r)]
+
+                key = keys.get(job)
+                if key is not None:
+                    assert call_cache is not None
+                    manifest = f'{tmpdir}/{job._job_id}.manifest'
+                    code.append(f'mkdir -p {shq(call_cache.outputs_url(key))}')
+                    code += [f'cp {shq(r._get_path(tmpdir))} {shq(call_cache.output_url(key, r))}'
+                             for r in call_cache.outputs(job)]
+                    code.append(CallCache.write_manifest(job, tmpdir, manifest))
+                    code.append(f'cp {shq(manifest)} {shq(call_cache.manifest_url(key))}')
                 code += ['\n']
 
+                jobs_code[job] = code
+
+            if localize_inputs:
+                code = new_code_block()
+                code += ["# Localize input resources"]
+                code += localize_inputs
+                code += ['\n']
                 run_code(code)
+
+            if dry_run:
+                for job in batch._jobs:
+                    run_code(jobs_code[job])
+            else:
+                async_to_blocking(self._run_jobs(batch._jobs, jobs_code, tmpdir))
         finally:
             if delete_scratch_on_exit:
                 sp.run(f'rm -rf {tmpdir}', shell=True, check=False)
 
         print('Batch completed successfully!')
 
+    def _job_resources(self, job: '_job.Job') -> Tuple[float, int]:
+        """The cores and bytes of memory reserved for `job` while it runs.
+
+        Requests larger than this backend's limits are capped at the limits,
+        so such a job runs once everything else has finished.
+        """
+        if job._cpu is not None:
+            mcpu = parse_cpu_in_mcpu(job._cpu)
+            if mcpu is None:
+                raise BatchException(f'invalid value for cpu: {job._cpu}')
+            cpus = mcpu / 1000
+        else:
+            cpus = 1.0
+
+        memory = 0
+        if job._memory is not None:
+            if job._memory in MEMORY_RATIOS:
+                memory = int(MEMORY_RATIOS[job._memory] * cpus)
+            else:
+                memory = parse_memory_in_bytes(job._memory) or 0
+
+        cpus = min(cpus, self._max_cpus)
+        if self._max_memory is not None:
+            memory = min(memory, self._max_memory)
+        return (cpus, memory)
+
+    async def _run_jobs(self, jobs: List['_job.Job'], jobs_code: Dict['_job.Job', List[str]], tmpdir: str):
+        """Run `jobs`, each once all of its dependencies have succeeded, as
+        many at once as the cores and memory of this backend allow.
+
+        After a job fails no more jobs are started, and the failure is raised
+        once the running jobs finish.
+        """
+        n_pending_parents = {j: len(j._dependencies) for j in jobs}
+        children: Dict['_job.Job', List['_job.Job']] = collections.defaultdict(list)
+        for j in jobs:
+            for parent in j._dependencies:
+                children[parent].append(j)
+
+        ready = [j for j in jobs if n_pending_parents[j] == 0]
+        running: Dict[asyncio.Future, '_job.Job'] = {}
+        free_cpus = self._max_cpus
+        free_memory = self._max_memory
+        failure: Optional[BaseException] = None
+
+        while ready or running:
+            if failure is None:
+                not_started = []
+                for j in ready:
+                    cpus, memory = self._job_resources(j)
+                    if cpus <= free_cpus and (free_memory is None or memory <= free_memory):
+                        free_cpus -= cpus
+                        if free_memory is not None:
+                            free_memory -= memory
+                        running[asyncio.ensure_future(self._run_job(j, jobs_code[j], tmpdir))] = j
+                    else:
+                        not_started.append(j)
+                ready = not_started
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                j = running.pop(task)
+                cpus, memory = self._job_resources(j)
+                free_cpus += cpus
+                if free_memory is not None:
+                    free_memory += memory
+                try:
+                    task.result()
+                except Exception as e:
+                    if failure is None:
+                        failure = e
+                    continue
+                for child in children[j]:
+                    n_pending_parents[child] -= 1
+                    if n_pending_parents[child] == 0:
+                        ready.append(child)
+            ready.sort(key=_job_order)
+
+        if failure is not None:
+            raise failure
+
+    async def _run_job(self, job: '_job.Job', code: List[str], tmpdir: str):
+        log_dir = f'{tmpdir}/logs/{job._job_id}'
+        os.makedirs(log_dir, exist_ok=True)
+        code_str = '\n'.join(code)
+        with open(f'{log_dir}/stdout', 'wb') as stdout, open(f'{log_dir}/stderr', 'wb') as stderr:
+            proc = await asyncio.create_subprocess_shell(code_str, stdout=stdout, stderr=stderr)
+            returncode = await proc.wait()
+
+        with open(f'{log_dir}/stdout', 'rb') as f:
+            out = f.read()
+        with open(f'{log_dir}/stderr', 'rb') as f:
+            err = f.read()
+        # the output of each job is printed together once it finishes
+        sys.stdout.write(out.decode(errors='replace'))
+        sys.stdout.flush()
+        sys.stderr.write(err.decode(errors='replace'))
+        sys.stderr.flush()
+
+        if returncode != 0:
+            e = sp.CalledProcessError(returncode, code_str, output=out, stderr=err)
+            print(e)
+            raise e
+
     def _get_scratch_dir(self):
         def _get_random_name():
             dir = f'{self._tmp_dir}/batch/{uuid.uuid4().hex[:6]}'
@@ -515,10 +720,16 @@ class ServiceBackend(Backend[bc.Batch]):
         activate_service_account = 'gcloud -q auth activate-service-account ' \
                                    '--key-file=/gsa-key/key.json'
 
+        call_cache = None
+        keys: Dict[_job.Job, Optional[str]] = {}
+        reused: Set[_job.Job] = set()
+
         def copy_input(r):
             if isinstance(r, resource.InputResourceFile):
                 return [(r._input_path, r._get_path(local_tmpdir))]
             assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
+            if r._source in reused:
+                return [(call_cache.output_url(keys[r._source], r), r._get_path(local_tmpdir))]
             return [(r._get_path(batch_remote_tmpdir), r._get_path(local_tmpdir))]
 
         def copy_internal_output(r):
@@ -569,6 +780,16 @@ class ServiceBackend(Backend[bc.Batch]):
                         f"You must specify 'image' for Python jobs if you are using a Python version other than 3.6, 3.7, or 3.8 (you are using {version})")
                 job._image = f'hailgenetics/python-dill:{version.major}.{version.minor}-slim'
 
+        if batch._call_cache is not None:
+            if not batch._call_cache.startswith('gs://'):
+                raise BatchException('the call cache of the ServiceBackend must be a Google Storage URL')
+            call_cache = CallCache(self._fs, batch._call_cache)
+            keys = await call_cache.keys(batch._jobs)
+            reused = await call_cache.lookup(keys)
+            if reused:
+                print(f'Reusing the outputs of {len(reused)} jobs from the call cache.')
+            pyjobs = [j for j in pyjobs if j not in reused]
+
         if len(pyjobs) > 0:
             with tqdm(total=len(pyjobs), desc='upload python functions', disable=disable_progress_bar) as pbar:
                 async def compile_job(job):
@@ -576,7 +797,15 @@ class ServiceBackend(Backend[bc.Batch]):
                     pbar.update(1)
                 await bounded_gather(*[functools.partial(compile_job, j) for j in pyjobs], parallelism=150)
 
+        reused_outputs = []
         for job in tqdm(batch._jobs, desc='create job objects', disable=disable_progress_bar):
+            key = keys.get(job)
+            if job in reused:
+                assert call_cache is not None and key is not None
+                reused_outputs += [(call_cache.output_url(key, r), dest)
+                                   for r in job._external_outputs for dest in r._output_paths]
+                continue
+
             inputs = [x for r in job._inputs for x in copy_input(r)]
 
             outputs = [x for r in job._internal_outputs for x in copy_internal_output(r)]
@@ -584,6 +813,14 @@ class ServiceBackend(Backend[bc.Batch]):
                 used_remote_tmpdir = True
             outputs += [x for r in job._external_outputs for x in copy_external_output(r)]
 
+            write_manifest = ''
+            if key is not None:
+                assert call_cache is not None
+                manifest = f'{local_tmpdir}/{job._job_id}.manifest'
+                write_manifest = CallCache.write_manifest(job, local_tmpdir, manifest)
+                outputs += [(r._get_path(local_tmpdir), call_cache.output_url(key, r)) for r in call_cache.outputs(job)]
+                outputs.append((manifest, call_cache.manifest_url(key)))
+
             symlinks = [x for r in job._mentioned for x in symlink_input_resource_group(r)]
 
             env_vars = {
@@ -598,19 +835,28 @@ class ServiceBackend(Backend[bc.Batch]):
 
             job_command = [cmd.strip() for cmd in job._command]
 
-            prepared_job_command = (f'{{\n{x}\n}}' for x in job_command)
+            prepared_job_command = " && ".join(f'{{\n{x}\n}}' for x in job_command)
+            if write_manifest:
+                # set -e does not stop at a failed command before the last
+                # && of a list, so the manifest, which marks the outputs
+                # complete in the call cache, is written only if the whole
+                # list succeeded
+                if prepared_job_command:
+                    prepared_job_command = f'{{\n{prepared_job_command}\n}} && {write_manifest}'
+                else:
+                    prepared_job_command = write_manifest
             cmd = f'''
 {bash_flags}
 {make_local_tmpdir}
 {"; ".join(symlinks)}
-{" && ".join(prepared_job_command)}
+{prepared_job_command}
 '''
 
             if dry_run:
                 commands.append(cmd)
                 continue
 
-            parents = [job_to_client_job_mapping[j] for j in job._dependencies]
+            parents = [job_to_client_job_mapping[j] for j in job._dependencies if j not in reused]
 
             attributes = copy.deepcopy(job.attributes) if job.attributes else dict()
             if job.name:
@@ -657,6 +903,11 @@ class ServiceBackend(Backend[bc.Batch]):
             print("\n\n".join(commands))
             return None
 
+        if reused_outputs:
+            await self._fs.copy(asyncio.Semaphore(COPY_PARALLELISM),
+                                [Transfer(src, dest, treat_dest_as=Transfer.DEST_IS_TARGET)
+                                 for src, dest in reused_outputs])
+
         if delete_scratch_on_exit and used_remote_tmpdir:
             parents = list(jobs_to_command.keys())
             rm_cmd = f'gsutil -m rm -r {batch_remote_tmpdir}'
@@ -87,6 +87,12 @@ class Batch:
         Automatically cancel the batch after N failures have occurred. The default
         behavior is there is no limit on the number of failures. Only
         applicable for the :class:`.ServiceBackend`. Must be greater than 0.
+    call_cache:
+        Directory (a Google Storage URL for the :class:`.ServiceBackend`) in
+        which to keep the outputs of successful jobs. A job whose image,
+        command, environment, resource requests and inputs match those of a
+        job that previously succeeded with this cache is not run again, and
+        its outputs are copied from the cache. If `None`, every job runs.
 
     """
 
@@ -113,7 +119,8 @@ class Batch:
                  default_shell: Optional[str] = None,
                  default_python_image: Optional[str] = None,
                  project: Optional[str] = None,
-                 cancel_after_n_failures: Optional[int] = None):
+                 cancel_after_n_failures: Optional[int] = None,
+                 call_cache: Optional[str] = None):
         self._jobs: List[job.Job] = []
         self._resource_map: Dict[str, _resource.Resource] = {}
         self._allocated_files: Set[str] = set()
@@ -148,6 +155,7 @@ class Batch:
         self._DEPRECATED_fs: Optional[RouterAsyncFS] = None
 
         self._cancel_after_n_failures = cancel_after_n_failures
+        self._call_cache = call_cache
 
     @property
     def _fs(self) -> AsyncFS:
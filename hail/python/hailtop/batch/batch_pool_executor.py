@@ -1,13 +1,15 @@
-from typing import Optional, Callable, Type, Union, List, Any, Iterable
+from typing import Optional, Callable, Type, Union, List, Any, Iterable, Dict, Tuple
 from types import TracebackType
 from io import BytesIO
 import asyncio
 import concurrent
+import logging
+import aiohttp
 import dill
 import functools
 import sys
 
-from hailtop.utils import secret_alnum_string, partition
+from hailtop.utils import secret_alnum_string, bounded_gather, sleep_and_backoff
 import hailtop.batch_client.aioclient as low_level_batch_client
 from hailtop.batch_client.parse import parse_cpu_in_mcpu
 
@@ -22,6 +24,15 @@ else:
     def create_task(*args, **kwargs):
         return asyncio.create_task(*args, **kwargs)  # pylint: disable=no-member
 
+log = logging.getLogger('batch_pool_executor')
+
+# how long calls are collected before they are submitted
+SUBMIT_DELAY_SECS = 0.1
+# number of job inputs uploaded at once
+UPLOAD_PARALLELISM = 20
+# number of job outputs downloaded at once
+DOWNLOAD_PARALLELISM = 20
+
 
 def cpu_spec_to_float(spec: Union[int, str]) -> float:
     if isinstance(spec, str):
@@ -31,12 +42,6 @@ def cpu_spec_to_float(spec: Union[int, str]) -> float:
     return float(spec)
 
 
-def chunk(fn):
-    def chunkedfn(*args):
-        return [fn(*arglist) for arglist in zip(*args)]
-    return chunkedfn
-
-
 def async_to_blocking(coro):
     return asyncio.get_event_loop().run_until_complete(coro)
 
@@ -57,6 +62,13 @@ class BatchPoolExecutor:
     minor verison with the local process. The `image` parameter overrides this
     behavior.
 
+    Calls are submitted in groups: the calls of a group are packed
+    `calls_per_job` to a job, and the jobs, at most `jobs_per_batch` of them,
+    run in one batch. A group is submitted once it is full, shortly after its
+    first call, when the result of one of its calls is requested, or when the
+    executor is shut down. The results of each job are returned as it
+    completes.
+
     When used as a context manager (the ``with`` syntax), the executor will wait
     for all jobs to finish before finishing the ``with`` statement. This
     behavior can be controlled by the `wait_on_exit` parameter.
@@ -113,6 +125,13 @@ class BatchPoolExecutor:
         If specified, the project to use when authenticating with Google
         Storage. Google Storage is used to transfer serialized values between
         this computer and the cloud machines that execute jobs.
+    calls_per_job:
+        The number of calls executed, one after the other, by each job. The
+        default value is ``1``. :meth:`.map` overrides this with its
+        `chunksize`.
+    jobs_per_batch:
+        The maximum number of jobs in each batch. The default value is
+        ``1000``.
     """
 
     def __init__(self, *,
@@ -122,7 +141,9 @@ class BatchPoolExecutor:
                  cpus_per_job: Optional[Union[int, str]] = None,
                  wait_on_exit: bool = True,
                  cleanup_bucket: bool = True,
-                 project: Optional[str] = None):
+                 project: Optional[str] = None,
+                 calls_per_job: int = 1,
+                 jobs_per_batch: int = 1000):
         self.name = name or "BatchPoolExecutor-" + secret_alnum_string(4)
         self.backend = backend or ServiceBackend()
         if not isinstance(self.backend, ServiceBackend):
@@ -147,6 +168,16 @@ class BatchPoolExecutor:
         self.cpus_per_job = cpus_per_job
         self.cleanup_bucket = cleanup_bucket
         self.wait_on_exit = wait_on_exit
+        if calls_per_job < 1:
+            raise ValueError(f'calls_per_job must be positive, found {calls_per_job}')
+        if jobs_per_batch < 1:
+            raise ValueError(f'jobs_per_batch must be positive, found {jobs_per_batch}')
+        self.calls_per_job = calls_per_job
+        self.jobs_per_batch = jobs_per_batch
+        # calls that have not been submitted yet
+        self._pending: Optional[_CallGroup] = None
+        self._groups: List[_CallGroup] = []
+        self._watchers: List[asyncio.Future] = []
 
     def __enter__(self):
         return self
@@ -155,7 +186,7 @@ class BatchPoolExecutor:
             fn: Callable,
             *iterables: Iterable[Any],
             timeout: Optional[Union[int, float]] = None,
-            chunksize: int = 1):
+            chunksize: Optional[int] = None):
         """Call `fn` on cloud machines with arguments from `iterables`.
 
         This function returns a generator which will produce each result in the
@@ -210,7 +241,8 @@ class BatchPoolExecutor:
             containers take about 5 seconds to start. Ideally, each task should
             take an order of magnitude more time than start-up time. You can
             make the chunksize larger to reduce parallelism but increase the
-            amount of meaningful work done per-container.
+            amount of meaningful work done per-container. If unspecified, the
+            executor's `calls_per_job` is used.
         """
 
         agen = async_to_blocking(
@@ -228,33 +260,18 @@ class BatchPoolExecutor:
                         fn: Callable,
                         iterables: Iterable[Iterable[Any]],
                         timeout: Optional[Union[int, float]] = None,
-                        chunksize: int = 1):
+                        chunksize: Optional[int] = None):
         """Aysncio compatible version of :meth:`.map`."""
-        if chunksize > 1:
-            list_per_argument = [list(x) for x in iterables]
-            n = len(list_per_argument[0])
-            assert all(n == len(x) for x in list_per_argument)
-            n_chunks = (n + chunksize - 1) // chunksize
-            iterables_chunks = [list(partition(n_chunks, x)) for x in list_per_argument]
-            iterables_chunks = [
-                chunk for chunk in iterables_chunks if len(chunk) > 0]
-            fn = chunk(fn)
-            iterables = iterables_chunks
-        submissions = [self.async_submit(fn, *arguments)
-                       for arguments in zip(*iterables)]
-        futures: List[BatchPoolFuture] = await asyncio.gather(*submissions)
+        futures = [self._add_call(fn, arguments, {}, chunksize or self.calls_per_job)
+                   for arguments in zip(*iterables)]
 
         async def async_result_or_cancel_all(future):
             try:
                 return await future.async_result(timeout=timeout)
             except Exception as err:
                 for fut in futures:
-                    fut.cancel()
+                    await fut.async_cancel()
                 raise err
-        if chunksize > 1:
-            return (val
-                    for future in futures
-                    for val in await async_result_or_cancel_all(future))
         return (await async_result_or_cancel_all(future)
                 for future in futures)
 
@@ -324,7 +341,9 @@ class BatchPoolExecutor:
                            **kwargs: Any
                            ) -> 'BatchPoolFuture':
         """Aysncio compatible version of :meth:`BatchPoolExecutor.submit`."""
+        return self._add_call(unapplied, args, kwargs, self.calls_per_job)
 
+    def _add_call(self, unapplied: Callable, args, kwargs, calls_per_job: int) -> 'BatchPoolFuture':
         if self._shutdown:
             raise RuntimeError('BatchPoolExecutor has already been shutdown.')
 
@@ -332,54 +351,198 @@ class BatchPoolExecutor:
             name = unapplied.__name__
         except AttributeError:
             name = '<anonymous>'
-        name = f'{name}-{secret_alnum_string(4)}'
-        batch = Batch(name=self.name + '-' + name,
-                      backend=self.backend,
-                      default_image=self.image)
-        self.batches.append(batch)
-        j = batch.new_job(name)
-
-        pipe = BytesIO()
-        dill.dump(functools.partial(unapplied, *args, **kwargs), pipe, recurse=True)
-        pipe.seek(0)
-        pickledfun_gcs = self.inputs + f'{name}/pickledfun'
-        await self.gcs.write_gs_file_from_file_like_object(pickledfun_gcs, pipe)
-        pickledfun_local = batch.read_input(pickledfun_gcs)
-
-        thread_limit = "1"
-        if self.cpus_per_job:
-            j.cpu(self.cpus_per_job)
-            thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
-        j.env("OMP_NUM_THREADS", thread_limit)
-        j.env("OPENBLAS_NUM_THREADS", thread_limit)
-        j.env("MKL_NUM_THREADS", thread_limit)
-        j.env("VECLIB_MAXIMUM_THREADS", thread_limit)
-        j.env("NUMEXPR_NUM_THREADS", thread_limit)
-
-        j.command('set -ex')
-        j.command(f'''python3 -c "
-import base64
+        pickledfun = dill.dumps(functools.partial(unapplied, *args, **kwargs), recurse=True)
+
+        group = self._pending
+        if group is None or not group.has_room(calls_per_job, self.jobs_per_batch):
+            self._submit_pending()
+            group = _CallGroup()
+            self._pending = group
+            asyncio.ensure_future(self._submit_later(group))
+        future = BatchPoolFuture(self, group)
+        group.add(name, pickledfun, future, calls_per_job)
+        return future
+
+    async def _submit_later(self, group: '_CallGroup'):
+        await asyncio.sleep(SUBMIT_DELAY_SECS)
+        self._submit_group(group)
+
+    def _submit_group(self, group: '_CallGroup'):
+        if self._pending is group:
+            self._submit_pending()
+
+    def _submit_pending(self):
+        group = self._pending
+        if group is not None:
+            self._pending = None
+            group.submitting = asyncio.ensure_future(self._submit(group))
+            self._groups.append(group)
+
+    async def _submit(self, group: '_CallGroup'):
+        # calls cancelled before they were submitted are dropped
+        jobs = [(name, [(pickledfun, future) for pickledfun, future in calls if not future.done()])
+                for name, _, calls in group.jobs]
+        jobs = [(name, calls) for name, calls in jobs if calls]
+        if not jobs:
+            return
+
+        token = secret_alnum_string(8)
+        try:
+            batch = Batch(name=self.name + '-' + token,
+                          backend=self.backend,
+                          default_image=self.image)
+            self.batches.append(batch)
+
+            async def upload_input(i, calls):
+                pipe = BytesIO(b''.join(pickledfun for pickledfun, _ in calls))
+                await self.gcs.write_gs_file_from_file_like_object(self.inputs + f'{token}/{i}', pipe)
+
+            await bounded_gather(*[functools.partial(upload_input, i, calls) for i, (_, calls) in enumerate(jobs)],
+                                 parallelism=UPLOAD_PARALLELISM)
+
+            job_outputs = []
+            for i, (name, calls) in enumerate(jobs):
+                j = batch.new_job(name)
+                pickledfuns_local = batch.read_input(self.inputs + f'{token}/{i}')
+
+                thread_limit = "1"
+                if self.cpus_per_job:
+                    j.cpu(self.cpus_per_job)
+                    thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
+                j.env("OMP_NUM_THREADS", thread_limit)
+                j.env("OPENBLAS_NUM_THREADS", thread_limit)
+                j.env("MKL_NUM_THREADS", thread_limit)
+                j.env("VECLIB_MAXIMUM_THREADS", thread_limit)
+                j.env("NUMEXPR_NUM_THREADS", thread_limit)
+
+                j.command('set -ex')
+                j.command(f'''python3 -c "
 import dill
 import traceback
-with open(\\"{j.ofile}\\", \\"wb\\") as out:
-    try:
-        with open(\\"{pickledfun_local}\\", \\"rb\\") as f:
-            dill.dump((dill.load(f)(), None), out, recurse=True)
-    except Exception as e:
-        print(\\"BatchPoolExecutor encountered an exception:\\")
-        traceback.print_exc()
-        dill.dump((e, traceback.format_exception(type(e), e, e.__traceback__)), out, recurse=True)
+with open(\\"{pickledfuns_local}\\", \\"rb\\") as f, open(\\"{j.ofile}\\", \\"wb\\") as out:
+    while True:
+        try:
+            fun = dill.load(f)
+        except EOFError:
+            break
+        try:
+            result = dill.dumps((fun(), None), recurse=True)
+        except Exception as e:
+            print(\\"BatchPoolExecutor encountered an exception:\\")
+            traceback.print_exc()
+            result = dill.dumps((e, traceback.format_exception(type(e), e, e.__traceback__)), recurse=True)
+        out.write(result)
+        out.flush()
 "''')
-        output_gcs = self.outputs + f'{name}/output'
-        batch.write_output(j.ofile, output_gcs)
-        backend_batch = batch.run(wait=False,
-                                  disable_progress_bar=True)._async_batch
-
-        return BatchPoolFuture(self,
-                               backend_batch,
-                               low_level_batch_client.Job.submitted_job(
-                                   backend_batch, 1),
-                               output_gcs)
+                output_gcs = self.outputs + f'{token}/{i}'
+                batch.write_output(j.ofile, output_gcs)
+                job_outputs.append((j, output_gcs, [future for _, future in calls]))
+
+            backend_batch = batch.run(wait=False,
+                                      disable_progress_bar=True)._async_batch
+        except Exception as e:
+            for _, calls in jobs:
+                for _, future in calls:
+                    future._set_exception(e)
+            return
+
+        group.batch = backend_batch
+        outputs = {}
+        for j, output_gcs, futures in job_outputs:
+            assert j._job_id is not None
+            outputs[j._job_id] = (output_gcs, futures)
+        self._watchers.append(asyncio.ensure_future(self._watch(backend_batch, outputs)))
+
+    async def _watch(self,
+                     batch: low_level_batch_client.Batch,
+                     jobs: Dict[int, Tuple[str, List['BatchPoolFuture']]]):
+        """Resolve the futures of the calls of each job of `batch` as the job
+        completes.
+
+        Each time more jobs complete, the done jobs are read from the first
+        unresolved job on, and only until as many unresolved jobs as have
+        newly completed are found, so each poll reads about the jobs that
+        completed since the last one.
+        """
+        n_jobs = len(jobs)
+        try:
+            last_n_completed = -1
+            can_wait = True
+            delay = 0.1
+            while any(not future.done() for _, futures in jobs.values() for future in futures):
+                if can_wait:
+                    try:
+                        status = await batch._wait_for_progress(last_n_completed)
+                    except aiohttp.ClientResponseError as e:
+                        if e.status != 404:
+                            raise
+                        # the server cannot wait on batches, poll instead
+                        can_wait = False
+                        continue
+                else:
+                    delay = await sleep_and_backoff(delay)
+                    status = await batch.status()
+                if status['n_completed'] == last_n_completed:
+                    continue
+                last_n_completed = status['n_completed']
+
+                n_newly_completed = last_n_completed - (n_jobs - len(jobs))
+                if n_newly_completed <= 0 or not jobs:
+                    continue
+                completed = []
+                done_jobs = batch.export_jobs(q='done', last_job_id=min(jobs) - 1)
+                try:
+                    async for job in done_jobs:
+                        output = jobs.pop(job['job_id'], None)
+                        if output is not None:
+                            completed.append(functools.partial(self._resolve, batch, job, *output))
+                            if len(completed) == n_newly_completed:
+                                break
+                finally:
+                    await done_jobs.aclose()
+                await bounded_gather(*completed, parallelism=DOWNLOAD_PARALLELISM)
+        except asyncio.CancelledError:  # pylint: disable=try-except-raise
+            raise
+        except Exception as e:
+            log.exception(f'while waiting on batch {batch.id}')
+            for _, futures in jobs.values():
+                for future in futures:
+                    future._set_exception(e)
+
+    async def _resolve(self,
+                       batch: low_level_batch_client.Batch,
+                       job: Dict[str, Any],
+                       output_gcs: str,
+                       futures: List['BatchPoolFuture']):
+        try:
+            if job['state'] != 'Success':
+                status = await (await batch.get_job(job['job_id'])).status()
+                error = low_level_batch_client.Job._get_error(status, 'main')
+                if error is None:
+                    error = f'job {job["job_id"]} of batch {batch.id} is {job["state"]}'
+                raise ValueError(f'submitted job failed:\n{error}')
+
+            output = BytesIO(await self.gcs.read_binary_gs_file(output_gcs))
+            for future in futures:
+                value, traceback = dill.load(output)
+                if traceback is None:
+                    future._set_result(value)
+                else:
+                    assert isinstance(value, BaseException)
+                    traceback = ''.join(traceback)
+                    future._set_exception(ValueError(f'submitted job failed:\n{traceback}'))
+        except Exception as e:
+            for future in futures:
+                future._set_exception(e)
+
+    async def _cancel_call(self, future: 'BatchPoolFuture'):
+        group = future.group
+        if group.submitting is None:
+            # the call is dropped when its group is submitted
+            return
+        await asyncio.shield(group.submitting)
+        if group.batch is not None and all(f is future or f.done() for f in group.futures):
+            await group.batch.cancel()
 
     def __exit__(self,
                  exc_type: Optional[Type[BaseException]],
@@ -408,6 +571,9 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
             If true, wait for all jobs to complete before returning from this
             method.
         """
+        self._submit_pending()
+        async_to_blocking(
+            asyncio.gather(*[group.submitting for group in self._groups if group.submitting is not None]))
         if wait:
             async def ignore_exceptions(f):
                 try:
@@ -421,6 +587,8 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
         self._shutdown = True
 
     def _cleanup(self, wait):
+        for watcher in self._watchers:
+            watcher.cancel()
         if self.cleanup_bucket:
             async_to_blocking(
                 self.gcs.delete_gs_files(self.directory))
@@ -428,19 +596,51 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
         self.backend.close()
 
 
+class _CallGroup:
+    """Calls submitted together as the jobs of one batch."""
+
+    def __init__(self):
+        # the name, number of calls per job, and pickled calls and their
+        # futures of each job
+        self.jobs: List[Tuple[str, int, List[Tuple[bytes, BatchPoolFuture]]]] = []
+        self.futures: List[BatchPoolFuture] = []
+        self.submitting: Optional[asyncio.Future] = None
+        self.batch: Optional[low_level_batch_client.Batch] = None
+
+    def has_room(self, calls_per_job: int, jobs_per_batch: int) -> bool:
+        if len(self.jobs) < jobs_per_batch:
+            return True
+        _, last_calls_per_job, calls = self.jobs[-1]
+        return last_calls_per_job == calls_per_job and len(calls) < calls_per_job
+
+    def add(self, name: str, pickledfun: bytes, future: 'BatchPoolFuture', calls_per_job: int):
+        self.futures.append(future)
+        if self.jobs:
+            _, last_calls_per_job, calls = self.jobs[-1]
+            if last_calls_per_job == calls_per_job and len(calls) < calls_per_job:
+                calls.append((pickledfun, future))
+                return
+        self.jobs.append((name, calls_per_job, [(pickledfun, future)]))
+
+
 class BatchPoolFuture:
     def __init__(self,
                  executor: BatchPoolExecutor,
-                 batch: low_level_batch_client.Batch,
-                 job: low_level_batch_client.Job,
-                 output_gcs: str):
+                 group: _CallGroup):
         self.executor = executor
-        self.batch = batch
-        self.job = job
-        self.output_gcs = output_gcs
-        self.fetch_coro = asyncio.ensure_future(self._async_fetch_result())
+        self.group = group
+        self.fetch_coro = asyncio.get_event_loop().create_future()
+        self.fetch_coro.add_done_callback(lambda _: executor._finish_future())
         executor._add_future(self)
 
+    def _set_result(self, value):
+        if not self.fetch_coro.done():
+            self.fetch_coro.set_result(value)
+
+    def _set_exception(self, exc: BaseException):
+        if not self.fetch_coro.done():
+            self.fetch_coro.set_exception(exc)
+
     def cancel(self):
         """Cancel this job if it has not yet been cancelled.
 
@@ -461,7 +661,7 @@ class BatchPoolFuture:
             # retrieve any exceptions raised
             self.fetch_coro.result()
             return False
-        await self.batch.cancel()
+        await self.executor._cancel_call(self)
         self.fetch_coro.cancel()
         return True
 
@@ -511,25 +711,8 @@ class BatchPoolFuture:
         """
         if self.cancelled():
             raise concurrent.futures.CancelledError()
-        return await asyncio.wait_for(self.fetch_coro, timeout=timeout)
-
-    async def _async_fetch_result(self):
-        try:
-            await self.job.wait()
-            main_container_status = self.job._status['status']['container_statuses']['main']
-            if main_container_status['state'] == 'error':
-                raise ValueError(
-                    f"submitted job failed:\n{main_container_status['error']}")
-            value, traceback = dill.loads(
-                await self.executor.gcs.read_binary_gs_file(self.output_gcs))
-            if traceback is None:
-                return value
-            assert isinstance(value, BaseException)
-            self.value = None
-            traceback = ''.join(traceback)
-            raise ValueError(f'submitted job failed:\n{traceback}')
-        finally:
-            self.executor._finish_future()
+        self.executor._submit_group(self.group)
+        return await asyncio.wait_for(asyncio.shield(self.fetch_coro), timeout=timeout)
 
     def exception(self, timeout: Optional[Union[float, int]] = None):
         """Block until the job is complete and raise any exceptions.
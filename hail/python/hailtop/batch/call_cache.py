@@ -0,0 +1,214 @@
+from typing import Any, Dict, List, Optional, Set, Union
+import functools
+import hashlib
+import json
+import re
+from shlex import quote as shq
+
+import dill
+
+from hailtop.aiotools import AsyncFS
+from hailtop.aiotools.fs import LocalStatFileStatus
+from hailtop.utils import bounded_gather
+
+from . import job as _job, resource as _resource  # pylint: disable=cyclic-import
+
+# bump to invalidate the entries of existing call caches
+CALL_CACHE_VERSION = 1
+
+STAT_PARALLELISM = 50
+
+_RESOURCE_REGEX = re.compile(
+    '(' + ')|('.join([_resource.ResourceFile._regex_pattern, _resource.ResourceGroup._regex_pattern]) + ')')
+
+
+# the resources a job produces
+_Output = Union['_resource.JobResourceFile', '_resource.PythonResult']
+
+
+class _NotCacheable(Exception):
+    pass
+
+
+def _output_name(r: _Output) -> str:
+    assert r._value is not None
+    return r._value
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CallCache:
+    """The outputs of successful jobs, stored under `root`.
+
+    A job's key hashes its image, shell, commands (or Python functions and
+    arguments), environment and resource requests. Each resource the job
+    reads is replaced by its content identity: the size and, where the file
+    system records them, the CRC32C, MD5 and generation of an input file (the
+    size and modification time of a local file), or the key of the job that
+    produces an intermediate file. A job whose key has a complete entry in the
+    cache need not run again; its outputs are copied from
+    ``{root}/{key}/outputs/``.
+
+    An entry is complete once its manifest, ``{root}/{key}/manifest``, is
+    written after the job succeeds, and while every output listed there still
+    has its recorded size. Jobs without outputs, jobs that mount buckets with
+    gcsfuse and jobs whose inputs cannot be found are never cached.
+    """
+
+    def __init__(self, fs: AsyncFS, root: str):
+        self._fs = fs
+        self._root = root.rstrip('/')
+
+    def outputs_url(self, key: str) -> str:
+        return f'{self._root}/{key}/outputs'
+
+    def output_url(self, key: str, r: _Output) -> str:
+        return f'{self.outputs_url(key)}/{r._value}'
+
+    def manifest_url(self, key: str) -> str:
+        return f'{self._root}/{key}/manifest'
+
+    @staticmethod
+    def outputs(job: '_job.Job') -> List[_Output]:
+        """The files produced by `job` that are used by other jobs or written
+        to outputs, ordered by name."""
+        outputs: Set[_Output] = {
+            r for r in job._internal_outputs | job._external_outputs
+            if isinstance(r, (_resource.JobResourceFile, _resource.PythonResult)) and r._source is job}
+        return sorted(outputs, key=_output_name)
+
+    @staticmethod
+    def write_manifest(job: '_job.Job', directory: str, path: str) -> str:
+        """A shell command writing the manifest of the outputs of `job`,
+        found under `directory`, to the local file `path`."""
+        sizes = [f'echo "$(wc -c < {shq(r._get_path(directory))}) {r._value}"'
+                 for r in CallCache.outputs(job)]
+        return f'{{ {"; ".join(sizes)}; }} > {shq(path)}'
+
+    async def keys(self, jobs: List['_job.Job']) -> Dict['_job.Job', Optional[str]]:
+        """The key of each of `jobs`, or `None` if a job cannot be cached.
+
+        `jobs` must be in topological order and Python jobs not yet compiled.
+        """
+        inputs = list({r for j in jobs for r in j._inputs if isinstance(r, _resource.InputResourceFile)})
+        identities = await bounded_gather(*[functools.partial(self._identify, r._input_path) for r in inputs],
+                                          parallelism=STAT_PARALLELISM)
+        input_identities = dict(zip(inputs, identities))
+
+        keys: Dict['_job.Job', Optional[str]] = {}
+        for j in jobs:
+            try:
+                keys[j] = self._key(j, input_identities, keys)
+            except _NotCacheable:
+                keys[j] = None
+        return keys
+
+    async def lookup(self, keys: Dict['_job.Job', Optional[str]]) -> Set['_job.Job']:
+        """The jobs with a complete entry in the cache."""
+        cached = [(j, key) for j, key in keys.items() if key is not None]
+        complete = await bounded_gather(
+            *[functools.partial(self._is_complete, key, self.outputs(j)) for j, key in cached],
+            parallelism=STAT_PARALLELISM)
+        return {j for (j, _), is_complete in zip(cached, complete) if is_complete}
+
+    async def _identify(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            status = await self._fs.statfile(url)
+        except (FileNotFoundError, ValueError):
+            # directories and URLs the file system cannot read
+            return None
+
+        identity = {'size': await status.size()}
+        for field in ('crc32c', 'md5Hash', 'generation'):
+            try:
+                identity[field] = await status[field]
+            except KeyError:
+                pass
+        if isinstance(status, LocalStatFileStatus):
+            # local files have no checksum, so their modification time stands in for one
+            identity['mtime_ns'] = status._stat_result.st_mtime_ns
+        return identity
+
+    def _key(self,
+             job: '_job.Job',
+             input_identities: Dict['_resource.InputResourceFile', Optional[Dict[str, Any]]],
+             keys: Dict['_job.Job', Optional[str]]) -> str:
+        if job._gcsfuse or not self.outputs(job):
+            raise _NotCacheable()
+
+        def canonical(r: '_resource.Resource') -> Any:
+            if isinstance(r, _resource.ResourceGroup):
+                return ['group', sorted([name, canonical(rf)] for name, rf in r._resources.items())]
+            if isinstance(r, _resource.InputResourceFile):
+                identity = input_identities.get(r)
+                if identity is None:
+                    raise _NotCacheable()
+                return ['input', identity]
+            assert isinstance(r, (_resource.JobResourceFile, _resource.PythonResult))
+            if r._source is job:
+                return ['output', r._value]
+            assert r._source is not None
+            key = keys.get(r._source)
+            if key is None:
+                raise _NotCacheable()
+            return [key, r._value]
+
+        def canonical_command(command: str) -> str:
+            def handler(match_obj):
+                r = job._batch._resource_map.get(match_obj.group())
+                if r is None:
+                    raise _NotCacheable()
+                return json.dumps(canonical(r))
+            return _RESOURCE_REGEX.sub(handler, command)
+
+        def canonical_argument(arg: Any) -> Any:
+            if isinstance(arg, _resource.Resource):
+                return canonical(arg)
+            return ['value', _digest(dill.dumps(arg, recurse=True))]
+
+        functions = []
+        if isinstance(job, _job.PythonJob):
+            for result, unapplied, args, kwargs in job._functions:
+                functions.append([canonical(result),
+                                  _digest(dill.dumps(unapplied, recurse=True)),
+                                  [canonical_argument(arg) for arg in args],
+                                  {kw: canonical_argument(arg) for kw, arg in kwargs.items()}])
+
+        spec = {
+            'version': CALL_CACHE_VERSION,
+            'image': job._image,
+            'shell': job._shell,
+            'env': job._env,
+            'cpu': job._cpu,
+            'memory': job._memory,
+            'storage': job._storage,
+            'machine_type': job._machine_type,
+            'command': [canonical_command(command) for command in job._command],
+            'functions': functions,
+            'inputs': sorted(json.dumps(canonical(r), sort_keys=True) for r in job._inputs),
+        }
+        return _digest(json.dumps(spec, sort_keys=True).encode('utf-8'))
+
+    async def _is_complete(self, key: str, outputs: List[_Output]) -> bool:
+        try:
+            manifest = (await self._fs.read(self.manifest_url(key))).decode('utf-8')
+        except FileNotFoundError:
+            return False
+
+        sizes = {}
+        for line in manifest.splitlines():
+            size, name = line.split(None, 1)
+            sizes[name] = int(size)
+
+        for r in outputs:
+            if r._value not in sizes:
+                return False
+            try:
+                status = await self._fs.statfile(self.output_url(key, r))
+            except FileNotFoundError:
+                return False
+            if await status.size() != sizes[r._value]:
+                return False
+        return True
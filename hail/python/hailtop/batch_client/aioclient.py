@@ -10,13 +10,26 @@ import secrets
 
 from hailtop.config import get_deploy_config, DeployConfig
 from hailtop.auth import service_auth_headers
-from hailtop.utils import bounded_gather, request_retry_transient_errors, tqdm, TQDM_DEFAULT_DISABLE
+from hailtop.utils import (bounded_gather, request_retry_transient_errors, retry_transient_errors, tqdm,
+                           TQDM_DEFAULT_DISABLE)
 from hailtop.httpx import client_session
 
 from .globals import tasks, complete_states
 
 log = logging.getLogger('batch_client.aioclient')
 
+# how long the server may hold a request waiting on a batch or job, and how
+# much longer than that to wait for its response
+WAIT_TIMEOUT_SECS = 30
+WAIT_RESPONSE_GRACE_SECS = 10
+
+# how long to wait for more of an export of jobs
+EXPORT_READ_TIMEOUT_SECS = 60
+
+
+class JobExportUnsupportedError(Exception):
+    pass
+
 
 class Job:
     @staticmethod
@@ -292,6 +305,22 @@ class SubmittedJob:
         return self._status
 
     async def wait(self):
+        if self._status and self._status['state'] in complete_states:
+            return self._status
+        try:
+            while True:
+                resp = await self._batch._client._get(
+                    f'/api/v1alpha/batches/{self.batch_id}/jobs/{self.job_id}/wait',
+                    params={'timeout': WAIT_TIMEOUT_SECS},
+                    timeout=aiohttp.ClientTimeout(total=WAIT_TIMEOUT_SECS + WAIT_RESPONSE_GRACE_SECS))
+                self._status = await resp.json()
+                if self._status['state'] in complete_states:
+                    return self._status
+        except aiohttp.ClientResponseError as e:
+            if e.status != 404:
+                raise
+            # the server cannot wait on jobs, poll instead
+
         i = 0
         while True:
             if await self.is_complete():
@@ -323,8 +352,7 @@ class Batch:
     async def cancel(self):
         await self._client._patch(f'/api/v1alpha/batches/{self.id}/cancel')
 
-    async def jobs(self, q=None):
-        last_job_id = None
+    async def jobs(self, q=None, last_job_id=None):
         while True:
             params = {}
             if q is not None:
@@ -339,6 +367,64 @@ class Batch:
             if last_job_id is None:
                 break
 
+    async def export_jobs(self, q=None, page_size=None, last_job_id=None):
+        """Yield the status of each job matching `q` after `last_job_id`, in
+        order of job id.
+
+        The server streams the jobs, querying `page_size` at a time. If the
+        stream is interrupted after making progress, it is resumed after the
+        last job received. If the server cannot export jobs, or fails the
+        first request, the jobs are paged through instead.
+        """
+        first_request = True
+        while True:
+            params = {}
+            if q is not None:
+                params['q'] = q
+            if page_size is not None:
+                params['page_size'] = page_size
+            if last_job_id is not None:
+                params['last_job_id'] = last_job_id
+            path = f'/api/v1alpha/batches/{self.id}/jobs/export'
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=EXPORT_READ_TIMEOUT_SECS)
+            if first_request:
+                first_request = False
+                try:
+                    resp = await retry_transient_errors(self._start_export, path, params, timeout)
+                except JobExportUnsupportedError:
+                    # the server cannot export jobs, page through them instead
+                    async for job in self.jobs(q=q, last_job_id=last_job_id):
+                        yield job
+                    return
+            else:
+                resp = await self._client._get(path, params=params, timeout=timeout)
+            resumed_after_job_id = last_job_id
+            try:
+                async for line in resp.content:
+                    job = json.loads(line)
+                    last_job_id = job['job_id']
+                    yield job
+                return
+            except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError):
+                if last_job_id == resumed_after_job_id:
+                    raise
+                log.warning(f'export of jobs of batch {self.id} interrupted after job {last_job_id}, resuming',
+                            exc_info=True)
+            finally:
+                resp.release()
+
+    async def _start_export(self, path, params, timeout):
+        try:
+            return await self._client._session.get(
+                self._client.url + path, params=params, headers=self._client._headers, timeout=timeout)
+        except aiohttp.ClientResponseError as e:
+            # a server without the export endpoint routes its path to the job
+            # with id "export", which fails with a 500 rather than a 404, and
+            # neither is retried
+            if e.status in (404, 500):
+                raise JobExportUnsupportedError() from e
+            raise
+
     async def get_job(self, job_id: int) -> Job:
         return await self._client.get_job(self.id, job_id)
 
@@ -376,11 +462,33 @@ class Batch:
             return await self.status()  # updates _last_known_status
         return self._last_known_status
 
+    async def _wait_for_progress(self, last_n_completed):
+        resp = await self._client._get(
+            f'/api/v1alpha/batches/{self.id}/wait',
+            params={'last_n_completed': last_n_completed, 'timeout': WAIT_TIMEOUT_SECS},
+            timeout=aiohttp.ClientTimeout(total=WAIT_TIMEOUT_SECS + WAIT_RESPONSE_GRACE_SECS))
+        self._last_known_status = await resp.json()
+        return self._last_known_status
+
     async def wait(self, *, disable_progress_bar=TQDM_DEFAULT_DISABLE):
         i = 0
         with tqdm(total=self.n_jobs,
                   disable=disable_progress_bar,
                   desc='completed jobs') as pbar:
+            # the server responds when the number of completed jobs changes
+            last_n_completed = -1
+            try:
+                while True:
+                    status = await self._wait_for_progress(last_n_completed)
+                    last_n_completed = status['n_completed']
+                    pbar.update(last_n_completed - pbar.n)
+                    if status['complete']:
+                        return status
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+                # the server cannot wait on batches, poll instead
+
             while True:
                 status = await self.status()
                 pbar.update(status['n_completed'] - pbar.n)
@@ -418,7 +526,7 @@ class BatchBuilder:
                    input_files=None, output_files=None, always_run=False,
                    timeout=None, gcsfuse=None, requester_pays_project=None,
                    mount_tokens=False, network: Optional[str] = None,
-                   unconfined: bool = False):
+                   unconfined: bool = False, sync_output_files: bool = False):
         if self._submitted:
             raise ValueError("cannot create a job in an already submitted batch")
 
@@ -494,6 +602,8 @@ class BatchBuilder:
             job_spec['network'] = network
         if unconfined:
             job_spec['unconfined'] = unconfined
+        if sync_output_files:
+            job_spec['sync_output_files'] = sync_output_files
 
         self._job_specs.append(job_spec)
 
@@ -628,10 +738,13 @@ class BatchClient:
             h.update(service_auth_headers(deploy_config, 'batch', token_file=token_file))
         self._headers = h
 
-    async def _get(self, path, params=None):
+    async def _get(self, path, params=None, timeout=None):
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
         return await request_retry_transient_errors(
             self._session, 'GET',
-            self.url + path, params=params, headers=self._headers)
+            self.url + path, params=params, headers=self._headers, **kwargs)
 
     async def _post(self, path, data=None, json=None):
         return await request_retry_transient_errors(
@@ -156,8 +156,11 @@ class Batch:
     def last_known_status(self):
         return async_to_blocking(self._async_batch.last_known_status())
 
-    def jobs(self, q=None):
-        return agen_to_blocking(self._async_batch.jobs(q=q))
+    def jobs(self, q=None, last_job_id=None):
+        return agen_to_blocking(self._async_batch.jobs(q=q, last_job_id=last_job_id))
+
+    def export_jobs(self, q=None, page_size=None, last_job_id=None):
+        return agen_to_blocking(self._async_batch.export_jobs(q=q, page_size=page_size, last_job_id=last_job_id))
 
     def get_job(self, job_id: int) -> Job:
         j = async_to_blocking(self._async_batch.get_job(job_id))
@@ -203,7 +206,7 @@ class BatchBuilder:
                    input_files=None, output_files=None, always_run=False,
                    timeout=None, gcsfuse=None, requester_pays_project=None,
                    mount_tokens=False, network: Optional[str] = None,
-                   unconfined: bool = False) -> Job:
+                   unconfined: bool = False, sync_output_files: bool = False) -> Job:
         if parents:
             parents = [parent._async_job for parent in parents]
 
@@ -215,7 +218,7 @@ class BatchBuilder:
             input_files=input_files, output_files=output_files, always_run=always_run,
             timeout=timeout, gcsfuse=gcsfuse,
             requester_pays_project=requester_pays_project, mount_tokens=mount_tokens,
-            network=network, unconfined=unconfined)
+            network=network, unconfined=unconfined, sync_output_files=sync_output_files)
 
         return Job.from_async_job(async_job)
 
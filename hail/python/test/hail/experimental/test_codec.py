@@ -1,3 +1,5 @@
+import numpy as np
+
 import hail as hl
 from test.hail.helpers import *
 
@@ -64,3 +66,82 @@ def test_complex_round_trips():
     assert_round_trip_all_specs(hl.struct(x=hl.dict({3: 'a', 4: 'b', 5: 'c'}),
                                           y=hl.array([3, 4, 5]),
                                           z=hl.set([3, 4, 5, 3])))
+
+
+def assert_binary_decode_matches_json(exp):
+    from hail.backend import binary_decoder
+    (pt, b) = hl.experimental.encode(hl.tuple([exp]), codec=BLOCKED_UNBUFFERED_SPEC)
+    result = binary_decoder.decode(hl.ttuple(exp.dtype), pt, b)[0]
+    expected = exp.dtype._from_json(
+        Env.spark_backend('decode')._jbackend.decodeToJSON(pt, b, BLOCKED_UNBUFFERED_SPEC))[0]
+    if isinstance(expected, np.ndarray):
+        assert np.array_equal(result, expected)
+    else:
+        assert result == expected
+
+
+@skip_unless_spark_backend()
+def test_binary_decoder_matches_json():
+    assert_binary_decode_matches_json(hl.literal(1))
+    assert_binary_decode_matches_json(hl.missing(hl.tint32))
+    assert_binary_decode_matches_json(hl.literal('hello, world'))
+    assert_binary_decode_matches_json(hl.struct(x=3, y=hl.missing(hl.tstr), z=hl.array([1.5, 2.5])))
+    assert_binary_decode_matches_json(hl.tuple([1, hl.missing(hl.tint64), True]))
+    assert_binary_decode_matches_json(hl.array([1, hl.missing(hl.tint32), 3]))
+    assert_binary_decode_matches_json(hl.array([True, False, hl.missing(hl.tbool)]))
+    assert_binary_decode_matches_json(hl.range(100_000).map(lambda i: hl.int64(i)))
+    assert_binary_decode_matches_json(hl.set(['a', 'b', hl.missing(hl.tstr)]))
+    assert_binary_decode_matches_json(hl.dict({3: 'a', 4: hl.missing(hl.tstr)}))
+    assert_binary_decode_matches_json(hl.locus('1', 100))
+    assert_binary_decode_matches_json(hl.interval(hl.locus('1', 100), hl.locus('1', 1000)))
+    assert_binary_decode_matches_json(hl.array([hl.call(0, 1), hl.call(1, 1, phased=True),
+                                                hl.call(2), hl.call(3, 5, phased=True)]))
+    assert_binary_decode_matches_json(hl.nd.array(np.arange(24, dtype=np.float64).reshape(2, 3, 4)))
+    assert_binary_decode_matches_json(hl.nd.array(np.arange(6, dtype=np.int32).reshape(3, 2)))
+
+
+@skip_unless_spark_backend()
+def test_binary_execute_matches_json():
+    backend = hl.utils.java.Env.backend()
+    t = hl.utils.range_table(1000)
+    t = t.annotate(s=hl.str(t.idx), f=hl.or_missing(t.idx % 3 == 0, hl.float(t.idx)),
+                   a=hl.range(t.idx % 5))
+    try:
+        backend._binary_results = False
+        expected = t.collect()
+        backend._binary_results = True
+        assert t.collect() == expected
+    finally:
+        del backend._binary_results
+
+
+@skip_unless_spark_backend()
+def test_encoded_literals():
+    backend = hl.utils.java.Env.backend()
+    values = [
+        (hl.tarray(hl.tint32), [1, None, 3]),
+        (hl.tarray(hl.tfloat64), [0.5, float('inf'), None]),
+        (hl.tarray(hl.tstr), ['a', None, '']),
+        (hl.tset(hl.tstr), {'b', 'a', None}),
+        (hl.tdict(hl.tint64, hl.tarray(hl.tbool)), {5: [True, None], 1: None, None: []}),
+        (hl.tstruct(x=hl.tint32, y=hl.tarray(hl.tstr), z=hl.ttuple(hl.tint64, hl.tcall)),
+         hl.Struct(x=None, y=['x'], z=(3, hl.Call([0, 1])))),
+        (hl.tarray(hl.tcall), [hl.Call([]), hl.Call([2]), hl.Call([1, 0]), hl.Call([1, 3], phased=True)]),
+        (hl.tarray(hl.tinterval(hl.tlocus('GRCh38'))),
+         [hl.Interval(hl.Locus('chr1', 10, 'GRCh38'), hl.Locus('chr2', 5, 'GRCh38'), includes_end=True)]),
+        (hl.tndarray(hl.tfloat64, 2), np.arange(6, dtype=np.float64).reshape(2, 3)),
+    ]
+    try:
+        backend._literal_encoding_threshold = 0
+        for t, v in values:
+            result = hl.eval(hl.literal(v, t))
+            if isinstance(v, np.ndarray):
+                assert np.array_equal(result, v)
+            else:
+                assert result == v, (t, v)
+
+        a = hl.literal(list(range(10_000)))
+        assert hl.eval(hl.sum(a)) == sum(range(10_000))
+        assert hl.eval(a[9_999]) == 9_999
+    finally:
+        del backend._literal_encoding_threshold
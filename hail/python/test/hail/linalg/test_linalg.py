@@ -6,6 +6,7 @@ from hail.utils import local_path_uri, FatalError, HailUserError
 from ..helpers import *
 import numpy as np
 import math
+import os
 from hail.expr.expressions import ExpressionException
 
 setUpModule = startTestHailContext
@@ -198,6 +199,14 @@ class Tests(unittest.TestCase):
             self._assert_eq(at4, at)
             self._assert_eq(at5, at)
 
+    def test_to_from_numpy_leave_nothing_in_shared_memory(self):
+        if not os.access('/dev/shm', os.W_OK):
+            raise unittest.SkipTest('no writable /dev/shm')
+        before = set(os.listdir('/dev/shm'))
+        a = np.random.rand(10, 11)
+        self._assert_eq(BlockMatrix.from_numpy(a, block_size=4).to_numpy(), a)
+        assert set(os.listdir('/dev/shm')) - before == set()
+
         self._assert_eq(bm.to_numpy(_force_blocking=True), a)
 
     @fails_service_backend()
@@ -864,6 +873,12 @@ class Tests(unittest.TestCase):
             self._assert_eq(expected, BlockMatrix.rectangles_to_numpy(rect_uri))
             self._assert_eq(expected, BlockMatrix.rectangles_to_numpy(rect_bytes_uri, binary=True))
 
+            memmap_path = hl.utils.new_local_temp_file()
+            result = BlockMatrix.rectangles_to_numpy(rect_bytes_uri, binary=True, memmap_path=memmap_path)
+            self.assertIsInstance(result, np.memmap)
+            self._assert_eq(expected, result)
+            self._assert_eq(expected, np.fromfile(memmap_path).reshape(3, 2))
+
     @fails_service_backend()
     @fails_local_backend()
     def test_to_ndarray(self):
@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+import bokeh.models
+
+import hail as hl
+from hail.plot import PlotSpec, aggregate_plots
+from ..helpers import *
+
+setUpModule = startTestHailContext
+tearDownModule = stopTestHailContext
+
+
+def count_calls(cls, method):
+    """Patch `cls.method` to record the objects it is called on."""
+    calls = []
+    original = getattr(cls, method)
+
+    def wrapper(self, *args, **kwargs):
+        calls.append(self)
+        return original(self, *args, **kwargs)
+
+    return mock.patch.object(cls, method, wrapper), calls
+
+
+class Tests(unittest.TestCase):
+    def table(self):
+        return hl.utils.range_table(100).annotate(
+            x=hl.rand_norm(seed=0),
+            y=hl.rand_norm(seed=1),
+            p=hl.rand_unif(0, 1, seed=2))
+
+    def test_aggregate_plots_makes_one_pass_per_source(self):
+        ht = self.table()
+        specs = [
+            PlotSpec.histogram(ht.x, range=(-3, 3)),
+            PlotSpec.cumulative_histogram(ht.y, range=(-3, 3)),
+            PlotSpec.cdf(ht.x),
+            PlotSpec.pdf(ht.x),
+            PlotSpec.smoothed_pdf(ht.y),
+            PlotSpec.histogram2d(ht.x, ht.y, range=((-3, 3), (-3, 3))),
+            PlotSpec.scatter(ht.x, ht.y),
+            PlotSpec.qq(ht.p),
+        ]
+        patch, calls = count_calls(hl.Table, 'aggregate')
+        with patch:
+            figures = aggregate_plots(specs)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(figures), len(specs))
+        for figure in figures:
+            self.assertIsInstance(figure, bokeh.models.Plot)
+
+    def test_aggregate_plots_computes_missing_ranges_in_one_pass(self):
+        ht = self.table()
+        specs = [
+            PlotSpec.histogram(ht.x),
+            PlotSpec.cumulative_histogram(ht.y),
+            PlotSpec.histogram2d(ht.x, ht.y),
+        ]
+        patch, calls = count_calls(hl.Table, 'aggregate')
+        with patch:
+            figures = aggregate_plots(specs)
+        # one pass for the ranges, one for the plots
+        self.assertEqual(len(calls), 2)
+        for figure in figures:
+            self.assertIsInstance(figure, bokeh.models.Plot)
+
+    def test_aggregate_plots_makes_one_pass_per_matrix_table_axis(self):
+        mt = hl.utils.range_matrix_table(20, 10)
+        mt = mt.annotate_rows(r=hl.float64(mt.row_idx))
+        mt = mt.annotate_cols(c=hl.float64(mt.col_idx))
+        specs = [
+            PlotSpec.histogram(mt.r, range=(0, 20)),
+            PlotSpec.cdf(mt.r),
+            PlotSpec.histogram(mt.c, range=(0, 10)),
+            PlotSpec.scatter(mt.c, mt.c),
+        ]
+        rows_patch, row_calls = count_calls(hl.MatrixTable, 'aggregate_rows')
+        cols_patch, col_calls = count_calls(hl.MatrixTable, 'aggregate_cols')
+        with rows_patch, cols_patch:
+            figures = aggregate_plots(specs)
+        self.assertEqual((len(row_calls), len(col_calls)), (1, 1))
+        for figure in figures:
+            self.assertIsInstance(figure, bokeh.models.Plot)
+
+    def test_aggregate_plots_manhattan(self):
+        ht = hl.balding_nichols_model(1, 10, 50).rows()
+        ht = ht.annotate(p=hl.rand_unif(0, 1, seed=0))
+        figure, = aggregate_plots([PlotSpec.manhattan(ht.p, ht.locus)])
+        self.assertIsInstance(figure, bokeh.models.Plot)
+
+    def test_aggregate_plots_rejects_scalar_data(self):
+        with self.assertRaises(ValueError):
+            aggregate_plots([PlotSpec.cdf(hl.float64(1.0))])
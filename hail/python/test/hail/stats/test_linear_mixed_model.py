@@ -265,6 +265,36 @@ class Tests(unittest.TestCase):
         self.assertAlmostEqual(stats.beta, beta1[0])
         self.assertAlmostEqual(stats.chi_sq, chi_sq)
 
+    def test_fit_alternatives_numpy_matches_per_column_fit(self):
+        np.random.seed(0)
+        n, f, m = 50, 3, 20
+        x = np.hstack([np.ones((n, 1)), np.random.normal(size=(n, f - 1))])
+        y = np.random.normal(size=n)
+        a = np.random.normal(size=(n, m))
+        a[:, 0] = 0.0  # degenerate
+        a[:, 1] = x[:, 1]  # collinear with a covariate
+
+        def assert_matches(model, p, low_rank):
+            model.fit(log_gamma=0.5)
+            pa = p @ a
+            res = model.fit_alternatives_numpy(pa, a if low_rank else None, return_pandas=True)
+            expected = np.array([model._fit_alternative_numpy(pa[:, i], a[:, i] if low_rank else None)
+                                 for i in range(m)])
+            self.assertTrue(np.all(np.isnan(res[['beta', 'sigma_sq', 'chi_sq', 'p_value']].values[:2])))
+            for j, field in enumerate(['beta', 'sigma_sq', 'chi_sq', 'p_value']):
+                self.assertTrue(np.allclose(res[field].values[2:], expected[2:, j]), field)
+
+        # full rank
+        k = np.random.normal(size=(n, n))
+        s, u = np.linalg.eigh(k @ k.T / n)
+        p = u.T
+        assert_matches(LinearMixedModel(p @ y, p @ x, s), p, False)
+
+        # low rank
+        r = n // 2
+        s, p = s[-r:], p[-r:, :]
+        assert_matches(LinearMixedModel(p @ y, p @ x, s, y, x), p, True)
+
     @skip_unless_spark_backend()
     def test_linear_mixed_model_function(self):
         n, f, m = 4, 2, 3
@@ -1,5 +1,6 @@
 import unittest
 
+import numpy as np
 import pandas as pd
 import pyspark.sql
 import pytest
@@ -1673,3 +1674,53 @@ def test_grouped_flatmap_streams():
         lambda group: hl.range(hl.len(group)).map(lambda i: group[i].annotate(z=group[0])),
         part.grouped(8)))
     ht._force_count()
+
+
+def test_to_numpy():
+    ht = hl.utils.range_table(100, n_partitions=20)
+    ht = ht.annotate(x=hl.or_missing(ht.idx % 3 == 0, ht.idx),
+                     s=hl.str(ht.idx),
+                     f=hl.float32(ht.idx) / 2,
+                     b=hl.or_missing(ht.idx % 5 != 0, ht.idx % 2 == 0),
+                     a=hl.range(ht.idx % 3),
+                     st=hl.struct(y=hl.int64(ht.idx)))
+    columns = ht.to_numpy()
+    rows = ht.collect()
+    assert list(columns) == ['idx', 'x', 's', 'f', 'b', 'a', 'st.y']
+    assert columns['idx'].dtype == np.int32
+    assert columns['f'].dtype == np.float32
+    assert columns['st.y'].dtype == np.int64
+    for name, getter in [('idx', lambda r: r.idx), ('x', lambda r: r.x), ('s', lambda r: r.s),
+                         ('f', lambda r: r.f), ('b', lambda r: r.b), ('a', lambda r: r.a),
+                         ('st.y', lambda r: r.st.y)]:
+        assert [None if m else v for v, m in zip(columns[name].data.tolist(),
+                                                 np.ma.getmaskarray(columns[name]).tolist())] \
+            == [getter(r) for r in rows]
+
+
+def test_to_numpy_fills_chunks_in_order():
+    ht = hl.utils.range_table(50, n_partitions=10)
+    ht = ht.filter((ht.idx < 12) | (ht.idx > 40))
+    ht = ht.annotate(x=hl.or_missing(ht.idx % 2 == 0, hl.str(ht.idx)))
+    columns = ht._to_numpy(True, partitions_per_query=3)
+    expected = [i for i in range(50) if i < 12 or i > 40]
+    assert columns['idx'].tolist() == expected
+    assert columns['x'].tolist() == [str(i) if i % 2 == 0 else None for i in expected]
+
+
+def test_to_numpy_empty():
+    columns = hl.utils.range_table(10).filter(False).to_numpy()
+    assert len(columns['idx']) == 0
+
+
+def test_to_pandas():
+    ht = hl.utils.range_table(10, n_partitions=3)
+    ht = ht.annotate(x=hl.or_missing(ht.idx % 2 == 0, ht.idx),
+                     f=hl.or_missing(ht.idx % 2 == 0, hl.float64(ht.idx)),
+                     s=hl.str(ht.idx))
+    df = ht.to_pandas()
+    assert str(df['x'].dtype) == 'Int32'
+    assert df['x'].isna().tolist() == [i % 2 != 0 for i in range(10)]
+    assert np.isnan(df['f'][1])
+    assert df['s'].tolist() == [str(i) for i in range(10)]
+    assert df['idx'].tolist() == list(range(10))
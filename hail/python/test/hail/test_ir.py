@@ -505,3 +505,56 @@ class CSETests(unittest.TestCase):
                     ' (bar (GetField idx (Ref row)))))'
         )
         assert expected == CSERenderer()(x)
+
+
+class HashingTests(unittest.TestCase):
+    def test_equal_irs_hash_equal(self):
+        def make(field):
+            return ir.ApplyBinaryPrimOp('+', ir.GetField(ir.Ref('row'), field), ir.I32(1))
+
+        self.assertEqual(make('a'), make('a'))
+        self.assertEqual(hash(make('a')), hash(make('a')))
+        self.assertNotEqual(make('a'), make('b'))
+        self.assertEqual(len({make('a'), make('a'), make('b')}), 2)
+
+    def test_irs_differing_in_attributes_hash_differently(self):
+        row = ir.Ref('row')
+        self.assertEqual(len({hash(ir.GetField(row, f'f{i}')) for i in range(1000)}), 1000)
+        self.assertEqual(len({hash(ir.I32(i)) for i in range(1000)}), 1000)
+        self.assertNotEqual(hash(ir.Ref('a')), hash(ir.Ref('b')))
+
+    def test_building_a_parent_does_not_render_a_literal(self):
+        lit = ir.Literal(hl.tarray(hl.tint32), list(range(100_000)))
+        parent = ir.MakeTuple([lit])
+        self.assertIsNone(lit._head_str)
+        self.assertEqual(parent, ir.MakeTuple([ir.Literal(hl.tarray(hl.tint32), list(range(100_000)))]))
+        self.assertNotEqual(parent, ir.MakeTuple([ir.Literal(hl.tarray(hl.tint32), list(range(1, 100_001)))]))
+        self.assertIsNone(lit._head_str)
+
+    def test_deep_ir_hash_and_render(self):
+        x = ir.I32(0)
+        irs = [x]
+        for i in range(10_000):
+            x = ir.ApplyBinaryPrimOp('+', x, ir.I32(i))
+            irs.append(x)
+        self.assertEqual(len(set(irs)), len(irs))
+        s = str(x)
+        self.assertIs(str(x), s)
+        self.assertEqual(str(irs[2]), str(ir.ApplyBinaryPrimOp('+', ir.ApplyBinaryPrimOp('+', ir.I32(0), ir.I32(0)), ir.I32(1))))
+
+
+class StackTraceTests(unittest.TestCase):
+    def test_stack_trace_is_captured(self):
+        x = ir.ArrayRef(ir.Ref('a'), ir.I32(0))
+        self.assertIsInstance(x._stack_trace, ir.StackTrace)
+        self.assertIn('test_stack_trace_is_captured', str(x._stack_trace))
+        self.assertIs(x.copy(*x.children)._stack_trace, x._stack_trace)
+
+    def test_stack_trace_capture_can_be_disabled(self):
+        ir.capture_stack_traces(False)
+        try:
+            x = ir.ArrayRef(ir.Ref('a'), ir.I32(0))
+            self.assertIsNotNone(x._error_id)
+            self.assertIsNone(x._stack_trace)
+        finally:
+            ir.capture_stack_traces(True)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+
+import aiohttp
+from aiohttp import web
+import pytest
+
+import hail.ir as ir
+from hail.backend.service_backend import ServiceBackend, ServiceSocket
+from hail.expr.types import tint32
+from hailtop.config import DeployConfig
+from hailtop.utils import async_to_blocking
+
+
+class StandInQueryService:
+    """Speaks the query service's multiplexed protocol, answering requests without a JVM."""
+
+    def __init__(self):
+        self.n_connections = 0
+        self.requests = []
+        self.close_after_response = False
+        self.runner = None
+        self.url = None
+
+    async def multiplex(self, request):
+        self.n_connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def respond(message):
+            data = message['data']
+            await asyncio.sleep(data.get('delay', 0))
+            if message['endpoint'] == 'type/value':
+                value = 'int32'
+            elif message['endpoint'] == 'fail':
+                await ws.send_json({'id': message['id'], 'status': 500, 'value': 'boom'})
+                return
+            else:
+                value = data['x']
+            await ws.send_json({'id': message['id'], 'status': 200, 'value': value})
+            if self.close_after_response:
+                await ws.close()
+
+        tasks = []
+        async for message in ws:
+            message = json.loads(message.data)
+            self.requests.append(message)
+            tasks.append(asyncio.ensure_future(respond(message)))
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/api/v1alpha/multiplex', self.multiplex)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class LocalServiceSocket(ServiceSocket):
+    def __init__(self, url):
+        super().__init__(deploy_config=DeployConfig('external', 'default', 'hail.is'))
+        self.url = url
+
+    async def session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+
+@pytest.fixture
+def service():
+    service = StandInQueryService()
+    async_to_blocking(service.start())
+    yield service
+    async_to_blocking(service.stop())
+
+
+@pytest.fixture
+def socket(service):
+    socket = LocalServiceSocket(service.url)
+    yield socket
+    socket.close()
+
+
+def test_concurrent_requests_share_one_connection(socket, service):
+    async def requests():
+        return await asyncio.gather(*[socket.async_request('echo', x=i, delay=(10 - i) / 100)
+                                      for i in range(10)])
+
+    assert async_to_blocking(requests()) == list(range(10))
+    assert socket.request('echo', x='again') == 'again'
+    assert service.n_connections == 1
+    assert len({r['data']['token'] for r in service.requests}) == 11
+
+
+def test_reconnects_after_connection_is_lost(socket, service):
+    service.close_after_response = True
+    assert socket.request('echo', x=1) == 1
+    assert socket.request('echo', x=2) == 2
+    assert service.n_connections == 2
+
+
+def test_server_errors_are_raised(socket):
+    from hail.utils import FatalError
+    with pytest.raises(FatalError, match='boom'):
+        socket.request('fail')
+    assert socket.request('echo', x=3) == 3
+
+
+def test_type_queries_are_cached(socket, service):
+    backend = ServiceBackend(billing_project='test', bucket='test',
+                             deploy_config=DeployConfig('external', 'default', 'hail.is'))
+    backend.socket = socket
+
+    def make_ir():
+        return ir.ApplyBinaryPrimOp('+', ir.I32(1), ir.I32(2))
+
+    assert backend.value_type(make_ir()) == tint32
+    assert backend.value_type(make_ir()) == tint32
+    assert backend.value_type(ir.ApplyBinaryPrimOp('+', ir.I32(1), ir.I32(3))) == tint32
+    assert len(service.requests) == 2
+
+
+def test_type_queries_of_reads_are_cached_until_the_data_is_overwritten(socket, service, tmp_path):
+    backend = ServiceBackend(billing_project='test', bucket='test',
+                             deploy_config=DeployConfig('external', 'default', 'hail.is'))
+    backend.socket = socket
+
+    path = str(tmp_path / 't.ht')
+    os.mkdir(path)
+
+    def write_table(metadata, mtime):
+        with open(f'{path}/metadata.json.gz', 'w') as f:
+            f.write(metadata)
+        os.utime(f'{path}/metadata.json.gz', (mtime, mtime))
+
+    def make_ir():
+        reader = ir.TableNativeReader(path, None, False)
+        return ir.TableCount(ir.TableRead(reader, False))
+
+    write_table('a', 1000)
+    backend.value_type(make_ir())
+    backend.value_type(make_ir())
+    assert len(service.requests) == 1
+
+    # the table is overwritten
+    write_table('b', 2000)
+    backend.value_type(make_ir())
+    backend.value_type(make_ir())
+    assert len(service.requests) == 2
+
+    # reads whose files cannot be identified are not cached
+    missing = ir.TableCount(ir.TableRead(ir.TableNativeReader(str(tmp_path / 'missing.ht'), None, False), False))
+    backend.value_type(missing)
+    backend.value_type(missing)
+    assert len(service.requests) == 4
@@ -1,11 +1,16 @@
+import base64
+import gzip
 import os
 import secrets
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import functools
+from itertools import accumulate
 import pytest
 from hailtop.utils import url_scheme, bounded_gather2
 from hailtop.aiotools import LocalAsyncFS, RouterAsyncFS, Transfer, FileAndDirectoryError
+import google_crc32c
+from hailtop.aiotools.fs import FileStatus, RangeScheduler, SourceCopier, crc32c_combine
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 from hailtop.aiotools.s3asyncfs import S3AsyncFS
 
@@ -434,6 +439,139 @@ async def test_copy_src_parts(copy_test_context):
     await expect_file(fs, f'{dest_base}subdir/file2', 'src/a/subdir/file2')
 
 
+@pytest.mark.asyncio
+async def test_sync_skips_unchanged_file(copy_test_context):
+    sema, fs, src_base, dest_base = copy_test_context
+
+    await create_test_file(fs, 'src', src_base, 'a')
+    await fs.copy(sema, Transfer(f'{src_base}a', f'{dest_base}a'))
+
+    copy_report = await fs.copy(sema, Transfer(f'{src_base}a', f'{dest_base}a'), sync=True)
+    source_report = copy_report._transfer_report._source_report
+    assert (source_report._files, source_report._skipped_files) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_sync_dir_copies_only_changed_files(copy_test_context):
+    sema, fs, src_base, dest_base = copy_test_context
+
+    await create_test_dir(fs, 'src', src_base, 'a/')
+    await fs.copy(sema, Transfer(f'{src_base}a', dest_base.rstrip('/')))
+    # same size, different contents
+    await write_file(fs, f'{src_base}a/file1', b'SRC/a/file1')
+    await create_test_file(fs, 'src', src_base, 'a/file4')
+
+    copy_report = await fs.copy(sema, Transfer(f'{src_base}a', dest_base.rstrip('/')), sync=True)
+    source_report = copy_report._transfer_report._source_report
+    assert (source_report._files, source_report._skipped_files) == (2, 1)
+
+    await expect_file(fs, f'{dest_base}a/file1', 'SRC/a/file1')
+    await expect_file(fs, f'{dest_base}a/subdir/file2', 'src/a/subdir/file2')
+    await expect_file(fs, f'{dest_base}a/file4', 'src/a/file4')
+
+
+@pytest.mark.asyncio
+async def test_copy_large_file_in_ranges(copy_test_context, monkeypatch):
+    sema, fs, src_base, dest_base = copy_test_context
+
+    # downloads of files of at least two ranges are ranged
+    monkeypatch.setattr(SourceCopier, 'MIN_RANGE_SIZE', 1024)
+    data = secrets.token_bytes(10 * 1024 + 7)
+    await write_file(fs, f'{src_base}a', data)
+
+    await fs.copy(sema, Transfer(f'{src_base}a', f'{dest_base}a'))
+
+    async with await fs.open(f'{dest_base}a') as f:
+        assert await f.read() == data
+
+
+@pytest.mark.asyncio
+async def test_copy_multi_part_file_is_verified(copy_test_context, monkeypatch):
+    sema, fs, src_base, dest_base = copy_test_context
+
+    monkeypatch.setattr(SourceCopier, 'PART_SIZE', 1024)
+    data = secrets.token_bytes(3 * 1024 + 5)
+    await write_file(fs, f'{src_base}a', data)
+
+    copy_report = await fs.copy(sema, Transfer(f'{src_base}a', f'{dest_base}a'))
+    assert copy_report._transfer_report._source_report._complete == 1
+
+    async with await fs.open(f'{dest_base}a') as f:
+        assert await f.read() == data
+
+
+class GzipEncodedFileStatus(FileStatus):
+    # the status Google Storage reports for `data` stored gzip-encoded
+    def __init__(self, data):
+        self.stored = gzip.compress(data)
+
+    async def size(self):
+        return len(self.stored)
+
+    async def __getitem__(self, key):
+        if key == 'contentEncoding':
+            return 'gzip'
+        if key == 'crc32c':
+            return base64.b64encode(google_crc32c.value(self.stored).to_bytes(4, 'big')).decode()
+        raise KeyError(key)
+
+
+@pytest.mark.asyncio
+async def test_copy_of_encoded_file_is_verified_against_bytes_read(tmp_path, monkeypatch):
+    data = secrets.token_bytes(3 * 1024 + 5)
+    src = str(tmp_path / 'src')
+    dest = str(tmp_path / 'dest')
+    with open(src, 'wb') as f:
+        f.write(data)
+
+    statfile = LocalAsyncFS.statfile
+
+    async def statfile_of_encoded_src(self, url):
+        if url.endswith('/src'):
+            return GzipEncodedFileStatus(data)
+        return await statfile(self, url)
+
+    monkeypatch.setattr(LocalAsyncFS, 'statfile', statfile_of_encoded_src)
+    monkeypatch.setattr(SourceCopier, 'PART_SIZE', 1024)
+
+    with ThreadPoolExecutor() as thread_pool:
+        async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool)]) as fs:
+            copy_report = await fs.copy(asyncio.Semaphore(10), Transfer(src, dest))
+            assert copy_report._transfer_report._source_report._complete == 1
+
+    with open(dest, 'rb') as f:
+        assert f.read() == data
+
+
+def test_crc32c_combine():
+    a = secrets.token_bytes(1000)
+    b = secrets.token_bytes(12345)
+    assert crc32c_combine(google_crc32c.value(a), google_crc32c.value(b), len(b)) == google_crc32c.value(a + b)
+    assert crc32c_combine(google_crc32c.value(a), google_crc32c.value(b''), 0) == google_crc32c.value(a)
+
+
+def test_range_scheduler_covers_download():
+    scheduler = RangeScheduler(1000, max_streams=4, min_range_size=10, max_range_size=100, target_secs=1.0)
+    assert scheduler.n_streams == 4
+
+    ranges = []
+    while True:
+        next_range = scheduler.next_range()
+        if next_range is None:
+            break
+        ranges.append(next_range)
+        start, length = next_range
+        assert 10 <= length <= 100 or start + length == 1000
+        # each stream moves 50 bytes per second
+        scheduler.observe(length, length / 50)
+
+    assert [start for start, _ in ranges] == list(accumulate([0] + [length for _, length in ranges[:-1]]))
+    assert sum(length for _, length in ranges) == 1000
+    assert ranges[0][1] == 62
+    # ranges grow to take about target_secs at the observed throughput
+    assert ranges[2][1] == 50
+
+
 async def write_file(fs, url, data):
     async with await fs.create(url) as f:
         await f.write(data)
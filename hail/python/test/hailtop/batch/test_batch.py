@@ -1,4 +1,8 @@
 import unittest
+import unittest.mock
+import contextlib
+import functools
+import io
 import os
 import subprocess as sp
 import tempfile
@@ -13,6 +17,8 @@ from hailtop.batch.globals import arg_max
 from hailtop.utils import grouped
 from hailtop.config import get_user_config
 from hailtop.batch.utils import concatenate
+from hailtop.batch.call_cache import CallCache
+from hailtop.batch_client.client import BatchClient
 
 from .utils import debug_info
 
@@ -393,6 +399,160 @@ class LocalTests(unittest.TestCase):
             b = Batch(backend=backend)
             b.run()
 
+    def test_independent_jobs_run_in_parallel(self):
+        with tempfile.TemporaryDirectory() as dir:
+            b = Batch(backend=LocalBackend(max_cpus=2))
+            # each job waits for the other to start
+            for me, other in [('a', 'b'), ('b', 'a')]:
+                j = b.new_job()
+                j.command(f'touch {dir}/{me}')
+                j.command(f'for i in $(seq 100); do [ -e {dir}/{other} ] && exit 0; sleep 0.1; done; exit 1')
+            b.run()
+
+    def test_jobs_run_within_cpu_limit(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = Batch(backend=LocalBackend(max_cpus=2))
+            for i in range(3):
+                j = b.new_job()
+                j.cpu(2)
+                j.command(f'echo "start {i}" >> {output_file.name}; sleep 0.2; echo "end {i}" >> {output_file.name}')
+            b.run()
+
+            assert self.read(output_file.name) == '\n'.join(f'start {i}\nend {i}' for i in range(3))
+
+    def test_dependent_jobs_wait_for_parents(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = Batch(backend=LocalBackend(max_cpus=4))
+            head = b.new_job()
+            head.command(f'sleep 0.5; echo "head" > {head.ofile}')
+            tails = []
+            for i in range(3):
+                tail = b.new_job()
+                tail.command(f'cat {head.ofile} > {tail.ofile}; echo "{i}" >> {tail.ofile}')
+                tails.append(tail)
+            merger = b.new_job()
+            merger.command(f'cat {" ".join(t.ofile for t in tails)} > {merger.ofile}')
+            b.write_output(merger.ofile, output_file.name)
+            b.run()
+
+            assert self.read(output_file.name) == 'head\n0\nhead\n1\nhead\n2'
+
+    def test_failed_job_skips_its_children(self):
+        with tempfile.TemporaryDirectory() as dir:
+            b = Batch(backend=LocalBackend(max_cpus=2))
+            parent = b.new_job()
+            parent.command('exit 1')
+            child = b.new_job()
+            child.depends_on(parent)
+            child.command(f'touch {dir}/child')
+            with self.assertRaises(sp.CalledProcessError):
+                b.run()
+            assert not os.path.exists(f'{dir}/child')
+
+    def test_call_cache_reuses_outputs_of_unchanged_jobs(self):
+        with tempfile.TemporaryDirectory() as cache, \
+                tempfile.NamedTemporaryFile('w') as input_file, \
+                tempfile.NamedTemporaryFile('w') as runs_file, \
+                tempfile.NamedTemporaryFile('w') as output_file:
+            input_file.write('abc\n')
+            input_file.flush()
+
+            def run(suffix):
+                b = Batch(backend=LocalBackend(), call_cache=cache)
+                input = b.read_input(input_file.name)
+                head = b.new_job()
+                head.command(f'cat {input} > {head.ofile}; echo head >> {runs_file.name}')
+                tail = b.new_job()
+                tail.command(f'cat {head.ofile} > {tail.ofile}; echo {suffix} >> {tail.ofile}; '
+                             f'echo tail >> {runs_file.name}')
+                b.write_output(tail.ofile, output_file.name)
+                b.run()
+
+            run('1')
+            run('1')
+            assert self.read(runs_file.name) == 'head\ntail'
+            assert self.read(output_file.name) == 'abc\n1'
+
+            run('2')
+            assert self.read(runs_file.name) == 'head\ntail\ntail'
+            assert self.read(output_file.name) == 'abc\n2'
+
+            with open(input_file.name, 'w') as f:
+                f.write('xyz\n')
+            run('2')
+            assert self.read(runs_file.name) == 'head\ntail\ntail\nhead\ntail'
+            assert self.read(output_file.name) == 'xyz\n2'
+
+    def test_call_cache_reruns_jobs_with_missing_outputs(self):
+        with tempfile.TemporaryDirectory() as cache, \
+                tempfile.NamedTemporaryFile('w') as runs_file, \
+                tempfile.NamedTemporaryFile('w') as output_file:
+            def run():
+                b = Batch(backend=LocalBackend(), call_cache=cache)
+                j = b.new_job()
+                j.command(f'echo hello > {j.ofile}; echo run >> {runs_file.name}')
+                b.write_output(j.ofile, output_file.name)
+                b.run()
+
+            run()
+            for root, _, files in os.walk(cache):
+                if 'ofile' in files:
+                    os.remove(os.path.join(root, 'ofile'))
+            run()
+            assert self.read(runs_file.name) == 'run\nrun'
+            assert self.read(output_file.name) == 'hello'
+
+    def test_call_cache_python_job(self):
+        with tempfile.TemporaryDirectory() as cache, \
+                tempfile.NamedTemporaryFile('w') as output_file:
+            calls = []
+
+            def run():
+                b = Batch(backend=LocalBackend(), call_cache=cache)
+                j = b.new_python_job()
+                result = j.call(lambda x: x * 2, 21)
+                b.write_output(result.as_str(), output_file.name)
+                b.run()
+                calls.append(self.read(output_file.name))
+
+            run()
+            os.remove(output_file.name)
+            run()
+            assert calls == ['42', '42']
+            # the second run copied the cached result rather than running the job
+            assert len(os.listdir(cache)) == 1
+
+
+class ServiceBackendDryRunTests(unittest.TestCase):
+    def dry_run_commands(self, b):
+        async def nothing_cached(self, keys):  # pylint: disable=unused-argument
+            return set()
+
+        out = io.StringIO()
+        with unittest.mock.patch.object(CallCache, 'lookup', nothing_cached), \
+                contextlib.redirect_stdout(out):
+            b.run(dry_run=True, disable_progress_bar=True)
+        return out.getvalue()
+
+    def test_call_cache_manifest_is_not_written_when_a_command_fails(self):
+        with unittest.mock.patch('hailtop.batch.backend.BatchClient', functools.partial(BatchClient, _token='token')):
+            backend = ServiceBackend(billing_project='test', remote_tmpdir='gs://bucket/tmp')
+        try:
+            b = Batch(backend=backend, call_cache='gs://bucket/cache')
+            j = b.new_job()
+            j.command('false')
+            j.command(f'echo hello > {j.ofile}')
+            b.write_output(j.ofile, 'gs://bucket/output')
+            commands = self.dry_run_commands(b)
+        finally:
+            backend.close()
+
+        with tempfile.TemporaryDirectory() as dir:
+            cmd = commands.replace('/io/batch/', f'{dir}/')
+            assert sp.run(['bash', '-c', cmd], check=False).returncode != 0
+            manifests = [f for _, _, files in os.walk(dir) for f in files if f.endswith('.manifest')]
+            assert manifests == []
+
 
 class ServiceTests(unittest.TestCase):
     def setUp(self):
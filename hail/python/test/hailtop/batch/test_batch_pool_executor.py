@@ -172,3 +172,27 @@ def test_bad_image_gives_good_error():
         assert 'submitted job failed:' in exc.args[0]
     else:
         assert False
+
+
+def test_map_packs_calls_into_shared_batches():
+    with BatchPoolExecutor(project='hail-vdc', image=PYTHON_DILL_IMAGE, calls_per_job=4, jobs_per_batch=2) as bpe:
+        actual = list(bpe.map(lambda x: x + 1, range(20)))
+    assert actual == list(range(1, 21))
+    # 5 jobs of 4 calls, 2 jobs per batch
+    assert len(bpe.batches) == 3
+
+
+def test_exception_in_packed_job():
+    def maybe_raise_value_error(x):
+        if x == 2:
+            raise ValueError('dead')
+        return x
+    with BatchPoolExecutor(project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+        gen = bpe.map(maybe_raise_value_error, range(4), chunksize=4)
+        assert [next(gen), next(gen)] == [0, 1]
+        try:
+            next(gen)
+        except ValueError as exc:
+            assert 'ValueError: dead' in exc.args[0]
+        else:
+            assert False
@@ -0,0 +1,112 @@
+import json
+
+import aiohttp
+from aiohttp import web
+import pytest
+
+from hailtop.batch_client.aioclient import BatchClient
+from hailtop.config.deploy_config import DeployConfig
+
+N_JOBS = 25
+
+
+class StandInFrontEnd:
+    def __init__(self, can_export, interrupt_after=None):
+        self.can_export = can_export
+        self.interrupt_after = interrupt_after
+        self.requests = []
+
+    async def get_batch(self, request):  # pylint: disable=unused-argument
+        return web.json_response({'id': 1, 'n_jobs': N_JOBS, 'token': 'token'})
+
+    async def get_jobs(self, request):
+        self.requests.append(dict(request.query))
+        last_job_id = int(request.query.get('last_job_id', 0))
+        jobs = [{'job_id': job_id} for job_id in range(last_job_id + 1, min(last_job_id + 10, N_JOBS) + 1)]
+        body = {'jobs': jobs}
+        if jobs and jobs[-1]['job_id'] < N_JOBS:
+            body['last_job_id'] = jobs[-1]['job_id']
+        return web.json_response(body)
+
+    async def export_jobs(self, request):
+        self.requests.append(dict(request.query))
+        last_job_id = int(request.query.get('last_job_id', 0))
+
+        resp = web.StreamResponse()
+        resp.content_type = 'application/x-ndjson'
+        await resp.prepare(request)
+        for job_id in range(last_job_id + 1, N_JOBS + 1):
+            await resp.write(json.dumps({'job_id': job_id}).encode() + b'\n')
+            if job_id == self.interrupt_after:
+                self.interrupt_after = None
+                request.transport.close()
+                return resp
+        await resp.write_eof()
+        return resp
+
+    async def get_job(self, request):
+        self.requests.append(dict(request.query))
+        job_id = int(request.match_info['job_id'])
+        return web.json_response({'job_id': job_id})
+
+    def app(self):
+        # the routes of the front end, in the order it registers them
+        app = web.Application()
+        app.router.add_get('/api/v1alpha/batches/{batch_id}', self.get_batch)
+        app.router.add_get('/api/v1alpha/batches/{batch_id}/jobs', self.get_jobs)
+        if self.can_export:
+            app.router.add_get('/api/v1alpha/batches/{batch_id}/jobs/export', self.export_jobs)
+        app.router.add_get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}', self.get_job)
+        return app
+
+
+async def export(front_end, last_job_id=None):
+    runner = web.AppRunner(front_end.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        async with aiohttp.ClientSession(raise_for_status=True) as session:
+            client = BatchClient(
+                'test', deploy_config=DeployConfig('external', 'default', 'example.com'), session=session, _token='token'
+            )
+            client.url = f'http://{host}:{port}'
+            batch = await client.get_batch(1)
+            return [job['job_id'] async for job in batch.export_jobs(page_size=10, last_job_id=last_job_id)]
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_export_streams_all_jobs():
+    front_end = StandInFrontEnd(can_export=True)
+    assert await export(front_end) == list(range(1, N_JOBS + 1))
+    assert front_end.requests == [{'page_size': '10'}]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_export_resumes():
+    front_end = StandInFrontEnd(can_export=True, interrupt_after=12)
+    assert await export(front_end) == list(range(1, N_JOBS + 1))
+    assert front_end.requests == [{'page_size': '10'}, {'page_size': '10', 'last_job_id': '12'}]
+
+
+@pytest.mark.asyncio
+async def test_export_falls_back_to_paging():
+    front_end = StandInFrontEnd(can_export=False)
+    assert await export(front_end) == list(range(1, N_JOBS + 1))
+    # the export request fails once, as a request for the job "export", and
+    # is not retried
+    assert front_end.requests == [{'page_size': '10'}, {}, {'last_job_id': '10'}, {'last_job_id': '20'}]
+
+
+@pytest.mark.asyncio
+async def test_export_starts_after_last_job_id():
+    front_end = StandInFrontEnd(can_export=True)
+    assert await export(front_end, last_job_id=20) == list(range(21, N_JOBS + 1))
+    assert front_end.requests == [{'page_size': '10', 'last_job_id': '20'}]
+
+    front_end = StandInFrontEnd(can_export=False)
+    assert await export(front_end, last_job_id=20) == list(range(21, N_JOBS + 1))
+    assert front_end.requests == [{'page_size': '10', 'last_job_id': '20'}, {'last_job_id': '20'}]
@@ -0,0 +1,122 @@
+import aiohttp
+from aiohttp import web
+import pytest
+
+from hailtop.batch_client.aioclient import BatchClient
+from hailtop.config.deploy_config import DeployConfig
+
+
+class StandInFrontEnd:
+    """Completes one job of a three job batch per request."""
+
+    def __init__(self, can_wait):
+        self.can_wait = can_wait
+        self.n_completed = 0
+        self.requests = []
+        self.last_n_completeds = []
+
+    def batch_status(self):
+        return {'id': 1, 'n_jobs': 3, 'token': 'token', 'n_completed': self.n_completed, 'complete': self.n_completed == 3}
+
+    def job_status(self):
+        return {'batch_id': 1, 'job_id': 3, 'state': 'Success' if self.n_completed == 3 else 'Running'}
+
+    async def get_batch(self, request):
+        self.requests.append(request.path)
+        self.n_completed = min(self.n_completed + 1, 3)
+        return web.json_response(self.batch_status())
+
+    async def wait_for_batch(self, request):
+        self.requests.append(request.path)
+        self.last_n_completeds.append(int(request.query['last_n_completed']))
+        self.n_completed = min(self.n_completed + 1, 3)
+        return web.json_response(self.batch_status())
+
+    async def get_job(self, request):
+        self.requests.append(request.path)
+        self.n_completed = min(self.n_completed + 1, 3)
+        return web.json_response(self.job_status())
+
+    async def wait_for_job(self, request):
+        self.requests.append(request.path)
+        self.n_completed = 3
+        return web.json_response(self.job_status())
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/api/v1alpha/batches/1', self.get_batch)
+        app.router.add_get('/api/v1alpha/batches/1/jobs/3', self.get_job)
+        if self.can_wait:
+            app.router.add_get('/api/v1alpha/batches/1/wait', self.wait_for_batch)
+            app.router.add_get('/api/v1alpha/batches/1/jobs/3/wait', self.wait_for_job)
+        return app
+
+
+async def with_client(front_end, f):
+    runner = web.AppRunner(front_end.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        async with aiohttp.ClientSession(raise_for_status=True) as session:
+            client = BatchClient(
+                'test', deploy_config=DeployConfig('external', 'default', 'example.com'), session=session, _token='token'
+            )
+            client.url = f'http://{host}:{port}'
+            return await f(client)
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_batch_wait_waits_on_the_server():
+    front_end = StandInFrontEnd(can_wait=True)
+
+    async def wait(client):
+        batch = await client.get_batch(1)
+        return await batch.wait(disable_progress_bar=True)
+
+    status = await with_client(front_end, wait)
+    assert status['complete']
+    assert front_end.requests == ['/api/v1alpha/batches/1'] + ['/api/v1alpha/batches/1/wait'] * 2
+    assert front_end.last_n_completeds == [-1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_wait_falls_back_to_polling():
+    front_end = StandInFrontEnd(can_wait=False)
+
+    async def wait(client):
+        batch = await client.get_batch(1)
+        return await batch.wait(disable_progress_bar=True)
+
+    status = await with_client(front_end, wait)
+    assert status['complete']
+    assert front_end.requests == ['/api/v1alpha/batches/1'] * 3
+
+
+@pytest.mark.asyncio
+async def test_job_wait_waits_on_the_server():
+    front_end = StandInFrontEnd(can_wait=True)
+
+    async def wait(client):
+        job = await client.get_job(1, 3)
+        return await job.wait()
+
+    status = await with_client(front_end, wait)
+    assert status['state'] == 'Success'
+    assert front_end.requests[-1] == '/api/v1alpha/batches/1/jobs/3/wait'
+
+
+@pytest.mark.asyncio
+async def test_job_wait_falls_back_to_polling():
+    front_end = StandInFrontEnd(can_wait=False)
+
+    async def wait(client):
+        job = await client.get_job(1, 3)
+        return await job.wait()
+
+    status = await with_client(front_end, wait)
+    assert status['state'] == 'Success'
+    assert '/api/v1alpha/batches/1/jobs/3/wait' not in front_end.requests
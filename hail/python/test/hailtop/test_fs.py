@@ -107,6 +107,23 @@ async def test_open_from(filesystem):
         assert r == b'cde'
 
 
+@pytest.mark.asyncio
+async def test_open_from_with_length(filesystem):
+    sema, fs, base = filesystem
+
+    file = f'{base}foo'
+
+    await fs.write(file, b'abcde')
+
+    async with await fs.open_from(file, 1, length=3) as f:
+        r = await f.read()
+        assert r == b'bcd'
+
+    async with await fs.open_from(file, 3, length=10) as f:
+        r = await f.read()
+        assert r == b'de'
+
+
 @pytest.mark.asyncio
 async def test_read_from(filesystem):
     sema, fs, base = filesystem
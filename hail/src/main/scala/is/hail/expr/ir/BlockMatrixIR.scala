@@ -18,7 +18,6 @@ import is.hail.io.fs.FS
 import is.hail.types.encoded.{EBlockMatrixNDArray, EFloat64}
 
 import scala.collection.mutable.ArrayBuffer
-import is.hail.utils.richUtils.RichDenseMatrixDouble
 import org.apache.spark.sql.Row
 import org.json4s.{DefaultFormats, Extraction, Formats, JValue, ShortTypeHints}
 
@@ -196,16 +195,15 @@ case class BlockMatrixBinaryReader(path: String, shape: IndexedSeq[Long], blockS
   def pathsUsed: Seq[String] = Array(path)
 
   val IndexedSeq(nRows, nCols) = shape
-  BlockMatrixIR.checkFitsIntoArray(nRows, nCols)
+  require(nRows <= Int.MaxValue, s"Number of rows exceeds Int.MaxValue: $nRows")
+  require(nCols <= Int.MaxValue, s"Number of columns exceeds Int.MaxValue: $nCols")
 
   lazy val fullType: BlockMatrixType = {
     BlockMatrixType.dense(TFloat64, nRows, nCols, blockSize)
   }
 
-  def apply(ctx: ExecuteContext): BlockMatrix = {
-    val breezeMatrix = RichDenseMatrixDouble.importFromDoubles(ctx.fs, path, nRows.toInt, nCols.toInt, rowMajor = true)
-    BlockMatrix.fromBreezeMatrix(breezeMatrix, blockSize)
-  }
+  def apply(ctx: ExecuteContext): BlockMatrix =
+    BlockMatrix.importFromDoubles(ctx.fs, path, nRows, nCols, blockSize)
 }
 
 case class BlockMatrixNativePersistParameters(id: String)
@@ -97,6 +97,13 @@ object EncodedLiteral {
     val bytes = codec.encode(ctx, pt, addr)
     EncodedLiteral(codec, bytes)
   }
+
+  // used by the Python frontend to ship large literals outside of the IR text
+  def fromPython(typeString: String, eTypeString: String, value: Array[Byte]): EncodedLiteral = {
+    val etype = IRParser.parse[EType](eTypeString, EType.eTypeParser)
+    val codec = TypedCodecSpec(etype, IRParser.parseType(typeString), BufferSpec.unblockedUncompressed)
+    EncodedLiteral(codec, value)
+  }
 }
 
 final case class EncodedLiteral(codec: AbstractTypedCodecSpec, value: WrappedByteArray) extends IR {
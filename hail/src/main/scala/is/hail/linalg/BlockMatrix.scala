@@ -124,6 +124,44 @@ object BlockMatrix {
     BlockMatrix(gp, (gp, pi) => (gp.blockCoordinates(pi), localBlocksBc(pi).value))
   }
 
+  // reads a row-major binary file of doubles one block row at a time, so the
+  // matrix need not fit in a single array
+  def importFromDoubles(fs: FS, path: String, nRows: Long, nCols: Long, blockSize: Int): M = {
+    val gp = GridPartitioner(blockSize, nRows, nCols)
+    val localBlocksBc = new Array[BroadcastValue[BDM[Double]]](gp.numPartitions)
+
+    using(fs.open(path)) { is =>
+      val in = new DoubleInputBuffer(is, RichArray.defaultBufSize)
+
+      var i = 0
+      while (i < gp.nBlockRows) {
+        val blockNRows = gp.blockRowNRows(i)
+        val blocks = Array.tabulate(gp.nBlockCols)(j => new Array[Double](blockNRows * gp.blockColNCols(j)))
+
+        var r = 0
+        while (r < blockNRows) {
+          var j = 0
+          while (j < gp.nBlockCols) {
+            val blockNCols = gp.blockColNCols(j)
+            in.readDoubles(blocks(j), r * blockNCols, blockNCols)
+            j += 1
+          }
+          r += 1
+        }
+
+        var j = 0
+        while (j < gp.nBlockCols) {
+          localBlocksBc(gp.coordinatesBlock(i, j)) = HailContext.backend.broadcast(
+            RichDenseMatrixDouble(blockNRows, gp.blockColNCols(j), blocks(j), isTranspose = true))
+          j += 1
+        }
+        i += 1
+      }
+    }
+
+    BlockMatrix(gp, (gp, pi) => (gp.blockCoordinates(pi), localBlocksBc(pi).value))
+  }
+
   def fromIRM(irm: IndexedRowMatrix): M =
     fromIRM(irm, defaultBlockSize)
 
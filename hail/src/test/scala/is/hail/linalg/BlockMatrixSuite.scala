@@ -10,6 +10,7 @@ import is.hail.expr.ir.{CompileAndEvaluate, GetField, TableCollect, TableLiteral
 import is.hail.types.virtual.{TFloat64, TInt64, TStruct}
 import is.hail.linalg.BlockMatrix.ops._
 import is.hail.utils._
+import is.hail.utils.richUtils.RichDenseMatrixDouble
 import is.hail.{HailSuite, TestUtils}
 import org.apache.spark.sql.Row
 import org.testng.annotations.Test
@@ -366,6 +367,18 @@ class BlockMatrixSuite extends HailSuite {
     }.check()
   }
 
+  @Test
+  def importFromDoublesTest() {
+    forAll(denseMatrix[Double]().flatMap { m =>
+      Gen.zip(Gen.const(m), Gen.choose(1, m.rows + 16))
+    }) { case (lm, blockSize) =>
+      val fname = ctx.createTmpPath("test")
+      RichDenseMatrixDouble.exportToDoubles(fs, fname, lm, forceRowMajor = true)
+      assert(lm === BlockMatrix.importFromDoubles(fs, fname, lm.rows, lm.cols, blockSize).toBreezeMatrix())
+      true
+    }.check()
+  }
+
   @Test
   def readWriteIdentityTrivial() {
     val m = toBM(4, 4, Array[Double](
@@ -6,8 +6,9 @@ import concurrent
 import logging
 import uvloop
 import asyncio
+import json
 import signal
-from aiohttp import web
+from aiohttp import web, WSMsgType
 import kubernetes_asyncio as kube
 from prometheus_async.aio.web import server_stats  # type: ignore
 from collections import defaultdict
@@ -141,6 +142,72 @@ async def handle_ws_response(request, userdata, endpoint, f):
     return ws
 
 
+MULTIPLEXED_ENDPOINTS = {
+    'execute': blocking_execute,
+    'load_references_from_dataset': blocking_load_references_from_dataset,
+    'type/value': blocking_value_type,
+    'type/table': blocking_table_type,
+    'type/matrix': blocking_matrix_type,
+    'type/blockmatrix': blocking_blockmatrix_type,
+    'references/get': blocking_get_reference,
+}
+
+
+@routes.get('/api/v1alpha/multiplex')
+@rest_authenticated_users_only
+async def multiplex(request, userdata):
+    """Serve many requests over one websocket.
+
+    Each message is ``{"id": ..., "endpoint": ..., "data": ...}``, where ``data`` is
+    the body the corresponding single-request endpoint expects. Requests run
+    concurrently; each response carries the id of its request.
+    """
+    app = request.app
+    user_queries: Dict[str, asyncio.Future] = request.app['queries'][userdata['username']]
+
+    ws = web.WebSocketResponse(heartbeat=30, max_msg_size=0)
+    await ws.prepare(request)
+    await add_user(app, userdata)
+
+    async def respond(request_id, endpoint, body):
+        f = MULTIPLEXED_ENDPOINTS.get(endpoint)
+        if f is None:
+            await ws.send_json({'id': request_id, 'status': 400, 'value': f'unknown endpoint: {endpoint}'})
+            return
+        token = body['token']
+        query = user_queries.get(token)
+        if query is None:
+            query = asyncio.ensure_future(retry_transient_errors(blocking_to_async, app['thread_pool'], f, userdata, body))
+            user_queries[token] = query
+        try:
+            try:
+                response = {'id': request_id, 'status': 200, 'value': await query}
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                exc_str = traceback.format_exception(type(exc), exc, exc.__traceback__)
+                response = {'id': request_id, 'status': 500, 'value': exc_str}
+            await ws.send_json(response)
+        finally:
+            query.cancel()
+            user_queries.pop(token, None)
+
+    in_flight = set()
+    try:
+        async for message in ws:  # iterating automatically ping-pongs which keeps the socket alive
+            if message.type != WSMsgType.TEXT:
+                break
+            message = json.loads(message.data)
+            task = asyncio.ensure_future(respond(message['id'], message['endpoint'], message['data']))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    finally:
+        for task in list(in_flight):
+            task.cancel()
+        await ws.close()
+    return ws
+
+
 @routes.get('/api/v1alpha/execute')
 @rest_authenticated_users_only
 async def execute(request, userdata):